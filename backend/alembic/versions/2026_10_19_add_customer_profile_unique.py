@@ -0,0 +1,77 @@
+"""Add unique (project_id, customer_id) constraint on customer_profiles
+
+Revision ID: add_customer_profile_unique
+Revises: add_message_idempotency
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = 'add_customer_profile_unique'
+down_revision = 'add_message_idempotency'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if not inspector.has_table('customer_profiles'):
+        return
+
+    existing = {uc['name'] for uc in inspector.get_unique_constraints('customer_profiles')}
+    if 'uq_customer_profile_project_customer' in existing:
+        return
+
+    # Fold duplicate profiles created by the old select-then-insert race into
+    # the oldest one before adding the constraint
+    op.execute("""
+        WITH ranked AS (
+            SELECT id,
+                   first_value(id) OVER w AS keep_id,
+                   row_number() OVER w AS rn
+            FROM customer_profiles
+            WINDOW w AS (
+                PARTITION BY project_id, customer_id
+                ORDER BY created_at, id::text
+            )
+        ),
+        totals AS (
+            SELECT r.keep_id,
+                   sum(coalesce(p.interaction_count, 0)) AS interaction_count,
+                   max(p.last_interaction) AS last_interaction
+            FROM ranked r
+            JOIN customer_profiles p ON p.id = r.id
+            GROUP BY r.keep_id
+            HAVING count(*) > 1
+        )
+        UPDATE customer_profiles p
+        SET interaction_count = t.interaction_count,
+            last_interaction = t.last_interaction
+        FROM totals t
+        WHERE p.id = t.keep_id
+    """)
+    op.execute("""
+        DELETE FROM customer_profiles p
+        USING customer_profiles d
+        WHERE p.project_id = d.project_id
+          AND p.customer_id = d.customer_id
+          AND (p.created_at, p.id::text) > (d.created_at, d.id::text)
+    """)
+
+    op.create_unique_constraint(
+        'uq_customer_profile_project_customer',
+        'customer_profiles',
+        ['project_id', 'customer_id'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint(
+        'uq_customer_profile_project_customer',
+        'customer_profiles',
+        type_='unique',
+    )
@@ -0,0 +1,48 @@
+"""Add unique (project_id, provider, external_id) index on messages
+
+Revision ID: add_message_idempotency
+Revises: add_usage_tracking
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = 'add_message_idempotency'
+down_revision = 'add_usage_tracking'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    existing = {idx['name'] for idx in inspector.get_indexes('messages')}
+    if 'uq_message_project_provider_external' in existing:
+        return
+
+    # Remove webhook redeliveries stored before dedup existed (keep the first copy)
+    op.execute("""
+        DELETE FROM messages m
+        USING messages d
+        WHERE m.external_id IS NOT NULL
+          AND m.project_id = d.project_id
+          AND m.provider = d.provider
+          AND m.external_id = d.external_id
+          AND (m.created_at, m.id::text) > (d.created_at, d.id::text)
+    """)
+
+    op.create_index(
+        'uq_message_project_provider_external',
+        'messages',
+        ['project_id', 'provider', 'external_id'],
+        unique=True,
+        postgresql_where=sa.text('external_id IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_message_project_provider_external', table_name='messages')
@@ -0,0 +1,54 @@
+"""Rolling conversation summaries and a thread index on conversation_history
+
+Revision ID: conversation_summaries
+Revises: order_items
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'conversation_summaries'
+down_revision = 'order_items'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'conversation_summaries' not in inspector.get_table_names():
+        op.create_table(
+            'conversation_summaries',
+            sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+            sa.Column('project_id', postgresql.UUID(as_uuid=True), nullable=False),
+            sa.Column('customer_id', sa.String(length=255), nullable=False),
+            sa.Column('platform', sa.String(length=50), nullable=False),
+            sa.Column('summary', sa.Text(), nullable=True),
+            sa.Column('covered_until', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('turns_summarized', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('pending_turns', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('project_id', 'customer_id', 'platform', name='uq_conversation_summary_thread'),
+        )
+
+    # Newest turns of one thread (recent window and summary refresh);
+    # created on the partitioned parent, so every partition gets it.
+    # A fresh database gets the table (and index) from the models instead.
+    if inspector.has_table('conversation_history'):
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conversation_thread_created "
+            "ON conversation_history (project_id, customer_id, platform, created_at)"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_conversation_thread_created")
+    op.drop_table('conversation_summaries')
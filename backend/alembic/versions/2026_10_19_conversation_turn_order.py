@@ -0,0 +1,45 @@
+"""Insertion order of conversation turns
+
+Revision ID: conversation_turn_order
+Revises: intent_models
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = 'conversation_turn_order'
+down_revision = 'intent_models'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    # The inbound and outbound turn of one reply are stored in the same
+    # transaction and get the same created_at; seq breaks the tie. Existing
+    # rows keep NULL so the column is added without rewriting partitions.
+    if inspector.has_table('conversation_history'):
+        columns = {column['name'] for column in inspector.get_columns('conversation_history')}
+        if 'seq' not in columns:
+            op.execute("CREATE SEQUENCE IF NOT EXISTS conversation_history_seq")
+            op.add_column('conversation_history', sa.Column('seq', sa.BigInteger(), nullable=True))
+            op.execute(
+                "ALTER TABLE conversation_history "
+                "ALTER COLUMN seq SET DEFAULT nextval('conversation_history_seq')"
+            )
+
+    if inspector.has_table('conversation_summaries'):
+        columns = {column['name'] for column in inspector.get_columns('conversation_summaries')}
+        if 'covered_seq' not in columns:
+            op.add_column('conversation_summaries', sa.Column('covered_seq', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversation_summaries', 'covered_seq')
+    op.drop_column('conversation_history', 'seq')
+    op.execute("DROP SEQUENCE IF EXISTS conversation_history_seq")
@@ -0,0 +1,90 @@
+"""Generated columns for customer identifiers and AI metadata kept in JSONB
+
+Revision ID: customer_lookup_columns
+Revises: shopify_incremental_sync
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = 'customer_lookup_columns'
+down_revision = 'shopify_incremental_sync'
+branch_labels = None
+depends_on = None
+
+# Keep in sync with the Computed() expressions in app/db/models.py
+ORDER_COLUMNS = {
+    'customer_email': "varchar(255) GENERATED ALWAYS AS (lower(customer ->> 'email')) STORED",
+    'customer_phone': "varchar(50) GENERATED ALWAYS AS (customer ->> 'phone') STORED",
+    'customer_name': "varchar(255) GENERATED ALWAYS AS (customer ->> 'name') STORED",
+}
+
+_PARTY = "(coalesce(recipient, '{}'::jsonb) || coalesce(sender, '{}'::jsonb))"
+
+MESSAGE_COLUMNS = {
+    'customer_id': (
+        "varchar(255) GENERATED ALWAYS AS (coalesce("
+        + ", ".join(
+            f"{_PARTY} ->> '{key}'"
+            for key in ('customer_id', 'telegram_id', 'facebook_id', 'instagram_id', 'phone', 'email')
+        )
+        + ")) STORED"
+    ),
+    'ai_tokens_used': (
+        "bigint GENERATED ALWAYS AS (coalesce("
+        "CASE WHEN jsonb_typeof(extra_data -> 'tokens_used') = 'number' "
+        "THEN (extra_data ->> 'tokens_used')::numeric::bigint END, "
+        "ai_prompt_tokens + ai_completion_tokens)) STORED"
+    ),
+}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    order_columns = {column['name'] for column in inspector.get_columns('orders')}
+    for name, definition in ORDER_COLUMNS.items():
+        if name not in order_columns:
+            op.execute(f"ALTER TABLE orders ADD COLUMN {name} {definition}")
+
+    # AI replies only flagged ai_generated/cost inside extra_data; move them
+    # onto the real columns before the generated ones are computed
+    op.execute("""
+        UPDATE messages
+        SET ai_generated = true,
+            ai_model = coalesce(ai_model, extra_data ->> 'model'),
+            ai_cost = coalesce(
+                ai_cost,
+                CASE WHEN jsonb_typeof(extra_data -> 'cost') = 'number'
+                     THEN (extra_data ->> 'cost')::double precision END
+            )
+        WHERE extra_data ->> 'ai_generated' = 'true'
+          AND ai_generated IS NOT true
+    """)
+
+    message_columns = {column['name'] for column in inspector.get_columns('messages')}
+    for name, definition in MESSAGE_COLUMNS.items():
+        if name not in message_columns:
+            # On the partitioned table this cascades to every partition
+            op.execute(f"ALTER TABLE messages ADD COLUMN {name} {definition}")
+
+    op.execute("CREATE INDEX IF NOT EXISTS idx_order_project_customer_email ON orders (project_id, customer_email)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_order_project_customer_phone ON orders (project_id, customer_phone)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_message_project_customer_created "
+        "ON messages (project_id, customer_id, created_at)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_message_project_customer_created")
+    op.execute("DROP INDEX IF EXISTS idx_order_project_customer_phone")
+    op.execute("DROP INDEX IF EXISTS idx_order_project_customer_email")
+
+    for name in MESSAGE_COLUMNS:
+        op.execute(f"ALTER TABLE messages DROP COLUMN IF EXISTS {name}")
+    for name in ORDER_COLUMNS:
+        op.execute(f"ALTER TABLE orders DROP COLUMN IF EXISTS {name}")
@@ -0,0 +1,42 @@
+"""Trained local intent classifiers
+
+Revision ID: intent_models
+Revises: conversation_summaries
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'intent_models'
+down_revision = 'conversation_summaries'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if 'intent_models' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'intent_models',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('project_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('model', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('report', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('samples', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('trained_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('idx_intent_model_project_trained', 'intent_models', ['project_id', 'trained_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_intent_model_project_trained', table_name='intent_models')
+    op.drop_table('intent_models')
@@ -0,0 +1,88 @@
+"""Normalized order_items table backfilled from orders.items
+
+Revision ID: order_items
+Revises: customer_lookup_columns
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'order_items'
+down_revision = 'customer_lookup_columns'
+branch_labels = None
+depends_on = None
+
+
+def _number(key: str) -> str:
+    value = f"item.value ->> '{key}'"
+    return (
+        f"CASE WHEN jsonb_typeof(item.value -> '{key}') = 'number' "
+        f"OR {value} ~ '^-?[0-9]+(\\.[0-9]+)?$' THEN ({value})::numeric END"
+    )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if 'order_items' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'order_items',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('order_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('project_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.String(length=255), nullable=True),
+        sa.Column('sku', sa.String(length=100), nullable=True),
+        sa.Column('name', sa.String(length=500), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('unit_price', sa.Float(), nullable=False),
+        sa.Column('order_date', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+    # Same projection as app.services.order_items.refresh_order_items,
+    # applied to every existing order
+    op.execute(f"""
+        INSERT INTO order_items (
+            id, order_id, project_id, position, product_id, sku, name,
+            quantity, unit_price, order_date
+        )
+        SELECT
+            gen_random_uuid(),
+            o.id,
+            o.project_id,
+            item.position - 1,
+            left(item.value ->> 'product_id', 255),
+            left(item.value ->> 'sku', 100),
+            left(coalesce(item.value ->> 'name', item.value ->> 'product_name', item.value ->> 'title'), 500),
+            coalesce({_number('quantity')}, 1)::integer,
+            coalesce({_number('price')}, {_number('unit_price')}, 0)::double precision,
+            coalesce(o.order_date, o.created_at)
+        FROM orders o
+        CROSS JOIN LATERAL jsonb_array_elements(
+            CASE WHEN jsonb_typeof(o.items) = 'array' THEN o.items ELSE '[]'::jsonb END
+        ) WITH ORDINALITY AS item(value, position)
+        WHERE jsonb_typeof(item.value) = 'object'
+    """)
+
+    # Indexes after the backfill so it does not maintain them row by row
+    op.create_index('idx_order_item_order', 'order_items', ['order_id'])
+    op.create_index('idx_order_item_project_date', 'order_items', ['project_id', 'order_date'])
+    op.create_index('idx_order_item_project_product', 'order_items', ['project_id', 'product_id'])
+    op.create_index('idx_order_item_project_sku', 'order_items', ['project_id', 'sku'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_order_item_project_sku', table_name='order_items')
+    op.drop_index('idx_order_item_project_product', table_name='order_items')
+    op.drop_index('idx_order_item_project_date', table_name='order_items')
+    op.drop_index('idx_order_item_order', table_name='order_items')
+    op.drop_table('order_items')
@@ -0,0 +1,208 @@
+"""Partition messages, api_logs and conversation_history by month
+
+Revision ID: partition_time_series
+Revises: add_customer_profile_unique
+Create Date: 2026-10-19 15:00:00.000000
+
+Each table is rebuilt as a RANGE (created_at) partitioned table with one
+partition per month (covering existing rows plus a few months ahead) and a
+DEFAULT partition. Indexes and foreign keys are recreated from the old
+table's definitions; the primary key becomes (id, created_at).
+
+Unique indexes on a partitioned table must include the partition key, so
+webhook idempotency moves from the unique index on messages to the
+message_external_ids key table.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'partition_time_series'
+down_revision = 'add_customer_profile_unique'
+branch_labels = None
+depends_on = None
+
+TABLES = ('messages', 'api_logs', 'conversation_history')
+PREMAKE_MONTHS = 3
+
+
+def _add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def _is_partitioned(bind, table: str) -> bool:
+    return bind.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"),
+        {"t": table},
+    ).scalar() is not None
+
+
+def _partition_table(bind, table: str):
+    legacy = f"{table}_unpartitioned"
+
+    op.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+
+    # Capture secondary indexes and foreign keys to recreate on the new table
+    indexes = bind.execute(
+        text("""
+            SELECT i.relname, pg_get_indexdef(x.indexrelid)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = to_regclass(:t)
+              AND NOT x.indisprimary
+              AND NOT x.indisunique
+        """),
+        {"t": legacy},
+    ).fetchall()
+    foreign_keys = bind.execute(
+        text("""
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = to_regclass(:t) AND contype = 'f'
+        """),
+        {"t": legacy},
+    ).fetchall()
+    sequence = bind.execute(
+        text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": legacy}
+    ).scalar()
+
+    op.execute(f"""
+        CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY RANGE (created_at)
+    """)
+    op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)")
+
+    # Monthly partitions from the oldest row through a few months ahead
+    current = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    oldest = bind.execute(
+        text(f"SELECT date_trunc('month', min(created_at) AT TIME ZONE 'UTC') FROM {legacy}")
+    ).scalar()
+    month = oldest or current
+    while month < _add_months(current, PREMAKE_MONTHS + 1):
+        upper = _add_months(month, 1)
+        op.execute(f"""
+            CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table}
+            FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{upper:%Y-%m-%d} 00:00:00+00')
+        """)
+        month = upper
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+    op.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+
+    if sequence:
+        # Keep the id sequence alive when the old table is dropped
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+
+    op.execute(f"DROP TABLE {legacy}")
+
+    for name, definition in indexes:
+        op.execute(definition.replace(f" ON public.{legacy} ", f" ON public.{table} ")
+                   .replace(f" ON {legacy} ", f" ON {table} "))
+    for name, definition in foreign_keys:
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    # Webhook idempotency keys (replaces the unique index on messages)
+    if not inspector.has_table('message_external_ids'):
+        op.create_table(
+            'message_external_ids',
+            sa.Column('project_id', postgresql.UUID(as_uuid=True), nullable=False),
+            sa.Column('provider', sa.String(length=50), nullable=False),
+            sa.Column('external_id', sa.String(length=255), nullable=False),
+            sa.Column('message_id', postgresql.UUID(as_uuid=True), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('project_id', 'provider', 'external_id'),
+        )
+        op.create_index('idx_message_external_id_created', 'message_external_ids', ['created_at'])
+
+        if inspector.has_table('messages'):
+            op.execute("""
+                INSERT INTO message_external_ids (project_id, provider, external_id, message_id, created_at)
+                SELECT project_id, provider, external_id, id, created_at
+                FROM messages
+                WHERE external_id IS NOT NULL
+                ON CONFLICT DO NOTHING
+            """)
+
+    if inspector.has_table('messages'):
+        op.execute("DROP INDEX IF EXISTS uq_message_project_provider_external")
+
+    for table in TABLES:
+        if inspector.has_table(table) and not _is_partitioned(bind, table):
+            _partition_table(bind, table)
+
+
+def _unpartition_table(bind, table: str):
+    partitioned = f"{table}_partitioned"
+
+    op.execute(f"ALTER TABLE {table} RENAME TO {partitioned}")
+
+    indexes = bind.execute(
+        text("""
+            SELECT i.relname, pg_get_indexdef(x.indexrelid)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = to_regclass(:t)
+              AND NOT x.indisprimary
+              AND NOT x.indisunique
+        """),
+        {"t": partitioned},
+    ).fetchall()
+    foreign_keys = bind.execute(
+        text("""
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = to_regclass(:t) AND contype = 'f'
+        """),
+        {"t": partitioned},
+    ).fetchall()
+    sequence = bind.execute(
+        text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": partitioned}
+    ).scalar()
+
+    op.execute(f"CREATE TABLE {table} (LIKE {partitioned} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    op.execute(f"INSERT INTO {table} SELECT * FROM {partitioned}")
+    op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id)")
+
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+
+    # Dropping the parent drops all partitions
+    op.execute(f"DROP TABLE {partitioned}")
+
+    for name, definition in indexes:
+        op.execute(definition.replace(f" ON public.{partitioned} ", f" ON public.{table} ")
+                   .replace(f" ON {partitioned} ", f" ON {table} "))
+    for name, definition in foreign_keys:
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    for table in TABLES:
+        if inspector.has_table(table) and _is_partitioned(bind, table):
+            _unpartition_table(bind, table)
+
+    if inspector.has_table('messages'):
+        op.create_index(
+            'uq_message_project_provider_external',
+            'messages',
+            ['project_id', 'provider', 'external_id'],
+            unique=True,
+            postgresql_where=sa.text('external_id IS NOT NULL'),
+        )
+
+    if inspector.has_table('message_external_ids'):
+        op.drop_index('idx_message_external_id_created', table_name='message_external_ids')
+        op.drop_table('message_external_ids')
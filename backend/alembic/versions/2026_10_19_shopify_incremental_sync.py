@@ -0,0 +1,71 @@
+"""Shopify sync cursors on integrations, unique (project_id, provider, external_id) on orders
+
+Revision ID: shopify_incremental_sync
+Revises: partition_time_series
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = 'shopify_incremental_sync'
+down_revision = 'partition_time_series'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    columns = {column['name'] for column in inspector.get_columns('integrations')}
+    if 'sync_updated_at_min' not in columns:
+        op.add_column('integrations', sa.Column('sync_updated_at_min', sa.DateTime(timezone=True), nullable=True))
+    if 'sync_since_id' not in columns:
+        op.add_column('integrations', sa.Column('sync_since_id', sa.String(length=64), nullable=True))
+
+    existing = {uc['name'] for uc in inspector.get_unique_constraints('orders')}
+    if 'uq_order_project_provider_external' in existing:
+        return
+
+    # Fold duplicate orders created by the old select-then-insert sync into
+    # the most recently updated one; messages follow the surviving order
+    op.execute("""
+        CREATE TEMPORARY TABLE order_duplicates ON COMMIT DROP AS
+        SELECT id, keep_id
+        FROM (
+            SELECT id,
+                   first_value(id) OVER w AS keep_id
+            FROM orders
+            WINDOW w AS (
+                PARTITION BY project_id, provider, external_id
+                ORDER BY last_updated DESC NULLS LAST, created_at DESC, id::text
+            )
+        ) ranked
+        WHERE id <> keep_id
+    """)
+    op.execute("""
+        UPDATE messages m
+        SET order_id = d.keep_id
+        FROM order_duplicates d
+        WHERE m.order_id = d.id
+    """)
+    op.execute("DELETE FROM orders o USING order_duplicates d WHERE o.id = d.id")
+
+    op.create_unique_constraint(
+        'uq_order_project_provider_external',
+        'orders',
+        ['project_id', 'provider', 'external_id'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint(
+        'uq_order_project_provider_external',
+        'orders',
+        type_='unique',
+    )
+    op.drop_column('integrations', 'sync_since_id')
+    op.drop_column('integrations', 'sync_updated_at_min')
@@ -2,7 +2,7 @@
 AI Assistant endpoints using Google Gemini.
 """
 
-from typing import Any
+from typing import Any, Dict
 from uuid import UUID
 import json
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -10,12 +10,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user_id
 from app.db.models import Project, Order, Message, MessageDirection, APILog, Product, BotInstruction
 from app.models.schemas import AssistantQuery, AssistantResponse, FunctionCall
 from app.services.service_factory import get_gemini_with_tracking
 from app.services.bot_function_executor import BotFunctionExecutor
+from app.services.conversation_memory import ConversationMemory, fit_to_budget
+from app.core.config import settings
 
 router = APIRouter()
 logger = structlog.get_logger(__name__)
@@ -39,11 +41,42 @@ async def verify_project_access(project_id: UUID, user_id: str, db: AsyncSession
     return project
 
 
+async def get_order_conversation(db: AsyncSession, project_id: UUID, order_id: UUID) -> Dict[str, Any]:
+    """
+    Memory of the conversation about an order: the customer thread's rolling
+    summary plus the newest order messages within the token budget.
+    """
+    result = await db.execute(
+        select(Message)
+        .where(Message.order_id == order_id)
+        .order_by(Message.created_at.desc())
+        .limit(settings.CONVERSATION_RECENT_TURNS + settings.CONVERSATION_SUMMARY_EVERY_TURNS)
+    )
+    messages = result.scalars().all()
+    
+    summary = None
+    if messages and messages[0].customer_id:
+        summary = await ConversationMemory(db, project_id).get_summary(
+            messages[0].customer_id, messages[0].platform
+        )
+    
+    turns = [
+        {
+            "role": "assistant" if msg.direction == MessageDirection.OUTBOUND else "user",
+            "content": msg.content,
+            "timestamp": msg.created_at.isoformat()
+        }
+        for msg in reversed(messages)
+    ]
+    return {"summary": summary, "recent": fit_to_budget(turns, settings.CONVERSATION_WINDOW_TOKENS)}
+
+
 @router.post("/query", response_model=AssistantResponse)
 async def query_assistant(
     query: AssistantQuery,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Send a query to the AI assistant and get a response.
@@ -126,23 +159,10 @@ async def query_assistant(
                 "currency": order.currency
             }
             
-            # Get conversation history for this order
-            result = await db.execute(
-                select(Message)
-                .where(Message.order_id == query.order_id)
-                .order_by(Message.created_at.desc())
-                .limit(10)
-            )
-            messages = result.scalars().all()
-            
-            context["conversation_history"] = [
-                {
-                    "role": "assistant" if msg.direction == MessageDirection.OUTBOUND else "user",
-                    "content": msg.content,
-                    "timestamp": msg.created_at.isoformat()
-                }
-                for msg in reversed(messages)
-            ]
+            # Conversation memory for this order
+            memory = await get_order_conversation(db, query.project_id, query.order_id)
+            context["conversation_summary"] = memory["summary"]
+            context["conversation_history"] = memory["recent"]
     
     try:
         # Get Gemini client with usage tracking enabled
@@ -160,7 +180,8 @@ async def query_assistant(
             prompt=query.message,
             context=context,
             use_functions=query.use_function_calling,
-            user_id=UUID(user_id)  # Pass user_id for tracking
+            user_id=UUID(user_id),  # Pass user_id for tracking
+            task="assistant"
         )
         
         # Log API usage (non-blocking)
@@ -205,7 +226,8 @@ async def query_assistant(
             executor = BotFunctionExecutor(
                 db=db,
                 project_id=query.project_id,
-                user_id=UUID(user_id)
+                user_id=UUID(user_id),
+                read_db=read_db
             )
             
             for fc in function_calls:
@@ -253,7 +275,8 @@ Provide a clear, formatted response explaining the results."""
                 follow_up_response = await gemini_client.generate_response(
                     prompt=follow_up_prompt,
                     context=follow_up_context,
-                    use_functions=False
+                    use_functions=False,
+                    task="assistant"
                 )
                 
                 response["text"] = follow_up_response.get("text", response.get("text", ""))
@@ -306,22 +329,8 @@ async def generate_reply(
             detail="Order not found"
         )
     
-    # Get conversation history
-    result = await db.execute(
-        select(Message)
-        .where(Message.order_id == order_id)
-        .order_by(Message.created_at.desc())
-        .limit(10)
-    )
-    messages = result.scalars().all()
-    
-    conversation_history = [
-        {
-            "role": "assistant" if msg.direction == MessageDirection.OUTBOUND else "user",
-            "content": msg.content
-        }
-        for msg in reversed(messages)
-    ]
+    # Conversation memory for this order
+    memory = await get_order_conversation(db, project_id, order_id)
     
     order_context = {
         "id": str(order.id),
@@ -336,7 +345,8 @@ async def generate_reply(
         response = await gemini_client.generate_sales_reply(
             customer_message=customer_message,
             order_context=order_context,
-            conversation_history=conversation_history
+            conversation_history=memory["recent"],
+            conversation_summary=memory["summary"]
         )
         
         # Log API usage (non-blocking)
@@ -398,7 +408,7 @@ async def analyze_sentiment(
     await verify_project_access(project_id, user_id, db)
     
     try:
-        analysis = await gemini_client.analyze_sentiment(message)
+        analysis = await gemini_client.analyze_sentiment(message, project_id=project_id)
         
         # Log API usage (non-blocking)
         try:
@@ -432,7 +442,7 @@ async def get_ai_usage(
     project_id: UUID,
     days: int = 30,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get AI usage statistics for a project.
@@ -9,7 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import (
     get_password_hash, verify_password,
     create_access_token, create_refresh_token, decode_token,
@@ -313,7 +313,7 @@ async def logout(
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get current authenticated user's information.
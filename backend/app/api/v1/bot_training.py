@@ -9,7 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user_id
 from app.db.models import Project, BotInstruction
 from app.api.v1.projects import verify_project_access
@@ -76,7 +76,7 @@ async def list_bot_instructions(
     project_id: UUID,
     active_only: bool = True,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """List all bot instructions for a project."""
     await verify_project_access(project_id, user_id, db)
@@ -236,7 +236,7 @@ async def list_auto_response_templates(
     project_id: UUID,
     active_only: bool = True,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """List all auto-response templates."""
     await verify_project_access(project_id, user_id, db)
@@ -311,7 +311,7 @@ async def create_auto_response_template(
 async def get_bot_knowledge_base(
     project_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """Get complete bot knowledge base for this project (all instructions + products)."""
     await verify_project_access(project_id, user_id, db)
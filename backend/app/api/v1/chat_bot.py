@@ -2,18 +2,22 @@
 AI Chat Bot endpoints for automatic customer conversation management.
 """
 
-from typing import Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from functools import partial
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status, Body
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pydantic import BaseModel
+import httpx
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db, AsyncSessionLocal
 from app.core.security import get_current_user_id
 from app.db.models import Project
 from app.services.ai_chat_bot import get_chat_bot
+from app.services.inbound_dispatcher import inbound_dispatcher
+from app.services.webhook_idempotency import mark_inbound_messages, store_inbound_once
 
 router = APIRouter()
 logger = structlog.get_logger(__name__)
@@ -157,6 +161,154 @@ async def handle_order_inquiry(
         )
 
 
+async def _process_webhook_messages(
+    project_id: UUID,
+    customer_id: str,
+    channel: str,
+    customer_phone: Optional[str],
+    on_response: Optional[Callable[[str], Awaitable[Any]]],
+    messages: List[Tuple[UUID, str]]
+):
+    """Run the AI bot once for stored webhook messages (background job)."""
+    async with AsyncSessionLocal() as db:
+        # No user_id for webhooks
+        chat_bot = get_chat_bot(db, project_id, None)
+        result = await chat_bot.process_incoming_message(
+            customer_message="\n".join(text for _, text in messages),
+            customer_id=customer_id,
+            channel=channel,
+            customer_phone=customer_phone,
+            inbound_message_id=messages[-1][0]
+        )
+        # The turn (or its fallback reply) is committed; don't recover it
+        error = (result or {}).get("error")
+        await mark_inbound_messages(
+            db, [message_id for message_id, _ in messages], "failed" if error else "processed", error
+        )
+        await db.commit()
+
+    if on_response and result.get("response"):
+        await on_response(result["response"])
+
+
+def _submit_webhook_message(
+    project_id: UUID,
+    channel: str,
+    customer_id: str,
+    customer_phone: Optional[str],
+    message_id: UUID,
+    message_text: str,
+    on_response: Optional[Callable[[str], Awaitable[Any]]] = None
+):
+    """Queue a stored webhook message for its AI turn (in order per customer)."""
+    key = f"{project_id}:{customer_id}"
+    handler = partial(
+        _process_webhook_messages,
+        project_id,
+        customer_id,
+        channel,
+        customer_phone,
+        on_response
+    )
+    if on_response:
+        inbound_dispatcher.submit(key, partial(handler, [(message_id, message_text)]))
+    else:
+        inbound_dispatcher.submit_burst(key, (message_id, message_text), handler)
+
+
+def _reply_target(channel: str, extra_data: Optional[Dict[str, Any]]) -> Optional[Callable[[str], Awaitable[Any]]]:
+    """Where the AI reply to a stored message goes, if the channel answers in place."""
+    extra_data = extra_data or {}
+    if channel == "discord" and extra_data.get("discord_interaction_token"):
+        return partial(
+            _edit_discord_response,
+            extra_data.get("discord_application_id"),
+            extra_data["discord_interaction_token"]
+        )
+    return None
+
+
+async def _queue_webhook_message(
+    db: AsyncSession,
+    project_id: UUID,
+    channel: str,
+    external_id: Optional[str],
+    customer_id: str,
+    message_text: str,
+    customer_phone: Optional[str] = None,
+    extra_data: Optional[Dict[str, Any]] = None
+) -> bool:
+    """
+    Persist a webhook message and queue it for AI processing.
+    
+    Messages a customer sends in quick succession are answered as one
+    turn, except when the reply is edited into the delivery itself (one
+    answer per delivery, e.g. Discord interactions; see _reply_target).
+    
+    Returns:
+        False if the message was a duplicate delivery
+    """
+    message_id = await store_inbound_once(db, channel, project_id, external_id, {
+        "content": message_text,
+        "sender": {
+            "customer_id": customer_id,
+            "phone": customer_phone,
+            "platform": channel
+        },
+        "extra_data": extra_data or {},
+    })
+    if message_id is None:
+        return False
+    
+    _submit_webhook_message(
+        project_id,
+        channel,
+        customer_id,
+        customer_phone,
+        message_id,
+        message_text,
+        _reply_target(channel, extra_data)
+    )
+    return True
+
+
+def resubmit_webhook_message(row: Any) -> bool:
+    """
+    Queue a message stored by _queue_webhook_message again (recovery sweep).
+
+    Discord replies are still edited in while the interaction token is
+    valid (15 minutes); later edits fail and are logged.
+
+    Returns:
+        False if the row has no customer to answer
+    """
+    sender = row.sender or {}
+    customer_id = sender.get("customer_id")
+    if not customer_id:
+        return False
+    _submit_webhook_message(
+        row.project_id,
+        row.provider,
+        str(customer_id),
+        sender.get("phone"),
+        row.id,
+        row.content,
+        _reply_target(row.provider, row.extra_data)
+    )
+    return True
+
+
+async def _edit_discord_response(application_id: str, interaction_token: str, content: str):
+    """Replace a deferred Discord interaction response with the AI reply."""
+    url = (
+        f"https://discord.com/api/v10/webhooks/{application_id}/"
+        f"{interaction_token}/messages/@original"
+    )
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        response = await client.patch(url, json={"content": content})
+        response.raise_for_status()
+
+
 @router.post("/{project_id}/webhook/whatsapp")
 async def whatsapp_webhook(
     project_id: UUID,
@@ -176,24 +328,26 @@ async def whatsapp_webhook(
     if not messages:
         return {"status": "no_messages"}
     
-    # Process each message (no user_id for webhooks)
-    chat_bot = get_chat_bot(db, project_id, None)
-    responses = []
+    # Persist and queue each message; replies are generated in the background
+    queued_count = 0
     
     for msg in messages:
         customer_id = msg.get("from")
         message_text = msg.get("text", {}).get("body", "")
         
         if customer_id and message_text:
-            result = await chat_bot.process_incoming_message(
-                customer_message=message_text,
-                customer_id=customer_id,
-                channel="whatsapp",
+            if await _queue_webhook_message(
+                db,
+                project_id,
+                "whatsapp",
+                msg.get("id"),
+                customer_id,
+                message_text,
                 customer_phone=customer_id
-            )
-            responses.append(result)
+            ):
+                queued_count += 1
     
-    return {"status": "processed", "count": len(responses)}
+    return {"status": "received", "count": queued_count}
 
 
 @router.post("/{project_id}/webhook/telegram")
@@ -248,22 +402,22 @@ async def discord_webhook(
         message_text = body.get("data", {}).get("options", [{}])[0].get("value", "")
         
         if customer_id and message_text:
-            # No user_id for webhooks
-            chat_bot = get_chat_bot(db, project_id, None)
-            
-            result = await chat_bot.process_incoming_message(
-                customer_message=message_text,
-                customer_id=str(customer_id),
-                channel="discord"
+            # Discord needs an answer within 3s: defer, then edit in the AI reply
+            await _queue_webhook_message(
+                db,
+                project_id,
+                "discord",
+                body.get("id"),
+                str(customer_id),
+                message_text,
+                extra_data={
+                    "discord_application_id": body.get("application_id"),
+                    "discord_interaction_token": body.get("token"),
+                }
             )
             
-            # Return Discord interaction response
-            return {
-                "type": 4,
-                "data": {
-                    "content": result["response"]
-                }
-            }
+            # Type 5 = DEFERRED_CHANNEL_MESSAGE_WITH_SOURCE
+            return {"type": 5}
     
     return {"status": "ok"}
 
@@ -286,16 +440,16 @@ async def tiktok_webhook(
         message_text = body.get("message", {}).get("text")
         
         if customer_id and message_text:
-            # No user_id for webhooks
-            chat_bot = get_chat_bot(db, project_id, None)
-            
-            result = await chat_bot.process_incoming_message(
-                customer_message=message_text,
-                customer_id=str(customer_id),
-                channel="tiktok"
+            await _queue_webhook_message(
+                db,
+                project_id,
+                "tiktok",
+                body.get("message", {}).get("id"),
+                str(customer_id),
+                message_text
             )
             
-            return {"status": "processed"}
+            return {"status": "received"}
     
     return {"status": "ok"}
 
@@ -304,7 +458,7 @@ async def tiktok_webhook(
 async def get_bot_stats(
     project_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get AI chat bot statistics.
@@ -326,35 +480,22 @@ async def get_bot_stats(
     # Get stats for last 30 days
     start_date = datetime.utcnow() - timedelta(days=30)
     
-    # Total messages
+    # One pass over the partition range; AI metadata comes from the
+    # generated/typed columns instead of decoding extra_data per row
+    outbound = Message.direction == MessageDirection.OUTBOUND
+    ai_reply = outbound & Message.ai_generated.is_(True)
     result = await db.execute(
-        select(func.count(Message.id))
-        .where(Message.project_id == project_id)
-        .where(Message.created_at >= start_date)
-    )
-    total_messages = result.scalar()
-    
-    # AI-generated messages
-    result = await db.execute(
-        select(func.count(Message.id))
-        .where(Message.project_id == project_id)
-        .where(Message.created_at >= start_date)
-        .where(Message.direction == MessageDirection.OUTBOUND)
-    )
-    outbound_messages = result.scalar()
-    
-    # Get all messages for detailed stats
-    result = await db.execute(
-        select(Message)
+        select(
+            func.count(Message.id),
+            func.count(Message.id).filter(outbound),
+            func.count(Message.id).filter(ai_reply),
+            func.coalesce(func.sum(Message.ai_tokens_used).filter(outbound), 0),
+            func.coalesce(func.sum(Message.ai_cost).filter(outbound), 0.0),
+        )
         .where(Message.project_id == project_id)
         .where(Message.created_at >= start_date)
-        .where(Message.direction == MessageDirection.OUTBOUND)
     )
-    messages = result.scalars().all()
-    
-    ai_generated = sum(1 for m in messages if m.extra_data and m.extra_data.get("ai_generated"))
-    total_tokens = sum(m.extra_data.get("tokens_used", 0) for m in messages if m.extra_data)
-    total_cost = sum(m.extra_data.get("cost", 0) for m in messages if m.extra_data)
+    total_messages, outbound_messages, ai_generated, total_tokens, total_cost = result.one()
     
     # Calculate time saved (assume 5 minutes per manual response)
     time_saved_hours = (ai_generated * 5) / 60
@@ -367,8 +508,8 @@ async def get_bot_stats(
         "total_messages": total_messages or 0,
         "ai_generated_messages": ai_generated,
         "automation_rate": round(automation_rate, 2),
-        "total_tokens_used": total_tokens,
-        "total_cost_usd": round(total_cost, 4),
+        "total_tokens_used": int(total_tokens),
+        "total_cost_usd": round(float(total_cost), 4),
         "time_saved_hours": round(time_saved_hours, 2),
         "estimated_cost_savings_usd": round(cost_savings, 2)
     }
@@ -10,7 +10,7 @@ from sqlalchemy import select, and_
 from pydantic import BaseModel
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user_id
 from app.db.models import Project, MessageDirection
 from app.services.enhanced_ai_service import EnhancedAIService
@@ -154,7 +154,7 @@ async def get_conversation_history(
     platform: str,
     limit: int = 20,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get conversation history for a customer.
@@ -356,7 +356,7 @@ async def list_business_contexts(
     context_type: Optional[str] = None,
     platform: Optional[str] = None,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     List all business contexts for the project.
@@ -366,7 +366,8 @@ async def list_business_contexts(
     ai_service = EnhancedAIService(db, project_id)
     contexts = await ai_service.get_business_context(
         context_type=context_type,
-        platform=platform
+        platform=platform,
+        track_usage=False
     )
     
     return {
@@ -556,7 +557,7 @@ async def learn_from_post(
 async def get_ai_insights_overview(
     project_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get comprehensive AI insights overview.
@@ -9,7 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user_id
 from app.db.models import Project, Integration, IntegrationStatus
 from app.models.schemas import (
@@ -194,7 +194,7 @@ async def test_integration_data(
 async def list_integrations(
     project_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     List all integrations for a project.
@@ -227,7 +227,7 @@ async def get_integration(
     project_id: UUID,
     integration_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get a specific integration details.
@@ -7,10 +7,10 @@ from uuid import UUID
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_
+from sqlalchemy import select, func, or_, and_
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user_id
 from app.db.models import Project, Message, Order, MessageDirection
 from app.models.schemas import (
@@ -67,6 +67,79 @@ def _resolve_conversation_id(msg: Message, customer_payload: Dict[str, Any]) ->
     return f"message-{msg.id}"
 
 
+def _aggregate_conversations(messages: List[Message]) -> Dict[str, Dict[str, Any]]:
+    """Fold messages into per-conversation summary dicts keyed by conversation id."""
+    conversations: dict[str, dict[str, Any]] = {}
+
+    for msg in messages:
+        customer_payload = _resolve_customer_payload(msg)
+        conversation_id = _resolve_conversation_id(msg, customer_payload)
+
+        convo = conversations.get(conversation_id)
+        if not convo:
+            convo = {
+                "channel": msg.provider or msg.platform or "unknown",
+                "customer_name": customer_payload.get("name")
+                or customer_payload.get("customer_name"),
+                "customer_email": customer_payload.get("email"),
+                "customer_phone": customer_payload.get("phone"),
+                "customer_id": customer_payload.get("customer_id")
+                or customer_payload.get("id")
+                or customer_payload.get("phone")
+                or customer_payload.get("email"),
+                "order_id": str(msg.order_id) if msg.order_id else None,
+                "last_message": None,
+                "last_message_at": None,
+                "unread_count": 0,
+                "total_messages": 0,
+                "ai_messages": 0,
+                "ai_enabled": False,
+                "recipient": customer_payload or {},
+                "profile_id": customer_payload.get("profile_id"),
+            }
+            conversations[conversation_id] = convo
+
+        convo["total_messages"] += 1
+        if msg.ai_generated:
+            convo["ai_messages"] += 1
+            convo["ai_enabled"] = True
+
+        if msg.direction == MessageDirection.INBOUND and not msg.is_read:
+            convo["unread_count"] += 1
+
+        created_at = msg.created_at
+        if created_at and (
+            convo["last_message_at"] is None or created_at > convo["last_message_at"]
+        ):
+            convo["last_message_at"] = created_at
+            convo["last_message"] = msg.content
+            convo["channel"] = msg.provider or msg.platform or convo["channel"]
+            convo["customer_name"] = (
+                customer_payload.get("name")
+                or customer_payload.get("customer_name")
+                or convo["customer_name"]
+            )
+            convo["customer_email"] = (
+                customer_payload.get("email") or convo["customer_email"]
+            )
+            convo["customer_phone"] = (
+                customer_payload.get("phone") or convo["customer_phone"]
+            )
+            convo["customer_id"] = (
+                customer_payload.get("customer_id")
+                or customer_payload.get("id")
+                or convo["customer_id"]
+            )
+            if msg.order_id:
+                convo["order_id"] = str(msg.order_id)
+            convo["profile_id"] = (
+                customer_payload.get("profile_id") or convo["profile_id"]
+            )
+            convo["recipient"] = customer_payload or {}
+
+    return conversations
+
+
 @router.post("/{project_id}/send", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 async def send_message(
     project_id: UUID,
@@ -140,7 +213,7 @@ async def get_inbox(
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get unified inbox with messages from all channels.
@@ -183,7 +256,7 @@ async def get_conversations(
     limit: int = Query(50, description="Maximum conversations to return", ge=1, le=200),
     search: Optional[str] = Query(None, description="Search by customer name, email, phone, or message"),
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """Return aggregated conversation summaries for messaging inbox."""
 
@@ -203,73 +276,7 @@ async def get_conversations(
     result = await db.execute(query)
     messages = result.scalars().all()
 
-    conversations: dict[str, dict[str, Any]] = {}
-
-    for msg in messages:
-        customer_payload = _resolve_customer_payload(msg)
-        conversation_id = _resolve_conversation_id(msg, customer_payload)
-
-        convo = conversations.get(conversation_id)
-        if not convo:
-            convo = {
-                "channel": msg.provider or msg.platform or "unknown",
-                "customer_name": customer_payload.get("name")
-                or customer_payload.get("customer_name"),
-                "customer_email": customer_payload.get("email"),
-                "customer_phone": customer_payload.get("phone"),
-                "customer_id": customer_payload.get("customer_id")
-                or customer_payload.get("id")
-                or customer_payload.get("phone")
-                or customer_payload.get("email"),
-                "order_id": str(msg.order_id) if msg.order_id else None,
-                "last_message": None,
-                "last_message_at": None,
-                "unread_count": 0,
-                "total_messages": 0,
-                "ai_messages": 0,
-                "ai_enabled": False,
-                "recipient": customer_payload or {},
-                "profile_id": customer_payload.get("profile_id"),
-            }
-            conversations[conversation_id] = convo
-
-        convo["total_messages"] += 1
-        if msg.ai_generated:
-            convo["ai_messages"] += 1
-            convo["ai_enabled"] = True
-
-        if msg.direction == MessageDirection.INBOUND and not msg.is_read:
-            convo["unread_count"] += 1
-
-        created_at = msg.created_at
-        if created_at and (
-            convo["last_message_at"] is None or created_at > convo["last_message_at"]
-        ):
-            convo["last_message_at"] = created_at
-            convo["last_message"] = msg.content
-            convo["channel"] = msg.provider or msg.platform or convo["channel"]
-            convo["customer_name"] = (
-                customer_payload.get("name")
-                or customer_payload.get("customer_name")
-                or convo["customer_name"]
-            )
-            convo["customer_email"] = (
-                customer_payload.get("email") or convo["customer_email"]
-            )
-            convo["customer_phone"] = (
-                customer_payload.get("phone") or convo["customer_phone"]
-            )
-            convo["customer_id"] = (
-                customer_payload.get("customer_id")
-                or customer_payload.get("id")
-                or convo["customer_id"]
-            )
-            if msg.order_id:
-                convo["order_id"] = str(msg.order_id)
-            convo["profile_id"] = (
-                customer_payload.get("profile_id") or convo["profile_id"]
-            )
-            convo["recipient"] = customer_payload or {}
+    conversations = _aggregate_conversations(messages)
 
     summaries: List[ConversationSummary] = []
     search_term = search.lower() if search else None
@@ -330,7 +337,7 @@ async def get_conversation_messages(
     days: int = Query(30, description="Number of days to look back", ge=1, le=180),
     limit: int = Query(200, description="Maximum messages to inspect", ge=50, le=500),
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ) -> Any:
     """Return messages belonging to the resolved conversation identifier."""
 
@@ -380,7 +387,7 @@ async def get_message(
     project_id: UUID,
     message_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get a specific message by ID.
@@ -442,7 +449,7 @@ async def get_conversation(
     project_id: UUID,
     order_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get full conversation thread for an order.
@@ -480,7 +487,7 @@ async def get_message_stats(
     project_id: UUID,
     days: int = Query(30, description="Number of days to analyze", ge=1, le=365),
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get message statistics for a project.
@@ -490,28 +497,35 @@ async def get_message_stats(
     
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    # Total messages
+    # Aggregate in the database, one row per provider/direction
     result = await db.execute(
-        select(Message)
+        select(
+            Message.provider,
+            Message.direction,
+            func.count(Message.id),
+            func.count(Message.id).filter(Message.ai_generated.is_(True)),
+            func.count(Message.id).filter(Message.is_read.isnot(True)),
+            func.coalesce(func.sum(Message.ai_cost), 0.0),
+        )
         .where(Message.project_id == project_id)
         .where(Message.created_at >= start_date)
+        .group_by(Message.provider, Message.direction)
     )
-    messages = result.scalars().all()
-    
-    total_messages = len(messages)
-    inbound_count = sum(1 for m in messages if m.direction == MessageDirection.INBOUND)
-    outbound_count = sum(1 for m in messages if m.direction == MessageDirection.OUTBOUND)
-    ai_generated_count = sum(1 for m in messages if m.ai_generated)
-    unread_count = sum(1 for m in messages if not m.is_read and m.direction == MessageDirection.INBOUND)
-    
-    # Messages by provider
-    messages_by_provider = {}
-    for message in messages:
-        provider = message.provider
-        messages_by_provider[provider] = messages_by_provider.get(provider, 0) + 1
     
-    # Total AI cost
-    total_ai_cost = sum(m.ai_cost or 0 for m in messages)
+    total_messages = inbound_count = outbound_count = 0
+    ai_generated_count = unread_count = 0
+    messages_by_provider: Dict[str, int] = {}
+    total_ai_cost = 0.0
+    for provider, direction, count, ai_count, not_read, ai_cost in result.all():
+        total_messages += count
+        ai_generated_count += ai_count
+        total_ai_cost += float(ai_cost)
+        messages_by_provider[provider] = messages_by_provider.get(provider, 0) + count
+        if direction == MessageDirection.INBOUND:
+            inbound_count += count
+            unread_count += not_read
+        elif direction == MessageDirection.OUTBOUND:
+            outbound_count += count
     
     return {
         "period_days": days,
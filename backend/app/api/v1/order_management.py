@@ -11,7 +11,7 @@ from sqlalchemy import select, and_
 from pydantic import BaseModel
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user_id
 from app.db.models import Project, OrderStatus
 from app.services.order_manager_service import OrderManagerService
@@ -181,7 +181,7 @@ async def get_order_progress(
     project_id: UUID,
     order_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get comprehensive order progress and timeline.
@@ -225,7 +225,7 @@ async def get_orders_requiring_attention(
     project_id: UUID,
     max_age_hours: int = 48,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get orders that need attention (stuck, delayed, pending too long).
@@ -417,7 +417,7 @@ async def schedule_followup(
 async def get_order_statistics(
     project_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get order management statistics.
@@ -10,10 +10,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user_id
 from app.db.models import Project, Order
 from app.models.schemas import OrderCreate, OrderUpdate, OrderResponse
+from app.services.order_items import refresh_order_items
 
 router = APIRouter()
 logger = structlog.get_logger(__name__)
@@ -76,12 +77,14 @@ async def create_order(
         items=order_data.items,
         total=order_data.total,
         currency=order_data.currency,
-        metadata=order_data.metadata,
+        extra_data=order_data.metadata,
         tags=order_data.tags,
         order_date=order_data.order_date or datetime.utcnow()
     )
     
     db.add(new_order)
+    await db.flush()
+    await refresh_order_items(db, [new_order.id])
     await db.commit()
     await db.refresh(new_order)
     
@@ -104,7 +107,7 @@ async def list_orders(
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     List orders for a project with optional filters.
@@ -140,7 +143,7 @@ async def get_order(
     project_id: UUID,
     order_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get a specific order with full details.
@@ -196,6 +199,10 @@ async def update_order(
     for field, value in update_data.items():
         setattr(order, field, value)
     
+    if "items" in update_data:
+        await db.flush()
+        await refresh_order_items(db, [order.id])
+    
     await db.commit()
     await db.refresh(order)
     
@@ -245,7 +252,7 @@ async def get_order_stats(
     project_id: UUID,
     days: int = Query(30, description="Number of days to analyze", ge=1, le=365),
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get order statistics summary for a project.
@@ -11,7 +11,7 @@ import structlog
 import csv
 import io
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user_id
 from app.db.models import Product, Project
 from pydantic import BaseModel
@@ -102,7 +102,7 @@ async def list_products(
     category: str | None = None,
     active_only: bool = True,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """List all products for a project."""
     await verify_project_access(project_id, user_id, db)
@@ -9,7 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user_id
 from app.db.models import Project
 from app.models.schemas import ProjectCreate, ProjectUpdate, ProjectResponse
@@ -58,7 +58,7 @@ async def create_project(
 @router.get("", response_model=List[ProjectResponse])
 async def list_projects(
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     List all projects owned by the current user.
@@ -77,7 +77,7 @@ async def list_projects(
 async def get_project(
     project_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get a specific project by ID.
@@ -10,7 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user_id
 from app.db.models import Project, Report, Order, Message, MessageDirection
 from app.models.schemas import ReportGenerate, ReportResponse
@@ -43,7 +43,8 @@ async def generate_report(
     project_id: UUID,
     report_data: ReportGenerate,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Generate a comprehensive analytics report with AI-powered insights.
@@ -67,10 +68,10 @@ async def generate_report(
     else:
         date_range = "custom"
     
-    # Generate report using comprehensive service
+    # Generate report using comprehensive service (analytics scans run on a replica)
     try:
         payload = await generate_report_service(
-            db=db,
+            db=read_db,
             project_id=project_id,
             report_type=report_data.report_type,
             date_range=date_range,
@@ -114,7 +115,7 @@ async def list_reports(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     List all generated reports for a project.
@@ -141,7 +142,7 @@ async def get_report(
     project_id: UUID,
     report_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get a specific report by ID.
@@ -261,38 +262,39 @@ async def _generate_messages_report(
     """Generate messaging analytics report."""
     
     result = await db.execute(
-        select(Message)
+        select(
+            Message.provider,
+            Message.direction,
+            func.count(Message.id),
+            func.count(Message.id).filter(Message.ai_generated.is_(True)),
+            func.coalesce(func.sum(Message.ai_cost), 0.0),
+            func.coalesce(func.sum(Message.ai_tokens_used), 0),
+        )
         .where(Message.project_id == project_id)
         .where(Message.created_at >= start_date)
         .where(Message.created_at <= end_date)
+        .group_by(Message.provider, Message.direction)
     )
-    messages = result.scalars().all()
-    
-    total_messages = len(messages)
-    inbound = sum(1 for m in messages if m.direction == MessageDirection.INBOUND)
-    outbound = sum(1 for m in messages if m.direction == MessageDirection.OUTBOUND)
-    ai_generated = sum(1 for m in messages if m.ai_generated)
     
-    # Messages by provider
+    total_messages = inbound = outbound = ai_generated = 0
+    total_ai_cost = 0.0
+    total_tokens = 0
     by_provider = {}
-    for msg in messages:
-        provider = msg.provider
+    for provider, direction, count, ai_count, ai_cost, tokens in result.all():
         if provider not in by_provider:
             by_provider[provider] = {"total": 0, "inbound": 0, "outbound": 0, "ai_generated": 0}
-        by_provider[provider]["total"] += 1
-        if msg.direction == MessageDirection.INBOUND:
-            by_provider[provider]["inbound"] += 1
+        by_provider[provider]["total"] += count
+        by_provider[provider]["ai_generated"] += ai_count
+        if direction == MessageDirection.INBOUND:
+            by_provider[provider]["inbound"] += count
+            inbound += count
         else:
-            by_provider[provider]["outbound"] += 1
-        if msg.ai_generated:
-            by_provider[provider]["ai_generated"] += 1
-    
-    # AI costs
-    total_ai_cost = sum(m.ai_cost or 0 for m in messages)
-    total_tokens = sum(
-        (m.ai_prompt_tokens or 0) + (m.ai_completion_tokens or 0) 
-        for m in messages
-    )
+            by_provider[provider]["outbound"] += count
+            outbound += count
+        total_messages += count
+        ai_generated += ai_count
+        total_ai_cost += float(ai_cost)
+        total_tokens += int(tokens)
     
     return {
         "period": {
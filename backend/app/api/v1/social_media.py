@@ -9,7 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user_id
 from app.db.models import SocialMediaComment, Project, Product, BotInstruction, AutoResponseTemplate
 from app.services.gemini_client import gemini_client
@@ -59,7 +59,7 @@ async def list_comments(
     skip: int = 0,
     limit: int = 50,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """List social media comments."""
     await verify_project_access(project_id, user_id, db)
@@ -132,7 +132,7 @@ async def create_comment(
     
     # Analyze sentiment
     try:
-        sentiment_analysis = await gemini_client.analyze_sentiment(comment.content)
+        sentiment_analysis = await gemini_client.analyze_sentiment(comment.content, project_id=project_id)
         sentiment = sentiment_analysis.get("sentiment", "neutral")
         
         # Detect intent from content
@@ -268,7 +268,8 @@ Response:"""
         ai_response = await gemini_client.generate_response(
             prompt=prompt,
             use_functions=False,
-            temperature=0.7
+            temperature=0.7,
+            task="comment_reply"
         )
         
         generated_response = ai_response.get("text", "").strip()
@@ -350,7 +351,7 @@ async def send_comment_response(
 async def get_comment_stats(
     project_id: UUID,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """Get social media comment statistics."""
     await verify_project_access(project_id, user_id, db)
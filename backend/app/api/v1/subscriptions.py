@@ -10,7 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 import structlog
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user_id
 from app.db.models import SubscriptionTier
 from app.services.subscription_service import SubscriptionService
@@ -110,7 +110,7 @@ async def get_plan_details(tier: str) -> Any:
 @router.get("/my-subscription")
 async def get_my_subscription(
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get current user's subscription details.
@@ -284,7 +284,7 @@ async def cancel_subscription(
 @router.get("/usage")
 async def get_usage_stats(
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get current month usage statistics.
@@ -359,7 +359,7 @@ async def track_usage(
 async def check_resource_limit(
     resource: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Check if user can use a specific resource.
@@ -409,7 +409,7 @@ async def check_resource_limit(
 async def check_feature_access(
     feature: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Check if user has access to a feature.
@@ -484,7 +484,7 @@ async def get_monthly_overages(
 @router.get("/usage-percentage")
 async def get_usage_percentage(
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Get usage as percentage of limits.
@@ -524,7 +524,7 @@ async def get_usage_percentage(
 @router.get("/usage-alerts")
 async def check_usage_alerts(
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Check if user should receive usage alerts.
@@ -563,7 +563,7 @@ async def check_usage_alerts(
 async def check_resource_limit(
     resource: str,
     user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
     """
     Check if user can use a resource (with enforcement).
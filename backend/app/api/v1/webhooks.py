@@ -2,29 +2,106 @@
 Webhook endpoints for receiving messages from integrations.
 """
 
-from typing import Any
+from typing import Any, List, Tuple
+from datetime import datetime
+from functools import partial
+import json
 from fastapi import APIRouter, Request, HTTPException, status, BackgroundTasks
 from uuid import UUID
 import structlog
 
-from app.db.models import (
-    Message,
-    CustomerProfile,
-    Integration,
-    IntegrationStatus,
-    MessageDirection,
-)
+from app.db.models import Integration
 from app.core.database import get_db, AsyncSessionLocal
 from app.workers.tasks import process_incoming_message
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from fastapi import Depends
+from app.api.v1.chat_bot import resubmit_webhook_message
 from app.services.ai_chat_bot import get_chat_bot
 from app.services.integrations.facebook import FacebookClient
+from app.services.integrations.shopify import ShopifyService
+from app.services.order_manager import OrderManager
+from app.services.webhook_idempotency import (
+    RECENT_MESSAGE_WINDOW,
+    claim_stale_inbound,
+    mark_inbound_messages,
+    store_inbound_once,
+)
+from app.services.inbound_dispatcher import inbound_dispatcher
 
 router = APIRouter()
 logger = structlog.get_logger(__name__)
 
+# Providers answered by the in-process dispatcher -> sender key holding the
+# customer id
+DISPATCHED_SENDER_KEYS = {
+    "telegram": "telegram_id",
+    "instagram": "instagram_id",
+    "facebook": "facebook_id",
+}
+# Providers whose messages are stored by the chat bot webhooks
+# (sender["customer_id"]), see chat_bot.resubmit_webhook_message(). WhatsApp
+# messages from the Twilio webhook below have no customer_id and go back
+# to Celery instead.
+CHAT_BOT_PROVIDERS = ("whatsapp", "discord", "tiktok")
+
+
+def _submit_inbound(provider: str, project_id: UUID, sender_id: str, message_id: UUID, text: str):
+    """Queue a stored inbound message for its AI turn (in order per sender)."""
+    key = f"{project_id}:{sender_id}"
+    if provider == "telegram":
+        inbound_dispatcher.submit_burst(
+            key, str(message_id), partial(_process_telegram_messages_with_ai, str(project_id))
+        )
+    elif provider == "instagram":
+        inbound_dispatcher.submit_burst(
+            key, str(message_id), partial(_process_incoming_messages_with_ai, str(project_id), "instagram")
+        )
+    elif provider == "facebook":
+        inbound_dispatcher.submit_burst(
+            key, (message_id, text), partial(_process_facebook_messages_with_ai, project_id, sender_id)
+        )
+    else:
+        raise ValueError(f"No inbound processor for provider {provider}")
+
+
+def _resubmit_inbound(row: Any) -> bool:
+    """Queue a claimed inbound row again on the path that first handled it."""
+    sender = row.sender or {}
+    if row.provider in DISPATCHED_SENDER_KEYS:
+        sender_id = sender.get(DISPATCHED_SENDER_KEYS[row.provider])
+        if not sender_id:
+            return False
+        _submit_inbound(row.provider, row.project_id, str(sender_id), row.id, row.content)
+        return True
+    if sender.get("customer_id"):
+        return resubmit_webhook_message(row)
+    if row.provider == "whatsapp":
+        process_incoming_message.delay(str(row.id), str(row.project_id))
+        return True
+    return False
+
+
+async def recover_inbound_messages() -> int:
+    """
+    Resubmit stored inbound messages that never got their AI turn.
+
+    Run by the dispatcher's recovery loop; see claim_stale_inbound().
+    """
+    async with AsyncSessionLocal() as db:
+        rows = await claim_stale_inbound(db, [*DISPATCHED_SENDER_KEYS, *CHAT_BOT_PROVIDERS])
+        await db.commit()
+
+    for row in rows:
+        try:
+            _resubmit_inbound(row)
+        except Exception as e:
+            # Claimed rows are tried again on a later sweep
+            logger.error("Failed to resubmit inbound message", message_id=str(row.id), error=str(e))
+    if rows:
+        logger.warning("Resubmitted unprocessed inbound messages", count=len(rows))
+    return len(rows)
+
 
 @router.post("/whatsapp/{project_id}")
 async def whatsapp_webhook(
@@ -44,36 +121,29 @@ async def whatsapp_webhook(
         message_text = payload.get("body", "")
         message_sid = payload.get("MessageSid")
         
-        # Save message
-        new_message = Message(
-            project_id=project_id,
-            content=message_text,
-            direction="inbound",
-            platform="whatsapp",
-            provider="whatsapp",
-            external_id=message_sid,
-            sender={
+        # Save message (once per MessageSid)
+        message_id = await store_inbound_once(db, "whatsapp", project_id, message_sid, {
+            "content": message_text,
+            "sender": {
                 "phone": from_number,
                 "platform": "whatsapp"
             },
-            status="received"
-        )
-        db.add(new_message)
-        await db.commit()
-        await db.refresh(new_message)
+        })
+        if message_id is None:
+            return {"status": "duplicate"}
         
         # Queue AI processing
         background_tasks.add_task(
             process_incoming_message.delay,
-            str(new_message.id),
+            str(message_id),
             str(project_id)
         )
         
         logger.info(
             "WhatsApp message received",
             project_id=str(project_id),
-            customer_id=str(customer.id),
-            message_id=str(new_message.id)
+            customer_phone=from_number,
+            message_id=str(message_id)
         )
         
         return {"status": "received"}
@@ -109,36 +179,30 @@ async def telegram_webhook(
         telegram_id = str(from_user.get("id"))
         username = from_user.get("username", "")
         message_text = message.get("text", "")
-        message_id = message.get("message_id")
         
-        # Save message
-        new_message = Message(
-            project_id=project_id,
-            content=message_text,
-            direction="inbound",
-            platform="telegram",
-            provider="telegram",
-            external_id=str(message_id),
-            sender={
+        # Telegram message ids are only unique within a chat
+        external_id = f"{chat.get('id')}:{message.get('message_id')}"
+        
+        # Save message (once per chat message)
+        new_message_id = await store_inbound_once(db, "telegram", project_id, external_id, {
+            "content": message_text,
+            "sender": {
                 "telegram_id": telegram_id,
                 "name": from_user.get("first_name", "") + " " + from_user.get("last_name", ""),
                 "username": username
             },
-            status="received"
-        )
-        db.add(new_message)
-        await db.commit()
-        await db.refresh(new_message)
+        })
+        if new_message_id is None:
+            return {"status": "ok"}
         
         # Process message asynchronously (no Celery worker available on Railway)
         try:
-            import asyncio
-            asyncio.create_task(_process_telegram_message_with_ai(str(new_message.id), str(project_id)))
+            _submit_inbound("telegram", project_id, telegram_id, new_message_id, message_text)
             logger.info(
                 "Telegram message queued for processing",
                 project_id=str(project_id),
                 telegram_id=telegram_id,
-                message_id=str(new_message.id)
+                message_id=str(new_message_id)
             )
         except Exception as e:
             logger.error("Failed to queue message processing", error=str(e))
@@ -173,28 +237,20 @@ async def instagram_webhook(
         message_text = message.get("text", "")
         message_id = message.get("mid")
         
-        # Save message
-        new_message = Message(
-            project_id=project_id,
-            content=message_text,
-            direction="inbound",
-            platform="instagram",
-            provider="instagram",
-            external_id=message_id,
-            sender={
+        # Save message (once per mid)
+        new_message_id = await store_inbound_once(db, "instagram", project_id, message_id, {
+            "content": message_text,
+            "sender": {
                 "instagram_id": sender_id,
                 "platform": "instagram"
             },
-            status="received"
-        )
-        db.add(new_message)
-        await db.commit()
-        await db.refresh(new_message)
+        })
+        if new_message_id is None:
+            return {"status": "duplicate"}
         
         # Process message asynchronously
         try:
-            import asyncio
-            asyncio.create_task(_process_incoming_message_with_ai(str(new_message.id), str(project_id), "instagram"))
+            _submit_inbound("instagram", project_id, sender_id, new_message_id, message_text)
             logger.info("Instagram message queued for processing", project_id=str(project_id))
         except Exception as e:
             logger.error("Failed to queue Instagram message", error=str(e))
@@ -227,43 +283,18 @@ async def instagram_verify(project_id: UUID, request: Request) -> Any:
 async def facebook_webhook(
     project_id: UUID,
     request: Request,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """
     Receive Facebook Messenger messages from Graph API.
+    
+    Events are persisted and acknowledged immediately; AI replies are
+    generated in the background (in order per sender).
     """
     try:
         payload = await request.json()
 
-        # Prepare AI chat bot (no user context for webhooks)
-        chat_bot = get_chat_bot(db, project_id, None)
-
-        # Load Facebook integration config for sending replies
-        integration_result = await db.execute(
-            select(Integration)
-            .where(Integration.project_id == project_id)
-            .where(Integration.provider == "facebook")
-        )
-        integration = integration_result.scalar_one_or_none()
-
-        facebook_client: FacebookClient | None = None
-        if integration:
-            try:
-                facebook_client = FacebookClient(integration.config or {})
-            except Exception as client_error:
-                logger.error(
-                    "Failed to initialize Facebook client",
-                    project_id=str(project_id),
-                    error=str(client_error)
-                )
-        else:
-            logger.warning(
-                "Facebook integration not configured",
-                project_id=str(project_id)
-            )
-
-        processed_count = 0
+        queued_count = 0
 
         # Extract message details from Facebook webhook format
         for entry in payload.get("entry", []):
@@ -277,48 +308,31 @@ async def facebook_webhook(
                 if "message" in messaging_event:
                     message = messaging_event["message"]
                     message_text = message.get("text", "")
-                    message_id = message.get("mid")
 
                     if not message_text:
                         continue
 
-                    # Process message with AI
-                    try:
-                        ai_result = await chat_bot.process_incoming_message(
-                            customer_message=message_text,
-                            customer_id=sender_id,
-                            channel="facebook"
-                        )
-
-                        response_text = (ai_result or {}).get("response")
-
-                        if response_text and facebook_client:
-                            await facebook_client.send_message(sender_id, response_text)
-                        elif response_text and not facebook_client:
-                            logger.warning(
-                                "Facebook response not sent: no client",
-                                project_id=str(project_id),
-                                sender_id=sender_id,
-                                integration_status=(integration.status.value if integration else None)
-                            )
-
-                        processed_count += 1
-
-                    except Exception as process_error:
-                        logger.error(
-                            "Failed to process Facebook message",
-                            project_id=str(project_id),
-                            sender_id=sender_id,
-                            error=str(process_error)
-                        )
+                    # Save message (once per mid - Meta redelivers on slow responses)
+                    new_message_id = await store_inbound_once(db, "facebook", project_id, message.get("mid"), {
+                        "content": message_text,
+                        "sender": {
+                            "facebook_id": sender_id,
+                            "platform": "facebook"
+                        },
+                    })
+                    if new_message_id is None:
+                        continue
+
+                    _submit_inbound("facebook", project_id, sender_id, new_message_id, message_text)
+                    queued_count += 1
 
         logger.info(
-            "Facebook messages processed",
+            "Facebook messages queued",
             project_id=str(project_id),
-            count=processed_count
+            count=queued_count
         )
 
-        return {"status": "processed", "count": processed_count}
+        return {"status": "received", "count": queued_count}
 
     except Exception as e:
         logger.error("Facebook webhook error", error=str(e))
@@ -342,12 +356,148 @@ async def facebook_verify(project_id: UUID, request: Request) -> Any:
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
 
+@router.post("/shopify/{project_id}")
+async def shopify_webhook(
+    project_id: UUID,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+) -> Any:
+    """
+    Receive Shopify order webhooks (orders/create, updated, cancelled, fulfilled).
+    
+    The HMAC is checked on the raw body, then the webhook is acknowledged
+    at once. Rapid successive updates to the same order are coalesced and
+    written as one upsert.
+    """
+    raw_body = await request.body()
+    topic = request.headers.get("X-Shopify-Topic", "")
+    
+    result = await db.execute(
+        select(Integration).where(
+            Integration.project_id == project_id,
+            Integration.provider == "shopify"
+        )
+    )
+    integration = result.scalars().first()
+    if integration is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shopify integration not found")
+    
+    shopify = ShopifyService.from_integration(integration)
+    if not shopify.verify_webhook(raw_body, request.headers.get("X-Shopify-Hmac-Sha256", "")):
+        logger.warning("Shopify webhook signature rejected", project_id=str(project_id), topic=topic)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid signature")
+    
+    if topic not in ShopifyService.get_webhook_topics():
+        return {"status": "ignored"}
+    
+    try:
+        order = json.loads(raw_body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON body")
+    
+    if not order.get("id"):
+        return {"status": "ignored"}
+    
+    inbound_dispatcher.submit_burst(
+        f"shopify:{project_id}:{order['id']}",
+        order,
+        partial(_upsert_shopify_orders, project_id, integration.id)
+    )
+    
+    logger.info(
+        "Shopify order webhook queued",
+        project_id=str(project_id),
+        topic=topic,
+        order_id=order["id"]
+    )
+    
+    return {"status": "received"}
+
+
 # Customer model removed - using CustomerProfile instead
 # Webhooks now store sender info directly in Message.sender JSONB field
 
 
-async def _process_telegram_message_with_ai(message_id: str, project_id: str):
-    """Process Telegram message with AI and send response."""
+async def _process_facebook_messages_with_ai(
+    project_id: UUID,
+    sender_id: str,
+    messages: List[Tuple[UUID, str]]
+):
+    """Generate one AI reply for a burst of stored Facebook messages and send it."""
+    message_id = messages[-1][0]
+    message_text = "\n".join(text for _, text in messages)
+
+    async with AsyncSessionLocal() as db:
+        # Load Facebook integration config for sending replies
+        integration_result = await db.execute(
+            select(Integration)
+            .where(Integration.project_id == project_id)
+            .where(Integration.provider == "facebook")
+        )
+        integration = integration_result.scalar_one_or_none()
+
+        facebook_client: FacebookClient | None = None
+        if integration:
+            try:
+                facebook_client = FacebookClient(integration.config or {})
+            except Exception as client_error:
+                logger.error(
+                    "Failed to initialize Facebook client",
+                    project_id=str(project_id),
+                    error=str(client_error)
+                )
+        else:
+            logger.warning(
+                "Facebook integration not configured",
+                project_id=str(project_id)
+            )
+
+        # No user context for webhooks
+        chat_bot = get_chat_bot(db, project_id, None)
+
+        try:
+            ai_result = await chat_bot.process_incoming_message(
+                customer_message=message_text,
+                customer_id=sender_id,
+                channel="facebook",
+                inbound_message_id=message_id
+            )
+            # The turn (or its fallback reply) is committed; don't recover it
+            error = (ai_result or {}).get("error")
+            await mark_inbound_messages(
+                db, [mid for mid, _ in messages], "failed" if error else "processed", error
+            )
+            await db.commit()
+
+            response_text = (ai_result or {}).get("response")
+
+            if response_text and facebook_client:
+                await facebook_client.send_message(sender_id, response_text)
+            elif response_text and not facebook_client:
+                logger.warning(
+                    "Facebook response not sent: no client",
+                    project_id=str(project_id),
+                    sender_id=sender_id,
+                    integration_status=(integration.status.value if integration else None)
+                )
+
+        except Exception as process_error:
+            logger.error(
+                "Failed to process Facebook message",
+                project_id=str(project_id),
+                sender_id=sender_id,
+                message_id=str(message_id),
+                error=str(process_error)
+            )
+
+
+async def _process_telegram_messages_with_ai(project_id: str, message_ids: List[str]):
+    """
+    Process a burst of Telegram messages with AI and send one response.
+    
+    Commands are handled individually; the remaining messages are answered
+    together as a single turn.
+    """
     from app.services.integrations.telegram import TelegramService
     from app.services.telegram_commands import process_telegram_command
     from app.core.database import AsyncSessionLocal
@@ -355,20 +505,25 @@ async def _process_telegram_message_with_ai(message_id: str, project_id: str):
     from sqlalchemy import select
     from uuid import UUID
     
+    message_id = message_ids[-1]
+    
     try:
         async with AsyncSessionLocal() as db:
-            # Fetch message
+            # Fetch messages
             result = await db.execute(
-                select(Message).where(Message.id == UUID(message_id))
+                select(Message)
+                .where(Message.id.in_([UUID(mid) for mid in message_ids]))
+                .where(Message.created_at >= datetime.utcnow() - RECENT_MESSAGE_WINDOW)
+                .order_by(Message.created_at)
             )
-            message = result.scalar_one_or_none()
+            messages = result.scalars().all()
             
-            if not message:
+            if not messages:
                 logger.error("Message not found for AI processing", message_id=message_id)
                 return
             
             # Get sender info from message
-            sender_info = message.sender or {}
+            sender_info = messages[-1].sender or {}
             telegram_id = sender_info.get("telegram_id")
             
             if not telegram_id:
@@ -402,19 +557,28 @@ async def _process_telegram_message_with_ai(message_id: str, project_id: str):
             # Create Telegram service
             telegram_service = TelegramService(bot_token)
             
-            # Check if message is a command
-            if message.content and message.content.startswith("/"):
-                is_command = await process_telegram_command(
-                    text=message.content,
-                    chat_id=telegram_id,
-                    project_id=UUID(project_id),
-                    telegram_service=telegram_service,
-                    db=db
-                )
-                
-                if is_command:
-                    logger.info("Command processed", command=message.content, chat_id=telegram_id)
-                    return
+            # Handle commands one by one, answer everything else together
+            texts = []
+            for message in messages:
+                if message.content and message.content.startswith("/"):
+                    is_command = await process_telegram_command(
+                        text=message.content,
+                        chat_id=telegram_id,
+                        project_id=UUID(project_id),
+                        telegram_service=telegram_service,
+                        db=db
+                    )
+                    
+                    if is_command:
+                        logger.info("Command processed", command=message.content, chat_id=telegram_id)
+                        continue
+                texts.append(message.content or "")
+            
+            if not texts:
+                await mark_inbound_messages(db, [message.id for message in messages])
+                await db.commit()
+                return
+            content = "\n".join(texts)
             
             # Generate AI response
             try:
@@ -423,7 +587,7 @@ async def _process_telegram_message_with_ai(message_id: str, project_id: str):
                 
                 # Build context for AI
                 context = f"""You are a helpful AI sales assistant for a business. 
-                Customer message: {message.content}
+                Customer message: {content}
                 
                 Please provide a helpful, friendly response. Keep it concise and professional.
                 If they're asking about products, orders, or need help, offer assistance.
@@ -433,7 +597,8 @@ async def _process_telegram_message_with_ai(message_id: str, project_id: str):
                     prompt=context,
                     use_functions=False,
                     max_tokens=200,
-                    temperature=0.7
+                    temperature=0.7,
+                    task="chat_reply"
                 )
                 
                 response_text = ai_response.get("text", "Hello! I'm your AI assistant. How can I help you today?")
@@ -441,7 +606,7 @@ async def _process_telegram_message_with_ai(message_id: str, project_id: str):
             except Exception as e:
                 logger.error("Failed to generate AI response", error=str(e))
                 # Fallback to simple response
-                response_text = f"🤖 Hello! I'm your AI sales assistant. How can I help you today?\n\nYou said: '{message.content}'"
+                response_text = f"🤖 Hello! I'm your AI sales assistant. How can I help you today?\n\nYou said: '{content}'"
             
             # Send response
             await telegram_service.send_message(
@@ -463,6 +628,7 @@ async def _process_telegram_message_with_ai(message_id: str, project_id: str):
                 status="sent"
             )
             db.add(outbound_message)
+            await mark_inbound_messages(db, [message.id for message in messages])
             await db.commit()
             
             logger.info(
@@ -479,25 +645,32 @@ async def _process_telegram_message_with_ai(message_id: str, project_id: str):
         )
 
 
-async def _process_incoming_message_with_ai(message_id: str, project_id: str, platform: str):
-    """Process incoming message from any platform with AI and send response."""
+async def _process_incoming_messages_with_ai(project_id: str, platform: str, message_ids: List[str]):
+    """Process a burst of incoming messages from any platform with AI as one turn."""
     from app.core.database import AsyncSessionLocal
     from app.db.models import Message
     from sqlalchemy import select
     from uuid import UUID
     
+    message_id = message_ids[-1]
+    
     try:
         async with AsyncSessionLocal() as db:
-            # Fetch message
+            # Fetch messages
             result = await db.execute(
-                select(Message).where(Message.id == UUID(message_id))
+                select(Message)
+                .where(Message.id.in_([UUID(mid) for mid in message_ids]))
+                .where(Message.created_at >= datetime.utcnow() - RECENT_MESSAGE_WINDOW)
+                .order_by(Message.created_at)
             )
-            message = result.scalar_one_or_none()
+            messages = result.scalars().all()
             
-            if not message:
+            if not messages:
                 logger.error("Message not found for AI processing", message_id=message_id)
                 return
             
+            content = "\n".join(m.content or "" for m in messages)
+            
             # Generate AI response
             try:
                 from app.services.gemini_client import GeminiClient
@@ -505,7 +678,7 @@ async def _process_incoming_message_with_ai(message_id: str, project_id: str, pl
                 
                 # Build context for AI
                 context = f"""You are a helpful AI sales assistant for a business. 
-                Customer message: {message.content}
+                Customer message: {content}
                 
                 Please provide a helpful, friendly response. Keep it concise and professional.
                 If they're asking about products, orders, or need help, offer assistance.
@@ -515,7 +688,8 @@ async def _process_incoming_message_with_ai(message_id: str, project_id: str, pl
                     prompt=context,
                     use_functions=False,
                     max_tokens=200,
-                    temperature=0.7
+                    temperature=0.7,
+                    task="chat_reply"
                 )
                 
                 response_text = ai_response.get("text", "Hello! I'm your AI assistant. How can I help you today?")
@@ -523,7 +697,7 @@ async def _process_incoming_message_with_ai(message_id: str, project_id: str, pl
             except Exception as e:
                 logger.error("Failed to generate AI response", error=str(e))
                 # Fallback to simple response
-                response_text = f"Hello! I'm your AI assistant. How can I help you today?\n\nYou said: '{message.content}'"
+                response_text = f"Hello! I'm your AI assistant. How can I help you today?\n\nYou said: '{content}'"
             
             # Save outbound message
             outbound_message = Message(
@@ -535,6 +709,7 @@ async def _process_incoming_message_with_ai(message_id: str, project_id: str, pl
                 status="sent"
             )
             db.add(outbound_message)
+            await mark_inbound_messages(db, [message.id for message in messages])
             await db.commit()
             
             logger.info(
@@ -550,3 +725,18 @@ async def _process_incoming_message_with_ai(message_id: str, project_id: str, pl
             platform=platform,
             error=str(e)
         )
+
+
+async def _upsert_shopify_orders(project_id: UUID, integration_id: UUID, orders: List[dict]):
+    """Write a burst of webhook payloads for one order as a single upsert (newest wins)."""
+    async with AsyncSessionLocal() as db:
+        manager = OrderManager(db, project_id)
+        await manager.upsert_shopify_orders(orders, integration_id)
+        await db.commit()
+    
+    logger.info(
+        "Shopify order upserted from webhooks",
+        project_id=str(project_id),
+        order_id=orders[-1].get("id"),
+        coalesced=len(orders)
+    )
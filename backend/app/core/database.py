@@ -1,18 +1,29 @@
 """
 Database connection and session management using SQLAlchemy 2.0 async.
-Single database architecture (simplified).
+Single primary database, with optional read replicas for read-only traffic.
 """
 
-from typing import AsyncGenerator
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import asyncio
+import itertools
 import ssl
+import structlog
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
 )
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import declarative_base, Session
 from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import Select
 from .config import settings
+from .metrics import InstrumentedQueuePool, register_pool_metrics
+
+logger = structlog.get_logger(__name__)
 
 # ============================================================================
 # DATABASE - Single unified database
@@ -49,9 +60,10 @@ engine = create_async_engine(
     pool_size=settings.DB_POOL_SIZE,
     max_overflow=settings.DB_MAX_OVERFLOW,
     pool_pre_ping=True,
-    poolclass=NullPool if settings.ENVIRONMENT == "serverless" else None,
+    poolclass=NullPool if settings.ENVIRONMENT == "serverless" else InstrumentedQueuePool,
     connect_args=get_connect_args(),
 )
+register_pool_metrics("primary", engine)
 
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
@@ -62,6 +74,169 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False,
 )
 
+# ============================================================================
+# READ REPLICAS
+# ============================================================================
+
+replica_engines: List[AsyncEngine] = [
+    create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        poolclass=InstrumentedQueuePool,
+        connect_args=get_connect_args(),
+    )
+    for url in settings.database_replica_urls
+]
+for index, replica in enumerate(replica_engines):
+    register_pool_metrics(f"replica{index}", replica)
+
+# Set once the current request/task has written through the primary, so its
+# later reads go to the primary too (read-your-writes)
+_wrote_to_primary: ContextVar[bool] = ContextVar("wrote_to_primary", default=False)
+
+
+def reset_read_your_writes():
+    """
+    Start a new unit of work for replica routing.
+
+    Each HTTP request gets a fresh context; long-lived loops (dispatcher
+    jobs, periodic flushes, worker tasks) call this per job so one write
+    doesn't pin every later read to the primary.
+    """
+    _wrote_to_primary.set(False)
+
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class ReplicaRouter:
+    """
+    Pick the engine for read-only statements.
+    
+    Replicas are used round-robin while their replay lag (checked
+    periodically) is within DB_REPLICA_MAX_LAG_SECONDS; otherwise, or after
+    the current request has written, reads fall back to the primary.
+    """
+    
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: List[AsyncEngine],
+        max_lag_seconds: float,
+        check_interval: float
+    ):
+        # Reads run in autocommit mode: no BEGIN/COMMIT round-trips
+        self.primary = primary.execution_options(isolation_level="AUTOCOMMIT")
+        self.replicas = [r.execution_options(isolation_level="AUTOCOMMIT") for r in replicas]
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._lag: Dict[int, Optional[float]] = {i: None for i in range(len(replicas))}
+        self._healthy: List[int] = list(range(len(replicas)))
+        self._round_robin = itertools.count()
+        self._check_task: Optional[asyncio.Task] = None
+    
+    def read_engine(self) -> AsyncEngine:
+        """Engine for the next read-only statement."""
+        if not self._healthy or _wrote_to_primary.get():
+            return self.primary
+        index = self._healthy[next(self._round_robin) % len(self._healthy)]
+        return self.replicas[index]
+    
+    async def check_lag(self):
+        """Measure replay lag on every replica and update the healthy set."""
+        healthy = []
+        for index, replica in enumerate(self.replicas):
+            try:
+                async with replica.connect() as conn:
+                    lag = float((await conn.execute(REPLICA_LAG_SQL)).scalar() or 0)
+            except Exception as e:
+                self._lag[index] = None
+                logger.warning("Replica unreachable", replica=index, error=str(e))
+                continue
+            
+            self._lag[index] = lag
+            if lag <= self.max_lag_seconds:
+                healthy.append(index)
+            else:
+                logger.warning("Replica lagging, reads go elsewhere", replica=index, lag_seconds=lag)
+        
+        self._healthy = healthy
+    
+    async def _run_lag_checks(self):
+        while True:
+            try:
+                await self.check_lag()
+            except Exception as e:
+                logger.error("Replica lag check failed", error=str(e))
+            await asyncio.sleep(self.check_interval)
+    
+    def start(self):
+        """Start periodic lag checks (no-op without replicas)."""
+        if self.replicas and (self._check_task is None or self._check_task.done()):
+            self._check_task = asyncio.create_task(self._run_lag_checks())
+            logger.info("Replica routing enabled", replicas=len(self.replicas))
+    
+    async def stop(self):
+        if self._check_task is not None:
+            self._check_task.cancel()
+            try:
+                await self._check_task
+            except asyncio.CancelledError:
+                pass
+            self._check_task = None
+    
+    def get_stats(self) -> Dict[str, object]:
+        """Replica lag and health for monitoring."""
+        return {
+            "replicas": len(self.replicas),
+            "healthy": list(self._healthy),
+            "lag_seconds": dict(self._lag),
+        }
+
+
+replica_router = ReplicaRouter(
+    engine,
+    replica_engines,
+    max_lag_seconds=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS,
+)
+
+
+class RoutingSession(Session):
+    """Sends SELECTs to a replica (when available) and everything else to the primary."""
+    
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or not isinstance(clause, Select):
+            return replica_router.primary.sync_engine
+        return replica_router.read_engine().sync_engine
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush_write(session, flush_context):
+    _wrote_to_primary.set(True)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_statement_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        _wrote_to_primary.set(True)
+
+
+# Read-only session factory (replica-routed, autocommit)
+ReadSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    expire_on_commit=False,
+    autoflush=False,
+)
+
 # Base class for models
 Base = declarative_base()
 
@@ -94,6 +269,38 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    FastAPI dependency for read-only endpoints (GETs).
+    
+    Never commits; statements run in autocommit mode and SELECTs are
+    served by a read replica when one is configured and fresh enough.
+    
+    Yields:
+        AsyncSession: Database session
+    """
+    async with ReadSessionLocal() as session:
+        yield session
+
+
+@asynccontextmanager
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """
+    Session scope for background jobs (Celery tasks, scripts).
+    
+    Commits on success and rolls back on error, like get_db. Opens a new
+    unit of work for replica routing (see reset_read_your_writes).
+    """
+    reset_read_your_writes()
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
 # Backward compatibility aliases
 get_auth_db = get_db
 get_app_db = get_db
@@ -110,4 +317,7 @@ async def init_db():
 
 async def close_db():
     """Close database connections."""
+    await replica_router.stop()
+    for replica in replica_engines:
+        await replica.dispose()
     await engine.dispose()
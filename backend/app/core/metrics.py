@@ -0,0 +1,253 @@
+"""
+Prometheus metrics for API, AI, database and queue hot paths.
+Defines the metrics, a pure ASGI middleware for request latency and the
+helpers used by the services to record their own timings.
+"""
+
+from typing import Any, Awaitable, Callable, Dict
+from functools import wraps
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# ============================================================================
+# Metric definitions
+# ============================================================================
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being served",
+)
+
+GEMINI_REQUEST_DURATION = Histogram(
+    "gemini_request_duration_seconds",
+    "Gemini generate_content latency by task, model and API key slot",
+    ["task", "model", "key_index", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+GEMINI_TOKENS = Counter(
+    "gemini_tokens_total",
+    "Gemini tokens used by task, API key slot and kind (prompt/completion)",
+    ["task", "key_index", "kind"],
+)
+GEMINI_COST = Counter(
+    "gemini_cost_usd_total",
+    "Estimated Gemini spend in USD by task and model",
+    ["task", "model"],
+)
+GEMINI_ERRORS = Counter(
+    "gemini_errors_total",
+    "Failed Gemini calls by task, API key slot and error type",
+    ["task", "key_index", "error"],
+)
+LLM_BATCH_SIZE = Histogram(
+    "llm_batch_size",
+    "Prompts packed into one Gemini call by the micro-batcher, by task",
+    ["task"],
+    buckets=(1, 2, 4, 8, 16, 32),
+)
+PROMPT_TOKENS_TRIMMED = Counter(
+    "prompt_tokens_trimmed_total",
+    "Estimated prompt tokens cut by the token budget, by task and prompt segment",
+    ["task", "segment"],
+)
+
+FAST_PATH_REQUESTS = Counter(
+    "fast_path_requests_total",
+    "Inbound messages seen by the rule-based fast path, by local intent and result (hit/miss/low_confidence/skipped/error)",
+    ["intent", "result"],
+)
+
+LOCAL_INTENT_PREDICTIONS = Counter(
+    "local_intent_predictions_total",
+    "Local intent classifier lookups by result (used/low_confidence/no_model)",
+    ["result"],
+)
+LOCAL_INTENT_SECONDS = Histogram(
+    "local_intent_prediction_seconds",
+    "Local intent classifier latency per message",
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005),
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Database pool connections by state",
+    ["engine", "state"],
+)
+
+WEBHOOK_MESSAGES = Counter(
+    "webhook_messages_total",
+    "Inbound webhook messages by provider and result (stored/duplicate/recovered/abandoned)",
+    ["provider", "result"],
+)
+INBOUND_QUEUE_DEPTH = Gauge(
+    "inbound_queue_depth",
+    "Inbound jobs waiting in the in-process dispatcher",
+)
+INBOUND_ACTIVE_KEYS = Gauge(
+    "inbound_active_keys",
+    "Conversations with an inbound job running or queued",
+)
+
+PROVIDER_SEND_DURATION = Histogram(
+    "provider_send_duration_seconds",
+    "Outbound message send latency by provider and outcome",
+    ["provider", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+
+WORKER_TASK_DURATION = Histogram(
+    "worker_task_duration_seconds",
+    "Celery task run time by task name and final state",
+    ["task", "state"],
+    buckets=(0.05, 0.1, 0.5, 1, 5, 15, 60, 300, 1800),
+)
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency per route template.
+
+    The route is read from the scope after routing (FastAPI stores the
+    matched route there), so `/orders/{order_id}` is one series no matter
+    how many ids are requested. Unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched",
+                str(status_code),
+            ).observe(time.perf_counter() - start)
+
+
+def render_metrics() -> bytes:
+    """Current metrics in the Prometheus text format."""
+    return generate_latest()
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+# ============================================================================
+# Database pool
+# ============================================================================
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long each checkout waited."""
+
+    metrics_name = "primary"
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self.metrics_name).observe(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+def register_pool_metrics(name: str, engine) -> None:
+    """Expose in-use/idle/overflow connection counts of an engine's pool."""
+    sync_engine = engine.sync_engine
+    if not hasattr(sync_engine.pool, "checkedout"):
+        return
+
+    if isinstance(sync_engine.pool, InstrumentedQueuePool):
+        sync_engine.pool.metrics_name = name
+
+    # The pool object is replaced on dispose(), so always read the current one
+    DB_POOL_CONNECTIONS.labels(name, "in_use").set_function(lambda: sync_engine.pool.checkedout())
+    DB_POOL_CONNECTIONS.labels(name, "idle").set_function(lambda: sync_engine.pool.checkedin())
+    DB_POOL_CONNECTIONS.labels(name, "overflow").set_function(lambda: max(sync_engine.pool.overflow(), 0))
+
+
+# ============================================================================
+# Outbound providers
+# ============================================================================
+
+def track_send(provider: str):
+    """
+    Decorator recording latency and outcome of an outbound send method.
+
+    A call counts as an error if it raises or returns {"status": "error"}.
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await func(*args, **kwargs)
+                if not (isinstance(result, dict) and result.get("status") == "error"):
+                    outcome = "ok"
+                return result
+            finally:
+                PROVIDER_SEND_DURATION.labels(provider, outcome).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# ============================================================================
+# Celery workers
+# ============================================================================
+
+_task_started_at: Dict[str, float] = {}
+
+
+def task_started(task_id: str):
+    _task_started_at[task_id] = time.perf_counter()
+
+
+def task_finished(task_id: str, task_name: str, state: str):
+    start = _task_started_at.pop(task_id, None)
+    if start is not None:
+        WORKER_TASK_DURATION.labels(task_name, state or "UNKNOWN").observe(time.perf_counter() - start)
@@ -0,0 +1,155 @@
+"""
+OpenTelemetry tracing for the customer message pipeline.
+Spans cover HTTP requests, each chat stage, every SQL statement, Gemini
+calls, outbound HTTP and queued background work. Traces are exported to
+an OTLP collector or a JSON-lines file; with TRACING_EXPORTER=none only
+the no-op API tracer is used.
+"""
+
+from typing import Any, Awaitable, Callable, Optional, Sequence
+from functools import wraps
+import threading
+import structlog
+from opentelemetry import context as otel_context, trace
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+tracer = trace.get_tracer("app")
+
+_provider = None
+
+
+class JsonLinesSpanExporter:
+    """Append finished spans to a file, one OTLP-style JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> Any:
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        lines = [span.to_json(indent=None) for span in spans]
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as trace_file:
+                trace_file.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.warning("Failed to write spans", path=self.path, error=str(e))
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def _build_exporter(kind: str):
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    if kind == "file":
+        return JsonLinesSpanExporter(settings.TRACING_FILE_PATH)
+    if kind == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter()
+    raise ValueError(f"Unknown TRACING_EXPORTER: {kind}")
+
+
+def setup_tracing(service_name: Optional[str] = None, app=None, engines: Sequence = ()):
+    """
+    Install the tracer provider and auto-instrumentation (idempotent).
+
+    Args:
+        service_name: Resource service.name (defaults to TRACING_SERVICE_NAME)
+        app: FastAPI app to instrument (server spans, incoming traceparent)
+        engines: Async engines whose statements get SQL spans
+    """
+    global _provider
+
+    kind = settings.TRACING_EXPORTER.lower()
+    if kind == "none" or _provider is not None:
+        return
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    from opentelemetry.instrumentation.aiohttp_client import AioHttpClientInstrumentor
+    from opentelemetry.instrumentation.celery import CeleryInstrumentor
+    from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+    from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+
+    provider = TracerProvider(
+        resource=Resource.create({
+            "service.name": service_name or settings.TRACING_SERVICE_NAME,
+            "deployment.environment": settings.ENVIRONMENT,
+        }),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(_build_exporter(kind)))
+    trace.set_tracer_provider(provider)
+    _provider = provider
+
+    if engines:
+        SQLAlchemyInstrumentor().instrument(
+            engines=[engine.sync_engine for engine in engines],
+            tracer_provider=provider,
+        )
+    HTTPXClientInstrumentor().instrument(tracer_provider=provider)
+    AioHttpClientInstrumentor().instrument(tracer_provider=provider)
+    # Injects trace context into task headers on publish, continues it in workers
+    CeleryInstrumentor().instrument(tracer_provider=provider)
+
+    if app is not None:
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+        FastAPIInstrumentor.instrument_app(
+            app,
+            tracer_provider=provider,
+            excluded_urls="metrics,health",
+        )
+
+    logger.info("Tracing enabled", exporter=kind, sample_ratio=settings.TRACING_SAMPLE_RATIO)
+
+
+def shutdown_tracing():
+    """Flush pending spans and stop the exporter."""
+    global _provider
+
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+
+
+def traced(name: str):
+    """Decorator wrapping an async function in a span."""
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_context() -> otel_context.Context:
+    """Trace context to hand over to work that runs later (queued jobs)."""
+    return otel_context.get_current()
+
+
+def link_to_current() -> Optional[trace.Link]:
+    """Link to the active span, or None outside a recorded trace."""
+    span_context = trace.get_current_span().get_span_context()
+    return trace.Link(span_context) if span_context.is_valid else None
+
+
+def add_trace_ids(logger, method_name, event_dict):
+    """structlog processor adding trace/span ids to log lines inside a span."""
+    span_context = trace.get_current_span().get_span_context()
+    if span_context.is_valid:
+        event_dict["trace_id"] = format(span_context.trace_id, "032x")
+        event_dict["span_id"] = format(span_context.span_id, "016x")
+    return event_dict
@@ -5,8 +5,8 @@ SQLAlchemy database models for all entities.
 from datetime import datetime
 from uuid import uuid4
 from sqlalchemy import (
-    Column, String, Text, Integer, Float, Boolean, DateTime, 
-    ForeignKey, Index, JSON, Enum as SQLEnum
+    Column, String, Text, Integer, BigInteger, Float, Boolean, DateTime, 
+    ForeignKey, Index, JSON, Enum as SQLEnum, UniqueConstraint, Computed, Sequence
 )
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
@@ -161,6 +161,10 @@ class Integration(Base):
     config = Column(JSONB, nullable=False, default={})  # API keys, tokens, etc.
     extra_data = Column(JSONB, default={})  # Additional provider-specific data
     last_sync = Column(DateTime(timezone=True))
+    # Incremental order sync cursors (Shopify): since_id while backfilling,
+    # then updated_at_min for each following run
+    sync_updated_at_min = Column(DateTime(timezone=True))
+    sync_since_id = Column(String(64))
     error_message = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -189,6 +193,10 @@ class Order(Base):
     
     # Customer information
     customer = Column(JSONB, default={})  # name, email, phone, address
+    # Generated from customer for indexed lookups; never written directly
+    customer_email = Column(String(255), Computed("lower(customer ->> 'email')", persisted=True))
+    customer_phone = Column(String(50), Computed("customer ->> 'phone'", persisted=True))
+    customer_name = Column(String(255), Computed("customer ->> 'name'", persisted=True))
     
     # Order details
     items = Column(JSONB, default=[])  # line items
@@ -202,26 +210,73 @@ class Order(Base):
     # Timestamps
     order_date = Column(DateTime(timezone=True))
     fulfilled_date = Column(DateTime(timezone=True))
-    last_updated = Column(DateTime(timezone=True), onupdate=func.now())
+    last_updated = Column(DateTime(timezone=True), onupdate=func.now())  # Platform updated_at for synced orders
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # Relationships
     project = relationship("Project", back_populates="orders")
     messages = relationship("Message", back_populates="order", cascade="all, delete-orphan")
+    order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan", passive_deletes=True)
     
     # Indexes
     __table_args__ = (
+        UniqueConstraint("project_id", "provider", "external_id", name="uq_order_project_provider_external"),
         Index("idx_order_external_provider", "external_id", "provider"),
         Index("idx_order_project_status", "project_id", "status"),
         Index("idx_order_date", "order_date"),
+        Index("idx_order_project_customer_email", "project_id", "customer_email"),
+        Index("idx_order_project_customer_phone", "project_id", "customer_phone"),
     )
     
     def __repr__(self):
         return f"<Order {self.external_id} - {self.status}>"
 
 
+class OrderItem(Base):
+    """
+    One line item of an order, normalized out of Order.items for analytics.
+
+    Derived data: rebuilt from Order.items by refresh_order_items() whenever
+    an order is created or synced, never edited on its own.
+    """
+    __tablename__ = "order_items"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)  # Index in Order.items
+    
+    product_id = Column(String(255))  # Platform or catalog product ID
+    sku = Column(String(100))
+    name = Column(String(500))
+    quantity = Column(Integer, nullable=False, default=1)
+    unit_price = Column(Float, nullable=False, default=0.0)
+    
+    # Copied from the order so period aggregates need no join
+    order_date = Column(DateTime(timezone=True), nullable=False)
+    
+    # Relationships
+    order = relationship("Order", back_populates="order_items")
+    
+    # Indexes
+    __table_args__ = (
+        Index("idx_order_item_order", "order_id"),
+        Index("idx_order_item_project_date", "project_id", "order_date"),
+        Index("idx_order_item_project_product", "project_id", "product_id"),
+        Index("idx_order_item_project_sku", "project_id", "sku"),
+    )
+    
+    def __repr__(self):
+        return f"<OrderItem {self.sku or self.product_id} x{self.quantity}>"
+
+
 class Message(Base):
-    """Unified message model across all channels."""
+    """
+    Unified message model across all channels.
+
+    Partitioned by month on created_at (see the partition_time_series
+    migration); the database primary key is (id, created_at).
+    """
     __tablename__ = "messages"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
@@ -241,6 +296,16 @@ class Message(Base):
     # Sender/Recipient info
     sender = Column(JSONB, default={})
     recipient = Column(JSONB, default={})
+    # Platform customer ID of the conversation, whichever side they are on
+    customer_id = Column(String(255), Computed(
+        "coalesce("
+        + ", ".join(
+            f"(coalesce(recipient, '{{}}'::jsonb) || coalesce(sender, '{{}}'::jsonb)) ->> '{key}'"
+            for key in ("customer_id", "telegram_id", "facebook_id", "instagram_id", "phone", "email")
+        )
+        + ")",
+        persisted=True,
+    ))
     
     # AI interaction
     ai_generated = Column(Boolean, default=False)
@@ -248,6 +313,14 @@ class Message(Base):
     ai_prompt_tokens = Column(Integer)
     ai_completion_tokens = Column(Integer)
     ai_cost = Column(Float)
+    # extra_data["tokens_used"] when the bot recorded it, else prompt + completion
+    ai_tokens_used = Column(BigInteger, Computed(
+        "coalesce("
+        "CASE WHEN jsonb_typeof(extra_data -> 'tokens_used') = 'number' "
+        "THEN (extra_data ->> 'tokens_used')::numeric::bigint END, "
+        "ai_prompt_tokens + ai_completion_tokens)",
+        persisted=True,
+    ))
     
     # Extra data
     extra_data = Column(JSONB, default={})
@@ -268,12 +341,37 @@ class Message(Base):
         Index("idx_message_project_created", "project_id", "created_at"),
         Index("idx_message_order", "order_id"),
         Index("idx_message_direction", "direction"),
+        Index("idx_message_project_customer_created", "project_id", "customer_id", "created_at"),
     )
     
     def __repr__(self):
         return f"<Message {self.direction} - {self.provider}>"
 
 
+class MessageExternalId(Base):
+    """
+    Webhook idempotency key: one row per provider delivery id.
+
+    Lives outside the partitioned messages table, whose unique indexes
+    would have to include created_at.
+    """
+    __tablename__ = "message_external_ids"
+    
+    project_id = Column(UUID(as_uuid=True), primary_key=True)
+    provider = Column(String(50), primary_key=True)
+    external_id = Column(String(255), primary_key=True)
+    message_id = Column(UUID(as_uuid=True), nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index("idx_message_external_id_created", "created_at"),
+    )
+    
+    def __repr__(self):
+        return f"<MessageExternalId {self.provider}:{self.external_id}>"
+
+
 class ModelTraining(Base):
     """AI model training job tracking."""
     __tablename__ = "model_trainings"
@@ -339,7 +437,7 @@ class Report(Base):
 
 
 class APILog(Base):
-    """API usage logging for billing and monitoring."""
+    """API usage logging for billing and monitoring (partitioned by month on created_at)."""
     __tablename__ = "api_logs"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -559,8 +657,16 @@ class AutoResponseTemplate(Base):
         return f"<AutoResponseTemplate {self.name}>"
 
 
+CONVERSATION_HISTORY_SEQ = Sequence("conversation_history_seq")
+
+
 class ConversationHistory(Base):
-    """Track conversation history per customer for memory and context."""
+    """
+    Track conversation history per customer for memory and context.
+
+    Partitioned by month on created_at. Turns stored in one transaction
+    share created_at; seq keeps them in insertion order.
+    """
     __tablename__ = "conversation_history"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
@@ -589,6 +695,11 @@ class ConversationHistory(Base):
     extra_data = Column(JSONB, default={})
     
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    seq = Column(
+        BigInteger,
+        CONVERSATION_HISTORY_SEQ,
+        server_default=CONVERSATION_HISTORY_SEQ.next_value()
+    )  # Insertion order; NULL on turns stored before it existed
     
     # Relationships
     project = relationship("Project", backref="conversation_histories")
@@ -598,12 +709,73 @@ class ConversationHistory(Base):
         Index("idx_conversation_customer", "customer_id", "platform"),
         Index("idx_conversation_project_customer", "project_id", "customer_id"),
         Index("idx_conversation_created", "created_at"),
+        Index("idx_conversation_thread_created", "project_id", "customer_id", "platform", "created_at"),
     )
     
     def __repr__(self):
         return f"<ConversationHistory {self.customer_id} - {self.platform}>"
 
 
+class ConversationSummary(Base):
+    """
+    Rolling summary of one customer thread (project, customer, platform).
+
+    Covers every ConversationHistory turn up to (covered_until, covered_seq);
+    newer turns are sent verbatim. pending_turns counts turns recorded since
+    the last refresh and decides when the summary is rebuilt.
+    """
+    __tablename__ = "conversation_summaries"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    customer_id = Column(String(255), nullable=False)
+    platform = Column(String(50), nullable=False)
+    
+    summary = Column(Text)
+    covered_until = Column(DateTime(timezone=True))  # created_at of the last summarized turn
+    covered_seq = Column(BigInteger)  # and its seq
+    turns_summarized = Column(Integer, nullable=False, default=0)
+    pending_turns = Column(Integer, nullable=False, default=0)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Indexes
+    __table_args__ = (
+        UniqueConstraint("project_id", "customer_id", "platform", name="uq_conversation_summary_thread"),
+    )
+    
+    def __repr__(self):
+        return f"<ConversationSummary {self.customer_id} - {self.platform}>"
+
+
+class IntentModel(Base):
+    """
+    Trained local intent classifier (app/services/intent_classifier.py).
+
+    One row per scope: a project, or all projects when project_id is NULL.
+    report holds the holdout evaluation against LLM labels.
+    """
+    __tablename__ = "intent_models"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=True)
+    
+    model = Column(JSONB, nullable=False)  # Serialized IntentClassifier
+    report = Column(JSONB, default={})
+    samples = Column(Integer, nullable=False, default=0)
+    
+    trained_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    # Indexes
+    __table_args__ = (
+        Index("idx_intent_model_project_trained", "project_id", "trained_at"),
+    )
+    
+    def __repr__(self):
+        return f"<IntentModel {self.project_id or 'global'} ({self.samples} samples)>"
+
+
 class BusinessContext(Base):
     """Store business-specific context, learning, and perception."""
     __tablename__ = "business_context"
@@ -786,6 +958,8 @@ class CustomerProfile(Base):
     
     # Indexes
     __table_args__ = (
+        # One profile per customer per project (target of the profile upsert)
+        UniqueConstraint("project_id", "customer_id", name="uq_customer_profile_project_customer"),
         Index("idx_customer_profile_project", "project_id"),
         Index("idx_customer_profile_customer_id", "customer_id"),
         Index("idx_customer_profile_email", "email"),
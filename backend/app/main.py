@@ -6,18 +6,25 @@ Configures middleware, routes, and lifecycle events.
 from fastapi import FastAPI, Request, status, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 from contextlib import asynccontextmanager
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
+import secrets
 import time
 import structlog
 
 from app.core.config import settings
-from app.core.database import init_db, close_db, AsyncSessionLocal, get_db
+from app.core.database import (
+    init_db, close_db, AsyncSessionLocal, get_db, replica_router, engine, replica_engines
+)
 from app.core.seed import seed_database
 from app.core.error_handlers import setup_error_handlers
+from app.core.metrics import MetricsMiddleware, METRICS_CONTENT_TYPE, render_metrics
+from app.core.tracing import add_trace_ids, setup_tracing, shutdown_tracing
+from app.services.usage_counters import usage_counters
+from app.services.inbound_dispatcher import inbound_dispatcher
 from app.api.v1 import (
     auth,
     projects,
@@ -44,6 +51,7 @@ structlog.configure(
         structlog.stdlib.add_log_level,
         structlog.stdlib.PositionalArgumentsFormatter(),
         structlog.processors.TimeStamper(fmt="iso"),
+        add_trace_ids,
         structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
         structlog.processors.UnicodeDecoder(),
@@ -64,12 +72,18 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Application starting", environment=settings.ENVIRONMENT)
     logger.info("✅ Database ready - migrations run by start.sh")
+    usage_counters.start()
+    replica_router.start()
+    inbound_dispatcher.start_recovery(webhooks.recover_inbound_messages)
     
     yield
     
     # Shutdown
     logger.info("Application shutting down")
+    await inbound_dispatcher.stop()
+    await usage_counters.stop()
     await close_db()
+    shutdown_tracing()
 
 
 # Create FastAPI application
@@ -85,6 +99,9 @@ app = FastAPI(
 # Setup global error handlers
 setup_error_handlers(app)
 
+# Tracing (no-op unless TRACING_EXPORTER is set)
+setup_tracing(app=app, engines=[engine, *replica_engines])
+
 
 # ============================================================================
 # Middleware Configuration
@@ -115,6 +132,11 @@ app.add_middleware(
 #     )
 
 
+# Prometheus request metrics (pure ASGI; runs inside the logging middleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     """Add request processing time header and logging."""
@@ -186,6 +208,20 @@ async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
 
+# Scrapers authenticate with METRICS_TOKEN; an unprotected endpoint is
+# only exposed in development
+if settings.METRICS_ENABLED and (settings.METRICS_TOKEN or settings.is_development):
+    @app.get("/metrics", tags=["Health"], include_in_schema=False)
+    async def metrics(request: Request):
+        """Prometheus metrics."""
+        if settings.METRICS_TOKEN:
+            supplied = request.headers.get("authorization", "").encode()
+            expected = f"Bearer {settings.METRICS_TOKEN}".encode()
+            if not secrets.compare_digest(supplied, expected):
+                return Response(status_code=status.HTTP_401_UNAUTHORIZED, headers={"WWW-Authenticate": "Bearer"})
+        return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/health/db", tags=["Health"])
 async def database_health_check(db: AsyncSession = Depends(get_db)):
     """Database health check endpoint."""
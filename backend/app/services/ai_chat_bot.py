@@ -8,9 +8,8 @@ from uuid import UUID
 from datetime import datetime
 import re
 import structlog
-from sqlalchemy import select
+from sqlalchemy import func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from langdetect import detect, detect_langs, LangDetectException
 
 from app.db.models import (
     Message,
@@ -22,16 +21,29 @@ from app.db.models import (
 )
 from app.services.enhanced_ai_service import EnhancedAIService
 from app.services.service_factory import get_gemini_with_tracking
+from app.services.inbound_dispatcher import conversation_locks
+from app.services.conversation_memory import ConversationMemory, schedule_summary_refresh
+from app.services.fast_path import FastPathRouter
+from app.services.intent_classifier import local_intent_service
+from app.core.tracing import traced, tracer
+from app.services.language_detection import (
+    SUPPORTED_LANGUAGES,
+    language_identifier,
+)
 
 logger = structlog.get_logger(__name__)
 
-SUPPORTED_LANGUAGES = {
-    "en": "English",
-    "es": "Spanish",
-    "fr": "French",
-    "ar": "Arabic",
-}
+# Intent detection prompt; the customer message is the input (micro-batched
+# with other conversations, see GeminiClient.classify)
+INTENT_INSTRUCTIONS = """Analyze the customer message given as input and determine the intent.
 
+Identify:
+1. Primary intent (order_status, cancel_order, modify_order, complaint, question, other)
+2. Urgency (low, medium, high, urgent)
+3. Sentiment (positive, neutral, negative)
+4. Extracted entities (order numbers, product names, etc.)
+
+Respond in JSON format."""
 
 LANGUAGE_NAMES = {
     "en": "English",
@@ -108,10 +120,6 @@ LANGUAGE_REQUEST_KEYWORDS = {
     "ar": {"arabic", "arab", "عربي", "العربية", "بالعربي"},
 }
 
-SCRIPT_LANGUAGE_PATTERNS = [
-    (re.compile(r"[\u0600-\u06FF]"), "ar"),
-]
-
 NON_LATIN_LANG_CODES = {"ar"}
 
 ACCENTED_CHAR_PATTERN = re.compile(r"[\u00C0-\u017F]")
@@ -132,7 +140,10 @@ class AIChatBot:
         self.project_id = project_id
         self.user_id = user_id
         self.gemini_client = get_gemini_with_tracking(db)
-        self.enhanced_service = EnhancedAIService(db, project_id)
+        # The bot owns the transaction: one commit per processed message
+        self.enhanced_service = EnhancedAIService(db, project_id, autocommit=False)
+        self.memory = ConversationMemory(db, project_id)
+        self.fast_path = FastPathRouter(db, project_id)
     
     async def process_incoming_message(
         self,
@@ -141,11 +152,15 @@ class AIChatBot:
         channel: str,
         order_id: Optional[UUID] = None,
         customer_phone: Optional[str] = None,
-        customer_email: Optional[str] = None
+        customer_email: Optional[str] = None,
+        inbound_message_id: Optional[UUID] = None
     ) -> Dict[str, Any]:
         """
         Process an incoming customer message and generate AI response.
         
+        Messages from the same customer are processed one at a time so
+        profile updates, context and replies never interleave.
+        
         Args:
             customer_message: The message from the customer
             customer_id: Customer identifier
@@ -153,10 +168,38 @@ class AIChatBot:
             order_id: Optional order ID if message is about specific order
             customer_phone: Customer phone number
             customer_email: Customer email
+            inbound_message_id: Set when a webhook already persisted the
+                inbound message; it is not stored a second time
             
         Returns:
             Dictionary with AI response and actions to take
         """
+        with tracer.start_as_current_span(
+            "chat.process_message",
+            attributes={"chat.channel": channel, "chat.project_id": str(self.project_id)},
+        ):
+            async with conversation_locks.acquire(f"{self.project_id}:{customer_id}"):
+                return await self._process_message(
+                    customer_message=customer_message,
+                    customer_id=customer_id,
+                    channel=channel,
+                    order_id=order_id,
+                    customer_phone=customer_phone,
+                    customer_email=customer_email,
+                    inbound_message_id=inbound_message_id
+                )
+    
+    async def _process_message(
+        self,
+        customer_message: str,
+        customer_id: str,
+        channel: str,
+        order_id: Optional[UUID],
+        customer_phone: Optional[str],
+        customer_email: Optional[str],
+        inbound_message_id: Optional[UUID]
+    ) -> Dict[str, Any]:
+        """Process a message while holding the customer's conversation lock."""
         logger.info(
             "Processing customer message",
             customer_id=customer_id,
@@ -183,34 +226,47 @@ class AIChatBot:
                 customer_email=customer_email
             )
 
-            inbound_msg = Message(
-                project_id=self.project_id,
-                order_id=order_id,
-                customer_id=customer_id,
-                direction=MessageDirection.INBOUND,
-                content=customer_message,
-                channel=channel,
-                provider=channel,
-                sender={
-                    "preferred_language": normalized_language,
-                    "language_source": language_source,
-                    "profile_id": str(profile.id) if profile else None,
-                },
-                extra_data={
-                    "customer_phone": customer_phone,
-                    "customer_email": customer_email
-                }
-            )
-            self.db.add(inbound_msg)
-            await self.db.commit()
-
-            intent = await self._detect_intent(customer_message)
+            if inbound_message_id is None:
+                inbound_msg = Message(
+                    project_id=self.project_id,
+                    order_id=order_id,
+                    direction=MessageDirection.INBOUND,
+                    content=customer_message,
+                    platform=channel,
+                    provider=channel,
+                    sender={
+                        "customer_id": customer_id,
+                        "preferred_language": normalized_language,
+                        "language_source": language_source,
+                        "profile_id": str(profile.id) if profile else None,
+                    },
+                    extra_data={
+                        "customer_phone": customer_phone,
+                        "customer_email": customer_email
+                    }
+                )
+                self.db.add(inbound_msg)
+                # Early commit so the customer's message survives an LLM failure
+                await self.db.commit()
 
-            context = await self._build_context(
+            # Common questions answered from templates and DB data skip the LLM
+            fast_answer = await self.fast_path.answer(
+                customer_message,
                 customer_id=customer_id,
-                order_id=order_id,
-                intent=intent
+                channel=channel,
+                language=normalized_language,
+                customer_name=profile.name if profile else None
             )
+            if fast_answer:
+                intent = fast_answer.to_intent()
+            else:
+                intent = await self._detect_intent(customer_message)
+                context = await self._build_context(
+                    customer_id=customer_id,
+                    channel=channel,
+                    order_id=order_id,
+                    intent=intent
+                )
 
             await self._store_conversation_event(
                 customer_id=customer_id,
@@ -222,16 +278,27 @@ class AIChatBot:
                 sentiment=intent.get("sentiment"),
                 entities=intent.get("entities"),
                 language=normalized_language,
+                urgency=intent.get("urgency"),
+                intent_source=intent.get("source", "llm"),
             )
 
-            ai_response = await self._generate_response(
-                message=customer_message,
-                intent=intent,
-                context=context,
-                channel=channel,
-                language=normalized_language,
-                customer_name=profile.name if profile else None
-            )
+            if fast_answer:
+                ai_response = {
+                    "text": fast_answer.text,
+                    "function_calls": [],
+                    "tokens_used": 0,
+                    "cost": 0.0,
+                    "metadata": {"fast_path": fast_answer.source},
+                }
+            else:
+                ai_response = await self._generate_response(
+                    message=customer_message,
+                    intent=intent,
+                    context=context,
+                    channel=channel,
+                    language=normalized_language,
+                    customer_name=profile.name if profile else None
+                )
             
             # Execute any required actions
             actions_taken = await self._execute_actions(ai_response.get("function_calls", []))
@@ -263,13 +330,19 @@ class AIChatBot:
             outbound_msg = Message(
                 project_id=self.project_id,
                 order_id=order_id,
-                customer_id=customer_id,
                 direction=MessageDirection.OUTBOUND,
                 content=response_content,
-                channel=channel,
+                platform=channel,
                 provider=channel,
+                recipient={"customer_id": customer_id},
+                ai_generated=not fast_answer,
+                ai_model=ai_response.get("model"),
+                ai_prompt_tokens=ai_response.get("prompt_tokens"),
+                ai_completion_tokens=ai_response.get("completion_tokens"),
+                ai_cost=ai_response.get("cost"),
                 extra_data={
-                    "ai_generated": True,
+                    "ai_generated": not fast_answer,
+                    "fast_path": fast_answer.source if fast_answer else None,
                     "model": ai_response.get("model"),
                     "tokens_used": ai_response.get("tokens_used"),
                     "cost": ai_response.get("cost"),
@@ -283,7 +356,6 @@ class AIChatBot:
                 }
             )
             self.db.add(outbound_msg)
-            await self.db.commit()
 
             await self._store_conversation_event(
                 customer_id=customer_id,
@@ -296,6 +368,12 @@ class AIChatBot:
                 entities={"actions_taken": actions_taken} if actions_taken else None,
                 language=normalized_language,
             )
+            summary_due = await self.memory.record_turns(customer_id, channel, turns=2)
+            
+            # Single commit for profile, history, actions and the reply
+            await self.db.commit()
+            if summary_due:
+                schedule_summary_refresh(self.project_id, customer_id, channel)
             
             logger.info(
                 "AI response generated",
@@ -316,16 +394,17 @@ class AIChatBot:
             
         except Exception as e:
             logger.error("Failed to process message", error=str(e), customer_id=customer_id)
+            await self.db.rollback()
             
             fallback_response = self._get_localized_message(detected_language, "technical_issue")
             
             fallback_msg = Message(
                 project_id=self.project_id,
-                customer_id=customer_id,
                 direction=MessageDirection.OUTBOUND,
                 content=fallback_response,
-                channel=channel,
+                platform=channel,
                 provider=channel,
+                recipient={"customer_id": customer_id},
                 extra_data={"error": str(e), "fallback": True}
             )
             self.db.add(fallback_msg)
@@ -337,6 +416,7 @@ class AIChatBot:
                 "should_escalate": True
             }
     
+    @traced("chat.detect_intent")
     async def _detect_intent(self, message: str) -> Dict[str, Any]:
         """
         Detect customer intent from message.
@@ -344,64 +424,53 @@ class AIChatBot:
         Returns:
             Dictionary with intent type, confidence, and extracted entities
         """
-        prompt = f"""Analyze this customer message and determine the intent:
-
-Message: "{message}"
-
-Identify:
-1. Primary intent (order_status, cancel_order, modify_order, complaint, question, other)
-2. Urgency (low, medium, high, urgent)
-3. Sentiment (positive, neutral, negative)
-4. Extracted entities (order numbers, product names, etc.)
-
-Respond in JSON format."""
+        # Trained local classifier first; the LLM only when it is unsure
+        local_intent = await local_intent_service.classify(self.db, self.project_id, message)
+        if local_intent:
+            return local_intent
         
-        response = await self.gemini_client.generate_response(
-            prompt=prompt,
-            use_functions=False,
-            temperature=0.2,
-            user_id=self.user_id
+        text = await self.gemini_client.classify(
+            "intent",
+            INTENT_INSTRUCTIONS,
+            f'Message: "{message}"',
+            user_id=self.user_id,
+            project_id=self.project_id
         )
         
         try:
             import json
-            intent = json.loads(response["text"])
+            intent = json.loads(text)
             return intent
         except:
             return {
                 "primary_intent": "question",
                 "urgency": "medium",
                 "sentiment": "neutral",
-                "entities": {}
+                "entities": {},
+                "source": "default"  # Not a real label; kept out of classifier training
             }
     
+    @traced("chat.build_context")
     async def _build_context(
         self,
         customer_id: str,
+        channel: str,
         order_id: Optional[UUID],
         intent: Dict[str, Any]
     ) -> Dict[str, Any]:
         """Build conversation context including history, orders, and customer profile."""
         context: Dict[str, Any] = {}
 
-        # Conversation history (last 10 messages)
-        result = await self.db.execute(
-            select(Message)
-            .where(Message.project_id == self.project_id)
-            .where(Message.customer_id == customer_id)
-            .order_by(Message.created_at.desc())
-            .limit(10)
-        )
-        messages = result.scalars().all()
+        # Conversation memory: rolling summary + token-budgeted recent turns
+        memory = await self.memory.get_context(customer_id, channel)
+        context["conversation_summary"] = memory["summary"]
+        context["conversation_history"] = memory["recent"]
 
-        context["conversation_history"] = [
-            {
-                "role": "assistant" if msg.direction == MessageDirection.OUTBOUND else "user",
-                "content": msg.content,
-                "timestamp": msg.created_at.isoformat(),
-            }
-            for msg in reversed(messages)
-        ]
+        # Orders are keyed by the generated customer_email/customer_phone columns
+        customer_orders = or_(
+            Order.customer_email == customer_id.lower(),
+            Order.customer_phone == customer_id,
+        )
 
         # Order context when useful
         relevant_intents = {"order_status", "cancel_order", "modify_order"}
@@ -412,8 +481,8 @@ Respond in JSON format."""
                 order_result = await self.db.execute(
                     select(Order)
                     .where(Order.project_id == self.project_id)
-                    .where(Order.customer_email == customer_id)
-                    .order_by(Order.order_date.desc())
+                    .where(customer_orders)
+                    .order_by(Order.order_date.desc().nulls_last())
                     .limit(1)
                 )
 
@@ -422,27 +491,27 @@ Respond in JSON format."""
                 context["order"] = {
                     "id": str(order.id),
                     "external_id": order.external_id,
-                    "status": order.status.value,
+                    "status": order.status,
                     "customer_name": order.customer_name,
                     "customer_email": order.customer_email,
-                    "total": float(order.total),
+                    "total": float(order.total or 0),
                     "currency": order.currency,
                     "order_date": order.order_date.isoformat() if order.order_date else None,
-                    "line_items": order.line_items,
+                    "line_items": order.items,
                     "tracking_number": (order.extra_data or {}).get("tracking_number"),
                 }
 
         # Customer stats (orders)
-        orders_result = await self.db.execute(
-            select(Order)
+        stats_result = await self.db.execute(
+            select(func.count(Order.id), func.coalesce(func.sum(Order.total), 0))
             .where(Order.project_id == self.project_id)
-            .where(Order.customer_email == customer_id)
+            .where(customer_orders)
         )
-        customer_orders = orders_result.scalars().all()
+        total_orders, lifetime_value = stats_result.one()
         context["customer_info"] = {
-            "total_orders": len(customer_orders),
-            "is_repeat_customer": len(customer_orders) > 1,
-            "customer_lifetime_value": float(sum(order.total for order in customer_orders)),
+            "total_orders": total_orders,
+            "is_repeat_customer": total_orders > 1,
+            "customer_lifetime_value": float(lifetime_value),
         }
 
         profile = await self._get_customer_profile(customer_id)
@@ -479,12 +548,18 @@ Respond in JSON format."""
         if not customer_id:
             return None
         try:
-            profile = await self.enhanced_service.get_customer_profile(customer_id)
+            # Read-only lookups within a turn; the upsert keeps the cache fresh
+            profile = await self.enhanced_service.get_customer_profile(
+                customer_id,
+                create_if_not_exists=False,
+                use_cache=True
+            )
             return profile
         except Exception as exc:
             logger.warning("Failed to load customer profile", error=str(exc), customer_id=customer_id)
             return None
 
+    @traced("chat.profile_upsert")
     async def _update_customer_profile(
         self,
         customer_id: str,
@@ -572,35 +647,27 @@ Respond in JSON format."""
         return None
 
     def _guess_language_from_script(self, message: str) -> Optional[str]:
-        for pattern, lang_code in SCRIPT_LANGUAGE_PATTERNS:
-            if pattern.search(message):
-                return lang_code
-        return None
+        return language_identifier.guess_from_script(message)
 
-    def _infer_language_from_text(self, message: str) -> Optional[str]:
-        if not message:
-            return None
-
-        try:
-            language_candidates = detect_langs(message)
-            if language_candidates:
-                top_candidate = language_candidates[0]
-                if top_candidate.prob >= 0.6:
-                    return self._normalize_language_code(top_candidate.lang)
-        except LangDetectException:
-            pass
-        except Exception:
-            logger.debug("detect_langs failed", text_preview=message[:30])
+    def _customer_language_key(self, customer_id: Optional[str]) -> Optional[str]:
+        return f"{self.project_id}:{customer_id}" if customer_id else None
 
-        try:
-            detected = detect(message)
-            if detected:
-                return self._normalize_language_code(detected)
-        except LangDetectException:
-            return None
+    def _infer_language_from_text(
+        self,
+        message: str,
+        customer_id: Optional[str] = None
+    ) -> Tuple[Optional[str], str]:
+        """Identify message language via the cached identifier (script, memo, then model)."""
+        if not message:
+            return None, "none"
 
-        return None
+        language, source = language_identifier.detect_with_source(
+            message,
+            customer_key=self._customer_language_key(customer_id),
+        )
+        return self._normalize_language_code(language), source
 
+    @traced("chat.detect_language")
     async def _detect_language(
         self,
         message: str,
@@ -618,6 +685,7 @@ Respond in JSON format."""
         if explicit_request:
             lang = self._ensure_supported_language(explicit_request)
             source = "customer_request" if lang == self._normalize_language_code(explicit_request) else "fallback"
+            language_identifier.remember(self._customer_language_key(customer_id), lang)
             return lang, source
 
         if stored_language:
@@ -629,15 +697,13 @@ Respond in JSON format."""
         source = "default"
 
         if normalized_message:
-            inferred_language = self._infer_language_from_text(normalized_message)
+            inferred_language, inferred_source = self._infer_language_from_text(
+                normalized_message,
+                customer_id,
+            )
             if inferred_language:
                 candidate_lang = inferred_language
-                source = "message"
-            else:
-                script_language = self._guess_language_from_script(normalized_message)
-                if script_language:
-                    candidate_lang = script_language
-                    source = "script"
+                source = inferred_source
 
         if not candidate_lang and channel:
             channel_defaults = {
@@ -658,6 +724,7 @@ Respond in JSON format."""
 
         return final_lang, final_source
 
+    @traced("chat.store_conversation_event")
     async def _store_conversation_event(
         self,
         *,
@@ -670,11 +737,18 @@ Respond in JSON format."""
         sentiment: Optional[str],
         entities: Optional[Dict[str, Any]],
         language: Optional[str],
+        urgency: Optional[str] = None,
+        intent_source: Optional[str] = None,
     ) -> None:
         try:
             merged_entities = dict(entities or {})
             if language:
                 merged_entities.setdefault("_language", language)
+            # Labels for the local intent classifier (see intent_classifier)
+            if urgency:
+                merged_entities.setdefault("_urgency", urgency)
+            if intent_source:
+                merged_entities.setdefault("_intent_source", intent_source)
 
             await self.enhanced_service.save_conversation(
                 customer_id=customer_id,
@@ -694,6 +768,7 @@ Respond in JSON format."""
                 channel=channel,
             )
 
+    @traced("chat.generate_response")
     async def _generate_response(
         self,
         message: str,
@@ -724,6 +799,7 @@ Respond in JSON format."""
             use_functions=True,
             temperature=0.7,
             user_id=self.user_id,
+            task="chat_reply",
         )
 
         metadata = response.setdefault("metadata", {})
@@ -816,6 +892,7 @@ Respond in JSON format."""
 
         return f"{base_prompt}\n{persona_detail}\n{closing_rules}"
 
+    @traced("chat.execute_actions")
     async def _execute_actions(self, function_calls: List[Dict[str, Any]]) -> List[str]:
         """Run follow-up actions requested by the AI model."""
         actions_taken: List[str] = []
@@ -892,7 +969,6 @@ Respond in JSON format."""
                     "timestamp": datetime.utcnow().isoformat(),
                     "updated_by": "AI Bot"
                 })
-            await self.db.commit()
     
     async def _send_tracking_info(
         self,
@@ -909,7 +985,6 @@ Respond in JSON format."""
             order.extra_data = order.extra_data or {}
             order.extra_data["tracking_number"] = tracking_number
             order.extra_data["tracking_updated_at"] = datetime.utcnow().isoformat()
-            await self.db.commit()
     
     async def _schedule_followup(
         self,
@@ -969,7 +1044,7 @@ Respond in JSON format."""
         status_message = f"""📦 Order Status Update
 
 Order #{order.external_id}
-Status: {order.status.value.upper()} ✓
+Status: {(order.status or 'pending').upper()} ✓
 Order Date: {order.order_date.strftime('%B %d, %Y')}
 Total: {order.currency} {order.total}
 
@@ -991,11 +1066,12 @@ Total: {order.currency} {order.total}
         outbound_msg = Message(
             project_id=self.project_id,
             order_id=order.id,
-            customer_id=customer_id,
             direction=MessageDirection.OUTBOUND,
             content=status_message,
-            channel=channel,
+            platform=channel,
             provider=channel,
+            recipient={"customer_id": customer_id},
+            ai_generated=True,
             extra_data={"ai_generated": True, "type": "order_status_update"}
         )
         self.db.add(outbound_msg)
@@ -1004,7 +1080,7 @@ Total: {order.currency} {order.total}
         return {
             "response": status_message,
             "order_id": str(order.id),
-            "status": order.status.value
+            "status": order.status
         }
 
 
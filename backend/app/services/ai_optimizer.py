@@ -10,6 +10,9 @@ from datetime import datetime, timedelta
 from redis import asyncio as aioredis
 import structlog
 
+from app.services.model_routing import model_router
+from app.services.token_budget import estimate_cost, token_counter, truncate_to_tokens
+
 logger = structlog.get_logger(__name__)
 
 
@@ -139,64 +142,49 @@ class AIOptimizer:
         """
         Select the most cost-effective model for the task.
         
+        Known tasks use their route from the model routing table (the one
+        GeminiClient applies); others fall back to the route of the
+        complexity tier.
+        
         Returns model config with temperature and max_tokens optimized.
         """
-        # Model selection based on task complexity
-        configs = {
-            "simple": {
-                "model": "gemini-2.0-flash",  # Fastest, cheapest
-                "temperature": 0.3,
-                "max_tokens": 150,
-                "use_case": "sentiment, classification, yes/no"
-            },
-            "medium": {
-                "model": "gemini-2.0-flash",
-                "temperature": 0.7,
-                "max_tokens": 500,
-                "use_case": "responses, summaries, extraction"
-            },
-            "complex": {
-                "model": "gemini-2.0-flash",
-                "temperature": 0.9,
-                "max_tokens": 1500,
-                "use_case": "creative, long-form, detailed"
-            }
+        # Legacy task names and complexity levels mapped onto routing tasks
+        task_aliases = {
+            "classification": "intent",
+            "yes_no": "intent",
+            "extract_order": "order_extraction",
+            "generate_response": "chat_reply",
+            "summarize": "message_summary",
+            "creative_writing": "content",
+            "detailed_analysis": "report_insights",
         }
-        
-        # Task-specific overrides
-        task_complexity = {
-            "sentiment": "simple",
-            "classification": "simple",
-            "yes_no": "simple",
-            "extract_order": "medium",
-            "generate_response": "medium",
-            "summarize": "medium",
-            "creative_writing": "complex",
-            "detailed_analysis": "complex"
+        complexity_tasks = {
+            "simple": "intent",
+            "medium": "chat_reply",
+            "complex": "content",
         }
         
-        complexity = task_complexity.get(task_type, complexity)
-        config = configs.get(complexity, configs["medium"])
+        task = task_aliases.get(task_type, task_type)
+        if task not in model_router.policy:
+            task = complexity_tasks.get(complexity, "chat_reply")
+        config = model_router.resolve(task).to_dict()
         
-        logger.info("Model selected", task_type=task_type, complexity=complexity)
+        logger.info("Model selected", task_type=task_type, task=task, model=config["model"])
         
         return config
     
     def estimate_tokens(self, text: str) -> int:
-        """Rough estimation of tokens (1 token ≈ 4 characters)."""
-        return len(text) // 4
+        """Calibrated local token estimate (see token_budget.TokenCounter)."""
+        return token_counter.count(text)
     
     def calculate_cost(self, input_tokens: int, output_tokens: int) -> float:
         """
         Calculate AI cost based on Gemini pricing.
         
-        Gemini 2.0 Flash (if paid):
-        - Input: $0.075 per 1M tokens
-        - Output: $0.30 per 1M tokens
+        Prices come from GEMINI_INPUT_PRICE_PER_MILLION and
+        GEMINI_OUTPUT_PRICE_PER_MILLION (Gemini 2.0 Flash: $0.075 / $0.30).
         """
-        input_cost = (input_tokens / 1_000_000) * 0.075
-        output_cost = (output_tokens / 1_000_000) * 0.30
-        return input_cost + output_cost
+        return estimate_cost(input_tokens, output_tokens)
     
     async def batch_similar_requests(
         self,
@@ -222,32 +210,33 @@ class AIOptimizer:
         
         return batches
     
-    def compress_context(self, context: Dict[str, Any]) -> Dict[str, Any]:
+    def compress_context(self, context: Dict[str, Any], max_tokens_per_value: int = 125) -> Dict[str, Any]:
         """
         Compress context to reduce token usage.
         
-        - Remove unnecessary fields
-        - Truncate long strings
-        - Summarize arrays
+        - Truncate strings to max_tokens_per_value tokens
+        - Keep leading list items while they fit in 4x that budget
         """
         compressed = {}
         
         for key, value in context.items():
             if isinstance(value, str):
-                # Truncate very long strings
-                if len(value) > 500:
-                    compressed[key] = value[:500] + "..."
-                else:
-                    compressed[key] = value
+                compressed[key] = truncate_to_tokens(value, max_tokens_per_value)
             elif isinstance(value, list):
-                # Limit array size
-                if len(value) > 5:
-                    compressed[key] = value[:5] + [f"...{len(value)-5} more"]
-                else:
-                    compressed[key] = value
+                kept = []
+                remaining = max_tokens_per_value * 4
+                for item in value:
+                    cost = token_counter.count(item if isinstance(item, str) else json.dumps(item, default=str))
+                    if cost > remaining and kept:
+                        break
+                    kept.append(item)
+                    remaining -= cost
+                if len(kept) < len(value):
+                    kept.append(f"...{len(value) - len(kept)} more")
+                compressed[key] = kept
             elif isinstance(value, dict):
                 # Recursively compress nested dicts
-                compressed[key] = self.compress_context(value)
+                compressed[key] = self.compress_context(value, max_tokens_per_value)
             else:
                 compressed[key] = value
         
@@ -520,7 +520,7 @@ Respond in JSON format."""
             response = await self.gemini.generate_response(
                 prompt=prompt,
                 use_functions=False,
-                temperature=0.3
+                task="sentiment"
             )
             
             import json
@@ -580,7 +580,7 @@ Format as JSON with keys: text, hashtags, cta, emojis"""
             response = await self.gemini.generate_response(
                 prompt=prompt,
                 use_functions=False,
-                temperature=0.8  # Higher for creativity
+                task="content"
             )
             
             import json
@@ -14,6 +14,7 @@ from app.db.models import (
     Order, Message, MessageDirection, Project, 
     Integration, IntegrationProvider, APILog
 )
+from app.services.order_items import co_purchased_products, top_products
 
 logger = structlog.get_logger(__name__)
 
@@ -21,8 +22,16 @@ logger = structlog.get_logger(__name__)
 class BotFunctionExecutor:
     """Executes bot function calls and returns real data from platform"""
     
-    def __init__(self, db: AsyncSession, project_id: UUID, user_id: UUID):
+    def __init__(
+        self,
+        db: AsyncSession,
+        project_id: UUID,
+        user_id: UUID,
+        read_db: Optional[AsyncSession] = None
+    ):
         self.db = db
+        # Stats and listings can be served from a read replica
+        self.read_db = read_db or db
         self.project_id = project_id
         self.user_id = user_id
     
@@ -64,6 +73,7 @@ class BotFunctionExecutor:
                 "get_unread_messages": self._get_unread_messages,
                 "get_urgent_messages": self._get_urgent_messages,
                 "get_top_products": self._get_top_products,
+                "get_frequently_bought_together": self._get_frequently_bought_together,
                 "compare_periods": self._compare_periods,
             }
             
@@ -105,7 +115,7 @@ class BotFunctionExecutor:
         start_date = datetime.utcnow() - timedelta(days=days)
         
         # Get total message count
-        total_result = await self.db.execute(
+        total_result = await self.read_db.execute(
             select(func.count(Message.id))
             .where(Message.project_id == self.project_id)
             .where(Message.created_at >= start_date)
@@ -113,7 +123,7 @@ class BotFunctionExecutor:
         total_messages = total_result.scalar() or 0
         
         # Get unread count
-        unread_result = await self.db.execute(
+        unread_result = await self.read_db.execute(
             select(func.count(Message.id))
             .where(Message.project_id == self.project_id)
             .where(Message.is_read == False)
@@ -122,7 +132,7 @@ class BotFunctionExecutor:
         unread_messages = unread_result.scalar() or 0
         
         # Get count by platform
-        platform_result = await self.db.execute(
+        platform_result = await self.read_db.execute(
             select(
                 Message.platform,
                 func.count(Message.id).label("count")
@@ -150,7 +160,7 @@ class BotFunctionExecutor:
         start_date = datetime.utcnow() - timedelta(days=days)
         
         # Get order statistics
-        stats_result = await self.db.execute(
+        stats_result = await self.read_db.execute(
             select(
                 func.count(Order.id).label("total_orders"),
                 func.sum(Order.total).label("total_revenue"),
@@ -175,7 +185,7 @@ class BotFunctionExecutor:
         
         # Get previous period for comparison
         prev_start = start_date - timedelta(days=days)
-        prev_result = await self.db.execute(
+        prev_result = await self.read_db.execute(
             select(
                 func.count(Order.id).label("total_orders"),
                 func.sum(Order.total).label("total_revenue")
@@ -222,7 +232,7 @@ class BotFunctionExecutor:
         
         query = query.order_by(Order.created_at.desc()).limit(limit)
         
-        result = await self.db.execute(query)
+        result = await self.read_db.execute(query)
         orders = result.scalars().all()
         
         orders_data = [
@@ -260,7 +270,7 @@ class BotFunctionExecutor:
         
         query = query.order_by(Message.created_at.desc()).limit(limit)
         
-        result = await self.db.execute(query)
+        result = await self.read_db.execute(query)
         messages = result.scalars().all()
         
         messages_data = [
@@ -287,7 +297,7 @@ class BotFunctionExecutor:
     
     async def _get_unread_messages(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Get unread messages"""
-        result = await self.db.execute(
+        result = await self.read_db.execute(
             select(Message)
             .where(Message.project_id == self.project_id)
             .where(Message.is_read == False)
@@ -321,7 +331,7 @@ class BotFunctionExecutor:
         # Get messages from last 24 hours that are unread
         yesterday = datetime.utcnow() - timedelta(days=1)
         
-        result = await self.db.execute(
+        result = await self.read_db.execute(
             select(Message)
             .where(Message.project_id == self.project_id)
             .where(Message.is_read == False)
@@ -379,7 +389,7 @@ class BotFunctionExecutor:
         start_date = datetime.utcnow() - timedelta(days=days)
         
         # Get order statistics
-        result = await self.db.execute(
+        result = await self.read_db.execute(
             select(
                 func.count(Order.id).label("total_orders"),
                 func.sum(Order.total).label("total_revenue"),
@@ -391,9 +401,9 @@ class BotFunctionExecutor:
         
         row = result.first()
         
-        # Get top products
-        # Note: This is simplified - in reality you'd aggregate from order items
-        top_products_data = []
+        top_products_data = await top_products(
+            self.read_db, self.project_id, start_date, limit=5
+        )
         
         report = {
             "report_type": "sales",
@@ -423,7 +433,7 @@ class BotFunctionExecutor:
         start_date = datetime.utcnow() - timedelta(days=period_days)
         
         # Get customer statistics from orders
-        result = await self.db.execute(
+        result = await self.read_db.execute(
             select(Order)
             .where(Order.project_id == self.project_id)
             .where(Order.created_at >= start_date)
@@ -502,7 +512,7 @@ class BotFunctionExecutor:
     
     async def _get_integration_status(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Get integration status"""
-        result = await self.db.execute(
+        result = await self.read_db.execute(
             select(Integration)
             .where(Integration.project_id == self.project_id)
         )
@@ -535,7 +545,7 @@ class BotFunctionExecutor:
             return {"success": False, "error": "message_id required"}
         
         # Get message
-        result = await self.db.execute(
+        result = await self.read_db.execute(
             select(Message)
             .where(Message.id == UUID(message_id))
             .where(Message.project_id == self.project_id)
@@ -654,41 +664,42 @@ class BotFunctionExecutor:
         limit = params.get("limit", 10)
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Get orders
-        result = await self.db.execute(
-            select(Order)
-            .where(Order.project_id == self.project_id)
-            .where(Order.created_at >= start_date)
+        products = await top_products(
+            self.read_db,
+            self.project_id,
+            start_date,
+            limit=limit,
+            order_by=params.get("sort_by", "quantity")
         )
         
-        orders = result.scalars().all()
+        return {
+            "success": True,
+            "data": {
+                "top_products": products,
+                "period_days": days
+            }
+        }
+    
+    async def _get_frequently_bought_together(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Get products most often bought in the same order"""
+        days = params.get("days", 90)
+        limit = params.get("limit", 10)
+        product = params.get("product")
+        start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Aggregate products
-        products = {}
-        for order in orders:
-            if order.items:
-                for item in order.items:
-                    product_name = item.get("name", "Unknown")
-                    if product_name not in products:
-                        products[product_name] = {
-                            "name": product_name,
-                            "quantity_sold": 0,
-                            "revenue": 0.0
-                        }
-                    products[product_name]["quantity_sold"] += item.get("quantity", 1)
-                    products[product_name]["revenue"] += float(item.get("price", 0)) * item.get("quantity", 1)
-        
-        # Sort by quantity sold
-        top_products = sorted(
-            products.values(),
-            key=lambda x: x["quantity_sold"],
-            reverse=True
-        )[:limit]
+        pairs = await co_purchased_products(
+            self.read_db,
+            self.project_id,
+            start_date,
+            limit=limit,
+            product=product
+        )
         
         return {
             "success": True,
             "data": {
-                "top_products": top_products,
+                "pairs": pairs,
+                "product": product,
                 "period_days": days
             }
         }
@@ -699,7 +710,7 @@ class BotFunctionExecutor:
         
         # Current period
         current_start = datetime.utcnow() - timedelta(days=period_days)
-        current_result = await self.db.execute(
+        current_result = await self.read_db.execute(
             select(
                 func.count(Order.id).label("orders"),
                 func.sum(Order.total).label("revenue")
@@ -711,7 +722,7 @@ class BotFunctionExecutor:
         
         # Previous period
         previous_start = current_start - timedelta(days=period_days)
-        previous_result = await self.db.execute(
+        previous_result = await self.read_db.execute(
             select(
                 func.count(Order.id).label("orders"),
                 func.sum(Order.total).label("revenue")
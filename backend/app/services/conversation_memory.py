@@ -0,0 +1,280 @@
+"""
+Conversation memory: a rolling summary per customer thread plus a
+token-budgeted window of the newest turns, so prompt context stays the
+same size however long a conversation gets.
+The summary is refreshed by a background task every few turns, never on
+the reply path.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+import structlog
+from sqlalchemy import and_, desc, func, select, true, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import ConversationHistory, ConversationSummary, MessageDirection
+from app.services.token_budget import token_counter, truncate_to_tokens
+
+logger = structlog.get_logger(__name__)
+
+# Upper bound on turns folded into the summary by one refresh
+MAX_TURNS_PER_REFRESH = 50
+# Longer turns are cut before they go into the summary prompt
+MAX_TURN_CHARS = 1000
+
+SUMMARY_PROMPT = """You keep the running memory of a customer conversation for a sales assistant.
+Update the summary with the new messages. Keep what matters later: who the customer is,
+products and orders discussed, preferences, promises made and open issues. Drop greetings
+and small talk. Write plain third-person notes, at most {max_words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+
+def fit_to_budget(turns: Sequence[Dict[str, Any]], max_tokens: int) -> List[Dict[str, Any]]:
+    """
+    Newest turns, oldest first, whose content fits in max_tokens.
+
+    The newest turn is always included, cut down if it alone is over budget.
+    """
+    window: List[Dict[str, Any]] = []
+    remaining = max_tokens
+    for turn in reversed(turns):
+        cost = token_counter.count(turn.get("content"))
+        if cost > remaining:
+            if not window:
+                window.append({**turn, "content": truncate_to_tokens(turn.get("content") or "", remaining)})
+            break
+        window.append(turn)
+        remaining -= cost
+    window.reverse()
+    return window
+
+
+def refresh_due(previous: int, pending: int) -> bool:
+    """
+    Whether moving from previous to pending unsummarized turns calls for a refresh.
+
+    The newest CONVERSATION_RECENT_TURNS turns are never summarized, so a
+    refresh is due each time CONVERSATION_SUMMARY_EVERY_TURNS more turns
+    have piled up beyond them (again and again if a refresh is lost).
+    """
+    every = max(1, settings.CONVERSATION_SUMMARY_EVERY_TURNS)
+    threshold = settings.CONVERSATION_RECENT_TURNS + every
+    if pending < threshold:
+        return False
+    return previous < threshold or (previous - threshold) // every < (pending - threshold) // every
+
+
+# Position of a turn in its thread. Turns stored in one transaction share
+# created_at, seq orders them; turns from before seq existed sort first.
+_TURN_SEQ = func.coalesce(ConversationHistory.seq, 0)
+
+
+def _after(row: ConversationSummary):
+    """Turns newer than the last one the summary covers."""
+    return and_(
+        ConversationHistory.created_at >= row.covered_until,  # Lets Postgres prune partitions
+        tuple_(ConversationHistory.created_at, _TURN_SEQ) > tuple_(row.covered_until, row.covered_seq or 0),
+    )
+
+
+def _turn(entry: ConversationHistory) -> Dict[str, Any]:
+    return {
+        "role": "user" if entry.message_direction == MessageDirection.INBOUND else "assistant",
+        "content": entry.message_content,
+        "timestamp": entry.created_at.isoformat() if entry.created_at else None,
+    }
+
+
+class ConversationMemory:
+    """Reads and maintains the memory of customer threads in one project."""
+
+    def __init__(self, db: AsyncSession, project_id: UUID):
+        self.db = db
+        self.project_id = project_id
+
+    def _history_of(self, customer_id: str, platform: str):
+        return and_(
+            ConversationHistory.project_id == self.project_id,
+            ConversationHistory.customer_id == customer_id,
+            ConversationHistory.platform == platform,
+        )
+
+    async def _summary_row(self, customer_id: str, platform: str) -> Optional[ConversationSummary]:
+        result = await self.db.execute(
+            select(ConversationSummary).where(
+                ConversationSummary.project_id == self.project_id,
+                ConversationSummary.customer_id == customer_id,
+                ConversationSummary.platform == platform,
+            )
+        )
+        return result.scalar_one_or_none()
+
+    async def get_summary(self, customer_id: str, platform: str) -> Optional[str]:
+        """The thread's current summary, if one has been written."""
+        row = await self._summary_row(customer_id, platform)
+        return row.summary if row else None
+
+    async def get_context(
+        self,
+        customer_id: str,
+        platform: str,
+        max_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Prompt memory for a thread.
+
+        Returns:
+            {"summary": str or None, "recent": [{"role", "content", "timestamp"}]}
+            where recent holds the newest turns not yet in the summary,
+            oldest first, within max_tokens (CONVERSATION_WINDOW_TOKENS)
+        """
+        row = await self._summary_row(customer_id, platform)
+
+        query = select(ConversationHistory).where(self._history_of(customer_id, platform))
+        if row and row.covered_until:
+            query = query.where(_after(row))
+        result = await self.db.execute(
+            query
+            .order_by(desc(ConversationHistory.created_at), desc(_TURN_SEQ))
+            .limit(settings.CONVERSATION_RECENT_TURNS + settings.CONVERSATION_SUMMARY_EVERY_TURNS)
+        )
+        turns = [_turn(entry) for entry in reversed(result.scalars().all())]
+
+        budget = settings.CONVERSATION_WINDOW_TOKENS if max_tokens is None else max_tokens
+        return {
+            "summary": row.summary if row else None,
+            "recent": fit_to_budget(turns, budget),
+        }
+
+    async def record_turns(self, customer_id: str, platform: str, turns: int = 1) -> bool:
+        """
+        Count newly stored turns of a thread, in the caller's transaction.
+
+        Returns:
+            True when a summary refresh should be scheduled (after commit,
+            see schedule_summary_refresh)
+        """
+        stmt = insert(ConversationSummary).values(
+            project_id=self.project_id,
+            customer_id=customer_id,
+            platform=platform,
+            turns_summarized=0,
+            pending_turns=turns,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["project_id", "customer_id", "platform"],
+            set_={"pending_turns": ConversationSummary.pending_turns + stmt.excluded.pending_turns},
+        ).returning(ConversationSummary.pending_turns)
+        result = await self.db.execute(stmt)
+        pending = result.scalar_one()
+        return refresh_due(pending - turns, pending)
+
+    async def refresh_summary(self, customer_id: str, platform: str, gemini_client) -> int:
+        """
+        Fold turns older than the verbatim window into the thread summary.
+
+        Safe to run concurrently: the write only lands if nobody else moved
+        the summary on in the meantime. The caller commits.
+
+        Returns:
+            Number of turns folded into the summary
+        """
+        row = await self._summary_row(customer_id, platform)
+        if row is None:
+            return 0
+
+        query = select(ConversationHistory).where(self._history_of(customer_id, platform))
+        if row.covered_until:
+            query = query.where(_after(row))
+        keep = settings.CONVERSATION_RECENT_TURNS
+        if keep > 0:
+            # Stop short of the newest turns; they stay verbatim in the window
+            newest_kept = (
+                select(ConversationHistory.created_at, _TURN_SEQ.label("seq"))
+                .where(self._history_of(customer_id, platform))
+                .order_by(desc(ConversationHistory.created_at), desc(_TURN_SEQ))
+                .offset(keep - 1)
+                .limit(1)
+                .subquery()
+            )
+            query = query.join(newest_kept, true()).where(
+                tuple_(ConversationHistory.created_at, _TURN_SEQ)
+                < tuple_(newest_kept.c.created_at, newest_kept.c.seq)
+            )
+        result = await self.db.execute(
+            query.order_by(ConversationHistory.created_at, _TURN_SEQ).limit(MAX_TURNS_PER_REFRESH)
+        )
+        entries = result.scalars().all()
+        if not entries:
+            return 0
+
+        lines = []
+        for entry in entries:
+            speaker = "Customer" if entry.message_direction == MessageDirection.INBOUND else "Assistant"
+            lines.append(f"{speaker}: {entry.message_content[:MAX_TURN_CHARS]}")
+        max_tokens = settings.CONVERSATION_SUMMARY_MAX_TOKENS
+        prompt = SUMMARY_PROMPT.format(
+            max_words=int(max_tokens * 0.75),
+            summary=row.summary or "(none yet)",
+            messages="\n".join(lines),
+        )
+        summary = (await gemini_client.generate_content(
+            prompt=prompt,
+            max_tokens=max_tokens,
+            task="conversation_summary"
+        )).strip()
+        if not summary:
+            return 0
+
+        result = await self.db.execute(
+            update(ConversationSummary)
+            .where(ConversationSummary.id == row.id)
+            .where(ConversationSummary.covered_until.is_not_distinct_from(row.covered_until))
+            .where(ConversationSummary.covered_seq.is_not_distinct_from(row.covered_seq))
+            .values(
+                summary=summary,
+                covered_until=entries[-1].created_at,
+                covered_seq=entries[-1].seq,
+                turns_summarized=ConversationSummary.turns_summarized + len(entries),
+                pending_turns=func.greatest(ConversationSummary.pending_turns - len(entries), 0),
+            )
+        )
+        if not result.rowcount:
+            logger.info("Conversation summary changed concurrently", customer_id=customer_id, platform=platform)
+            return 0
+
+        logger.info(
+            "Conversation summary refreshed",
+            customer_id=customer_id,
+            platform=platform,
+            turns=len(entries),
+        )
+        return len(entries)
+
+
+def schedule_summary_refresh(project_id: UUID, customer_id: str, platform: str) -> None:
+    """Queue a background summary refresh. Best effort: a lost one is retried after more turns."""
+    from app.workers.celery_app import celery_app
+
+    try:
+        celery_app.send_task(
+            "app.workers.tasks.refresh_conversation_summary",
+            args=[str(project_id), customer_id, platform],
+            retry=False,
+        )
+    except Exception as exc:
+        logger.warning(
+            "Failed to queue conversation summary refresh",
+            error=str(exc),
+            customer_id=customer_id,
+            platform=platform,
+        )
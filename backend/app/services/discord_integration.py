@@ -6,6 +6,7 @@ Handles Discord bot integration for customer support.
 from typing import Dict, Any, Optional
 import structlog
 import aiohttp
+from app.core.metrics import track_send
 
 logger = structlog.get_logger(__name__)
 
@@ -30,6 +31,7 @@ class DiscordIntegration:
             "Content-Type": "application/json"
         }
     
+    @track_send("discord")
     async def send_message(
         self,
         channel_id: str,
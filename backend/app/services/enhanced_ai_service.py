@@ -7,12 +7,17 @@ from typing import List, Dict, Any, Optional
 from uuid import UUID
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, and_, or_
+from sqlalchemy import select, desc, and_, or_, func, cast
+from sqlalchemy.dialects.postgresql import insert, JSONB
 import structlog
 import re
 import json
 
 from app.services.gemini_client import GeminiClient
+from app.services.usage_counters import usage_counters
+from app.services.profile_cache import profile_cache
+from app.services.order_items import refresh_order_items
+from app.services.conversation_memory import ConversationMemory, schedule_summary_refresh
 from app.db.models import (
     ConversationHistory, BusinessContext, CustomerProfile,
     SocialMediaPost, SocialMediaComment, Message, Order,
@@ -21,16 +26,54 @@ from app.db.models import (
 
 logger = structlog.get_logger(__name__)
 
+# Message analysis prompt; the customer message is the input (micro-batched,
+# see GeminiClient.classify)
+MESSAGE_ANALYSIS_INSTRUCTIONS = """Analyze the customer message given as input.
+
+Extract:
+1. Intent (product_inquiry, order_status, complaint, praise, shipping_question, pricing_question, general_inquiry)
+2. Sentiment (positive, negative, neutral, frustrated, excited)
+3. Entities (product names, order numbers, locations, dates)
+
+Return as JSON:
+{
+    "intent": "",
+    "sentiment": "",
+    "entities": {},
+    "requires_urgent_attention": true/false
+}"""
+
 
 class EnhancedAIService:
     """
     Enhanced AI service with memory, context, and intelligent automation.
     """
     
-    def __init__(self, db: AsyncSession, project_id: UUID):
+    def __init__(self, db: AsyncSession, project_id: UUID, autocommit: bool = True):
+        """
+        Args:
+            db: Database session
+            project_id: Project UUID
+            autocommit: Commit after each write. Pass False when the caller
+                owns the transaction (writes are only flushed where ids or
+                defaults are needed)
+        """
         self.db = db
         self.project_id = project_id
+        self.autocommit = autocommit
         self.gemini_client = GeminiClient()
+        self.memory = ConversationMemory(db, project_id)
+    
+    async def _commit(self, *instances):
+        """Commit and refresh instances, or just flush them inside a caller's unit of work."""
+        if not self.autocommit:
+            if instances:
+                await self.db.flush(instances)
+            return
+        
+        await self.db.commit()
+        for instance in instances:
+            await self.db.refresh(instance)
     
     async def get_conversation_history(
         self, 
@@ -51,7 +94,7 @@ class EnhancedAIService:
                     ConversationHistory.platform == platform
                 )
             )
-            .order_by(desc(ConversationHistory.created_at))
+            .order_by(desc(ConversationHistory.created_at), desc(ConversationHistory.seq).nulls_last())
             .limit(limit)
         )
         return list(reversed(result.scalars().all()))  # Oldest first
@@ -87,8 +130,8 @@ class EnhancedAIService:
         )
         
         self.db.add(conversation)
-        await self.db.commit()
-        await self.db.refresh(conversation)
+        if self.autocommit:
+            await self._commit(conversation)
         
         logger.info("Conversation saved", customer_id=customer_id, platform=platform)
         return conversation
@@ -96,11 +139,45 @@ class EnhancedAIService:
     async def get_customer_profile(
         self, 
         customer_id: str,
-        create_if_not_exists: bool = True
+        create_if_not_exists: bool = True,
+        use_cache: bool = False
     ) -> Optional[CustomerProfile]:
         """
         Get or create customer profile.
+        
+        Creation is race-free (INSERT ... ON CONFLICT DO NOTHING), so
+        concurrent first messages from a new customer share one profile.
+        With use_cache=True a read-only snapshot may be returned from the
+        in-process profile cache.
         """
+        if use_cache:
+            cached = profile_cache.get(self.project_id, customer_id)
+            if cached is not None:
+                return cached
+        
+        profile = await self._select_customer_profile(customer_id)
+        
+        if not profile and create_if_not_exists:
+            now = datetime.utcnow()
+            stmt = (
+                insert(CustomerProfile)
+                .values(
+                    project_id=self.project_id,
+                    customer_id=customer_id,
+                    first_interaction=now
+                )
+                .on_conflict_do_nothing(index_elements=["project_id", "customer_id"])
+            )
+            await self.db.execute(stmt)
+            await self._commit()
+            profile = await self._select_customer_profile(customer_id)
+            logger.info("Customer profile created", customer_id=customer_id)
+        
+        if profile and use_cache:
+            return self._cache_profile(profile)
+        return profile
+    
+    async def _select_customer_profile(self, customer_id: str) -> Optional[CustomerProfile]:
         result = await self.db.execute(
             select(CustomerProfile)
             .where(
@@ -110,20 +187,7 @@ class EnhancedAIService:
                 )
             )
         )
-        profile = result.scalar_one_or_none()
-        
-        if not profile and create_if_not_exists:
-            profile = CustomerProfile(
-                project_id=self.project_id,
-                customer_id=customer_id,
-                first_interaction=datetime.utcnow()
-            )
-            self.db.add(profile)
-            await self.db.commit()
-            await self.db.refresh(profile)
-            logger.info("Customer profile created", customer_id=customer_id)
-        
-        return profile
+        return result.scalar_one_or_none()
     
     async def update_customer_profile(
         self,
@@ -132,39 +196,72 @@ class EnhancedAIService:
         **updates
     ) -> CustomerProfile:
         """
-        Update customer profile with new information.
-        """
-        profile = await self.get_customer_profile(customer_id)
+        Record an interaction and apply profile updates in one statement.
         
-        # Update interaction count and timestamp
-        profile.interaction_count += 1
-        profile.last_interaction = datetime.utcnow()
-        
-        # Update platform accounts
-        if platform:
-            platform_accounts = profile.platform_accounts or {}
-            if platform not in platform_accounts:
-                platform_accounts[platform] = customer_id
-            profile.platform_accounts = platform_accounts
+        Uses INSERT ... ON CONFLICT DO UPDATE ... RETURNING: creates the
+        profile on first contact, otherwise bumps the interaction counter,
+        adds the platform account if it is new and overwrites the given
+        fields. The result refreshes the profile cache once it is committed.
+        """
+        now = datetime.utcnow()
+        columns = CustomerProfile.__table__.c
+        updates = {
+            key: value for key, value in updates.items()
+            if key in columns and value is not None
+        }
         
-        # Apply other updates
-        for key, value in updates.items():
-            if hasattr(profile, key) and value is not None:
-                setattr(profile, key, value)
+        stmt = insert(CustomerProfile).values(
+            project_id=self.project_id,
+            customer_id=customer_id,
+            platform_accounts={platform: customer_id} if platform else {},
+            interaction_count=1,
+            first_interaction=now,
+            last_interaction=now,
+            **updates
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["project_id", "customer_id"],
+            set_={
+                "interaction_count": func.coalesce(columns.interaction_count, 0) + 1,
+                "last_interaction": stmt.excluded.last_interaction,
+                # Existing accounts win: only new platforms are added
+                "platform_accounts": stmt.excluded.platform_accounts.op("||")(
+                    func.coalesce(columns.platform_accounts, cast({}, JSONB))
+                ),
+                "updated_at": func.now(),
+                **{key: stmt.excluded[key] for key in updates},
+            }
+        ).returning(CustomerProfile)
         
-        await self.db.commit()
-        await self.db.refresh(profile)
+        result = await self.db.execute(
+            select(CustomerProfile)
+            .from_statement(stmt)
+            .execution_options(populate_existing=True)
+        )
+        profile = result.scalar_one()
+        await self._commit()
         
+        self._cache_profile(profile)
         return profile
     
+    def _cache_profile(self, profile: CustomerProfile) -> CustomerProfile:
+        """Cache a profile snapshot, once the caller's transaction commits if it owns one."""
+        if self.autocommit:
+            return profile_cache.put(profile)
+        return profile_cache.put_on_commit(self.db, profile)
+    
     async def get_business_context(
         self,
         context_type: Optional[str] = None,
         platform: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        track_usage: bool = True
     ) -> List[BusinessContext]:
         """
         Retrieve relevant business context for AI responses.
+        
+        Usage statistics are recorded in the write-behind counter buffer,
+        so this query never writes to the database.
         """
         query = select(BusinessContext).where(
             and_(
@@ -193,11 +290,10 @@ class EnhancedAIService:
         result = await self.db.execute(query)
         contexts = result.scalars().all()
         
-        # Update times_used for retrieved contexts
-        for context in contexts:
-            context.times_used += 1
-            context.last_used = datetime.utcnow()
-        await self.db.commit()
+        if track_usage:
+            now = datetime.utcnow()
+            for context in contexts:
+                usage_counters.record(BusinessContext, context.id, now)
         
         return contexts
     
@@ -250,7 +346,7 @@ If this is not an order request, set is_order to false."""
         try:
             response = await self.gemini_client.generate_content(
                 prompt=prompt,
-                temperature=0.3  # Lower temperature for accuracy
+                task="order_extraction"
             )
             
             # Parse JSON response
@@ -339,14 +435,17 @@ If this is not an order request, set is_order to false."""
         )
         
         self.db.add(order)
-        await self.db.commit()
-        await self.db.refresh(order)
+        await self.db.flush([order])
+        await refresh_order_items(self.db, [order.id])
         
         # Update customer profile
         if profile:
             profile.total_orders += 1
             profile.total_spent += total
-            await self.db.commit()
+        
+        await self._commit(order)
+        if profile:
+            self._cache_profile(profile)
         
         logger.info("Order created from message", order_id=str(order.id), total=total)
         return order
@@ -362,8 +461,8 @@ If this is not an order request, set is_order to false."""
         Generate AI response with full context awareness.
         Includes: conversation history, customer profile, business context.
         """
-        # Get conversation history
-        history = await self.get_conversation_history(customer_id, platform, limit=10)
+        # Conversation memory: rolling summary + token-budgeted recent turns
+        memory = await self.memory.get_context(customer_id, platform)
         
         # Get customer profile
         profile = await self.get_customer_profile(customer_id)
@@ -390,7 +489,7 @@ If this is not an order request, set is_order to false."""
         # Build context-rich prompt
         context_prompt = self._build_contextual_prompt(
             customer_message=customer_message,
-            history=history,
+            memory=memory,
             profile=profile,
             business_context=business_context,
             order_info=order_info,
@@ -400,7 +499,8 @@ If this is not an order request, set is_order to false."""
         # Generate response
         response = await self.gemini_client.generate_content(
             prompt=context_prompt,
-            temperature=0.8
+            temperature=0.8,
+            task="chat_reply"
         )
         
         # Analyze sentiment and intent
@@ -426,12 +526,19 @@ If this is not an order request, set is_order to false."""
             direction=MessageDirection.OUTBOUND
         )
         
+        summary_due = await self.memory.record_turns(customer_id, platform, turns=2)
+        if self.autocommit:
+            await self.db.commit()
+            if summary_due:
+                schedule_summary_refresh(self.project_id, customer_id, platform)
+        
         return {
             "response": response,
             "intent": analysis.get("intent"),
             "sentiment": analysis.get("sentiment"),
             "context_used": {
-                "history_messages": len(history),
+                "history_messages": len(memory["recent"]),
+                "conversation_summary": memory["summary"] is not None,
                 "business_contexts": len(business_context),
                 "customer_profile": profile is not None,
                 "order_context": order_info is not None
@@ -441,7 +548,7 @@ If this is not an order request, set is_order to false."""
     def _build_contextual_prompt(
         self,
         customer_message: str,
-        history: List[ConversationHistory],
+        memory: Dict[str, Any],
         profile: Optional[CustomerProfile],
         business_context: List[BusinessContext],
         order_info: Optional[Dict],
@@ -471,12 +578,15 @@ If this is not an order request, set is_order to false."""
             if profile.special_instructions:
                 prompt_parts.append(f"- Special Note: {profile.special_instructions}")
         
-        # Add conversation history
-        if history:
+        # Add conversation memory
+        if memory.get("summary"):
+            prompt_parts.append("\n## Conversation Summary:")
+            prompt_parts.append(memory["summary"])
+        if memory.get("recent"):
             prompt_parts.append(f"\n## Recent Conversation History:")
-            for msg in history[-5:]:  # Last 5 messages
-                direction = "Customer" if msg.message_direction == MessageDirection.INBOUND else "You"
-                prompt_parts.append(f"- {direction}: {msg.message_content}")
+            for turn in memory["recent"]:
+                direction = "Customer" if turn["role"] == "user" else "You"
+                prompt_parts.append(f"- {direction}: {turn['content']}")
         
         # Add order context
         if order_info:
@@ -498,25 +608,11 @@ If this is not an order request, set is_order to false."""
         """
         Analyze message for intent, sentiment, and entities.
         """
-        prompt = f"""Analyze this customer message:
-
-"{message}"
-
-Extract:
-1. Intent (product_inquiry, order_status, complaint, praise, shipping_question, pricing_question, general_inquiry)
-2. Sentiment (positive, negative, neutral, frustrated, excited)
-3. Entities (product names, order numbers, locations, dates)
-
-Return as JSON:
-{{
-    "intent": "",
-    "sentiment": "",
-    "entities": {{}},
-    "requires_urgent_attention": true/false
-}}"""
-
         try:
-            response = await self.gemini_client.generate_content(prompt=prompt, temperature=0.2)
+            response = await self.gemini_client.classify(
+                "message_analysis", MESSAGE_ANALYSIS_INSTRUCTIONS, f'"{message}"',
+                project_id=self.project_id
+            )
             return json.loads(self._extract_json_from_response(response))
         except:
             return {"intent": "general_inquiry", "sentiment": "neutral", "entities": {}}
@@ -528,9 +624,13 @@ Return as JSON:
         if len(message) < 100:
             return message
         
-        prompt = f"Summarize this message in one sentence (max 100 chars): {message}"
         try:
-            return await self.gemini_client.generate_content(prompt=prompt, temperature=0.3)
+            return await self.gemini_client.classify(
+                "message_summary",
+                "Summarize the message given as input in one sentence (max 100 chars).",
+                message,
+                project_id=self.project_id
+            )
         except:
             return message[:100] + "..."
     
@@ -0,0 +1,478 @@
+"""
+Deterministic fast path for common customer questions.
+"Where is my order", "what are your hours" and "how much is X" are
+answered from auto-response templates, orders, business context and the
+product catalog without an LLM call. Anything the rules are not confident
+about returns None and goes to Gemini as before.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+import re
+import structlog
+from sqlalchemy import func, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import FAST_PATH_REQUESTS
+from app.db.models import AutoResponseTemplate, BusinessContext, Order, Product
+from app.services.usage_counters import usage_counters
+
+logger = structlog.get_logger(__name__)
+
+# Local intent -> phrasings (en, es, fr, ar) that leave little doubt
+INTENT_PATTERNS = {
+    "order_status": [
+        r"\bwhere(?:'s| is) my (?:order|package|parcel)\b",
+        r"\b(?:order|delivery) status\b",
+        r"\bstatus of my order\b",
+        r"\btrack(?:ing)? (?:my )?(?:order|package)\b",
+        r"\bhas my order (?:shipped|been shipped|arrived)\b",
+        r"d[oó]nde est[aá] mi (?:pedido|paquete)",
+        r"estado de mi pedido",
+        r"rastrear mi pedido",
+        r"o[uù] est ma commande",
+        r"statut de (?:ma )?commande",
+        r"suivi de (?:ma )?commande",
+        r"أين طلبي|وين طلبي|حالة طلبي|حالة الطلب|تتبع طلبي|تتبع الطلب",
+    ],
+    "business_hours": [
+        r"\bwhat are your (?:opening |business |store )?hours\b",
+        r"\b(?:opening|business|store|working) hours\b",
+        r"\bwhen (?:are|do) you (?:open|close)\b",
+        r"\bare you open\b",
+        r"\bhorarios?\b",
+        r"a qu[eé] hora (?:abren|cierran)",
+        r"\bhoraires?\b",
+        r"heures d'ouverture",
+        r"مواعيد العمل|ساعات العمل|متى تفتحون|متى تفتح",
+    ],
+    "product_price": [
+        r"\bhow much (?:is|are|does|do|for)\b",
+        r"\bprice (?:of|for)\b",
+        r"\bwhat(?:'s| is) the price\b",
+        r"\bcost of\b",
+        r"cu[aá]nto (?:cuesta|cuestan|vale)",
+        r"precio de",
+        r"combien (?:co[uû]te|co[uû]tent)",
+        r"quel est le prix|prix d[eu]",
+        r"كم سعر|ما سعر|بكم",
+    ],
+}
+
+# Words that turn a routine question into something needing judgment
+ESCALATION_WORDS = re.compile(
+    r"\b(?:not|never|wrong|late|damaged|broken|refund|cancel|complain|angry|still)\b"
+    r"|\b(?:no|nunca|tarde|roto|reembolso|cancelar)\b"
+    r"|\b(?:pas|jamais|retard|cass[ée]|rembourse\w*|annuler)\b"
+    r"|\b(?:لم|متأخر|استرجاع|إلغاء)\b|ما وصل",
+    re.IGNORECASE,
+)
+
+ORDER_NUMBER = re.compile(r"#\s?([A-Za-z0-9-]{3,})|\b(\d{4,})\b")
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# Intents the chat bot understands, for the fast path's local intents
+BOT_INTENTS = {
+    "order_status": "order_status",
+    "business_hours": "question",
+    "product_price": "question",
+    "product_faq": "question",
+    "template": "question",
+}
+
+LOCALIZED_ANSWERS = {
+    "en": {
+        "order_status": "Your order #{number} is {status}.",
+        "tracking": "Tracking number: {tracking}",
+        "product_price": "{name} costs {price}.",
+        "in_stock": "It's in stock.",
+        "out_of_stock": "It's currently out of stock.",
+    },
+    "es": {
+        "order_status": "Tu pedido #{number} está {status}.",
+        "tracking": "Número de seguimiento: {tracking}",
+        "product_price": "{name} cuesta {price}.",
+        "in_stock": "Está disponible.",
+        "out_of_stock": "Por ahora está agotado.",
+    },
+    "fr": {
+        "order_status": "Votre commande #{number} est {status}.",
+        "tracking": "Numéro de suivi : {tracking}",
+        "product_price": "{name} coûte {price}.",
+        "in_stock": "Il est en stock.",
+        "out_of_stock": "Il est actuellement en rupture de stock.",
+    },
+    "ar": {
+        "order_status": "طلبك رقم #{number} حالته: {status}.",
+        "tracking": "رقم التتبع: {tracking}",
+        "product_price": "سعر {name} هو {price}.",
+        "in_stock": "المنتج متوفر.",
+        "out_of_stock": "المنتج غير متوفر حاليًا.",
+    },
+}
+
+LOCALIZED_STATUSES = {
+    "en": {
+        "pending": "pending", "processing": "being processed", "fulfilled": "fulfilled",
+        "shipped": "shipped", "delivered": "delivered", "cancelled": "cancelled", "refunded": "refunded",
+    },
+    "es": {
+        "pending": "pendiente", "processing": "en preparación", "fulfilled": "completado",
+        "shipped": "enviado", "delivered": "entregado", "cancelled": "cancelado", "refunded": "reembolsado",
+    },
+    "fr": {
+        "pending": "en attente", "processing": "en préparation", "fulfilled": "traitée",
+        "shipped": "expédiée", "delivered": "livrée", "cancelled": "annulée", "refunded": "remboursée",
+    },
+    "ar": {
+        "pending": "قيد الانتظار", "processing": "قيد التجهيز", "fulfilled": "مكتمل",
+        "shipped": "تم الشحن", "delivered": "تم التسليم", "cancelled": "ملغى", "refunded": "مسترد",
+    },
+}
+
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def _has_phrase(text: str, phrase: str) -> bool:
+    """Whether phrase occurs in (normalized) text as whole words."""
+    return re.search(rf"(?<!\w){re.escape(_normalize(phrase))}(?!\w)", text) is not None
+
+
+def _words(text: str) -> set:
+    return {word for word in re.findall(r"\w+", text.lower()) if len(word) > 2}
+
+
+def _language(code: Optional[str]) -> str:
+    base = (code or "en").lower().split("-", 1)[0]
+    return base if base in LOCALIZED_ANSWERS else "en"
+
+
+def _format_price(price: float, currency: Optional[str]) -> str:
+    return f"{price:,.2f} {currency or 'USD'}"
+
+
+def detect_intent(message: str) -> Optional[Dict[str, Any]]:
+    """
+    Local intent of a message with a confidence in [0, 1], or None.
+
+    A phrase match starts at 0.9; long messages, several questions or
+    words hinting at a problem lower it, since those need the LLM.
+    """
+    text = _normalize(message)
+    for intent, patterns in INTENT_PATTERNS.items():
+        if any(re.search(pattern, text) for pattern in patterns):
+            confidence = 0.9
+            if len(text.split()) > 15:
+                confidence -= 0.2
+            if text.count("?") > 1:
+                confidence -= 0.2
+            if ESCALATION_WORDS.search(text):
+                confidence -= 0.3
+            return {"intent": intent, "confidence": round(confidence, 2)}
+    return None
+
+
+class FastPathAnswer:
+    """A reply produced without the LLM."""
+
+    def __init__(
+        self,
+        intent: str,
+        text: str,
+        confidence: float,
+        source: str,
+        entities: Optional[Dict[str, Any]] = None,
+        template_id: Optional[UUID] = None
+    ):
+        self.intent = intent
+        self.text = text
+        self.confidence = confidence
+        self.source = source
+        self.entities = entities or {}
+        self.template_id = template_id
+
+    def to_intent(self) -> Dict[str, Any]:
+        """Intent dict shaped like the LLM intent detection result."""
+        return {
+            "primary_intent": BOT_INTENTS.get(self.intent, "question"),
+            "urgency": "low",
+            "sentiment": "neutral",
+            "entities": self.entities,
+            "confidence": self.confidence,
+            "source": "fast_path",
+        }
+
+
+class FastPathRouter:
+    """Answers common questions of one project from its own data."""
+
+    def __init__(self, db: AsyncSession, project_id: UUID):
+        self.db = db
+        self.project_id = project_id
+
+    async def answer(
+        self,
+        message: str,
+        customer_id: str,
+        channel: str,
+        language: Optional[str] = None,
+        customer_name: Optional[str] = None
+    ) -> Optional[FastPathAnswer]:
+        """
+        Deterministic reply to message, or None when the LLM should answer.
+
+        Records a hit/miss per local intent in fast_path_requests_total.
+        """
+        if not settings.FAST_PATH_ENABLED:
+            return None
+        text = _normalize(message)
+        if not text or len(text) > settings.FAST_PATH_MAX_CHARS:
+            FAST_PATH_REQUESTS.labels("none", "skipped").inc()
+            return None
+
+        lang = _language(language)
+        detected = detect_intent(text)
+        intent = detected["intent"] if detected else "none"
+        try:
+            answer = await self._from_templates(text, channel, detected, customer_name)
+            if answer is not None and answer.confidence < settings.FAST_PATH_MIN_CONFIDENCE:
+                answer = None  # A weak template match must not hide the rules below
+            if answer is None and detected:
+                if detected["confidence"] >= settings.FAST_PATH_MIN_CONFIDENCE:
+                    answer = await self._answer_intent(detected, text, customer_id, channel, lang)
+                else:
+                    FAST_PATH_REQUESTS.labels(intent, "low_confidence").inc()
+                    return None
+            if answer is None:
+                answer = await self._from_product_faq(text)
+        except Exception as e:
+            # The fast path is an optimization; never fail the message over it
+            logger.warning("Fast path lookup failed", error=str(e), intent=intent)
+            FAST_PATH_REQUESTS.labels(intent, "error").inc()
+            return None
+
+        if answer is None or answer.confidence < settings.FAST_PATH_MIN_CONFIDENCE:
+            FAST_PATH_REQUESTS.labels(intent, "miss").inc()
+            return None
+
+        if answer.template_id is not None:
+            usage_counters.record(AutoResponseTemplate, answer.template_id)
+        FAST_PATH_REQUESTS.labels(answer.intent, "hit").inc()
+        logger.info(
+            "Fast path answered",
+            intent=answer.intent,
+            source=answer.source,
+            confidence=answer.confidence,
+            customer_id=customer_id
+        )
+        return answer
+
+    async def _answer_intent(
+        self,
+        detected: Dict[str, Any],
+        text: str,
+        customer_id: str,
+        channel: str,
+        lang: str
+    ) -> Optional[FastPathAnswer]:
+        intent = detected["intent"]
+        if intent == "order_status":
+            return await self._order_status(text, customer_id, lang, detected["confidence"])
+        if intent == "business_hours":
+            return await self._business_hours(channel, detected["confidence"])
+        if intent == "product_price":
+            return await self._product_price(text, lang, detected["confidence"])
+        return None
+
+    async def _from_templates(
+        self,
+        text: str,
+        channel: str,
+        detected: Optional[Dict[str, Any]],
+        customer_name: Optional[str]
+    ) -> Optional[FastPathAnswer]:
+        """Merchant templates that send verbatim (no AI enhancement, no approval)."""
+        result = await self.db.execute(
+            select(AutoResponseTemplate)
+            .where(AutoResponseTemplate.project_id == self.project_id)
+            .where(AutoResponseTemplate.is_active == True)
+            .where(AutoResponseTemplate.use_ai_enhancement == False)
+            .where(AutoResponseTemplate.requires_approval == False)
+        )
+        best = None
+        best_score = 0.0
+        for template in result.scalars().all():
+            platforms = template.trigger_platforms or []
+            if platforms and channel not in platforms:
+                continue
+            matched = [
+                keyword for keyword in (template.trigger_keywords or [])
+                if keyword and _has_phrase(text, keyword)
+            ]
+            if not matched:
+                continue
+            score = 0.75 + 0.1 * (len(matched) - 1)
+            if detected and template.trigger_intent in (detected["intent"], BOT_INTENTS.get(detected["intent"])):
+                score += 0.1
+            if ESCALATION_WORDS.search(text):
+                score -= 0.3
+            if score > best_score:
+                best, best_score = template, score
+        if best is None:
+            return None
+
+        values = {"customer_name": customer_name or ""}
+        rendered = PLACEHOLDER.sub(lambda match: str(values.get(match.group(1), match.group(0))), best.response_template)
+        if PLACEHOLDER.search(rendered):
+            return None  # Needs data only the LLM path gathers
+
+        return FastPathAnswer(
+            intent="template",
+            text=rendered,
+            confidence=round(min(best_score, 0.95), 2),
+            source=f"template:{best.name}",
+            template_id=best.id,
+        )
+
+    async def _order_status(
+        self,
+        text: str,
+        customer_id: str,
+        lang: str,
+        confidence: float
+    ) -> Optional[FastPathAnswer]:
+        # Same customer keys as the chat bot's order context
+        query = (
+            select(Order)
+            .where(Order.project_id == self.project_id)
+            .where(or_(
+                Order.customer_email == customer_id.lower(),
+                Order.customer_phone == customer_id,
+            ))
+        )
+        number = ORDER_NUMBER.search(text)
+        if number:
+            # Customers quote the shop's order number, not the platform ID
+            number = number.group(1) or number.group(2)
+            query = query.where(or_(
+                Order.external_id == number,
+                Order.extra_data["order_number"].astext == number,
+            ))
+        result = await self.db.execute(
+            query.order_by(Order.order_date.desc().nulls_last()).limit(1)
+        )
+        order = result.scalar_one_or_none()
+        if order is None or not order.status:
+            return None
+
+        answers = LOCALIZED_ANSWERS[lang]
+        status = LOCALIZED_STATUSES[lang].get(order.status, order.status)
+        extra_data = order.extra_data or {}
+        order_number = str(extra_data.get("order_number") or order.external_id)
+        reply = answers["order_status"].format(number=order_number, status=status)
+        tracking = extra_data.get("tracking_number")
+        if tracking:
+            reply += "\n" + answers["tracking"].format(tracking=tracking)
+        return FastPathAnswer(
+            intent="order_status",
+            text=reply,
+            confidence=confidence,
+            source="orders",
+            entities={"order_id": str(order.id), "order_number": order_number},
+        )
+
+    async def _business_hours(self, channel: str, confidence: float) -> Optional[FastPathAnswer]:
+        result = await self.db.execute(
+            select(BusinessContext)
+            .where(BusinessContext.project_id == self.project_id)
+            .where(BusinessContext.is_active == True)
+            .where(or_(
+                BusinessContext.context_type.in_(("business_hours", "hours")),
+                BusinessContext.context_key.in_(("business_hours", "opening_hours", "hours")),
+            ))
+            .order_by(BusinessContext.relevance_score.desc().nulls_last())
+        )
+        for context in result.scalars().all():
+            platforms = context.active_for_platforms or []
+            if not platforms or channel in platforms:
+                return FastPathAnswer(
+                    intent="business_hours",
+                    text=context.content,
+                    confidence=confidence,
+                    source=f"business_context:{context.context_key}",
+                )
+        return None
+
+    async def _matching_products(self, text: str) -> List[Product]:
+        """Active products whose name appears in text as whole words, longest name first."""
+        # strpos, unlike LIKE, treats % and _ in names literally; it still
+        # matches inside words ("pin" in "shipping"), so candidates are
+        # checked for word boundaries below
+        result = await self.db.execute(
+            select(Product)
+            .where(Product.project_id == self.project_id)
+            .where(Product.is_active == True)
+            .where(func.strpos(literal(text), func.lower(Product.name)) > 0)
+            .order_by(func.length(Product.name).desc())
+            .limit(10)
+        )
+        return [product for product in result.scalars().all() if _has_phrase(text, product.name)][:2]
+
+    @staticmethod
+    def _unambiguous(products: Sequence[Product]) -> Optional[Product]:
+        if not products:
+            return None
+        if len(products) > 1 and len(products[1].name) == len(products[0].name):
+            return None
+        return products[0]
+
+    async def _product_price(self, text: str, lang: str, confidence: float) -> Optional[FastPathAnswer]:
+        product = self._unambiguous(await self._matching_products(text))
+        if product is None or product.price is None:
+            return None
+
+        answers = LOCALIZED_ANSWERS[lang]
+        reply = answers["product_price"].format(
+            name=product.name,
+            price=_format_price(product.price, product.currency),
+        )
+        reply += " " + answers["in_stock" if product.in_stock else "out_of_stock"]
+        return FastPathAnswer(
+            intent="product_price",
+            text=reply,
+            confidence=confidence,
+            source="products",
+            entities={"product_id": str(product.id), "product_name": product.name},
+        )
+
+    async def _from_product_faq(self, text: str) -> Optional[FastPathAnswer]:
+        """A product FAQ entry whose question shares most words with the message."""
+        product = self._unambiguous(await self._matching_products(text))
+        if product is None or not product.faq:
+            return None
+
+        message_words = _words(text) - _words(product.name)
+        best, best_overlap = None, 0.0
+        for entry in product.faq:
+            if not isinstance(entry, dict) or not entry.get("answer"):
+                continue
+            question_words = _words(entry.get("question", "")) - _words(product.name)
+            if not question_words or not message_words:
+                continue
+            overlap = len(question_words & message_words) / len(question_words | message_words)
+            if overlap > best_overlap:
+                best, best_overlap = entry, overlap
+        if best is None:
+            return None
+
+        # Word overlap of 0.6 and above reads as the same question
+        return FastPathAnswer(
+            intent="product_faq",
+            text=best["answer"],
+            confidence=round(min(0.95, 0.5 + best_overlap * 0.5), 2),
+            source="product_faq",
+            entities={"product_id": str(product.id), "product_name": product.name},
+        )
@@ -7,9 +7,21 @@ Supports multiple API keys with automatic rotation for rate limit management.
 from typing import List, Dict, Any, Optional
 from uuid import UUID
 import json
+import time
 import structlog
-import google.generativeai as genai
 from app.core.config import settings
+from app.core.metrics import (
+    GEMINI_COST,
+    GEMINI_ERRORS,
+    GEMINI_REQUEST_DURATION,
+    GEMINI_TOKENS,
+    PROMPT_TOKENS_TRIMMED,
+)
+from app.core.tracing import tracer
+from app.services.llm_backend import LLMBackend, generate_async, get_backend
+from app.services.llm_batcher import prompt_batcher
+from app.services.model_routing import model_router
+from app.services.token_budget import PromptBudget, estimate_cost, token_counter
 from app.core.ai_personas import (
     get_web_assistant_prompt,
     AI_SALER_BASE_PROMPT,
@@ -73,7 +85,8 @@ WEB_ASSISTANT_BEHAVIOR_RULES = """You are an AI Sales Assistant for AI Sales Com
 - get_urgent_messages() - Get high-priority messages
 - generate_sales_report(period) - Create sales report
 - generate_customer_report(days) - Customer analytics
-- get_top_products(days, limit) - Best selling products
+- get_top_products(days, limit, sort_by) - Best selling products
+- get_frequently_bought_together(days, limit, product) - Products bought together
 - compare_periods(period_days) - Compare time periods
 - sync_integration(integration) - Trigger data sync
 - get_integration_status() - Check integration health
@@ -122,21 +135,48 @@ WEB_ASSISTANT_BEHAVIOR_RULES = """You are an AI Sales Assistant for AI Sales Com
 - Take action without asking"""
 
 
+# Which context survives when a prompt is over its token budget (higher
+# is kept longer). System rules and the user query are never trimmed.
+PROMPT_PRIORITIES = {
+    "state": 90,
+    "order": 80,
+    "instructions": 70,
+    "history": 60,
+    "profile": 50,
+    "summary": 40,
+    "catalog": 20,
+}
+
+# Instructions for micro-batched classification (the message is the input)
+SENTIMENT_INSTRUCTIONS = """Analyze the sentiment of the customer message given as input and provide:
+1. Overall sentiment (positive, neutral, negative)
+2. Urgency level (low, medium, high, urgent)
+3. Key concerns or topics
+4. Recommended response tone
+
+Respond in JSON format."""
+
+
 class GeminiClient:
     """Client for interacting with Google Gemini AI with multi-key support."""
     
-    def __init__(self):
+    def __init__(self, backend: Optional[LLMBackend] = None):
         """Initialize Gemini client with multiple API keys."""
         self.model_name = settings.GEMINI_MODEL
+        self.backend = backend or get_backend()
         
         # Load multiple API keys
         self.api_keys = self._load_api_keys()
         self.current_key_index = 0
+        self.active_key_index = 0  # Slot of the key the backend is configured with (metrics label)
         
         if self.api_keys:
             # Configure with first key initially
-            genai.configure(api_key=self.api_keys[0])
-            logger.info(f"Gemini API configured with {len(self.api_keys)} API keys")
+            self.backend.configure(self.api_keys[0], 0)
+            logger.info(
+                f"Gemini API configured with {len(self.api_keys)} API keys",
+                backend=self.backend.name
+            )
         else:
             logger.warning("No GEMINI API keys set - AI features will be limited")
         
@@ -147,6 +187,12 @@ class GeminiClient:
         self.subscription_service = None
         self.ai_optimizer = None
     
+    def set_backend(self, backend: LLMBackend):
+        """Swap the LLM backend (e.g. a ReplayBackend in load tests)."""
+        self.backend = backend
+        if self.api_keys:
+            self.backend.configure(self.api_keys[self.active_key_index], self.active_key_index)
+    
     def set_subscription_service(self, service):
         """Set subscription service for usage tracking."""
         self.subscription_service = service
@@ -156,8 +202,8 @@ class GeminiClient:
         self.ai_optimizer = optimizer
     
     def _estimate_tokens(self, text: str) -> int:
-        """Rough estimate of tokens (1 token ≈ 4 characters)."""
-        return len(text) // 4
+        """Calibrated local token estimate (see token_budget.TokenCounter)."""
+        return token_counter.count(text)
     
     async def _check_usage_limit(self, user_id: Optional[UUID]) -> bool:
         """Check if user can make AI request."""
@@ -178,15 +224,19 @@ class GeminiClient:
         user_id: Optional[UUID],
         prompt: str,
         response: str,
-        model: str = "gemini-2.0-flash"
+        model: str = "gemini-2.0-flash",
+        tokens_input: Optional[int] = None,
+        tokens_output: Optional[int] = None
     ):
-        """Track AI usage for billing."""
+        """Track AI usage for billing, with the API's token counts when it reported them."""
         if not user_id or not self.subscription_service:
             return
         
         try:
-            tokens_input = self._estimate_tokens(prompt)
-            tokens_output = self._estimate_tokens(response)
+            if not tokens_input:
+                tokens_input = self._estimate_tokens(prompt)
+            if not tokens_output:
+                tokens_output = self._estimate_tokens(response)
             
             await self.subscription_service.track_ai_usage(
                 user_id=user_id,
@@ -231,9 +281,11 @@ class GeminiClient:
     
     def _configure_next_key(self):
         """Configure Gemini with next API key in rotation."""
+        key_index = self.current_key_index
         next_key = self._get_next_api_key()
         if next_key:
-            genai.configure(api_key=next_key)
+            self.backend.configure(next_key, key_index)
+            self.active_key_index = key_index
             logger.debug(f"Rotated to API key index {self.current_key_index}")
         return next_key
     
@@ -366,6 +418,32 @@ class GeminiClient:
                         "limit": {
                             "type": "integer",
                             "description": "Number of products to return (default: 10)"
+                        },
+                        "sort_by": {
+                            "type": "string",
+                            "enum": ["quantity", "revenue"],
+                            "description": "Rank by units sold or by revenue (default: quantity)"
+                        }
+                    }
+                }
+            },
+            {
+                "name": "get_frequently_bought_together",
+                "description": "Get product pairs most often bought in the same order",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "days": {
+                            "type": "integer",
+                            "description": "Period to analyze (default: 90)"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Number of pairs to return (default: 10)"
+                        },
+                        "product": {
+                            "type": "string",
+                            "description": "Only pairs with this product name, SKU or ID"
                         }
                     }
                 }
@@ -618,7 +696,8 @@ class GeminiClient:
         use_functions: bool = True,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
-        user_id: Optional[UUID] = None
+        user_id: Optional[UUID] = None,
+        task: str = "general"
     ) -> Dict[str, Any]:
         """
         Generate a response from Gemini with optional function calling.
@@ -627,9 +706,11 @@ class GeminiClient:
             prompt: The input prompt/question
             context: Additional context (conversation history, order details, etc.)
             use_functions: Whether to enable function calling
-            temperature: Sampling temperature (0.0 - 1.0)
-            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature (0.0 - 1.0), overrides the task's route
+            max_tokens: Maximum tokens to generate, overrides the task's route
             user_id: User ID for usage tracking (optional)
+            task: Kind of call (chat_reply, intent, sentiment, ...); selects the
+                model route (see model_routing) and labels metrics
             
         Returns:
             Dictionary containing response text, function calls, and metadata
@@ -646,30 +727,24 @@ class GeminiClient:
         
         try:
             # Build the full prompt with context
-            full_prompt = self._build_prompt(prompt, context)
+            full_prompt = self._build_prompt(prompt, context, task=task)
             
-            # Prepare generation config
+            # Model and generation parameters come from the task's route;
+            # explicit arguments win
+            route = model_router.resolve(task)
             generation_config = {
-                "temperature": temperature or settings.GEMINI_TEMPERATURE,
-                "max_output_tokens": max_tokens or settings.GEMINI_MAX_TOKENS,
+                "temperature": route.temperature if temperature is None else temperature,
+                "max_output_tokens": max_tokens or route.max_tokens,
                 "top_p": 0.95,
                 "top_k": 40
             }
-            
-            # Use gemini-2.0-flash (FREE and actually available!)
-            model_name = "gemini-2.0-flash"
+            model_name = route.model
             
             # Initialize model without functions first
             if use_functions:
-                model = genai.GenerativeModel(
-                    model_name=model_name,
-                    generation_config=generation_config
-                )
+                model = self.backend.model(model_name, generation_config)
             else:
-                model = genai.GenerativeModel(
-                    model_name=model_name,
-                    generation_config=generation_config
-                )
+                model = self.backend.model(model_name, generation_config)
             
             # Generate response with automatic key rotation on rate limit
             max_retries = len(self.api_keys) if self.api_keys else 1
@@ -685,10 +760,45 @@ class GeminiClient:
                         total_keys=len(self.api_keys)
                     )
                     
-                    response = model.generate_content(full_prompt)
+                    key_label = str(self.active_key_index)
+                    with tracer.start_as_current_span(
+                        "gemini.generate_content",
+                        attributes={
+                            "gemini.model": model_name,
+                            "gemini.task": task,
+                            "gemini.key_index": key_label,
+                            "gemini.prompt_chars": len(full_prompt),
+                            "gemini.attempt": attempt + 1,
+                        },
+                    ) as span:
+                        started = time.perf_counter()
+                        try:
+                            response = await generate_async(model, full_prompt)
+                        except Exception as call_error:
+                            GEMINI_REQUEST_DURATION.labels(task, model_name, key_label, "error").observe(
+                                time.perf_counter() - started
+                            )
+                            GEMINI_ERRORS.labels(task, key_label, self._error_type(call_error)).inc()
+                            raise
+                        GEMINI_REQUEST_DURATION.labels(task, model_name, key_label, "ok").observe(
+                            time.perf_counter() - started
+                        )
+                        usage = getattr(response, "usage_metadata", None)
+                        if usage is not None:
+                            prompt_tokens = usage.prompt_token_count or 0
+                            completion_tokens = usage.candidates_token_count or 0
+                            GEMINI_TOKENS.labels(task, key_label, "prompt").inc(prompt_tokens)
+                            GEMINI_TOKENS.labels(task, key_label, "completion").inc(completion_tokens)
+                            span.set_attribute("gemini.prompt_tokens", prompt_tokens)
+                            span.set_attribute("gemini.completion_tokens", completion_tokens)
+                            token_counter.calibrate(full_prompt, prompt_tokens)
                     
                     # Parse response
                     result = self._parse_response(response)
+                    result["model"] = model_name
+                    result["task"] = task
+                    if result.get("cost"):
+                        GEMINI_COST.labels(task, model_name).inc(result["cost"])
                     
                     # Track usage for billing
                     if user_id:
@@ -696,13 +806,17 @@ class GeminiClient:
                             user_id=user_id,
                             prompt=full_prompt,
                             response=result.get("text", ""),
-                            model=model_name
+                            model=model_name,
+                            tokens_input=result.get("prompt_tokens"),
+                            tokens_output=result.get("completion_tokens")
                         )
                     
                     logger.info(
                         "Gemini response generated successfully",
                         tokens_used=result.get("tokens_used"),
                         has_function_calls=bool(result.get("function_calls")),
+                        task=task,
+                        model=model_name,
                         key_index=self.current_key_index
                     )
                     
@@ -725,15 +839,9 @@ class GeminiClient:
                             self._configure_next_key()
                             # Recreate model with new key
                             if use_functions:
-                                model = genai.GenerativeModel(
-                                    model_name=model_name,
-                                    generation_config=generation_config
-                                )
+                                model = self.backend.model(model_name, generation_config)
                             else:
-                                model = genai.GenerativeModel(
-                                    model_name=model_name,
-                                    generation_config=generation_config
-                                )
+                                model = self.backend.model(model_name, generation_config)
                             continue
                     else:
                         # Not a rate limit error, raise immediately
@@ -758,7 +866,23 @@ class GeminiClient:
             logger.error("Unexpected error in generate_response", error=str(e), traceback=error_details)
             raise
     
-    def _build_prompt(self, prompt: str, context: Optional[Dict[str, Any]] = None) -> str:
+    @staticmethod
+    def _error_type(error: Exception) -> str:
+        """Coarse error class for metrics labels."""
+        error_msg = str(error).lower()
+        if "rate limit" in error_msg or "quota" in error_msg or "429" in error_msg:
+            return "rate_limit"
+        if "timeout" in error_msg or "deadline" in error_msg:
+            return "timeout"
+        return "other"
+    
+    def _build_prompt(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        max_input_tokens: Optional[int] = None,
+        task: str = "general"
+    ) -> str:
         persona = (context or {}).get("persona", "web_assistant")
         persona_detail = (context or {}).get("persona_detail")
 
@@ -778,61 +902,104 @@ class GeminiClient:
 
         context = context or {}
 
-        context_str = ""
+        # Segments in prompt order; when over budget the lowest priority
+        # context is trimmed first (catalog, summary, history, profile, ...)
+        budget = PromptBudget(settings.PROMPT_TOKEN_BUDGET if max_input_tokens is None else max_input_tokens)
+        budget.add("system", [system_instructions], required=True)
+
         if context:
-            context_str = "\n\nContext:\n"
+            budget.add("context", ["\n\nContext:\n"], required=True)
 
             if persona == "ai_saler" and context.get("custom_instructions"):
-                context_str += "\n**BRAND INSTRUCTIONS (FOLLOW PRECISELY):**\n"
-                for instruction in context["custom_instructions"]:
-                    context_str += (
+                budget.add(
+                    "instructions",
+                    [
                         f"- (Priority {instruction.get('priority', 0)}) "
                         f"[{', '.join(instruction.get('platforms') or ['all'])}] "
                         f"{instruction.get('instruction')}\n"
-                    )
+                        for instruction in context["custom_instructions"]
+                    ],
+                    header="\n**BRAND INSTRUCTIONS (FOLLOW PRECISELY):**\n",
+                    priority=PROMPT_PRIORITIES["instructions"],
+                )
 
+            state = []
             if context.get("intent"):
-                context_str += "\nConversation state:\n"
-                context_str += f"- Intent: {context['intent'].get('primary_intent')}\n"
-                context_str += f"- Urgency: {context['intent'].get('urgency')}\n"
-                context_str += f"- Sentiment: {context['intent'].get('sentiment')}\n"
-
+                state.append(
+                    "\nConversation state:\n"
+                    f"- Intent: {context['intent'].get('primary_intent')}\n"
+                    f"- Urgency: {context['intent'].get('urgency')}\n"
+                    f"- Sentiment: {context['intent'].get('sentiment')}\n"
+                )
             if context.get("channel"):
-                context_str += f"- Channel: {context['channel']}\n"
-
+                state.append(f"- Channel: {context['channel']}\n")
             if context.get("current_message"):
-                context_str += f"- Latest customer message: {context['current_message']}\n"
+                state.append(f"- Latest customer message: {context['current_message']}\n")
+            budget.add("state", state, priority=PROMPT_PRIORITIES["state"], truncate=True)
 
             if context.get("customer_profile"):
                 profile = context["customer_profile"]
-                context_str += "\nCustomer profile:\n"
-                context_str += f"- Name: {profile.get('name')}\n"
-                context_str += f"- Preferred language: {profile.get('preferred_language')}\n"
-                context_str += f"- Communication style: {profile.get('communication_style')}\n"
+                budget.add(
+                    "profile",
+                    [
+                        f"- Name: {profile.get('name')}\n",
+                        f"- Preferred language: {profile.get('preferred_language')}\n",
+                        f"- Communication style: {profile.get('communication_style')}\n",
+                    ],
+                    header="\nCustomer profile:\n",
+                    priority=PROMPT_PRIORITIES["profile"],
+                )
 
             if context.get("product_catalog"):
-                context_str += "\nProduct highlights:\n"
-                for product in context["product_catalog"][:10]:
-                    context_str += (
+                budget.add(
+                    "catalog",
+                    [
                         f"- {product.get('name')} (${product.get('price')} {product.get('currency')}): "
                         f"{product.get('description')}\n"
-                    )
+                        for product in context["product_catalog"][:10]
+                    ],
+                    header="\nProduct highlights:\n",
+                    priority=PROMPT_PRIORITIES["catalog"],
+                )
+
+            if context.get("conversation_summary"):
+                budget.add(
+                    "summary",
+                    [f"{context['conversation_summary']}\n"],
+                    header="\nConversation so far (summary):\n",
+                    priority=PROMPT_PRIORITIES["summary"],
+                    truncate=True,
+                )
 
             if context.get("conversation_history"):
-                context_str += "\nRecent conversation:\n"
-                for msg in context["conversation_history"][-5:]:
-                    role = msg.get("role")
-                    content = msg.get("content")
-                    context_str += f"- {role}: {content}\n"
+                budget.add(
+                    "history",
+                    [f"- {msg.get('role')}: {msg.get('content')}\n" for msg in context["conversation_history"]],
+                    header="\nRecent conversation:\n",
+                    priority=PROMPT_PRIORITIES["history"],
+                    drop_from="start",
+                    max_tokens=settings.CONVERSATION_WINDOW_TOKENS,
+                    truncate=True,
+                )
 
             if context.get("order"):
                 order = context["order"]
-                context_str += "\nOrder details:\n"
-                context_str += f"- Order ID: {order.get('id')}\n"
-                context_str += f"- Status: {order.get('status')}\n"
-                context_str += f"- Total: {order.get('currency')} {order.get('total')}\n"
+                budget.add(
+                    "order",
+                    [
+                        f"- Order ID: {order.get('id')}\n"
+                        f"- Status: {order.get('status')}\n"
+                        f"- Total: {order.get('currency')} {order.get('total')}\n"
+                    ],
+                    header="\nOrder details:\n",
+                    priority=PROMPT_PRIORITIES["order"],
+                )
 
-        full_prompt = f"{system_instructions}{context_str}\n\nUser Query: {prompt}\n\nResponse:"
+        budget.add("query", [f"\n\nUser Query: {prompt}\n\nResponse:"], required=True)
+
+        full_prompt = budget.render()
+        for segment, tokens in budget.trimmed.items():
+            PROMPT_TOKENS_TRIMMED.labels(task, segment).inc(tokens)
         return full_prompt
     
     def _parse_response(self, response) -> Dict[str, Any]:
@@ -887,14 +1054,16 @@ class GeminiClient:
                             "parameters": params
                         })
         
-        # Calculate token usage (approximate)
+        # Token usage as reported by the API; input and output are priced separately
         if hasattr(response, 'usage_metadata'):
             usage = response.usage_metadata
             result["tokens_used"] = usage.total_token_count
-            
-            # Rough cost estimation (update with actual Gemini pricing)
-            # Example: $0.00025 per 1K tokens for Pro model
-            result["cost"] = (result["tokens_used"] / 1000) * 0.00025
+            result["prompt_tokens"] = getattr(usage, "prompt_token_count", 0) or 0
+            result["completion_tokens"] = getattr(usage, "candidates_token_count", 0) or 0
+            if result["prompt_tokens"] or result["completion_tokens"]:
+                result["cost"] = estimate_cost(result["prompt_tokens"], result["completion_tokens"])
+            else:
+                result["cost"] = estimate_cost(result["tokens_used"] or 0, 0)
         
         return result
     
@@ -902,7 +1071,8 @@ class GeminiClient:
         self,
         prompt: str,
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        task: str = "content"
     ) -> str:
         """
         Simplified method to generate text content from Gemini.
@@ -911,6 +1081,7 @@ class GeminiClient:
             prompt: The input prompt
             temperature: Sampling temperature (0.0 - 1.0)
             max_tokens: Maximum tokens to generate
+            task: Kind of call for metrics
             
         Returns:
             Generated text response as string
@@ -920,15 +1091,48 @@ class GeminiClient:
             context=None,
             use_functions=False,
             temperature=temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            task=task
         )
         return result.get("text", "")
     
+    async def classify(
+        self,
+        task: str,
+        instructions: str,
+        item: str,
+        user_id: Optional[UUID] = None,
+        project_id: Optional[UUID] = None
+    ) -> str:
+        """
+        Answer a small classification/extraction prompt, micro-batched.
+        
+        Concurrent calls of one project with the same task and instructions
+        share one Gemini request, whichever client they were made through
+        (see llm_batcher.PromptBatcher). Keep the
+        per-input text out of instructions so calls can coalesce.
+        
+        Args:
+            task: Routing task (intent, sentiment, ...)
+            instructions: What to do with the input and the answer format
+            item: The input (message, comment, ...)
+            user_id: User ID for usage limits and tracking (optional)
+            project_id: Project the input belongs to; inputs are only
+                batched with others of the same project (never without one)
+            
+        Returns:
+            Answer text, as a standalone call would return it
+        """
+        return await prompt_batcher.submit(
+            task, instructions, item, user_id=user_id, project_id=project_id, client=self
+        )
+    
     async def generate_sales_reply(
         self,
         customer_message: str,
         order_context: Optional[Dict[str, Any]] = None,
-        conversation_history: Optional[List[Dict[str, str]]] = None
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        conversation_summary: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Specialized method for generating sales replies.
@@ -937,57 +1141,47 @@ class GeminiClient:
             customer_message: The customer's message
             order_context: Related order information
             conversation_history: Previous messages in the conversation
+            conversation_summary: Rolling summary of older messages
             
         Returns:
             Generated reply with optional function calls
         """
         context = {
             "conversation_history": conversation_history or [],
+            "conversation_summary": conversation_summary,
             "order": order_context
         }
         
         return await self.generate_response(
             prompt=customer_message,
             context=context,
-            use_functions=True
+            use_functions=True,
+            task="sales_reply"
         )
     
-    async def analyze_sentiment(self, message: str) -> Dict[str, Any]:
+    async def analyze_sentiment(self, message: str, project_id: Optional[UUID] = None) -> Dict[str, Any]:
         """
         Analyze sentiment of a customer message.
         
         Args:
             message: The message to analyze
+            project_id: Project the message belongs to (batching scope)
             
         Returns:
             Sentiment analysis results
         """
-        prompt = f"""Analyze the sentiment of this customer message and provide:
-1. Overall sentiment (positive, neutral, negative)
-2. Urgency level (low, medium, high, urgent)
-3. Key concerns or topics
-4. Recommended response tone
-
-Message: {message}
-
-Respond in JSON format."""
-        
-        response = await self.generate_response(
-            prompt=prompt,
-            use_functions=False,
-            temperature=0.3  # Lower temperature for analysis
-        )
+        text = await self.classify("sentiment", SENTIMENT_INSTRUCTIONS, message, project_id=project_id)
         
         try:
             # Attempt to parse JSON response
-            analysis = json.loads(response["text"])
+            analysis = json.loads(text)
             return analysis
         except json.JSONDecodeError:
             return {
                 "sentiment": "neutral",
                 "urgency": "medium",
                 "concerns": [],
-                "raw_analysis": response["text"]
+                "raw_analysis": text
             }
     
     async def generate_product_recommendation(
@@ -1028,7 +1222,7 @@ Respond in JSON format as array of recommendations."""
         response = await self.generate_response(
             prompt=prompt,
             use_functions=False,
-            temperature=0.6
+            task="recommendation"
         )
         
         try:
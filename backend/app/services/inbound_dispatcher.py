@@ -0,0 +1,270 @@
+"""
+Background consumer for inbound webhook messages.
+Webhook handlers persist the message, submit a job and return 200 right
+away; jobs run concurrently across customers but in order per customer,
+and bursts from one customer are coalesced into a single AI turn.
+"""
+
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import structlog
+
+from app.core.config import settings
+from app.core.database import reset_read_your_writes
+from app.core.metrics import INBOUND_ACTIVE_KEYS, INBOUND_QUEUE_DEPTH
+from app.core.tracing import current_context, link_to_current, tracer
+
+logger = structlog.get_logger(__name__)
+
+Job = Callable[[], Awaitable[Any]]
+BurstHandler = Callable[[List[Any]], Awaitable[Any]]
+Sweep = Callable[[], Awaitable[int]]
+
+
+class KeyedLock:
+    """
+    One asyncio lock per key, created on demand and dropped when unused.
+
+    Serializes work per conversation (key "<project_id>:<customer_id>")
+    without limiting parallelism across conversations.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._holders: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def acquire(self, key: str) -> AsyncIterator[None]:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._holders[key] = self._holders.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._holders[key] -= 1
+            if not self._holders[key]:
+                del self._holders[key]
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class _Burst:
+    """Items from one customer that will be handled as a single job."""
+
+    def __init__(self, handler: BurstHandler):
+        self.handler = handler
+        self.items: List[Any] = []
+        self.links: List[Any] = []  # Requests that contributed items (trace links)
+        self.first_at = self.last_at = asyncio.get_running_loop().time()
+        self.closed = False
+
+    def add(self, item: Any):
+        self.items.append(item)
+        self.last_at = asyncio.get_running_loop().time()
+        link = link_to_current()
+        if link is not None:
+            self.links.append(link)
+
+    async def __call__(self):
+        await self.handler(self.items)
+
+
+class InboundDispatcher:
+    """
+    Per-key FIFO queues drained by short-lived worker tasks.
+
+    Each key (usually "<project_id>:<customer_id>") gets at most one worker,
+    so a customer's messages are handled in arrival order. Different keys run
+    in parallel, capped by a global concurrency limit to protect the LLM
+    quota and the connection pool.
+
+    `submit_burst()` coalesces items: a burst stays open until no new item
+    has arrived for `debounce_seconds` (or `max_debounce_seconds` passed
+    since the first one), and items arriving while an earlier job for the
+    key is still running join the next turn.
+
+    Each job runs in an "inbound.job" span parented to the trace of the
+    request that submitted it; coalesced bursts link every contributing
+    request.
+
+    Queues live in memory only. `start_recovery()` runs a sweep at startup
+    and then periodically, so work lost with the process (crash, deploy,
+    jobs cancelled by `stop()`) is resubmitted from the database.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        debounce_seconds: Optional[float] = None,
+        max_debounce_seconds: Optional[float] = None
+    ):
+        self.max_concurrency = max_concurrency or settings.INBOUND_MAX_CONCURRENCY
+        self.debounce_seconds = (
+            settings.INBOUND_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        )
+        self.max_debounce_seconds = (
+            settings.INBOUND_MAX_DEBOUNCE_SECONDS if max_debounce_seconds is None else max_debounce_seconds
+        )
+        self._queues: Dict[str, Deque[Tuple[Job, Any, float]]] = {}
+        self._open_bursts: Dict[str, _Burst] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._recovery_task: Optional[asyncio.Task] = None
+        self._recovered = 0
+        self._processed = 0
+        self._failed = 0
+        self._coalesced = 0
+
+    def submit(self, key: str, job: Job):
+        """Queue a job behind any pending jobs with the same key."""
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+        queue.append((job, current_context(), asyncio.get_running_loop().time()))
+
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._drain(key))
+
+    def submit_burst(self, key: str, item: Any, handler: BurstHandler):
+        """
+        Add an item to the key's open burst, queueing a new burst if needed.
+
+        All items of a burst are passed to the handler of the burst that
+        opened it, so use one handler per key.
+        """
+        burst = self._open_bursts.get(key)
+        if burst is None or burst.closed:
+            burst = self._open_bursts[key] = _Burst(handler)
+            self.submit(key, burst)
+        else:
+            self._coalesced += 1
+        burst.add(item)
+
+    async def _wait_for_quiet(self, key: str, burst: _Burst):
+        """Sleep until the burst has been quiet for the debounce window, then close it."""
+        loop = asyncio.get_running_loop()
+        while True:
+            deadline = min(
+                burst.last_at + self.debounce_seconds,
+                burst.first_at + self.max_debounce_seconds
+            )
+            delay = deadline - loop.time()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        burst.closed = True
+        if self._open_bursts.get(key) is burst:
+            del self._open_bursts[key]
+
+    async def _drain(self, key: str):
+        """Run queued jobs for one key until its queue is empty."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        loop = asyncio.get_running_loop()
+        queue = self._queues[key]
+        try:
+            while queue:
+                job, trace_context, enqueued_at = queue.popleft()
+                is_burst = isinstance(job, _Burst)
+                if is_burst:
+                    # Debounce outside the semaphore so waiting doesn't hold a slot
+                    await self._wait_for_quiet(key, job)
+                async with self._semaphore:
+                    with tracer.start_as_current_span(
+                        "inbound.job",
+                        context=trace_context,
+                        links=job.links if is_burst else None,
+                        attributes={
+                            "inbound.key": key,
+                            "inbound.items": len(job.items) if is_burst else 1,
+                            "inbound.queued_seconds": loop.time() - enqueued_at,
+                        },
+                    ):
+                        try:
+                            reset_read_your_writes()
+                            await job()
+                            self._processed += 1
+                        except Exception as e:
+                            self._failed += 1
+                            logger.error("Inbound job failed", key=key, error=str(e))
+        finally:
+            # No await between the empty check and cleanup, so submit() can't
+            # slip a job into a queue whose worker is gone
+            self._queues.pop(key, None)
+            self._workers.pop(key, None)
+
+    def pending_count(self) -> int:
+        """Number of jobs waiting to run."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def get_stats(self) -> Dict[str, int]:
+        """Queue statistics for monitoring."""
+        return {
+            "active_keys": len(self._workers),
+            "pending_jobs": self.pending_count(),
+            "processed": self._processed,
+            "failed": self._failed,
+            "coalesced": self._coalesced,
+            "recovered": self._recovered,
+        }
+
+    async def _run_recovery(self, sweep: Sweep, interval: float):
+        """Background loop that runs the recovery sweep, first right away."""
+        while True:
+            try:
+                reset_read_your_writes()
+                self._recovered += await sweep()
+            except Exception as e:
+                logger.error("Inbound recovery sweep failed", error=str(e))
+            await asyncio.sleep(interval)
+
+    def start_recovery(self, sweep: Sweep, interval: Optional[float] = None):
+        """Run `sweep` now and every `interval` seconds; it returns how many jobs it resubmitted."""
+        if self._recovery_task is None or self._recovery_task.done():
+            self._recovery_task = asyncio.create_task(self._run_recovery(
+                sweep,
+                settings.INBOUND_RECOVERY_INTERVAL_SECONDS if interval is None else interval
+            ))
+
+    async def stop(self, timeout: float = 30.0):
+        """
+        Wait for queued jobs to finish (bounded by timeout) on shutdown.
+
+        Abandoned jobs keep their messages in "received", so the next
+        recovery sweep (on any instance) picks them up.
+        """
+        if self._recovery_task is not None:
+            self._recovery_task.cancel()
+            try:
+                await self._recovery_task
+            except asyncio.CancelledError:
+                pass
+            self._recovery_task = None
+
+        workers = list(self._workers.values())
+        if not workers:
+            return
+
+        logger.info("Draining inbound jobs", workers=len(workers), pending=self.pending_count())
+        done, pending = await asyncio.wait(workers, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("Inbound jobs abandoned on shutdown", workers=len(pending))
+
+
+# Global inbound dispatcher
+inbound_dispatcher = InboundDispatcher()
+INBOUND_QUEUE_DEPTH.set_function(inbound_dispatcher.pending_count)
+INBOUND_ACTIVE_KEYS.set_function(lambda: len(inbound_dispatcher._workers))
+
+# Per-conversation locks (shared by webhook jobs and direct API calls)
+conversation_locks = KeyedLock()
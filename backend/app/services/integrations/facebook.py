@@ -7,6 +7,7 @@ from typing import Dict, Any, Optional, List
 import aiohttp
 import structlog
 from uuid import UUID
+from app.core.metrics import track_send
 
 logger = structlog.get_logger(__name__)
 
@@ -32,6 +33,7 @@ class FacebookClient:
         if not self.page_id or not self.access_token:
             raise ValueError("Facebook config must include page_id and access_token")
     
+    @track_send("facebook")
     async def send_message(
         self,
         customer_id: UUID,
@@ -1,143 +1,409 @@
 """
 Shopify integration service.
+Admin REST API client with link-header pagination and a client-side leaky
+bucket matching Shopify's per-shop rate limit.
 """
 
+import asyncio
+import base64
 import hmac
 import hashlib
-from typing import Dict, Any, List
+import time
+from datetime import datetime
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+import httpx
 import structlog
 from app.core.config import settings
 
 logger = structlog.get_logger(__name__)
 
 
+def parse_shopify_time(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Shopify ISO-8601 timestamp (e.g. 2026-10-19T12:00:00-04:00)."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _split_window(start: datetime, end: datetime, parts: int) -> List[Tuple[datetime, datetime]]:
+    """Cut [start, end] into `parts` consecutive slices (one slice for short windows)."""
+    if parts <= 1 or (end - start).total_seconds() < 3600:
+        return [(start, end)]
+
+    step = (end - start) / parts
+    bounds = [start + step * index for index in range(parts)] + [end]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class ShopifyRateLimiter:
+    """
+    Client-side leaky bucket for one shop.
+
+    Shopify allows a burst of `capacity` REST calls that drains at
+    `leak_rate` calls per second. The local estimate is corrected from the
+    X-Shopify-Shop-Api-Call-Limit header of every response, so concurrent
+    fetches share the budget instead of running into 429s.
+    """
+
+    def __init__(self, capacity: int = 40, leak_rate: float = 2.0, headroom: int = 2):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.headroom = headroom
+        self.level = 0.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _leak(self):
+        now = time.monotonic()
+        self.level = max(0.0, self.level - (now - self._updated) * self.leak_rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._leak()
+            limit = max(self.capacity - self.headroom, 1)
+            while self.level + 1 > limit:
+                await asyncio.sleep((self.level + 1 - limit) / self.leak_rate)
+                self._leak()
+            self.level += 1
+
+    def observe(self, call_limit: Optional[str]):
+        """Sync with the server's view, e.g. "32/40"."""
+        if not call_limit or "/" not in call_limit:
+            return
+        used, capacity = call_limit.split("/", 1)
+        try:
+            self.capacity = int(capacity)
+            self._leak()
+            self.level = max(self.level, float(used))
+        except ValueError:
+            pass
+
+
 class ShopifyService:
     """Service for Shopify API integration."""
-    
-    def __init__(self, shop_url: str, api_key: str, api_secret: str):
+
+    max_retries = 5
+
+    def __init__(
+        self,
+        shop_url: str,
+        api_key: str,
+        api_secret: str,
+        access_token: Optional[str] = None,
+        webhook_secret: Optional[str] = None
+    ):
         """Initialize Shopify service with credentials."""
         self.shop_url = shop_url
         self.api_key = api_key
         self.api_secret = api_secret
+        self.access_token = access_token
+        self.webhook_secret = webhook_secret
         self.api_version = "2024-01"
-    
+        self.limiter = ShopifyRateLimiter()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @classmethod
+    def from_integration(cls, integration) -> "ShopifyService":
+        """
+        Build a client from an Integration's config.
+
+        Uses shop_domain, api_key and api_secret, plus access_token and
+        webhook_secret when the shop has them.
+        """
+        config = integration.config or {}
+        return cls(
+            shop_url=config.get("shop_domain") or (integration.extra_data or {}).get("shop_domain", ""),
+            api_key=config.get("api_key", ""),
+            api_secret=config.get("api_secret", ""),
+            access_token=config.get("access_token"),
+            webhook_secret=config.get("webhook_secret"),
+        )
+
+    @property
+    def base_url(self) -> str:
+        if settings.SHOPIFY_API_BASE_URL:
+            return settings.SHOPIFY_API_BASE_URL.rstrip("/")
+        shop = self.shop_url.replace("https://", "").replace("http://", "").strip("/")
+        shop = shop.replace(".myshopify.com", "")
+        return f"https://{shop}.myshopify.com"
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            if self.access_token:
+                auth, headers = None, {"X-Shopify-Access-Token": self.access_token}
+            else:
+                auth, headers = httpx.BasicAuth(self.api_key, self.api_secret or ""), {}
+            self._client = httpx.AsyncClient(
+                base_url=f"{self.base_url}/admin/api/{self.api_version}",
+                auth=auth,
+                headers=headers,
+                timeout=httpx.Timeout(30.0, connect=10.0),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None
+    ) -> httpx.Response:
+        """Rate-limited request; 429s are retried after Retry-After."""
+        client = self._get_client()
+
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            response = await client.request(method, url, params=params, json=json)
+            self.limiter.observe(response.headers.get("X-Shopify-Shop-Api-Call-Limit"))
+
+            if response.status_code == 429 and attempt < self.max_retries:
+                retry_after = float(response.headers.get("Retry-After", 2.0))
+                logger.warning("Shopify rate limited", shop=self.shop_url, retry_after=retry_after)
+                # The bucket is full from the server's point of view
+                self.limiter.level = self.limiter.capacity
+                await asyncio.sleep(retry_after)
+                continue
+
+            response.raise_for_status()
+            return response
+
+        response.raise_for_status()
+        return response
+
     def verify_webhook(self, data: bytes, hmac_header: str) -> bool:
         """
         Verify Shopify webhook HMAC signature.
-        
+
         Args:
             data: Raw request body bytes
-            hmac_header: HMAC signature from X-Shopify-Hmac-Sha256 header
-            
+            hmac_header: Base64 HMAC-SHA256 from the X-Shopify-Hmac-Sha256 header
+
         Returns:
             True if signature is valid, False otherwise
         """
-        computed_hmac = hmac.new(
-            self.api_secret.encode('utf-8'),
-            data,
-            hashlib.sha256
-        ).hexdigest()
-        
+        # Custom apps sign with their webhook secret, public apps with the API secret
+        secret = self.webhook_secret or self.api_secret or settings.SHOPIFY_API_SECRET
+        if not secret or not hmac_header:
+            return False
+
+        computed_hmac = base64.b64encode(
+            hmac.new(secret.encode('utf-8'), data, hashlib.sha256).digest()
+        ).decode()
+
         return hmac.compare_digest(computed_hmac, hmac_header)
-    
+
     async def fetch_orders(
-        self, 
-        limit: int = 50, 
+        self,
+        limit: int = 50,
         status: str = "any",
         since_id: str = None
     ) -> List[Dict[str, Any]]:
         """
-        Fetch orders from Shopify.
-        
+        Fetch one page of orders from Shopify.
+
         Args:
-            limit: Maximum number of orders to fetch
+            limit: Maximum number of orders to fetch (Shopify caps pages at 250)
             status: Order status filter (any, open, closed, cancelled)
             since_id: Fetch orders after this ID
-            
+
         Returns:
             List of order dictionaries
         """
-        # TODO: Implement actual Shopify API call
-        # Example using shopify-python-api:
-        # import shopify
-        # shopify.ShopifyResource.set_site(f"https://{self.api_key}:{self.api_secret}@{self.shop_url}/admin/api/{self.api_version}")
-        # orders = shopify.Order.find(limit=limit, status=status, since_id=since_id)
-        
         logger.info("Fetching Shopify orders", limit=limit, status=status)
-        
-        return []
-    
+
+        params = {"limit": min(limit, 250), "status": status}
+        if since_id:
+            params["since_id"] = since_id
+        response = await self._request("GET", "/orders.json", params=params)
+        return response.json().get("orders", [])
+
+    async def iter_orders(
+        self,
+        updated_at_min: Optional[datetime] = None,
+        updated_at_max: Optional[datetime] = None,
+        since_id: Optional[str] = None,
+        status: str = "any",
+        page_size: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield pages of orders, following the Link header's `next` URL.
+
+        With since_id pages come in ascending id order, which makes the
+        position resumable; updated_at_min/max select a time window.
+        """
+        params: Dict[str, Any] = {
+            "limit": min(page_size or settings.SHOPIFY_SYNC_PAGE_SIZE, 250),
+            "status": status,
+        }
+        if since_id:
+            params["since_id"] = since_id
+        if updated_at_min:
+            params["updated_at_min"] = updated_at_min.isoformat()
+        if updated_at_max:
+            params["updated_at_max"] = updated_at_max.isoformat()
+
+        url: Optional[str] = "/orders.json"
+        while url:
+            response = await self._request("GET", url, params=params)
+            orders = response.json().get("orders", [])
+            if orders:
+                yield orders
+
+            # page_info URLs carry the cursor; other filters must not be repeated
+            url = response.links.get("next", {}).get("url")
+            params = None
+
+    async def iter_orders_concurrently(
+        self,
+        updated_at_min: datetime,
+        updated_at_max: datetime,
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield pages for an updated_at window fetched as parallel time slices.
+
+        Each slice paginates on its own; all of them share the shop's rate
+        limiter. Pages arrive in no particular order.
+        """
+        slices = _split_window(updated_at_min, updated_at_max, concurrency or settings.SHOPIFY_SYNC_CONCURRENCY)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=len(slices) * 2)
+        finished = object()
+
+        async def produce(start: datetime, end: datetime):
+            try:
+                async for page in self.iter_orders(updated_at_min=start, updated_at_max=end):
+                    await queue.put(page)
+            finally:
+                await queue.put(finished)
+
+        producers = [asyncio.create_task(produce(start, end)) for start, end in slices]
+        try:
+            remaining = len(producers)
+            while remaining:
+                page = await queue.get()
+                if page is finished:
+                    remaining -= 1
+                    continue
+                yield page
+            # Surface fetch errors once every slice has stopped
+            await asyncio.gather(*producers)
+        finally:
+            for producer in producers:
+                producer.cancel()
+
     async def get_order(self, order_id: str) -> Dict[str, Any]:
         """
         Get a specific order by ID.
-        
+
         Args:
             order_id: Shopify order ID
-            
+
         Returns:
             Order dictionary
         """
-        # TODO: Implement
         logger.info("Fetching Shopify order", order_id=order_id)
-        return {}
-    
+        response = await self._request("GET", f"/orders/{order_id}.json")
+        return response.json().get("order", {})
+
     async def update_order(self, order_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Update an order in Shopify.
-        
+
         Args:
             order_id: Shopify order ID
             data: Update data
-            
+
         Returns:
             Updated order dictionary
         """
-        # TODO: Implement
         logger.info("Updating Shopify order", order_id=order_id)
-        return {}
-    
-    def transform_order(self, shopify_order: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self._request(
+            "PUT",
+            f"/orders/{order_id}.json",
+            json={"order": {"id": order_id, **data}}
+        )
+        return response.json().get("order", {})
+
+    @staticmethod
+    def transform_order(shopify_order: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Transform Shopify order format to internal format.
-        
+        Transform Shopify order format to Order column values.
+
         Args:
-            shopify_order: Order data from Shopify API
-            
+            shopify_order: Order data from Shopify API or an orders/* webhook
+
         Returns:
-            Transformed order dictionary
+            Transformed order dictionary (everything but project_id)
         """
+        customer = shopify_order.get("customer") or {}
+        name = " ".join(filter(None, [customer.get("first_name"), customer.get("last_name")]))
+
+        if shopify_order.get("cancelled_at"):
+            status = "cancelled"
+        elif shopify_order.get("fulfillment_status") == "fulfilled":
+            status = "fulfilled"
+        else:
+            status = {
+                "paid": "processing",
+                "partially_paid": "processing",
+                "refunded": "refunded",
+                "voided": "cancelled",
+            }.get((shopify_order.get("financial_status") or "").lower(), "pending")
+
+        fulfillments = shopify_order.get("fulfillments") or []
+
         return {
             "external_id": str(shopify_order.get("id")),
             "provider": "shopify",
-            "status": shopify_order.get("financial_status"),
+            "status": status,
             "customer": {
-                "name": shopify_order.get("customer", {}).get("name"),
-                "email": shopify_order.get("customer", {}).get("email"),
-                "phone": shopify_order.get("customer", {}).get("phone"),
+                "id": str(customer["id"]) if customer.get("id") else None,
+                "name": name or customer.get("name"),
+                "email": shopify_order.get("email") or customer.get("email"),
+                "phone": shopify_order.get("phone") or customer.get("phone"),
+                "shipping_address": shopify_order.get("shipping_address") or {},
             },
             "items": [
                 {
                     "name": item.get("name"),
                     "quantity": item.get("quantity"),
-                    "price": float(item.get("price", 0)),
+                    "price": float(item.get("price") or 0),
                     "sku": item.get("sku"),
+                    "product_id": item.get("product_id"),
+                    "variant_id": item.get("variant_id"),
                 }
-                for item in shopify_order.get("line_items", [])
+                for item in shopify_order.get("line_items") or []
             ],
-            "total": float(shopify_order.get("total_price", 0)),
-            "currency": shopify_order.get("currency", "USD"),
-            "metadata": {
+            "total": float(shopify_order.get("total_price") or 0),
+            "currency": shopify_order.get("currency") or "USD",
+            "tags": [tag.strip() for tag in (shopify_order.get("tags") or "").split(",") if tag.strip()],
+            "extra_data": {
                 "order_number": shopify_order.get("order_number"),
+                "financial_status": shopify_order.get("financial_status"),
                 "fulfillment_status": shopify_order.get("fulfillment_status"),
-                "tags": shopify_order.get("tags"),
             },
+            "order_date": parse_shopify_time(shopify_order.get("created_at")),
+            "fulfilled_date": parse_shopify_time(fulfillments[-1].get("created_at")) if fulfillments else None,
+            "last_updated": parse_shopify_time(shopify_order.get("updated_at")),
         }
-    
+
     @staticmethod
     def get_webhook_topics() -> List[str]:
         """
         Get list of webhook topics to subscribe to.
-        
+
         Returns:
             List of Shopify webhook topics
         """
@@ -6,6 +6,7 @@ from typing import Dict, Any, Optional
 import structlog
 import httpx
 from app.core.config import settings
+from app.core.metrics import track_send
 
 logger = structlog.get_logger(__name__)
 
@@ -18,6 +19,7 @@ class TelegramService:
         self.bot_token = bot_token
         self.api_url = f"https://api.telegram.org/bot{bot_token}"
     
+    @track_send("telegram")
     async def send_message(
         self,
         chat_id: str,
@@ -6,6 +6,7 @@ from typing import Dict, Any
 import structlog
 import httpx
 from app.core.config import settings
+from app.core.metrics import track_send
 
 logger = structlog.get_logger(__name__)
 
@@ -19,6 +20,7 @@ class WhatsAppService:
         self.access_token = access_token
         self.api_url = "https://graph.facebook.com/v18.0"
     
+    @track_send("whatsapp")
     async def send_message(
         self,
         to: str,
@@ -0,0 +1,438 @@
+"""
+Local intent, urgency and sentiment classifier for inbound messages.
+Hashed word and character n-grams feed one softmax-regression head per
+label, trained offline on the labels earlier LLM calls left in
+ConversationHistory. Prediction is pure Python over a sparse vector and
+takes well under a millisecond, so confident predictions replace the
+intent LLM call; everything else still goes to Gemini.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from datetime import datetime, timedelta
+from uuid import UUID
+import asyncio
+import math
+import random
+import re
+import time
+import zlib
+import structlog
+from sqlalchemy import delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import LOCAL_INTENT_PREDICTIONS, LOCAL_INTENT_SECONDS
+from app.db.models import ConversationHistory, IntentModel, MessageDirection
+
+logger = structlog.get_logger(__name__)
+
+# Feature space; sparse, only features seen in training are stored
+HASH_DIM = 1 << 18
+HEADS = ("intent", "urgency", "sentiment")
+# A model is only served with both: intent replaces the LLM call, and
+# urgency decides escalation
+REQUIRED_HEADS = ("intent", "urgency")
+# Labels with fewer training examples are left out of a head
+MIN_LABEL_SUPPORT = 10
+# Messages whose text hashes to this bucket (of 5) form the holdout set
+HOLDOUT_BUCKET = 0
+# Only LLM labels train; rows labeled by the classifier itself or the fast
+# path would feed its own mistakes back
+TRAINABLE_SOURCES = ("llm",)
+
+
+def _hash(token: str) -> int:
+    # crc32, not hash(): it must be stable across processes
+    return zlib.crc32(token.encode("utf-8")) & (HASH_DIM - 1)
+
+
+def featurize(text: str) -> Dict[int, float]:
+    """L2-normalized hashed word unigrams, bigrams and in-word char trigrams."""
+    text = " ".join((text or "").lower().split())
+    words = re.findall(r"\w+", text)
+    tokens = [f"w:{word}" for word in words]
+    tokens += [f"b:{first} {second}" for first, second in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        tokens += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    if "?" in text:
+        tokens.append("p:?")
+    if "!" in text:
+        tokens.append("p:!")
+
+    features: Dict[int, float] = {}
+    for token in tokens:
+        index = _hash(token)
+        features[index] = features.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(value * value for value in features.values())) or 1.0
+    return {index: value / norm for index, value in features.items()}
+
+
+class LinearHead:
+    """Multinomial logistic regression over hashed features for one label."""
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        weights: Optional[Dict[int, List[float]]] = None,
+        bias: Optional[List[float]] = None
+    ):
+        self.labels = list(labels)
+        self.weights = weights or {}
+        self.bias = bias or [0.0] * len(self.labels)
+
+    def predict_proba(self, features: Dict[int, float]) -> List[float]:
+        scores = list(self.bias)
+        for index, value in features.items():
+            row = self.weights.get(index)
+            if row is not None:
+                for k, weight in enumerate(row):
+                    scores[k] += weight * value
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        total = sum(exps)
+        return [value / total for value in exps]
+
+    def predict(self, features: Dict[int, float]) -> Tuple[str, float]:
+        probs = self.predict_proba(features)
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.labels[best], probs[best]
+
+    def fit(
+        self,
+        samples: Sequence[Tuple[Dict[int, float], str]],
+        epochs: int = 8,
+        learning_rate: float = 0.5,
+        l2: float = 1e-5,
+        seed: int = 0
+    ) -> None:
+        """SGD on cross-entropy; weights are only touched for features present."""
+        index_of = {label: k for k, label in enumerate(self.labels)}
+        order = list(range(len(samples)))
+        rng = random.Random(seed)
+        classes = len(self.labels)
+        for epoch in range(epochs):
+            rate = learning_rate / (1 + epoch)
+            rng.shuffle(order)
+            for i in order:
+                features, label = samples[i]
+                gradient = self.predict_proba(features)
+                gradient[index_of[label]] -= 1.0
+                for k in range(classes):
+                    self.bias[k] -= rate * gradient[k]
+                for index, value in features.items():
+                    row = self.weights.get(index)
+                    if row is None:
+                        row = self.weights[index] = [0.0] * classes
+                    for k in range(classes):
+                        row[k] -= rate * (gradient[k] * value + l2 * row[k])
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Near-zero rows carry no signal; dropping them keeps the JSON small
+        return {
+            "labels": self.labels,
+            "bias": [round(value, 5) for value in self.bias],
+            "weights": {
+                str(index): [round(value, 5) for value in row]
+                for index, row in self.weights.items()
+                if max(abs(value) for value in row) >= 1e-4
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LinearHead":
+        return cls(
+            labels=data["labels"],
+            weights={int(index): row for index, row in data["weights"].items()},
+            bias=data["bias"],
+        )
+
+
+class IntentClassifier:
+    """One LinearHead per label (intent, urgency, sentiment) over shared features."""
+
+    def __init__(self, heads: Dict[str, LinearHead]):
+        self.heads = heads
+
+    def predict(self, text: str) -> Dict[str, Tuple[str, float]]:
+        """(label, confidence) per head."""
+        features = featurize(text)
+        return {name: head.predict(features) for name, head in self.heads.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"hash_dim": HASH_DIM, "heads": {name: head.to_dict() for name, head in self.heads.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IntentClassifier":
+        if data.get("hash_dim") != HASH_DIM:
+            raise ValueError("Model was trained with a different feature space")
+        return cls({name: LinearHead.from_dict(head) for name, head in data["heads"].items()})
+
+
+def _normalize_label(value: Optional[str]) -> Optional[str]:
+    if not value or not isinstance(value, str):
+        return None
+    return value.strip().lower().replace(" ", "_")[:100] or None
+
+
+def _evaluate_head(
+    head: LinearHead,
+    samples: Sequence[Tuple[Dict[int, float], str]],
+    threshold: float
+) -> Dict[str, Any]:
+    """Agreement with the LLM labels on held-out messages."""
+    counts = {label: {"tp": 0, "fp": 0, "fn": 0} for label in head.labels}
+    correct = confident = confident_correct = 0
+    for features, expected in samples:
+        predicted, confidence = head.predict(features)
+        hit = predicted == expected
+        correct += hit
+        if confidence >= threshold:
+            confident += 1
+            confident_correct += hit
+        if hit:
+            counts[expected]["tp"] += 1
+        else:
+            counts[predicted]["fp"] += 1
+            counts[expected]["fn"] += 1
+
+    per_label = {}
+    for label, count in counts.items():
+        precision = count["tp"] / (count["tp"] + count["fp"]) if count["tp"] + count["fp"] else 0.0
+        recall = count["tp"] / (count["tp"] + count["fn"]) if count["tp"] + count["fn"] else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_label[label] = {
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(f1, 4),
+            "support": count["tp"] + count["fn"],
+        }
+
+    total = len(samples)
+    return {
+        "test_samples": total,
+        "accuracy": round(correct / total, 4) if total else None,
+        "macro_f1": round(sum(item["f1"] for item in per_label.values()) / len(per_label), 4) if per_label else None,
+        # Share of messages the classifier would answer, and how often it agrees there
+        "coverage": round(confident / total, 4) if total else None,
+        "confident_accuracy": round(confident_correct / confident, 4) if confident else None,
+        "labels": per_label,
+    }
+
+
+def train_classifier(
+    rows: Sequence[Tuple[str, Dict[str, Optional[str]]]],
+    threshold: Optional[float] = None
+) -> Tuple[Optional[IntentClassifier], Dict[str, Any]]:
+    """
+    Train on (message, {head: label}) rows and evaluate on a holdout split.
+
+    The split is by a hash of the message text, so repeated messages never
+    straddle it. CPU-bound: run it off the event loop.
+
+    Returns:
+        (classifier or None when an intent or urgency head can't be trained, report)
+    """
+    threshold = settings.LOCAL_INTENT_MIN_CONFIDENCE if threshold is None else threshold
+    train: Dict[str, List[Tuple[Dict[int, float], str]]] = {name: [] for name in HEADS}
+    test: Dict[str, List[Tuple[Dict[int, float], str]]] = {name: [] for name in HEADS}
+    test_texts = []
+    for text, labels in rows:
+        features = featurize(text)
+        holdout = zlib.crc32(text.lower().encode("utf-8")) % 5 == HOLDOUT_BUCKET
+        if holdout:
+            test_texts.append(text)
+        for name in HEADS:
+            label = _normalize_label(labels.get(name))
+            if label:
+                (test if holdout else train)[name].append((features, label))
+
+    heads: Dict[str, LinearHead] = {}
+    report: Dict[str, Any] = {"samples": len(rows), "threshold": threshold, "heads": {}}
+    for name in HEADS:
+        support: Dict[str, int] = {}
+        for _, label in train[name]:
+            support[label] = support.get(label, 0) + 1
+        labels = sorted(label for label, count in support.items() if count >= MIN_LABEL_SUPPORT)
+        if len(labels) < 2:
+            report["heads"][name] = {"skipped": "fewer than two labels with enough examples"}
+            continue
+        kept = set(labels)
+        head = LinearHead(labels)
+        head.fit([sample for sample in train[name] if sample[1] in kept])
+        heads[name] = head
+        report["heads"][name] = {
+            "train_samples": sum(support[label] for label in labels),
+            **_evaluate_head(head, [sample for sample in test[name] if sample[1] in kept], threshold),
+        }
+
+    if any(name not in heads for name in REQUIRED_HEADS):
+        return None, report
+
+    classifier = IntentClassifier(heads)
+    if test_texts:
+        timings = []
+        for text in test_texts:
+            started = time.perf_counter()
+            classifier.predict(text)
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        timings.sort()
+        report["latency_us"] = {
+            "mean": round(sum(timings) / len(timings), 1),
+            "p50": round(timings[len(timings) // 2], 1),
+            "p99": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 1),
+        }
+    return classifier, report
+
+
+async def load_training_rows(
+    db: AsyncSession,
+    project_id: Optional[UUID] = None,
+    days: Optional[int] = None,
+    limit: Optional[int] = None
+) -> List[Tuple[str, Dict[str, Optional[str]]]]:
+    """Newest LLM-labeled inbound turns, for one project or all of them."""
+    days = settings.LOCAL_INTENT_TRAINING_DAYS if days is None else days
+    limit = settings.LOCAL_INTENT_MAX_SAMPLES if limit is None else limit
+    source = ConversationHistory.entities_extracted["_intent_source"].astext
+    query = (
+        select(
+            ConversationHistory.message_content,
+            ConversationHistory.intent,
+            ConversationHistory.sentiment,
+            ConversationHistory.entities_extracted["_urgency"].astext.label("urgency"),
+        )
+        .where(ConversationHistory.message_direction == MessageDirection.INBOUND)
+        .where(ConversationHistory.intent.is_not(None))
+        .where(ConversationHistory.created_at >= datetime.utcnow() - timedelta(days=days))
+        .where(or_(source.is_(None), source.in_(TRAINABLE_SOURCES)))
+        .order_by(ConversationHistory.created_at.desc())
+        .limit(limit)
+    )
+    if project_id is not None:
+        query = query.where(ConversationHistory.project_id == project_id)
+    result = await db.execute(query)
+    return [
+        (row.message_content, {"intent": row.intent, "urgency": row.urgency, "sentiment": row.sentiment})
+        for row in result
+        if row.message_content
+    ]
+
+
+async def train_and_store(db: AsyncSession, project_id: Optional[UUID] = None) -> Dict[str, Any]:
+    """
+    Retrain the classifier of a project (None = global) and store it if it
+    is good enough to serve; older models of the same scope are removed.
+    The caller commits.
+    """
+    rows = await load_training_rows(db, project_id)
+    if len(rows) < settings.LOCAL_INTENT_MIN_SAMPLES:
+        return {"samples": len(rows), "stored": False, "reason": "not enough labeled messages"}
+
+    classifier, report = await asyncio.to_thread(train_classifier, rows)
+    intent_report = report["heads"].get("intent", {})
+    confident_accuracy = intent_report.get("confident_accuracy")
+    reason = None
+    if classifier is None:
+        reason = "not enough labeled messages for an intent and an urgency head"
+    elif any(
+        (report["heads"][name].get("confident_accuracy") or 0.0) < settings.LOCAL_INTENT_MIN_ACCURACY
+        for name in REQUIRED_HEADS
+    ):
+        reason = "holdout agreement with LLM labels below LOCAL_INTENT_MIN_ACCURACY"
+    if reason:
+        report.update(stored=False, reason=reason)
+        logger.info("Intent classifier not stored", project_id=str(project_id) if project_id else "global", report=report)
+        return report
+
+    scope = IntentModel.project_id == project_id if project_id else IntentModel.project_id.is_(None)
+    await db.execute(delete(IntentModel).where(scope))
+    db.add(IntentModel(project_id=project_id, model=classifier.to_dict(), report=report, samples=len(rows)))
+    report["stored"] = True
+    logger.info(
+        "Intent classifier trained",
+        project_id=str(project_id) if project_id else "global",
+        samples=len(rows),
+        coverage=intent_report.get("coverage"),
+        confident_accuracy=confident_accuracy,
+    )
+    return report
+
+
+class LocalIntentService:
+    """
+    Serves the newest stored classifier per project (falling back to the
+    global one) from memory; checks for a retrained model every
+    LOCAL_INTENT_RELOAD_SECONDS.
+    """
+
+    def __init__(self):
+        # project_id -> (model row id, classifier, checked_at)
+        self._models: Dict[UUID, Tuple[Optional[UUID], Optional[IntentClassifier], float]] = {}
+
+    async def _classifier(self, db: AsyncSession, project_id: UUID) -> Optional[IntentClassifier]:
+        now = time.monotonic()
+        cached = self._models.get(project_id)
+        if cached and now - cached[2] < settings.LOCAL_INTENT_RELOAD_SECONDS:
+            return cached[1]
+
+        # Project model first, then the global one
+        result = await db.execute(
+            select(IntentModel.id)
+            .where(or_(IntentModel.project_id == project_id, IntentModel.project_id.is_(None)))
+            .order_by(IntentModel.project_id.is_(None), IntentModel.trained_at.desc())
+            .limit(1)
+        )
+        model_id = result.scalar_one_or_none()
+        if cached and cached[0] == model_id:
+            self._models[project_id] = (model_id, cached[1], now)
+            return cached[1]
+
+        classifier = None
+        if model_id is not None:
+            data = (await db.execute(select(IntentModel.model).where(IntentModel.id == model_id))).scalar_one_or_none()
+            try:
+                classifier = IntentClassifier.from_dict(data) if data else None
+            except (KeyError, ValueError) as e:
+                logger.warning("Unusable intent classifier", model_id=str(model_id), error=str(e))
+        self._models[project_id] = (model_id, classifier, now)
+        return classifier
+
+    async def classify(self, db: AsyncSession, project_id: UUID, message: str) -> Optional[Dict[str, Any]]:
+        """
+        Intent dict shaped like the LLM's, or None when there is no model or
+        the intent or urgency prediction is below LOCAL_INTENT_MIN_CONFIDENCE.
+        """
+        if not settings.LOCAL_INTENT_ENABLED:
+            return None
+        classifier = await self._classifier(db, project_id)
+        if classifier is None:
+            LOCAL_INTENT_PREDICTIONS.labels("no_model").inc()
+            return None
+
+        started = time.perf_counter()
+        predictions = classifier.predict(message)
+        LOCAL_INTENT_SECONDS.observe(time.perf_counter() - started)
+
+        threshold = settings.LOCAL_INTENT_MIN_CONFIDENCE
+        intent, confidence = predictions["intent"]
+        # A missed "urgent" costs more than an LLM call, so urgency must be
+        # sure too; a model without an urgency head can't vouch for it
+        urgency, urgency_confidence = predictions.get("urgency", (None, 0.0))
+        if confidence < threshold or urgency_confidence < threshold:
+            LOCAL_INTENT_PREDICTIONS.labels("low_confidence").inc()
+            return None
+
+        LOCAL_INTENT_PREDICTIONS.labels("used").inc()
+        sentiment, _ = predictions.get("sentiment", ("neutral", 1.0))
+        return {
+            "primary_intent": intent,
+            "urgency": urgency,
+            "sentiment": sentiment,
+            "entities": {},
+            "confidence": round(confidence, 4),
+            "source": "local",
+        }
+
+
+local_intent_service = LocalIntentService()
@@ -0,0 +1,169 @@
+"""
+Language identification service for customer messages.
+Uses a script fast path, per-customer memoization and a preloaded,
+deterministic n-gram model restricted to the supported languages.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+from functools import lru_cache
+import os
+import re
+import structlog
+from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
+from langdetect.lang_detect_exception import LangDetectException
+
+logger = structlog.get_logger(__name__)
+
+SUPPORTED_LANGUAGES = {
+    "en": "English",
+    "es": "Spanish",
+    "fr": "French",
+    "ar": "Arabic",
+}
+
+SCRIPT_LANGUAGE_PATTERNS = [
+    (re.compile(r"[\u0600-\u06FF]"), "ar"),
+]
+
+
+class LanguageIdentifier:
+    """
+    Fast, cached language identification.
+
+    Lookup order:
+    1. Script fast path (non-Latin alphabets map directly to a language)
+    2. Per-customer memo for short messages ("ok", "thanks!") that carry
+       too little signal to classify on their own
+    3. N-gram model, loaded once at startup with only the supported
+       language profiles and a fixed seed so results are reproducible
+    """
+
+    def __init__(
+        self,
+        languages: Sequence[str] = tuple(SUPPORTED_LANGUAGES),
+        min_confidence: float = 0.6,
+        min_text_length: int = 12,
+        cache_size: int = 4096,
+        customer_memo_size: int = 10000
+    ):
+        self.languages = list(languages)
+        self.min_confidence = min_confidence
+        self.min_text_length = min_text_length
+        self.customer_memo_size = customer_memo_size
+
+        self._factory = self._load_factory(self.languages)
+        self._customer_memo: "OrderedDict[str, str]" = OrderedDict()
+        self._detect_cached = lru_cache(maxsize=cache_size)(self._detect_with_model)
+
+    @staticmethod
+    def _load_factory(languages: Sequence[str]) -> DetectorFactory:
+        """Load only the profiles we support; fewer languages = smaller probability vectors."""
+        profiles = []
+        for code in languages:
+            # load_json_profile parses each profile itself and wants the raw JSON text
+            with open(os.path.join(PROFILES_DIRECTORY, code), encoding="utf-8") as f:
+                profiles.append(f.read())
+
+        factory = DetectorFactory()
+        factory.load_json_profile(profiles)
+        factory.set_seed(0)
+
+        logger.info("Language profiles loaded", languages=languages)
+        return factory
+
+    def detect(self, text: str, customer_key: Optional[str] = None) -> Optional[str]:
+        """Detect the language of a message. Returns a supported code or None."""
+        return self.detect_with_source(text, customer_key)[0]
+
+    def detect_with_source(
+        self,
+        text: str,
+        customer_key: Optional[str] = None
+    ) -> Tuple[Optional[str], str]:
+        """
+        Detect the language of a message and report which stage decided.
+
+        Returns:
+            Tuple of (language code or None, source) where source is one of
+            "script", "memo", "message" or "none"
+        """
+        normalized = (text or "").strip()
+        if not normalized:
+            return None, "none"
+
+        script_lang = self.guess_from_script(normalized)
+        if script_lang:
+            self._remember(customer_key, script_lang)
+            return script_lang, "script"
+
+        if customer_key and len(normalized) < self.min_text_length:
+            memo_lang = self._customer_memo.get(customer_key)
+            if memo_lang:
+                self._customer_memo.move_to_end(customer_key)
+                return memo_lang, "memo"
+
+        lang = self._detect_cached(normalized.lower())
+        if lang:
+            self._remember(customer_key, lang)
+            return lang, "message"
+
+        return None, "none"
+
+    def detect_batch(
+        self,
+        texts: Sequence[str],
+        customer_keys: Optional[Sequence[Optional[str]]] = None
+    ) -> List[Optional[str]]:
+        """Detect languages for many messages at once (same semantics as detect)."""
+        keys = customer_keys or [None] * len(texts)
+        return [self.detect(text, key) for text, key in zip(texts, keys)]
+
+    def guess_from_script(self, text: str) -> Optional[str]:
+        """Map non-Latin scripts straight to a language without running the model."""
+        for pattern, lang_code in SCRIPT_LANGUAGE_PATTERNS:
+            if pattern.search(text):
+                return lang_code
+        return None
+
+    def remember(self, customer_key: Optional[str], language: Optional[str]):
+        """Record a customer's language (e.g. after an explicit request)."""
+        if language in self.languages:
+            self._remember(customer_key, language)
+
+    def _remember(self, customer_key: Optional[str], language: str):
+        if not customer_key:
+            return
+        self._customer_memo[customer_key] = language
+        self._customer_memo.move_to_end(customer_key)
+        if len(self._customer_memo) > self.customer_memo_size:
+            self._customer_memo.popitem(last=False)
+
+    def _detect_with_model(self, text: str) -> Optional[str]:
+        try:
+            detector = self._factory.create()
+            detector.append(text)
+            candidates = detector.get_probabilities()
+        except LangDetectException:
+            return None
+        except Exception:
+            logger.debug("Language model failed", text_preview=text[:30])
+            return None
+
+        if candidates and candidates[0].prob >= self.min_confidence:
+            return candidates[0].lang
+        return None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Cache statistics for monitoring."""
+        info = self._detect_cached.cache_info()
+        return {
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "cache_size": info.currsize,
+            "customers_memoized": len(self._customer_memo),
+        }
+
+
+# Global language identifier (profiles are loaded once at import time)
+language_identifier = LanguageIdentifier()
@@ -0,0 +1,399 @@
+"""
+Pluggable LLM backends behind GeminiClient.
+The live backend talks to the Gemini API; the recording backend wraps it and
+appends every call to a JSON-lines file; the replay and stub backends answer
+offline with configurable latency and injected rate limits, so throughput
+and key rotation can be exercised reproducibly.
+"""
+
+from typing import Any, Dict, List, Optional
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+import asyncio
+import contextvars
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+# SDK calls block for the whole request; they run on this pool so the event
+# loop keeps serving webhooks, timers and other conversations meanwhile
+_call_executor = ThreadPoolExecutor(
+    max_workers=settings.LLM_CALL_THREADS,
+    thread_name_prefix="llm-call"
+)
+
+
+class LLMBackend:
+    """
+    Interface used by GeminiClient.
+
+    `configure()` selects the API key for subsequent calls and `model()`
+    returns an object with a blocking `generate_content(prompt)` shaped like
+    `google.generativeai.GenerativeModel`. Callers on the event loop go
+    through `generate_async()`, never the blocking method directly.
+    """
+
+    name = "base"
+
+    def configure(self, api_key: str, key_index: int = 0):
+        raise NotImplementedError
+
+    def model(self, model_name: str, generation_config: Dict[str, Any]):
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Live Google Gemini API."""
+
+    name = "gemini"
+
+    def __init__(self):
+        import google.generativeai as genai
+        self._genai = genai
+
+    def configure(self, api_key: str, key_index: int = 0):
+        self._genai.configure(api_key=api_key)
+
+    def model(self, model_name: str, generation_config: Dict[str, Any]):
+        return self._genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=generation_config
+        )
+
+
+async def generate_async(model, prompt: str):
+    """Run a model's blocking generate_content in the call pool and await it."""
+    loop = asyncio.get_running_loop()
+    # Copy the context so the active trace span is visible in the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _call_executor,
+        partial(context.run, model.generate_content, prompt)
+    )
+
+
+# ============================================================================
+# Response shapes
+# ============================================================================
+
+class _Obj:
+    """Attribute bag mirroring the google.generativeai response objects."""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def build_response(
+    text: str,
+    function_calls: Optional[List[Dict[str, Any]]] = None,
+    usage: Optional[Dict[str, int]] = None
+):
+    """Response object with the attributes GeminiClient reads from a real one."""
+    parts = [_Obj(text=text)] if text else []
+    for call in function_calls or []:
+        parts.append(_Obj(
+            text="",
+            function_call=_Obj(name=call.get("name"), args=call.get("args") or {})
+        ))
+
+    usage = usage or {}
+    return _Obj(
+        text=text,
+        candidates=[_Obj(content=_Obj(parts=parts))],
+        usage_metadata=_Obj(
+            prompt_token_count=usage.get("prompt_tokens", 0),
+            candidates_token_count=usage.get("completion_tokens", 0),
+            total_token_count=usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0),
+        )
+    )
+
+
+def summarize_response(response) -> Dict[str, Any]:
+    """Plain-data view of a (real or replayed) response for recording."""
+    text = ""
+    function_calls = []
+    candidates = getattr(response, "candidates", None) or []
+    if candidates:
+        for part in getattr(candidates[0].content, "parts", []) or []:
+            if getattr(part, "text", None) and not text:
+                text = part.text
+            func_call = getattr(part, "function_call", None)
+            if func_call and getattr(func_call, "name", None):
+                try:
+                    args = dict(func_call.args) if func_call.args else {}
+                except (TypeError, ValueError):
+                    args = {}
+                function_calls.append({"name": func_call.name, "args": args})
+    if not text:
+        try:
+            text = response.text or ""
+        except (AttributeError, ValueError):
+            text = ""
+
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "text": text,
+        "function_calls": function_calls,
+        "usage": {
+            "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "completion_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+        },
+    }
+
+
+def prompt_key(model_name: str, prompt: str) -> str:
+    """Stable lookup key of a call in a recording."""
+    return hashlib.sha256(f"{model_name}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+# ============================================================================
+# Record
+# ============================================================================
+
+class _RecordingModel:
+    def __init__(self, backend: "RecordingBackend", inner, model_name: str, generation_config: Dict[str, Any]):
+        self._backend = backend
+        self._inner = inner
+        self._model_name = model_name
+        self._generation_config = generation_config
+        # Calls run in worker threads while other requests rotate keys
+        self._key_index = backend.key_index
+
+    def generate_content(self, prompt: str):
+        entry = {
+            "key": prompt_key(self._model_name, prompt),
+            "model": self._model_name,
+            "generation_config": self._generation_config,
+            "key_index": self._key_index,
+            "prompt": prompt,
+            "recorded_at": time.time(),
+        }
+        started = time.perf_counter()
+        try:
+            response = self._inner.generate_content(prompt)
+        except Exception as e:
+            entry["latency"] = time.perf_counter() - started
+            entry["error"] = str(e)
+            self._backend.write(entry)
+            raise
+        entry["latency"] = time.perf_counter() - started
+        entry.update(summarize_response(response))
+        self._backend.write(entry)
+        return response
+
+
+class RecordingBackend(LLMBackend):
+    """Live backend that appends every call (including failures) to a JSON-lines file."""
+
+    name = "record"
+
+    def __init__(self, inner: LLMBackend, path: str):
+        self.inner = inner
+        self.path = path
+        self.key_index = 0
+        self._lock = threading.Lock()
+
+    def configure(self, api_key: str, key_index: int = 0):
+        self.key_index = key_index
+        self.inner.configure(api_key, key_index)
+
+    def model(self, model_name: str, generation_config: Dict[str, Any]):
+        return _RecordingModel(self, self.inner.model(model_name, generation_config), model_name, generation_config)
+
+    def write(self, entry: Dict[str, Any]):
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as recording:
+                recording.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            logger.warning("Failed to record LLM call", path=self.path, error=str(e))
+
+
+# ============================================================================
+# Replay / stub
+# ============================================================================
+
+class ReplayRateLimitError(Exception):
+    """Injected rate limit, worded like the API's so the client rotates keys."""
+
+    def __init__(self, key_index: int):
+        super().__init__(f"429 Resource has been exhausted (e.g. check quota). key_index={key_index}")
+
+
+def parse_latency(spec: str):
+    """
+    Latency sampler from a spec string.
+
+    `recorded` replays the captured latency; `fixed:0.8`, `uniform:0.2,1.5`
+    and `lognormal:<median>,<sigma>` draw from the given distribution.
+    Returns None for `recorded`.
+    """
+    kind, _, args = (spec or "recorded").partition(":")
+    kind = kind.strip().lower()
+    values = [float(value) for value in args.split(",") if value.strip()]
+
+    if kind == "recorded":
+        return None
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Invalid LLM_REPLAY_LATENCY: {spec}")
+
+
+class _ReplayModel:
+    def __init__(self, backend: "ReplayBackend", model_name: str):
+        self._backend = backend
+        self._model_name = model_name
+        # Calls run in worker threads while other requests rotate keys
+        self._key_index = backend.key_index
+
+    def generate_content(self, prompt: str):
+        return self._backend.answer(self._model_name, prompt, self._key_index)
+
+
+class ReplayBackend(LLMBackend):
+    """
+    Offline backend answering from a recording.
+
+    Calls are matched on model + prompt; repeated prompts cycle through
+    their recorded answers and unknown prompts get a canned reply. With no
+    recording it acts as a pure stub. The call blocks its thread for the
+    sampled latency like the real client does, and 429s are injected randomly
+    (`rate_limit_ratio`) and per key once `key_rpm` calls were made in the
+    last minute.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        latency: str = "recorded",
+        rate_limit_ratio: float = 0.0,
+        key_rpm: int = 0,
+        seed: Optional[int] = None
+    ):
+        self.latency = parse_latency(latency)
+        self.rate_limit_ratio = rate_limit_ratio
+        self.key_rpm = key_rpm
+        self.key_index = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls_by_key: Dict[int, deque] = defaultdict(deque)
+        self._recordings: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self.stats = {"calls": 0, "hits": 0, "misses": 0, "rate_limited": 0}
+
+        if path:
+            self.load(path)
+
+    def load(self, path: str):
+        loaded = 0
+        with open(path, encoding="utf-8") as recording:
+            for line in recording:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry.get("error"):
+                    continue
+                self._recordings[entry["key"]].append(entry)
+                loaded += 1
+        logger.info("LLM recording loaded", path=path, calls=loaded, prompts=len(self._recordings))
+
+    def configure(self, api_key: str, key_index: int = 0):
+        self.key_index = key_index
+
+    def model(self, model_name: str, generation_config: Dict[str, Any]):
+        return _ReplayModel(self, model_name)
+
+    def _rate_limited(self, key_index: int) -> bool:
+        if self.rate_limit_ratio and self._rng.random() < self.rate_limit_ratio:
+            return True
+        if self.key_rpm <= 0:
+            return False
+
+        now = time.monotonic()
+        calls = self._calls_by_key[key_index]
+        while calls and now - calls[0] >= 60:
+            calls.popleft()
+        if len(calls) >= self.key_rpm:
+            return True
+        calls.append(now)
+        return False
+
+    def answer(self, model_name: str, prompt: str, key_index: Optional[int] = None):
+        key = prompt_key(model_name, prompt)
+        if key_index is None:
+            key_index = self.key_index
+
+        with self._lock:
+            self.stats["calls"] += 1
+            if self._rate_limited(key_index):
+                self.stats["rate_limited"] += 1
+                raise ReplayRateLimitError(key_index)
+
+            entries = self._recordings.get(key)
+            if entries:
+                self.stats["hits"] += 1
+                entry = entries[self._cursor[key] % len(entries)]
+                self._cursor[key] += 1
+            else:
+                self.stats["misses"] += 1
+                entry = {
+                    "text": "Thanks for your message! How can I help you further?",
+                    "function_calls": [],
+                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 12},
+                    "latency": 0.0,
+                }
+
+            delay = self.latency(self._rng) if self.latency else entry.get("latency", 0.0)
+
+        if delay > 0:
+            time.sleep(delay)
+        return build_response(entry.get("text", ""), entry.get("function_calls"), entry.get("usage"))
+
+
+def create_backend(kind: Optional[str] = None) -> LLMBackend:
+    """Backend selected by LLM_BACKEND."""
+    kind = (kind or settings.LLM_BACKEND).lower()
+
+    if kind == "gemini":
+        return GeminiBackend()
+    if kind == "record":
+        return RecordingBackend(GeminiBackend(), settings.LLM_RECORDING_PATH)
+    if kind in ("replay", "stub"):
+        return ReplayBackend(
+            path=settings.LLM_RECORDING_PATH if kind == "replay" else None,
+            latency=settings.LLM_REPLAY_LATENCY,
+            rate_limit_ratio=settings.LLM_REPLAY_RATE_LIMIT_RATIO,
+            key_rpm=settings.LLM_REPLAY_KEY_RPM,
+            seed=settings.LLM_REPLAY_SEED,
+        )
+    raise ValueError(f"Unknown LLM_BACKEND: {kind}")
+
+
+@lru_cache(maxsize=None)
+def _shared_backend(kind: str) -> LLMBackend:
+    return create_backend(kind)
+
+
+def get_backend(kind: Optional[str] = None) -> LLMBackend:
+    """
+    Process-wide backend selected by LLM_BACKEND, shared by every GeminiClient.
+
+    One instance per process keeps a replay recording loaded once, replay
+    rate limits counted across clients and recorded lines from interleaving.
+    """
+    return _shared_backend((kind or settings.LLM_BACKEND).lower())
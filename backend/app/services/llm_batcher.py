@@ -0,0 +1,269 @@
+"""
+Micro-batching for small LLM classification prompts.
+Concurrent requests of one project that share a task and instructions are
+gathered for a few milliseconds and sent to Gemini as one prompt; the
+per-item answers are fanned back to the callers. All GeminiClients of a
+process share `prompt_batcher`, so requests served by different clients
+still coalesce. Under load this turns N tiny calls into
+one, cutting request count and rate-limit pressure.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+import asyncio
+import hashlib
+import json
+import re
+import structlog
+
+from app.core.config import settings
+from app.core.metrics import LLM_BATCH_SIZE
+from app.services.model_routing import model_router
+
+logger = structlog.get_logger(__name__)
+
+SINGLE_PROMPT = """{instructions}
+
+Input:
+{item}"""
+
+BATCH_PROMPT = """{instructions}
+
+Apply the instructions above to each of the {count} inputs below, independently of each other.
+Respond with only a JSON object whose keys are the input numbers ("1" to "{count}") and whose
+values are the answers, each exactly as the instructions ask for one input.
+
+{items}"""
+
+
+def _extract_json(text: str) -> str:
+    """JSON part of a reply that may be wrapped in markdown or prose."""
+    match = re.search(r'\{.*\}|\[.*\]', text or "", re.DOTALL)
+    return match.group(0) if match else (text or "")
+
+
+class _Request:
+    """One caller waiting for the answer to one input."""
+
+    def __init__(self, client, item: str, user_id: Optional[UUID]):
+        self.client = client
+        self.item = item
+        self.user_id = user_id
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class _Batch:
+    """Requests of one project with the same task and instructions gathered in one window."""
+
+    def __init__(self, task: str, instructions: str):
+        self.task = task
+        self.instructions = instructions
+        self.loop = asyncio.get_running_loop()
+        self.requests: List[_Request] = []
+        self.closed = False
+
+
+class PromptBatcher:
+    """
+    Coalesces small prompts in front of GeminiClients.
+
+    `submit()` returns the answer text for one input, as a standalone call
+    with SINGLE_PROMPT would. A batch is sent when the window closes or it
+    reaches max_items; a batch of one goes out as a plain single call.
+    Inputs of different projects never share a prompt, so one tenant's
+    messages are not sent alongside another's.
+    Answers missing from a batched reply (or a reply that doesn't parse)
+    are retried one by one, so callers never see a partial batch.
+    Usage limits and billing go through each caller's own client.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        window_ms: Optional[float] = None,
+        max_items: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.client = client
+        self.window = (settings.LLM_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_items = max(1, max_items or settings.LLM_BATCH_MAX_ITEMS)
+        self.enabled = settings.LLM_BATCH_ENABLED if enabled is None else enabled
+        self._open: Dict[Tuple[Optional[UUID], str, str], _Batch] = {}
+        self._tasks = set()  # Strong references to running flushes
+        self._batched_calls = 0
+        self._single_calls = 0
+        self._items = 0
+        self._fallbacks = 0
+
+    async def submit(
+        self,
+        task: str,
+        instructions: str,
+        item: str,
+        user_id: Optional[UUID] = None,
+        project_id: Optional[UUID] = None,
+        client=None
+    ) -> str:
+        """
+        Answer text for one input under the task's instructions.
+
+        Only inputs with the same project_id are batched together; calls
+        without one are sent on their own.
+        client is the caller's GeminiClient (default: the batcher's).
+        Raises whatever the underlying Gemini call raised.
+        """
+        request = _Request(client or self.client, item, user_id)
+        if not self.enabled or self.max_items == 1 or project_id is None:
+            return await self._single(task, instructions, request)
+
+        key = (project_id, task, hashlib.sha1(instructions.encode("utf-8")).hexdigest())
+        batch = self._open.get(key)
+        if batch is None or batch.closed or batch.loop is not asyncio.get_running_loop():
+            batch = self._open[key] = _Batch(task, instructions)
+            self._spawn(self._flush_after_window(key, batch))
+
+        batch.requests.append(request)
+        if len(batch.requests) >= self.max_items:
+            self._close(key, batch)
+            self._spawn(self._send(batch))
+        return await request.future
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _close(self, key: Tuple[Optional[UUID], str, str], batch: _Batch):
+        batch.closed = True
+        if self._open.get(key) is batch:
+            del self._open[key]
+
+    async def _flush_after_window(self, key: Tuple[Optional[UUID], str, str], batch: _Batch):
+        await asyncio.sleep(self.window)
+        if batch.closed:
+            return  # Sent early on reaching max_items
+        self._close(key, batch)
+        await self._send(batch)
+
+    async def _single(self, task: str, instructions: str, request: _Request) -> str:
+        self._single_calls += 1
+        response = await request.client.generate_response(
+            prompt=SINGLE_PROMPT.format(instructions=instructions, item=request.item),
+            use_functions=False,
+            user_id=request.user_id,
+            task=task
+        )
+        return response.get("text", "")
+
+    async def _answer_alone(self, batch: _Batch, request: _Request):
+        if request.future.done():
+            return
+        try:
+            text = await self._single(batch.task, batch.instructions, request)
+            if not request.future.done():
+                request.future.set_result(text)
+        except Exception as e:
+            if not request.future.done():
+                request.future.set_exception(e)
+
+    async def _send(self, batch: _Batch):
+        requests = batch.requests
+        self._items += len(requests)
+        LLM_BATCH_SIZE.labels(batch.task).observe(len(requests))
+        if len(requests) == 1:
+            await self._answer_alone(batch, requests[0])
+            return
+
+        # Limits are per caller; anyone over theirs gets the single-call answer
+        allowed = []
+        for request in requests:
+            if await request.client._check_usage_limit(request.user_id):
+                allowed.append(request)
+            else:
+                await self._answer_alone(batch, request)
+        if not allowed:
+            return
+
+        items = "\n\n".join(
+            f"Input {number}:\n{request.item}" for number, request in enumerate(allowed, 1)
+        )
+        prompt = BATCH_PROMPT.format(instructions=batch.instructions, count=len(allowed), items=items)
+        max_tokens = min(model_router.resolve(batch.task).max_tokens * len(allowed), settings.GEMINI_MAX_TOKENS)
+
+        self._batched_calls += 1
+        try:
+            # Not billed to anyone, so any caller's client can send it
+            response = await allowed[0].client.generate_response(
+                prompt=prompt,
+                use_functions=False,
+                max_tokens=max_tokens,
+                task=batch.task
+            )
+        except Exception as e:
+            for request in allowed:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        answers = self._parse_answers(response.get("text", ""))
+        await self._track_usage(batch, allowed, response)
+
+        missing = []
+        for number, request in enumerate(allowed, 1):
+            answer = answers.get(str(number))
+            if answer is None:
+                missing.append(request)
+            elif not request.future.done():
+                request.future.set_result(answer if isinstance(answer, str) else json.dumps(answer))
+
+        if missing:
+            self._fallbacks += len(missing)
+            logger.warning(
+                "Batched reply missed answers, retrying singly",
+                task=batch.task,
+                batch_size=len(allowed),
+                missing=len(missing)
+            )
+            await asyncio.gather(*(self._answer_alone(batch, request) for request in missing))
+
+    @staticmethod
+    def _parse_answers(text: str) -> Dict[str, Any]:
+        try:
+            answers = json.loads(_extract_json(text))
+        except ValueError:
+            return {}
+        if isinstance(answers, list):
+            return {str(number): answer for number, answer in enumerate(answers, 1)}
+        return answers if isinstance(answers, dict) else {}
+
+    async def _track_usage(self, batch: _Batch, requests: List[_Request], response: Dict[str, Any]):
+        """Bill each caller an equal share of the batched call."""
+        users = [request for request in requests if request.user_id]
+        if not users:
+            return
+        share = len(requests)
+        tokens_input = -(-(response.get("prompt_tokens") or 0) // share)
+        tokens_output = -(-(response.get("completion_tokens") or 0) // share)
+        for request in users:
+            await request.client._track_usage(
+                user_id=request.user_id,
+                prompt=request.item,
+                response="",
+                model=response.get("model", settings.LLM_DEFAULT_MODEL),
+                tokens_input=tokens_input,
+                tokens_output=tokens_output
+            )
+
+    def get_stats(self) -> Dict[str, int]:
+        """Batching statistics for monitoring."""
+        return {
+            "open_batches": len(self._open),
+            "batched_calls": self._batched_calls,
+            "single_calls": self._single_calls,
+            "items": self._items,
+            "fallbacks": self._fallbacks,
+        }
+
+
+# Global batcher instance
+prompt_batcher = PromptBatcher()
@@ -0,0 +1,134 @@
+"""
+Per-task model routing for LLM calls.
+Every GeminiClient call names its task; the policy table below maps the
+task to a model, output-token cap and temperature. Deployments override
+single entries with LLM_TASK_ROUTES without touching code.
+"""
+
+from typing import Any, Dict, Optional
+import json
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+# Tiers, cheapest first. "light" calls return a label or a small JSON
+# object, "reply" calls a chat-sized message, "long" calls reports and
+# multi-part content.
+TIER_DEFAULTS = {
+    "light": {"max_tokens": 256, "temperature": 0.1},
+    "reply": {"max_tokens": 1024, "temperature": 0.7},
+    "long": {"max_tokens": 2048, "temperature": 0.7},
+}
+
+# task -> tier plus any field that differs from the tier default
+TASK_POLICY: Dict[str, Dict[str, Any]] = {
+    # Classification and extraction (JSON out)
+    "intent": {"tier": "light"},
+    "sentiment": {"tier": "light", "max_tokens": 384},
+    "message_analysis": {"tier": "light", "max_tokens": 384},
+    "order_extraction": {"tier": "light", "max_tokens": 512},
+    "order_progress": {"tier": "light"},
+    "post_analysis": {"tier": "light", "max_tokens": 512},
+    # Short generated messages
+    "chat_reply": {"tier": "reply"},
+    "sales_reply": {"tier": "reply"},
+    "comment_reply": {"tier": "reply", "max_tokens": 300, "temperature": 0.8},
+    "order_message": {"tier": "reply", "max_tokens": 400},
+    "message_summary": {"tier": "light", "max_tokens": 64, "temperature": 0.3},
+    "conversation_summary": {"tier": "reply", "max_tokens": 400, "temperature": 0.2},
+    "recommendation": {"tier": "reply", "temperature": 0.6},
+    # Long form
+    "assistant": {"tier": "long"},
+    "report_insights": {"tier": "long", "temperature": 0.3},
+    "content": {"tier": "long", "temperature": 0.8},
+}
+
+
+class ModelRoute:
+    """Model and generation parameters resolved for one task."""
+
+    def __init__(self, task: str, model: str, max_tokens: int, temperature: float, tier: str):
+        self.task = task
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.tier = tier
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "task": self.task,
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "tier": self.tier,
+        }
+
+
+def _tier_model(tier: str) -> str:
+    return settings.LLM_LIGHT_MODEL if tier == "light" else settings.LLM_DEFAULT_MODEL
+
+
+def _overrides() -> Dict[str, Dict[str, Any]]:
+    """LLM_TASK_ROUTES parsed; a malformed value is logged and ignored."""
+    raw = settings.LLM_TASK_ROUTES
+    if not raw:
+        return {}
+    if isinstance(raw, dict):
+        return raw
+    try:
+        parsed = json.loads(raw)
+    except ValueError as e:
+        logger.warning("Invalid LLM_TASK_ROUTES, using built-in routes", error=str(e))
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+class ModelRouter:
+    """Resolves tasks to routes; results are cached per task."""
+
+    def __init__(self, policy: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.policy = TASK_POLICY if policy is None else policy
+        self._routes: Dict[str, ModelRoute] = {}
+
+    def resolve(self, task: str) -> ModelRoute:
+        route = self._routes.get(task)
+        if route is None:
+            route = self._build(task)
+            self._routes[task] = route
+        return route
+
+    def _build(self, task: str) -> ModelRoute:
+        overrides = _overrides()
+        entry = {**self.policy.get(task, {}), **overrides.get(task, {})}
+        tier = entry.get("tier")
+        if tier not in TIER_DEFAULTS:
+            # Unknown tasks keep the global generation defaults
+            return ModelRoute(
+                task=task,
+                model=entry.get("model", settings.LLM_DEFAULT_MODEL),
+                max_tokens=int(entry.get("max_tokens", settings.GEMINI_MAX_TOKENS)),
+                temperature=float(entry.get("temperature", settings.GEMINI_TEMPERATURE)),
+                tier="default",
+            )
+        defaults = TIER_DEFAULTS[tier]
+        return ModelRoute(
+            task=task,
+            model=entry.get("model", _tier_model(tier)),
+            max_tokens=int(entry.get("max_tokens", defaults["max_tokens"])),
+            temperature=float(entry.get("temperature", defaults["temperature"])),
+            tier=tier,
+        )
+
+    def reset(self) -> None:
+        """Forget cached routes (after settings change)."""
+        self._routes.clear()
+
+    def table(self) -> Dict[str, Dict[str, Any]]:
+        """Effective route of every known task."""
+        tasks = set(self.policy) | set(_overrides())
+        return {task: self.resolve(task).to_dict() for task in sorted(tasks)}
+
+
+model_router = ModelRouter()
@@ -0,0 +1,167 @@
+"""
+Normalized order line items and the product analytics built on them.
+order_items is derived from Order.items; refresh it in the same transaction
+as any write that changes an order's items.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+from datetime import datetime
+from uuid import UUID
+from sqlalchemy import and_, delete, func, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import OrderItem
+
+
+def _number(key: str) -> str:
+    """SQL numeric for item[key], NULL unless it is a number or numeric string."""
+    value = f"item.value ->> '{key}'"
+    return (
+        f"CASE WHEN jsonb_typeof(item.value -> '{key}') = 'number' "
+        f"OR {value} ~ '^-?[0-9]+(\\.[0-9]+)?$' THEN ({value})::numeric END"
+    )
+
+
+# Accepts both Shopify-shaped items (name/price) and the ones the bot
+# creates (product_name, plus unit_price from manual entries)
+_INSERT_ORDER_ITEMS = text(f"""
+    INSERT INTO order_items (
+        id, order_id, project_id, position, product_id, sku, name,
+        quantity, unit_price, order_date
+    )
+    SELECT
+        gen_random_uuid(),
+        o.id,
+        o.project_id,
+        item.position - 1,
+        left(item.value ->> 'product_id', 255),
+        left(item.value ->> 'sku', 100),
+        left(coalesce(item.value ->> 'name', item.value ->> 'product_name', item.value ->> 'title'), 500),
+        coalesce({_number('quantity')}, 1)::integer,
+        coalesce({_number('price')}, {_number('unit_price')}, 0)::double precision,
+        coalesce(o.order_date, o.created_at)
+    FROM orders o
+    CROSS JOIN LATERAL jsonb_array_elements(
+        CASE WHEN jsonb_typeof(o.items) = 'array' THEN o.items ELSE '[]'::jsonb END
+    ) WITH ORDINALITY AS item(value, position)
+    WHERE o.id = ANY(:order_ids)
+      AND jsonb_typeof(item.value) = 'object'
+""")
+
+
+async def refresh_order_items(db: AsyncSession, order_ids: Sequence[UUID]) -> None:
+    """
+    Rebuild the order_items rows of the given orders from their items JSONB.
+
+    Runs as two set-based statements regardless of how many orders or
+    lines are involved. Orders must already be flushed; the caller commits.
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return
+    await db.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+    await db.execute(_INSERT_ORDER_ITEMS, {"order_ids": order_ids})
+
+
+def _product_key():
+    """Groups lines of the same product even when only some carry an ID."""
+    return func.coalesce(OrderItem.product_id, OrderItem.sku, OrderItem.name)
+
+
+async def top_products(
+    db: AsyncSession,
+    project_id: UUID,
+    start_date: datetime,
+    limit: int = 10,
+    order_by: str = "quantity"
+) -> List[Dict[str, Any]]:
+    """
+    Best selling products since start_date.
+
+    Args:
+        order_by: "quantity" (units sold) or "revenue"
+    """
+    product_key = _product_key()
+    quantity = func.sum(OrderItem.quantity)
+    revenue = func.sum(OrderItem.quantity * OrderItem.unit_price)
+
+    result = await db.execute(
+        select(
+            func.max(OrderItem.name).label("name"),
+            func.max(OrderItem.sku).label("sku"),
+            func.max(OrderItem.product_id).label("product_id"),
+            quantity.label("quantity_sold"),
+            revenue.label("revenue"),
+            func.count(func.distinct(OrderItem.order_id)).label("orders"),
+        )
+        .where(OrderItem.project_id == project_id)
+        .where(OrderItem.order_date >= start_date)
+        .group_by(product_key)
+        .order_by((revenue if order_by == "revenue" else quantity).desc())
+        .limit(limit)
+    )
+
+    return [
+        {
+            "name": row.name or "Unknown",
+            "sku": row.sku,
+            "product_id": row.product_id,
+            "quantity_sold": int(row.quantity_sold or 0),
+            "revenue": round(float(row.revenue or 0), 2),
+            "orders": row.orders,
+        }
+        for row in result
+    ]
+
+
+async def co_purchased_products(
+    db: AsyncSession,
+    project_id: UUID,
+    start_date: datetime,
+    limit: int = 10,
+    product: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Product pairs most often bought in the same order since start_date.
+
+    Args:
+        product: Only pairs containing this product ID, SKU or name
+    """
+    first = OrderItem.__table__.alias("first_item")
+    second = OrderItem.__table__.alias("second_item")
+    first_key = func.coalesce(first.c.product_id, first.c.sku, first.c.name)
+    second_key = func.coalesce(second.c.product_id, second.c.sku, second.c.name)
+
+    query = (
+        select(
+            func.max(first.c.name).label("product"),
+            func.max(second.c.name).label("bought_with"),
+            func.count(func.distinct(first.c.order_id)).label("orders"),
+        )
+        .select_from(first)
+        .join(second, and_(second.c.order_id == first.c.order_id, second_key != first_key))
+        .where(first.c.project_id == project_id)
+        .where(first.c.order_date >= start_date)
+        .group_by(first_key, second_key)
+        .order_by(func.count(func.distinct(first.c.order_id)).desc())
+        .limit(limit)
+    )
+    if product:
+        query = query.where(or_(
+            first.c.product_id == product,
+            first.c.sku == product,
+            first.c.name.ilike(product),
+        ))
+    else:
+        # Count each unordered pair once
+        query = query.where(first_key < second_key)
+
+    result = await db.execute(query)
+    return [
+        {
+            "product": row.product or "Unknown",
+            "bought_with": row.bought_with or "Unknown",
+            "orders": row.orders,
+        }
+        for row in result
+    ]
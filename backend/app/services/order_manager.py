@@ -4,17 +4,29 @@ Handles order synchronization, status updates, and automated notifications.
 """
 
 from typing import Dict, Any, List, Optional
-from datetime import datetime
-from uuid import UUID
+from datetime import datetime, timedelta, timezone
+from uuid import UUID, uuid4
 import structlog
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, or_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.db.models import Order, OrderStatus, Message, MessageDirection, Integration
 from app.services.gemini_client import gemini_client
+from app.services.integrations.shopify import ShopifyService
+from app.services.order_items import refresh_order_items
 
 logger = structlog.get_logger(__name__)
 
+ORDER_UPSERT_BATCH_SIZE = 500
+
+# Columns refreshed from Shopify when an order already exists
+SHOPIFY_UPSERT_COLUMNS = (
+    "status", "customer", "items", "total", "currency", "tags",
+    "extra_data", "order_date", "fulfilled_date", "last_updated",
+)
+
 
 class OrderManager:
     """Manages automatic order tracking and updates."""
@@ -23,6 +35,64 @@ class OrderManager:
         self.db = db
         self.project_id = project_id
     
+    async def upsert_shopify_orders(
+        self,
+        shopify_orders: List[Dict[str, Any]],
+        integration_id: Optional[UUID] = None
+    ) -> int:
+        """
+        Insert or update Shopify orders in batched ON CONFLICT statements.
+        
+        Rows are keyed on (project_id, provider, external_id). An order is
+        only overwritten by data with an equal or newer Shopify updated_at,
+        so late or replayed payloads cannot roll it back. order_items is
+        rebuilt for every written order. The caller commits.
+        
+        Args:
+            shopify_orders: Orders from the Shopify API or webhooks
+            integration_id: Integration the orders came from
+            
+        Returns:
+            Number of orders inserted or updated
+        """
+        # One row per order: the same statement may not touch a row twice
+        latest: Dict[str, Dict[str, Any]] = {}
+        for shopify_order in shopify_orders:
+            values = ShopifyService.transform_order(shopify_order)
+            if integration_id:
+                values["extra_data"]["integration_id"] = str(integration_id)
+            current = latest.get(values["external_id"])
+            if current is None or (
+                values["last_updated"]
+                and (current["last_updated"] is None or values["last_updated"] >= current["last_updated"])
+            ):
+                latest[values["external_id"]] = values
+        
+        rows = [
+            {"id": uuid4(), "project_id": self.project_id, **values}
+            for values in latest.values()
+        ]
+        
+        affected = 0
+        for start in range(0, len(rows), ORDER_UPSERT_BATCH_SIZE):
+            stmt = insert(Order).values(rows[start:start + ORDER_UPSERT_BATCH_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["project_id", "provider", "external_id"],
+                set_={column: stmt.excluded[column] for column in SHOPIFY_UPSERT_COLUMNS},
+                where=or_(
+                    Order.last_updated.is_(None),
+                    stmt.excluded.last_updated.is_(None),
+                    Order.last_updated <= stmt.excluded.last_updated,
+                )
+            ).returning(Order.id)
+            result = await self.db.execute(stmt)
+            order_ids = result.scalars().all()
+            # Only orders that were actually written get their lines rebuilt
+            await refresh_order_items(self.db, order_ids)
+            affected += len(order_ids)
+        
+        return affected
+    
     async def sync_order_from_shopify(
         self,
         shopify_order: Dict[str, Any],
@@ -40,68 +110,19 @@ class OrderManager:
         """
         logger.info("Syncing Shopify order", order_id=shopify_order.get('id'))
         
-        external_id = str(shopify_order['id'])
+        await self.upsert_shopify_orders([shopify_order], integration_id)
+        await self.db.commit()
         
-        # Check if order already exists
         result = await self.db.execute(
             select(Order).where(
                 and_(
                     Order.project_id == self.project_id,
-                    Order.external_id == external_id,
-                    Order.provider == 'shopify'
+                    Order.provider == 'shopify',
+                    Order.external_id == str(shopify_order['id'])
                 )
-            )
+            ).execution_options(populate_existing=True)
         )
-        existing_order = result.scalar_one_or_none()
-        
-        # Parse order data
-        customer = shopify_order.get('customer', {})
-        line_items = shopify_order.get('line_items', [])
-        
-        order_data = {
-            "project_id": self.project_id,
-            "integration_id": integration_id,
-            "external_id": external_id,
-            "provider": "shopify",
-            "customer_name": customer.get('first_name', '') + ' ' + customer.get('last_name', ''),
-            "customer_email": customer.get('email'),
-            "customer_phone": customer.get('phone'),
-            "total": float(shopify_order.get('total_price', 0)),
-            "currency": shopify_order.get('currency', 'USD'),
-            "status": self._map_shopify_status(shopify_order.get('financial_status', 'pending')),
-            "line_items": line_items,
-            "shipping_address": shopify_order.get('shipping_address', {}),
-            "billing_address": shopify_order.get('billing_address', {}),
-            "order_date": datetime.fromisoformat(shopify_order['created_at'].replace('Z', '+00:00')),
-            "extra_data": {
-                "shopify_order_number": shopify_order.get('order_number'),
-                "fulfillment_status": shopify_order.get('fulfillment_status'),
-                "tags": shopify_order.get('tags', '').split(',') if shopify_order.get('tags') else []
-            }
-        }
-        
-        if existing_order:
-            # Update existing order
-            for key, value in order_data.items():
-                if key not in ['id', 'created_at', 'project_id']:
-                    setattr(existing_order, key, value)
-            existing_order.updated_at = datetime.utcnow()
-            await self.db.commit()
-            await self.db.refresh(existing_order)
-            logger.info("Order updated", order_id=str(existing_order.id))
-            return existing_order
-        else:
-            # Create new order
-            order = Order(**order_data)
-            self.db.add(order)
-            await self.db.commit()
-            await self.db.refresh(order)
-            logger.info("New order created", order_id=str(order.id))
-            
-            # Send notification to customer
-            await self._send_order_confirmation(order)
-            
-            return order
+        return result.scalar_one()
     
     async def update_order_status(
         self,
@@ -212,7 +233,7 @@ class OrderManager:
             "order_details": {
                 "total": order.total,
                 "currency": order.currency,
-                "items_count": len(order.line_items),
+                "items_count": len(order.items or []),
                 "order_date": order.order_date.isoformat()
             },
             "status_history": order.extra_data.get('status_history', []) if order.extra_data else [],
@@ -252,7 +273,7 @@ class OrderManager:
                 "customer": order.customer_name,
                 "total": order.total,
                 "currency": order.currency,
-                "items": len(order.line_items)
+                "items": len(order.items or [])
             }
         }
         
@@ -270,7 +291,8 @@ class OrderManager:
         response = await gemini_client.generate_response(
             prompt=prompt,
             context=context,
-            use_functions=True
+            use_functions=True,
+            task="order_message"
         )
         
         # Execute function calls if any
@@ -295,7 +317,7 @@ class OrderManager:
 Customer: {order.customer_name}
 Order ID: {order.external_id}
 Total: {order.currency} {order.total}
-Items: {len(order.line_items)} items
+Items: {len(order.items or [])} items
 
 Keep it professional, warm, and include:
 1. Thank you message
@@ -307,7 +329,7 @@ Keep it professional, warm, and include:
             response = await gemini_client.generate_response(
                 prompt=prompt,
                 use_functions=False,
-                temperature=0.7
+                task="order_message"
             )
             
             message_content = response.get('text', f"Thank you for your order #{order.external_id}! We're processing it now.")
@@ -359,7 +381,7 @@ Make it warm and helpful. Include tracking info if shipped."""
             response = await gemini_client.generate_response(
                 prompt=prompt,
                 use_functions=False,
-                temperature=0.7
+                task="order_message"
             )
             
             message_content = response.get('text', base_message)
@@ -465,13 +487,19 @@ async def sync_all_shopify_orders(
     shopify_client
 ) -> Dict[str, Any]:
     """
-    Sync all orders from Shopify for a project.
+    Incrementally sync orders from Shopify for a project.
+    
+    The first run backfills every order in id order and stores the last id
+    in `Integration.sync_since_id` after each page, so an interrupted
+    backfill resumes where it stopped. Later runs fetch only orders updated
+    since `Integration.sync_updated_at_min`, in parallel time slices. Every
+    page is upserted and committed as one batch.
     
     Args:
         db: Database session
         project_id: Project ID
         integration_id: Shopify integration ID
-        shopify_client: Shopify client instance
+        shopify_client: ShopifyService instance
         
     Returns:
         Sync results summary
@@ -479,32 +507,62 @@ async def sync_all_shopify_orders(
     logger.info("Starting Shopify order sync", project_id=str(project_id))
     
     manager = OrderManager(db, project_id)
+    integration = await db.get(Integration, integration_id)
+    if integration is None:
+        return {"success": False, "error": "Integration not found"}
+    
+    started_at = datetime.now(timezone.utc)
+    synced_count = 0
+    pages = 0
     
     try:
-        # Fetch orders from Shopify
-        shopify_orders = await shopify_client.get_orders(limit=50)  # Adjust limit as needed
-        
-        synced_orders = []
-        errors = []
-        
-        for shopify_order in shopify_orders:
-            try:
-                order = await manager.sync_order_from_shopify(shopify_order, integration_id)
-                synced_orders.append(str(order.id))
-            except Exception as e:
-                logger.error("Failed to sync order", order_id=shopify_order.get('id'), error=str(e))
-                errors.append({"order_id": shopify_order.get('id'), "error": str(e)})
-        
+        if integration.sync_updated_at_min is None:
+            mode = "backfill"
+            async for page in shopify_client.iter_orders(since_id=integration.sync_since_id):
+                synced_count += await manager.upsert_shopify_orders(page, integration_id)
+                integration.sync_since_id = str(max(int(order["id"]) for order in page))
+                await db.commit()
+                pages += 1
+        else:
+            mode = "incremental"
+            window_start = integration.sync_updated_at_min - timedelta(
+                seconds=settings.SHOPIFY_SYNC_OVERLAP_SECONDS
+            )
+            async for page in shopify_client.iter_orders_concurrently(window_start, started_at):
+                synced_count += await manager.upsert_shopify_orders(page, integration_id)
+                await db.commit()
+                pages += 1
+        
+        # The window is complete: the next run starts from here
+        integration.sync_updated_at_min = started_at
+        integration.last_sync = started_at
+        integration.error_message = None
+        await db.commit()
+        
+        logger.info(
+            "Shopify order sync finished",
+            project_id=str(project_id),
+            mode=mode,
+            pages=pages,
+            synced_count=synced_count,
+            duration=(datetime.now(timezone.utc) - started_at).total_seconds()
+        )
         return {
             "success": True,
-            "synced_count": len(synced_orders),
-            "orders": synced_orders,
-            "errors": errors
+            "mode": mode,
+            "pages": pages,
+            "synced_count": synced_count,
         }
     
     except Exception as e:
-        logger.error("Shopify sync failed", error=str(e))
+        logger.error("Shopify sync failed", project_id=str(project_id), error=str(e))
+        await db.rollback()
+        integration = await db.get(Integration, integration_id)
+        if integration is not None:
+            integration.error_message = f"Order sync failed: {e}"[:1000]
+            await db.commit()
         return {
             "success": False,
+            "synced_count": synced_count,
             "error": str(e)
         }
@@ -532,7 +532,7 @@ Return as JSON:
 }}"""
 
         try:
-            response = await self.gemini_client.generate_content(prompt=prompt, temperature=0.3)
+            response = await self.gemini_client.generate_content(prompt=prompt, task="order_progress")
             decision = json.loads(self._extract_json(response))
             return decision
         except:
@@ -588,7 +588,7 @@ Requirements:
 Return only the message text, no explanations."""
 
         try:
-            message = await self.gemini_client.generate_content(prompt=prompt, temperature=0.8)
+            message = await self.gemini_client.generate_content(prompt=prompt, temperature=0.8, task="order_message")
             return message
         except:
             # Fallback to template
@@ -616,7 +616,7 @@ Return only the message text, no explanations."""
         prompt += " Keep it friendly and concise (under 150 chars)."
         
         try:
-            message = await self.gemini_client.generate_content(prompt=prompt, temperature=0.7)
+            message = await self.gemini_client.generate_content(prompt=prompt, task="order_message")
             return message
         except:
             return f"Hi {customer_name}! Update about your order #{order.external_id}. We'll keep you posted! 📦"
@@ -0,0 +1,176 @@
+"""
+Maintenance of monthly partitions for time-series tables.
+Creates partitions ahead of time and retires expired months by detaching
+(and dropping) whole partitions instead of running large DELETEs.
+"""
+
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import re
+import structlog
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import MessageExternalId
+
+logger = structlog.get_logger(__name__)
+
+# Partitioned table -> retention setting
+PARTITIONED_TABLES: Dict[str, str] = {
+    "messages": "MESSAGE_RETENTION_DAYS",
+    "api_logs": "API_LOG_RETENTION_DAYS",
+    "conversation_history": "CONVERSATION_HISTORY_RETENTION_DAYS",
+}
+
+_BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def month_start(value: datetime) -> datetime:
+    """First instant of the month containing `value`."""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    """Shift a month start by `count` months."""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    """Name of the partition holding `month` (e.g. messages_p202610)."""
+    return f"{table}_p{month:%Y%m}"
+
+
+class PartitionManager:
+    """
+    Keeps monthly RANGE partitions on created_at in shape.
+
+    Tables that are not partitioned (e.g. created by `init_db()` instead of
+    the migrations) are skipped.
+    """
+
+    def __init__(self, premake_months: Optional[int] = None, retention_mode: Optional[str] = None):
+        self.premake_months = (
+            settings.PARTITION_PREMAKE_MONTHS if premake_months is None else premake_months
+        )
+        self.retention_mode = (retention_mode or settings.PARTITION_RETENTION_MODE).lower()
+
+    @staticmethod
+    async def is_partitioned(db: AsyncSession, table: str) -> bool:
+        result = await db.execute(
+            text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"),
+            {"t": table}
+        )
+        return result.scalar() is not None
+
+    @staticmethod
+    async def list_partitions(db: AsyncSession, table: str) -> List[Tuple[str, datetime, datetime]]:
+        """Range partitions of a table as (name, lower, upper); the DEFAULT partition is left out."""
+        result = await db.execute(
+            text("""
+                SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass(:t)
+            """),
+            {"t": table}
+        )
+
+        partitions = []
+        for name, bound in result.all():
+            match = _BOUND_PATTERN.search(bound or "")
+            if not match:
+                continue
+            lower, upper = (
+                datetime.fromisoformat(value).astimezone(timezone.utc).replace(tzinfo=None)
+                for value in match.groups()
+            )
+            partitions.append((name, lower, upper))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    async def ensure_partitions(self, db: AsyncSession, table: str) -> List[str]:
+        """Create partitions for the current month and the next few months."""
+        if not await self.is_partitioned(db, table):
+            return []
+
+        existing = {name for name, _, _ in await self.list_partitions(db, table)}
+        current = month_start(datetime.utcnow())
+
+        created = []
+        for offset in range(self.premake_months + 1):
+            month = add_months(current, offset)
+            name = partition_name(table, month)
+            if name in existing:
+                continue
+
+            upper = add_months(month, 1)
+            try:
+                await db.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{upper:%Y-%m-%d} 00:00:00+00')"
+                ))
+                await db.commit()
+                created.append(name)
+            except Exception as e:
+                # Fails when the DEFAULT partition already holds rows for this month
+                await db.rollback()
+                logger.error("Failed to create partition", table=table, partition=name, error=str(e))
+
+        if created:
+            logger.info("Partitions created", table=table, partitions=created)
+        return created
+
+    async def drop_expired_partitions(self, db: AsyncSession, table: str, retention_days: int) -> List[str]:
+        """Detach (and unless in detach mode, drop) partitions entirely older than the retention window."""
+        if retention_days <= 0 or not await self.is_partitioned(db, table):
+            return []
+
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+        retired = []
+        for name, lower, upper in await self.list_partitions(db, table):
+            if upper > cutoff:
+                break
+
+            await db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            if self.retention_mode != "detach":
+                await db.execute(text(f"DROP TABLE {name}"))
+            await db.commit()
+            retired.append(name)
+
+        if retired:
+            logger.info(
+                "Expired partitions retired",
+                table=table,
+                partitions=retired,
+                mode=self.retention_mode
+            )
+        return retired
+
+    @staticmethod
+    async def purge_webhook_keys(db: AsyncSession, retention_days: int) -> int:
+        """Delete webhook idempotency keys past the redelivery window."""
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        result = await db.execute(
+            delete(MessageExternalId).where(MessageExternalId.created_at < cutoff)
+        )
+        await db.commit()
+        return result.rowcount or 0
+
+    async def ensure_all(self, db: AsyncSession) -> Dict[str, List[str]]:
+        """Create upcoming partitions for every partitioned table."""
+        return {table: await self.ensure_partitions(db, table) for table in PARTITIONED_TABLES}
+
+    async def apply_retention(self, db: AsyncSession) -> Dict[str, object]:
+        """Retire expired partitions for every table and purge old webhook keys."""
+        retired = {
+            table: await self.drop_expired_partitions(db, table, getattr(settings, retention_setting))
+            for table, retention_setting in PARTITIONED_TABLES.items()
+        }
+        purged = await self.purge_webhook_keys(db, settings.WEBHOOK_KEY_RETENTION_DAYS)
+        return {"retired": retired, "webhook_keys_deleted": purged}
+
+
+# Global partition manager
+partition_manager = PartitionManager()
@@ -0,0 +1,117 @@
+"""
+Short-lived in-process cache of customer profiles.
+Lets one chat turn read the profile several times (language detection,
+context building) after a single upsert, without extra SELECTs.
+"""
+
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+from uuid import UUID
+import time
+import structlog
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import CustomerProfile
+
+logger = structlog.get_logger(__name__)
+
+# Session.info key of snapshots waiting for their transaction to commit
+_PENDING_KEY = "profile_cache_pending"
+
+
+class ProfileCache:
+    """
+    TTL + LRU cache of profile snapshots keyed by (project_id, customer_id).
+
+    Entries are transient CustomerProfile copies that are not attached to
+    any session, so they are safe to read after the originating session
+    has closed or rolled back. They are read-only: never add them to a
+    session.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_entries: int = 10000):
+        self.ttl_seconds = (
+            settings.CUSTOMER_PROFILE_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        )
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[UUID, str], Tuple[float, CustomerProfile]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, project_id: UUID, customer_id: str) -> Optional[CustomerProfile]:
+        """Return a cached profile snapshot, or None if missing/expired."""
+        key = (project_id, customer_id)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry[1]
+
+    def put(self, profile: CustomerProfile) -> CustomerProfile:
+        """Cache a snapshot of a loaded profile and return the snapshot."""
+        snapshot = self._snapshot(profile)
+        self._store(snapshot)
+        return snapshot
+
+    def put_on_commit(self, session: AsyncSession, profile: CustomerProfile) -> CustomerProfile:
+        """
+        Snapshot a profile written in a transaction the caller still owns.
+
+        The snapshot only enters the cache once the session commits; a
+        rollback discards it, so other turns never see rolled-back data.
+        The current entry is dropped right away since it is about to change.
+        """
+        snapshot = self._snapshot(profile)
+        key = (profile.project_id, profile.customer_id)
+        self.invalidate(*key)
+        session.sync_session.info.setdefault(_PENDING_KEY, {})[key] = snapshot
+        return snapshot
+
+    def _store(self, snapshot: CustomerProfile):
+        key = (snapshot.project_id, snapshot.customer_id)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, snapshot)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, project_id: UUID, customer_id: str):
+        """Drop a profile after it was changed outside the upsert path."""
+        self._entries.pop((project_id, customer_id), None)
+
+    @staticmethod
+    def _snapshot(profile: CustomerProfile) -> CustomerProfile:
+        mapper = inspect(CustomerProfile)
+        return CustomerProfile(**{
+            attr.key: getattr(profile, attr.key) for attr in mapper.column_attrs
+        })
+
+    def get_stats(self) -> Dict[str, int]:
+        """Cache statistics for monitoring."""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "size": len(self._entries),
+        }
+
+
+# Global customer profile cache
+profile_cache = ProfileCache()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_profiles(session):
+    for snapshot in session.info.pop(_PENDING_KEY, {}).values():
+        profile_cache._store(snapshot)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_profiles(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -179,7 +179,7 @@ class ReportGenerator:
                     "status": order.status.value,
                     "provider": order.provider,
                     "order_date": order.order_date.isoformat(),
-                    "items_count": len(order.line_items)
+                    "items_count": len(order.items or [])
                 }
                 for order in orders[:50]  # Limit to 50 for performance
             ]
@@ -452,7 +452,7 @@ Format as structured JSON with keys: trends, concerns, recommendations, predicti
             response = await gemini_client.generate_response(
                 prompt=prompt,
                 use_functions=False,
-                temperature=0.3
+                task="report_insights"
             )
             
             try:
@@ -7,13 +7,14 @@ from typing import List, Dict, Any, Optional
 from uuid import UUID
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, desc
+from sqlalchemy import select, and_, or_, desc
 import structlog
 import re
 import json
 
 from app.services.gemini_client import GeminiClient
 from app.services.enhanced_ai_service import EnhancedAIService
+from app.services.usage_counters import usage_counters
 from app.db.models import (
     SocialMediaPost, SocialMediaComment, BusinessContext,
     AutoResponseTemplate
@@ -376,7 +377,7 @@ Return as JSON:
 }}"""
 
         try:
-            response = await self.gemini_client.generate_content(prompt=prompt, temperature=0.3)
+            response = await self.gemini_client.generate_content(prompt=prompt, task="post_analysis")
             return json.loads(self._extract_json(response))
         except Exception as e:
             logger.error("Failed to analyze post", error=str(e))
@@ -416,7 +417,7 @@ Return as JSON:
 }}"""
 
         try:
-            response = await self.gemini_client.generate_content(prompt=prompt, temperature=0.3)
+            response = await self.gemini_client.generate_content(prompt=prompt, task="post_analysis")
             return json.loads(self._extract_json(response))
         except:
             return {}
@@ -491,10 +492,9 @@ Return as JSON:
             if matches > max_matches:
                 max_matches = matches
                 best_match = template
-                template.times_used += 1
         
         if best_match:
-            await self.db.commit()
+            usage_counters.record(AutoResponseTemplate, best_match.id)
         
         return best_match
     
@@ -525,7 +525,8 @@ Make it sound personal and friendly while keeping the main message. Return only
             try:
                 response = await self.gemini_client.generate_content(
                     prompt=prompt,
-                    temperature=0.7
+                    temperature=0.7,
+                    task="comment_reply"
                 )
             except:
                 pass  # Use template as-is if AI fails
@@ -561,7 +562,7 @@ Return only the reply text, no explanations."""
 
         response = await self.gemini_client.generate_content(
             prompt=prompt,
-            temperature=0.8
+            task="comment_reply"
         )
         
         return response
@@ -589,7 +590,7 @@ Return as JSON array:
 ]"""
 
         try:
-            response = await self.gemini_client.generate_content(prompt=prompt, temperature=0.4)
+            response = await self.gemini_client.generate_content(prompt=prompt, temperature=0.4, task="post_analysis")
             return json.loads(self._extract_json(response))
         except:
             return []
@@ -7,6 +7,7 @@ from typing import Dict, Any, Optional, List
 import structlog
 import aiohttp
 from datetime import datetime
+from app.core.metrics import track_send
 
 logger = structlog.get_logger(__name__)
 
@@ -31,6 +32,7 @@ class TikTokIntegration:
             "Content-Type": "application/json"
         }
     
+    @track_send("tiktok")
     async def send_message(
         self,
         conversation_id: str,
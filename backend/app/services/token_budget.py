@@ -0,0 +1,198 @@
+"""
+Token counting and per-call prompt budgets.
+Counts are local estimates calibrated against the prompt token counts
+Gemini reports for real calls, so budgeting and billing need no extra
+API round trips.
+"""
+
+from typing import Dict, List, Optional, Sequence
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+# Uncalibrated rates. Gemini's tokenizer splits non-Latin scripts (Arabic,
+# Cyrillic, CJK, emoji) much finer than English text.
+ASCII_CHARS_PER_TOKEN = 4.0
+OTHER_CHARS_PER_TOKEN = 2.0
+
+# Prompts shorter than this say little about the tokenizer; skip them
+MIN_CALIBRATION_TOKENS = 50
+
+
+class TokenCounter:
+    """
+    Local token estimates scaled by a calibration factor.
+
+    The factor is a moving average of actual / estimated prompt tokens
+    over real calls, so estimates converge on the real tokenizer for the
+    traffic this deployment sees. All Gemini models share one tokenizer,
+    hence a single factor.
+    """
+
+    def __init__(self, factor: Optional[float] = None, alpha: float = 0.1):
+        self.factor = settings.TOKEN_CALIBRATION_FACTOR if factor is None else factor
+        self.alpha = alpha
+        self.samples = 0
+
+    @staticmethod
+    def _raw(text: str) -> float:
+        ascii_chars = len(text.encode("ascii", "ignore"))
+        return ascii_chars / ASCII_CHARS_PER_TOKEN + (len(text) - ascii_chars) / OTHER_CHARS_PER_TOKEN
+
+    def count(self, text: Optional[str]) -> int:
+        """Estimated tokens in text."""
+        if not text:
+            return 0
+        return max(1, round(self._raw(text) * self.factor))
+
+    def calibrate(self, text: str, actual_tokens: int) -> None:
+        """Fold the token count the API reported for text into the factor."""
+        raw = self._raw(text or "")
+        if not actual_tokens or raw < MIN_CALIBRATION_TOKENS:
+            return
+        ratio = actual_tokens / raw
+        # First samples move the factor quickly, later ones smooth it
+        weight = max(self.alpha, 1.0 / (self.samples + 1))
+        self.factor += weight * (ratio - self.factor)
+        self.samples += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {"factor": round(self.factor, 4), "samples": self.samples}
+
+
+token_counter = TokenCounter()
+
+
+def truncate_to_tokens(text: str, max_tokens: int, counter: Optional[TokenCounter] = None) -> str:
+    """Cut text to about max_tokens, marking the cut with '...'."""
+    counter = counter or token_counter
+    tokens = counter.count(text)
+    if tokens <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    keep = int(len(text) * max_tokens / tokens)
+    return text[:max(0, keep - 3)] + "..."
+
+
+def estimate_cost(input_tokens: int, output_tokens: int) -> float:
+    """USD cost of a call at the configured Gemini prices."""
+    return (
+        input_tokens * settings.GEMINI_INPUT_PRICE_PER_MILLION
+        + output_tokens * settings.GEMINI_OUTPUT_PRICE_PER_MILLION
+    ) / 1_000_000
+
+
+class PromptSegment:
+    """
+    One block of a prompt: a header plus items that can be dropped one at a time.
+
+    Required segments are never trimmed. Optional ones lose items from
+    drop_from ("end" or "start") when the prompt is over budget, lowest
+    priority first; with truncate=True the last item left is shortened
+    instead of dropped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        items: Sequence[str],
+        header: str = "",
+        priority: int = 0,
+        required: bool = False,
+        drop_from: str = "end",
+        max_tokens: Optional[int] = None,
+        truncate: bool = False,
+    ):
+        self.name = name
+        self.items = list(items)
+        self.header = header
+        self.priority = priority
+        self.required = required
+        self.drop_from = drop_from
+        self.max_tokens = max_tokens
+        self.truncate = truncate
+
+    def render(self) -> str:
+        if not self.items:
+            return ""
+        return self.header + "".join(self.items)
+
+
+class PromptBudget:
+    """
+    Assembles a prompt from segments within max_tokens input tokens.
+
+    Segments render in the order they were added; trimming goes by
+    priority. After render(), tokens holds the estimated prompt size and
+    trimmed the estimated tokens cut per segment.
+    """
+
+    def __init__(self, max_tokens: int, counter: Optional[TokenCounter] = None):
+        self.max_tokens = max_tokens
+        self.counter = counter or token_counter
+        self.segments: List[PromptSegment] = []
+        self.tokens = 0
+        self.trimmed: Dict[str, int] = {}
+
+    def add(self, name: str, items: Sequence[str], **options) -> None:
+        """Append a segment (see PromptSegment for options); empty ones are skipped."""
+        if items:
+            self.segments.append(PromptSegment(name, items, **options))
+
+    def _trim(self, segment: PromptSegment, costs: List[int], excess: int) -> int:
+        """Cut about `excess` tokens from segment; returns tokens actually removed."""
+        removed = 0
+        while removed < excess and segment.items:
+            index = 0 if segment.drop_from == "start" else len(segment.items) - 1
+            if segment.truncate and len(segment.items) == 1:
+                keep = max(0, costs[index] - (excess - removed))
+                if keep > 0:
+                    segment.items[index] = truncate_to_tokens(segment.items[index], keep, self.counter)
+                    new_cost = self.counter.count(segment.items[index])
+                    removed += costs[index] - new_cost
+                    costs[index] = new_cost
+                    break
+            removed += costs.pop(index)
+            segment.items.pop(index)
+        if not segment.items:
+            removed += self.counter.count(segment.header)
+        return removed
+
+    def render(self) -> str:
+        costs = {
+            id(segment): [self.counter.count(item) for item in segment.items]
+            for segment in self.segments
+        }
+
+        def size(segment: PromptSegment) -> int:
+            if not segment.items:
+                return 0
+            return self.counter.count(segment.header) + sum(costs[id(segment)])
+
+        # Per-segment caps first, then the overall budget by priority
+        for segment in self.segments:
+            if segment.max_tokens is not None and not segment.required:
+                excess = size(segment) - segment.max_tokens
+                if excess > 0:
+                    removed = self._trim(segment, costs[id(segment)], excess)
+                    self.trimmed[segment.name] = self.trimmed.get(segment.name, 0) + removed
+
+        total = sum(size(segment) for segment in self.segments)
+        optional = sorted(
+            (segment for segment in self.segments if not segment.required),
+            key=lambda segment: segment.priority
+        )
+        for segment in optional:
+            if total <= self.max_tokens:
+                break
+            removed = self._trim(segment, costs[id(segment)], total - self.max_tokens)
+            self.trimmed[segment.name] = self.trimmed.get(segment.name, 0) + removed
+            total -= removed
+
+        if total > self.max_tokens:
+            logger.warning("Prompt over token budget after trimming", tokens=total, budget=self.max_tokens)
+        self.tokens = total
+        return "".join(segment.render() for segment in self.segments)
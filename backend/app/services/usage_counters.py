@@ -0,0 +1,134 @@
+"""
+Write-behind usage counters.
+Aggregates `times_used`/`last_used` increments in memory and flushes them
+to the database in batches, so hot read paths stay read-only.
+"""
+
+from typing import Dict, Any, Optional, Tuple, Type
+from uuid import UUID
+from datetime import datetime
+import asyncio
+import structlog
+from sqlalchemy import update, bindparam, func
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, reset_read_your_writes
+
+logger = structlog.get_logger(__name__)
+
+
+class UsageCounterBuffer:
+    """
+    Accumulate usage increments per row and flush them periodically.
+
+    Each model must expose an integer `times_used` column; a `last_used`
+    timestamp column is updated too when the model has one.
+    """
+
+    def __init__(self, flush_interval: Optional[float] = None):
+        self.flush_interval = flush_interval or settings.USAGE_COUNTER_FLUSH_INTERVAL_SECONDS
+        # {(model, row_id): {"count": int, "last_used": datetime}}
+        self._pending: Dict[Tuple[Type, UUID], Dict[str, Any]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def record(self, model: Type, row_id: UUID, used_at: Optional[datetime] = None):
+        """Record a single use of a row. Never touches the database."""
+        if row_id is None:
+            return
+        self._add((model, row_id), 1, used_at or datetime.utcnow())
+
+    def _add(self, key: Tuple[Type, UUID], count: int, used_at: datetime):
+        entry = self._pending.get(key)
+        if entry is None:
+            self._pending[key] = {"count": count, "last_used": used_at}
+        else:
+            entry["count"] += count
+            if used_at > entry["last_used"]:
+                entry["last_used"] = used_at
+
+    def pending_count(self) -> int:
+        """Number of rows with unflushed increments."""
+        return len(self._pending)
+
+    async def flush(self, session_factory=AsyncSessionLocal) -> int:
+        """
+        Write all pending increments in one batched UPDATE per model.
+
+        Returns:
+            Number of rows updated
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            pending, self._pending = self._pending, {}
+
+            by_model: Dict[Type, list] = {}
+            for (model, row_id), entry in pending.items():
+                by_model.setdefault(model, []).append({
+                    "b_id": row_id,
+                    "b_count": entry["count"],
+                    "b_last_used": entry["last_used"],
+                })
+
+            try:
+                async with session_factory() as session:
+                    for model, params in by_model.items():
+                        await session.execute(self._build_update(model), params)
+                    await session.commit()
+            except Exception as e:
+                # Put increments back so they are retried on the next flush
+                for key, entry in pending.items():
+                    self._add(key, entry["count"], entry["last_used"])
+                logger.error("Usage counter flush failed", error=str(e), rows=len(pending))
+                return 0
+
+            logger.debug("Usage counters flushed", rows=len(pending), models=len(by_model))
+            return len(pending)
+
+    def _build_update(self, model: Type):
+        """Build an executemany UPDATE that increments counters by primary key."""
+        table = model.__table__
+        values = {
+            "times_used": func.coalesce(table.c.times_used, 0) + bindparam("b_count"),
+        }
+        if "last_used" in table.c:
+            values["last_used"] = bindparam("b_last_used")
+
+        return (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(**values)
+        )
+
+    async def _run_periodic_flush(self):
+        """Background loop that flushes pending counters on an interval."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                reset_read_your_writes()
+                await self.flush()
+            except Exception as e:
+                logger.error("Usage counter flush loop error", error=str(e))
+
+    def start(self):
+        """Start the periodic flush loop on the running event loop."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._run_periodic_flush())
+            logger.info("Usage counter flusher started", interval=self.flush_interval)
+
+    async def stop(self):
+        """Stop the flush loop and write out anything still pending."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+
+# Global usage counter buffer
+usage_counters = UsageCounterBuffer()
@@ -0,0 +1,308 @@
+"""
+Idempotent webhook ingestion.
+Meta, Telegram and Twilio redeliver webhooks on slow responses; this module
+suppresses duplicates with a recent-id set (Redis or in-memory, with TTL)
+checked before any DB write, backed by the message_external_ids key table.
+
+Stored messages start as "received" and become "processed" (or "failed")
+once their AI turn commits; rows still "received" after a crash or deploy
+are claimed again by claim_stale_inbound().
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+from collections import OrderedDict
+from datetime import timedelta
+from uuid import UUID, uuid4
+import time
+import structlog
+from redis import asyncio as aioredis
+from sqlalchemy import DateTime, Integer, and_, cast, func, select, update
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import WEBHOOK_MESSAGES
+from app.db.models import Message, MessageDirection, MessageExternalId
+
+logger = structlog.get_logger(__name__)
+
+# Bursts are processed seconds after ingestion; bounding created_at lets
+# Postgres prune lookups to the latest messages partitions.
+RECENT_MESSAGE_WINDOW = timedelta(days=1)
+
+
+class WebhookIdempotency:
+    """
+    Recent delivery-id set with TTL.
+
+    `claim()` is a single hash lookup for retries; the first delivery of an
+    id wins and every redelivery inside the TTL window is rejected.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[str] = None,
+        ttl_seconds: Optional[int] = None,
+        max_entries: int = 100_000
+    ):
+        self.backend = (backend or settings.WEBHOOK_DEDUP_BACKEND).lower()
+        self.ttl_seconds = ttl_seconds or settings.WEBHOOK_DEDUP_TTL_SECONDS
+        self.max_entries = max_entries
+        # In-memory set: key -> expiry (insertion order == expiry order)
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._redis = None
+
+    def _key(self, provider: str, external_id: str, project_id: Optional[UUID]) -> str:
+        return f"webhook:seen:{provider}:{project_id or '-'}:{external_id}"
+
+    def _get_redis(self):
+        if self._redis is None:
+            self._redis = aioredis.from_url(
+                settings.REDIS_URL,
+                password=settings.REDIS_PASSWORD,
+                socket_timeout=0.5,
+            )
+        return self._redis
+
+    async def claim(
+        self,
+        provider: str,
+        external_id: Optional[str],
+        project_id: Optional[UUID] = None
+    ) -> bool:
+        """
+        Mark a delivery as seen.
+
+        Returns:
+            True if this is the first delivery (caller should process it),
+            False if it is a duplicate. Deliveries without an id are always
+            processed.
+        """
+        if not external_id:
+            return True
+
+        key = self._key(provider, str(external_id), project_id)
+
+        if self.backend == "redis":
+            try:
+                claimed = await self._get_redis().set(key, 1, nx=True, ex=self.ttl_seconds)
+                return bool(claimed)
+            except Exception as e:
+                logger.warning("Redis dedup unavailable, using memory", error=str(e))
+
+        return self._claim_in_memory(key)
+
+    async def release(
+        self,
+        provider: str,
+        external_id: Optional[str],
+        project_id: Optional[UUID] = None
+    ):
+        """Forget a delivery so a redelivery is processed (use when ingestion failed)."""
+        if not external_id:
+            return
+
+        key = self._key(provider, str(external_id), project_id)
+        self._seen.pop(key, None)
+
+        if self.backend == "redis":
+            try:
+                await self._get_redis().delete(key)
+            except Exception as e:
+                logger.warning("Failed to release webhook id", error=str(e))
+
+    def _claim_in_memory(self, key: str) -> bool:
+        now = time.monotonic()
+
+        # Expire old entries from the front
+        while self._seen:
+            oldest_key, expires_at = next(iter(self._seen.items()))
+            if expires_at > now and len(self._seen) < self.max_entries:
+                break
+            self._seen.popitem(last=False)
+
+        expires_at = self._seen.get(key)
+        if expires_at is not None and expires_at > now:
+            return False
+
+        self._seen[key] = now + self.ttl_seconds
+        return True
+
+
+async def insert_inbound_message(db: AsyncSession, values: Dict[str, Any]) -> Optional[UUID]:
+    """
+    Insert an inbound message unless (project, provider, external_id) exists.
+
+    The key row and the message are written in the caller's transaction,
+    so a rollback releases the key as well.
+
+    Returns:
+        New message id, or None if the message was already stored
+    """
+    values = {"id": uuid4(), **values}
+
+    if values.get("external_id"):
+        claimed = await db.execute(
+            insert(MessageExternalId)
+            .values(
+                project_id=values["project_id"],
+                provider=values["provider"],
+                external_id=values["external_id"],
+                message_id=values["id"],
+            )
+            .on_conflict_do_nothing(index_elements=["project_id", "provider", "external_id"])
+            .returning(MessageExternalId.message_id)
+        )
+        if claimed.scalar_one_or_none() is None:
+            return None
+
+    await db.execute(insert(Message).values(**values))
+    return values["id"]
+
+
+async def store_inbound_once(
+    db: AsyncSession,
+    provider: str,
+    project_id: UUID,
+    external_id: Optional[str],
+    values: Dict[str, Any]
+) -> Optional[UUID]:
+    """
+    Persist an inbound webhook message exactly once.
+
+    Redeliveries are rejected by the recent-id set before touching the
+    database; the key table catches anything that slips past it (e.g.
+    after a restart). Returns the new message id, or None for duplicates.
+    """
+    if not await webhook_idempotency.claim(provider, external_id, project_id):
+        WEBHOOK_MESSAGES.labels(provider, "duplicate").inc()
+        logger.info(
+            "Duplicate webhook delivery ignored",
+            provider=provider,
+            project_id=str(project_id),
+            external_id=external_id
+        )
+        return None
+
+    try:
+        message_id = await insert_inbound_message(db, {
+            "project_id": project_id,
+            "direction": MessageDirection.INBOUND,
+            "platform": provider,
+            "provider": provider,
+            "external_id": external_id,
+            "status": "received",
+            **values
+        })
+        await db.commit()
+    except Exception:
+        await webhook_idempotency.release(provider, external_id, project_id)
+        raise
+
+    if message_id is None:
+        WEBHOOK_MESSAGES.labels(provider, "duplicate").inc()
+        logger.info(
+            "Duplicate webhook message already stored",
+            provider=provider,
+            project_id=str(project_id),
+            external_id=external_id
+        )
+    else:
+        WEBHOOK_MESSAGES.labels(provider, "stored").inc()
+    return message_id
+
+
+async def mark_inbound_messages(
+    db: AsyncSession,
+    message_ids: Sequence[UUID],
+    status: str = "processed",
+    error: Optional[str] = None
+):
+    """
+    Move inbound messages out of "received" in the caller's transaction.
+
+    Call it with the AI turn's writes (or right after they commit) so a
+    crash before that point leaves the rows for recovery.
+    """
+    if not message_ids:
+        return
+    values = {"status": status}
+    if error:
+        values["error_message"] = error[:1000]
+    await db.execute(
+        update(Message)
+        .where(Message.id.in_(list(message_ids)))
+        .where(Message.created_at >= func.now() - RECENT_MESSAGE_WINDOW)
+        .where(Message.direction == MessageDirection.INBOUND)
+        .where(Message.status == "received")
+        .values(**values)
+    )
+
+
+async def claim_stale_inbound(
+    db: AsyncSession,
+    providers: Sequence[str],
+    limit: int = 500
+) -> List[Any]:
+    """
+    Claim inbound messages left in "received" for another processing attempt.
+
+    A message is stale once INBOUND_RECOVERY_STALE_SECONDS passed since it
+    was stored (or last claimed), so jobs still queued or debouncing are
+    left alone. Each claim bumps extra_data["recovery_attempts"] and
+    ["recovered_at"] in one UPDATE, so concurrent sweeps on several
+    instances never claim the same row twice; rows out of attempts become
+    "failed". Committing is up to the caller.
+
+    Returns:
+        Rows with id, project_id, provider, content, sender and extra_data
+    """
+    now = func.now()
+    attempts = func.coalesce(Message.extra_data["recovery_attempts"].astext.cast(Integer), 0)
+    last_try = func.coalesce(
+        Message.extra_data["recovered_at"].astext.cast(DateTime(timezone=True)),
+        Message.created_at
+    )
+    stale = and_(
+        Message.provider.in_(list(providers)),
+        Message.direction == MessageDirection.INBOUND,
+        Message.status == "received",
+        Message.created_at >= now - timedelta(seconds=settings.INBOUND_RECOVERY_MAX_AGE_SECONDS),
+        last_try < now - timedelta(seconds=settings.INBOUND_RECOVERY_STALE_SECONDS),
+    )
+    max_attempts = settings.INBOUND_RECOVERY_MAX_ATTEMPTS
+
+    abandoned = await db.execute(
+        update(Message)
+        .where(stale, attempts >= max_attempts)
+        .values(status="failed", error_message=f"Not processed after {max_attempts} recovery attempts")
+        .returning(Message.provider)
+    )
+    for provider in abandoned.scalars().all():
+        WEBHOOK_MESSAGES.labels(provider, "abandoned").inc()
+
+    candidates = (
+        select(Message.id)
+        .where(stale, attempts < max_attempts)
+        .order_by(Message.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = await db.execute(
+        update(Message)
+        .where(Message.id.in_(candidates.scalar_subquery()), stale)
+        .values(extra_data=func.coalesce(Message.extra_data, cast({}, JSONB)).op("||")(
+            func.jsonb_build_object("recovery_attempts", attempts + 1, "recovered_at", now)
+        ))
+        .returning(
+            Message.id, Message.project_id, Message.provider, Message.content, Message.sender, Message.extra_data
+        )
+    )
+    rows = claimed.all()
+    for row in rows:
+        WEBHOOK_MESSAGES.labels(row.provider, "recovered").inc()
+    return rows
+
+
+# Global webhook idempotency guard
+webhook_idempotency = WebhookIdempotency()
@@ -4,7 +4,16 @@ Celery application configuration for background tasks.
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_shutdown,
+)
 from app.core.config import settings
+from app.core import metrics
 
 # Create Celery instance
 celery_app = Celery(
@@ -46,7 +55,54 @@ celery_app.conf.beat_schedule = {
         "task": "app.workers.tasks.cleanup_old_logs",
         "schedule": crontab(hour=2, minute=0),  # Daily at 2 AM
     },
+    "maintain-partitions": {
+        "task": "app.workers.tasks.maintain_partitions",
+        "schedule": crontab(hour=1, minute=0),  # Daily at 1 AM
+    },
+    "train-intent-classifiers": {
+        "task": "app.workers.tasks.train_intent_classifiers",
+        "schedule": crontab(hour=3, minute=0),  # Daily at 3 AM
+    },
 }
 
+
+
+# Async runtime: one persistent event loop per worker process. Prefork
+# children reset the engine pool inherited from the parent and start their
+# own loop; solo/thread pools start it lazily on the first task.
+@worker_process_init.connect
+def _init_worker_runtime(**kwargs):
+    from app.workers.runtime import worker_runtime
+    worker_runtime.after_fork()
+    worker_runtime.start()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _stop_worker_runtime(**kwargs):
+    from app.workers.runtime import worker_runtime
+    worker_runtime.stop()
+
+
+# Prometheus: task run time per task name. With the prefork pool each child
+# records its own samples; serve them from the pool process with
+# `--pool threads` (or solo) when WORKER_METRICS_PORT is set.
+@worker_init.connect
+def _start_metrics_server(**kwargs):
+    if settings.METRICS_ENABLED and settings.WORKER_METRICS_PORT:
+        from prometheus_client import start_http_server
+        start_http_server(settings.WORKER_METRICS_PORT)
+
+
+@task_prerun.connect
+def _task_started(task_id=None, **kwargs):
+    metrics.task_started(task_id)
+
+
+@task_postrun.connect
+def _task_finished(task_id=None, task=None, state=None, **kwargs):
+    metrics.task_finished(task_id, getattr(task, "name", "unknown"), state)
+
+
 if __name__ == "__main__":
     celery_app.start()
@@ -0,0 +1,119 @@
+"""
+Async runtime for Celery worker processes.
+Owns one long-lived event loop per worker process so the async engine's
+pool and the Gemini client survive across tasks.
+"""
+
+from typing import Awaitable, Optional, TypeVar
+import asyncio
+import threading
+import structlog
+
+from app.core.config import settings
+from app.core.database import engine, replica_engines, close_db
+from app.core.tracing import setup_tracing, shutdown_tracing
+from app.services.usage_counters import usage_counters
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class WorkerRuntime:
+    """
+    Persistent event loop running in a daemon thread.
+
+    Tasks submit coroutines with `run()`, which blocks the calling task
+    thread until the coroutine finishes. With the prefork pool that is one
+    task at a time per process; with `--pool threads` many task threads
+    share the loop and their coroutines run concurrently on one engine.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the loop thread (idempotent)."""
+        with self._lock:
+            if self._loop is not None and self._loop.is_running():
+                return
+
+            # Exporter threads don't survive fork, so set up tracing per process
+            setup_tracing(
+                service_name=f"{settings.TRACING_SERVICE_NAME}-worker",
+                engines=[engine, *replica_engines],
+            )
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=self._run_loop,
+                args=(loop,),
+                name="worker-async-loop",
+                daemon=True,
+            )
+            thread.start()
+            self._loop, self._thread = loop, thread
+
+        self.run(self._on_start())
+        logger.info("Worker async runtime started")
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    async def _on_start(self):
+        usage_counters.start()
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Run a coroutine on the worker loop and return its result."""
+        if self._loop is None or not self._loop.is_running():
+            self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return future.result(timeout)
+
+    def after_fork(self):
+        """
+        Reset state inherited from the parent process.
+
+        Pooled connections were opened by the parent; dropping them without
+        closing leaves the parent's sockets alone.
+        """
+        engine.sync_engine.dispose(close=False)
+        for replica in replica_engines:
+            replica.sync_engine.dispose(close=False)
+        self._loop = None
+        self._thread = None
+
+    def stop(self):
+        """Flush buffered writes, close pools and stop the loop."""
+        if self._loop is None or not self._loop.is_running():
+            return
+
+        try:
+            self.run(self._on_stop(), timeout=30)
+        except Exception as e:
+            logger.error("Worker runtime shutdown error", error=str(e))
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._loop = None
+        self._thread = None
+        shutdown_tracing()
+        logger.info("Worker async runtime stopped")
+
+    async def _on_stop(self):
+        await usage_counters.stop()
+        await close_db()
+
+
+# Global worker runtime (one per worker process)
+worker_runtime = WorkerRuntime()
+
+
+def run_async(coro: Awaitable[T]) -> T:
+    """Run a coroutine from a Celery task on the worker's persistent loop."""
+    return worker_runtime.run(coro)
@@ -1,261 +0,0 @@
-"""
-Celery background tasks for async processing.
-"""
-
-from datetime import datetime, timedelta
-from typing import Dict, Any
-import structlog
-from celery import Task
-
-from app.workers.celery_app import celery_app
-from app.core.database import AsyncSessionLocal
-from app.db.models import (
-    Integration, IntegrationStatus, Order, Message, 
-    MessageDirection, Project, Report, APILog
-)
-from sqlalchemy import select, and_
-from sqlalchemy.ext.asyncio import AsyncSession
-
-logger = structlog.get_logger(__name__)
-
-
-class DatabaseTask(Task):
-    """Base task with database session management."""
-    
-    _db = None
-    
-    @property
-    def db(self):
-        if self._db is None:
-            self._db = AsyncSessionLocal()
-        return self._db
-    
-    def after_return(self, *args, **kwargs):
-        if self._db is not None:
-            self._db.close()
-
-
-@celery_app.task(bind=True, base=DatabaseTask)
-def sync_shopify_orders(self):
-    """Sync orders from all connected Shopify integrations."""
-    logger.info("Starting Shopify order sync")
-    
-    # TODO: Implement Shopify API integration
-    # 1. Get all active Shopify integrations
-    # 2. For each integration, fetch new/updated orders
-    # 3. Create or update Order records in database
-    # 4. Create Message records for order updates
-    
-    return {"status": "completed", "synced": 0}
-
-
-@celery_app.task(bind=True, base=DatabaseTask)
-def sync_integration(self, integration_id: str):
-    """Sync data for a specific integration."""
-    logger.info("Syncing integration", integration_id=integration_id)
-    
-    # TODO: Implement provider-specific sync logic
-    # - Shopify: fetch orders
-    # - WhatsApp: fetch messages
-    # - Telegram: fetch updates
-    # etc.
-    
-    return {"status": "completed", "integration_id": integration_id}
-
-
-@celery_app.task(bind=True, base=DatabaseTask)
-def send_message_task(self, message_id: str):
-    """
-    Send a queued message via the appropriate provider.
-    
-    Args:
-        message_id: UUID of the message to send
-    """
-    logger.info("Sending message", message_id=message_id)
-    
-    # TODO: Implement message sending logic
-    # 1. Load message from database
-    # 2. Determine provider (WhatsApp, Telegram, etc.)
-    # 3. Call provider API to send message
-    # 4. Update message status and external_id
-    # 5. Handle retries on failure
-    
-    return {"status": "sent", "message_id": message_id}
-
-
-@celery_app.task(bind=True, base=DatabaseTask)
-def process_message_queue(self):
-    """Process all queued outbound messages."""
-    logger.info("Processing message queue")
-    
-    # TODO: Implement queue processing
-    # 1. Get all messages with status="queued"
-    # 2. For each message, call send_message_task
-    # 3. Implement rate limiting per provider
-    
-    return {"status": "completed", "processed": 0}
-
-
-@celery_app.task(bind=True, base=DatabaseTask)
-def process_inbound_message(self, message_data: Dict[str, Any]):
-    """
-    Process an inbound message from a webhook.
-    
-    Args:
-        message_data: Message payload from webhook
-    """
-    logger.info("Processing inbound message", provider=message_data.get("provider"))
-    
-    # TODO: Implement inbound message processing
-    # 1. Create Message record
-    # 2. Extract customer info and find/create Order
-    # 3. Optionally trigger AI response generation
-    # 4. Send WebSocket notification to frontend
-    
-    return {"status": "processed"}
-
-
-@celery_app.task(bind=True, base=DatabaseTask)
-def generate_ai_response(self, message_id: str, auto_send: bool = False):
-    """
-    Generate AI response for an inbound message.
-    
-    Args:
-        message_id: UUID of the message to respond to
-        auto_send: Whether to automatically send the generated response
-    """
-    logger.info("Generating AI response", message_id=message_id)
-    
-    # TODO: Implement AI response generation
-    # 1. Load message and context
-    # 2. Call Gemini to generate response
-    # 3. Create new outbound Message record
-    # 4. If auto_send, queue for sending
-    # 5. Otherwise, mark as draft for human review
-    
-    return {"status": "generated", "message_id": message_id}
-
-
-@celery_app.task(bind=True, base=DatabaseTask)
-def generate_daily_reports(self):
-    """Generate daily reports for all active projects."""
-    logger.info("Generating daily reports")
-    
-    # TODO: Implement daily report generation
-    # 1. Get all active projects
-    # 2. For each project, generate:
-    #    - Sales report
-    #    - Messages report
-    #    - Performance report
-    # 3. Store in Report table
-    # 4. Optionally send email notifications
-    
-    return {"status": "completed", "reports_generated": 0}
-
-
-@celery_app.task(bind=True, base=DatabaseTask)
-def train_model(self, training_id: str):
-    """
-    Train or fine-tune an AI model for a project.
-    
-    Args:
-        training_id: UUID of the ModelTraining record
-    """
-    logger.info("Starting model training", training_id=training_id)
-    
-    # TODO: Implement model training
-    # 1. Load training data from dataset_location
-    # 2. Prepare data for Gemini fine-tuning
-    # 3. Submit training job to Vertex AI
-    # 4. Poll for completion
-    # 5. Update ModelTraining record with results
-    
-    return {"status": "completed", "training_id": training_id}
-
-
-@celery_app.task(bind=True, base=DatabaseTask)
-def cleanup_old_logs(self):
-    """Delete API logs older than 90 days."""
-    logger.info("Cleaning up old logs")
-    
-    # TODO: Implement log cleanup
-    # 1. Calculate cutoff date (90 days ago)
-    # 2. Delete APILog records older than cutoff
-    # 3. Return count of deleted records
-    
-    return {"status": "completed", "deleted": 0}
-
-
-@celery_app.task(bind=True, base=DatabaseTask)
-def verify_integration(self, integration_id: str):
-    """
-    Verify that an integration connection is working.
-    
-    Args:
-        integration_id: UUID of the integration to verify
-    """
-    logger.info("Verifying integration", integration_id=integration_id)
-    
-    # TODO: Implement integration verification
-    # 1. Load integration from database
-    # 2. Test API connection with credentials
-    # 3. Update status to CONNECTED or ERROR
-    # 4. Store error message if failed
-    
-    return {"status": "verified", "integration_id": integration_id}
-
-
-@celery_app.task(bind=True, base=DatabaseTask, max_retries=3)
-def schedule_followup(
-    self,
-    customer_id: str,
-    message: str,
-    delay_hours: int,
-    channel: str,
-    project_id: str
-):
-    """
-    Schedule a follow-up message to be sent after a delay.
-    
-    Args:
-        customer_id: Customer identifier
-        message: Message content
-        delay_hours: Hours to wait before sending
-        channel: Communication channel
-        project_id: Project UUID
-    """
-    logger.info(
-        "Scheduling follow-up",
-        customer_id=customer_id,
-        delay_hours=delay_hours,
-        channel=channel
-    )
-    
-    # Schedule the message to be sent later
-    send_message_task.apply_async(
-        args=[{
-            "customer_id": customer_id,
-            "message": message,
-            "channel": channel,
-            "project_id": project_id
-        }],
-        countdown=delay_hours * 3600  # Convert hours to seconds
-    )
-    
-    return {"status": "scheduled"}
-
-
-@celery_app.task(bind=True)
-def health_check(self):
-    """Simple health check task for monitoring."""
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
-
-
-# Task routing configuration
-celery_app.conf.task_routes = {
-    "app.workers.tasks.send_message_task": {"queue": "messages"},
-    "app.workers.tasks.generate_ai_response": {"queue": "ai"},
-    "app.workers.tasks.train_model": {"queue": "training"},
-    "app.workers.tasks.sync_*": {"queue": "sync"},
-    "app.workers.tasks.generate_*": {"queue": "reports"},
-}
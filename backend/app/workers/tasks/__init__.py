@@ -1,5 +1,16 @@
 """Worker tasks for background job processing."""
 
 from .ai_tasks import process_incoming_message
+from .intent_tasks import train_intent_classifiers
+from .maintenance_tasks import cleanup_old_logs, maintain_partitions
+from .memory_tasks import refresh_conversation_summary
+from .shopify_tasks import sync_shopify_orders
 
-__all__ = ["process_incoming_message"]
+__all__ = [
+    "process_incoming_message",
+    "cleanup_old_logs",
+    "maintain_partitions",
+    "refresh_conversation_summary",
+    "sync_shopify_orders",
+    "train_intent_classifiers",
+]
@@ -6,6 +6,8 @@ from celery import shared_task
 from uuid import UUID
 import structlog
 
+from app.workers.runtime import run_async
+
 logger = structlog.get_logger(__name__)
 
 
@@ -21,6 +23,7 @@ def process_incoming_message(self, message_id: str, project_id: str):
     from app.services.ai_orchestrator import AIOrchestrator
     from app.core.database import get_async_session
     from app.db.models import Message
+    from app.services.webhook_idempotency import mark_inbound_messages
     from sqlalchemy import select
     
     try:
@@ -48,6 +51,9 @@ def process_incoming_message(self, message_id: str, project_id: str):
                     project_id=UUID(project_id)
                 )
                 
+                # Leaves the recovery sweep (webhooks.recover_inbound_messages)
+                await mark_inbound_messages(db, [message.id])
+                
                 logger.info(
                     "Message processed by AI",
                     message_id=message_id,
@@ -57,8 +63,7 @@ def process_incoming_message(self, message_id: str, project_id: str):
                 return response
         
         # Run async function
-        import asyncio
-        return asyncio.run(process())
+        return run_async(process())
         
     except Exception as e:
         logger.error(
@@ -66,6 +71,15 @@ def process_incoming_message(self, message_id: str, project_id: str):
             message_id=message_id,
             error=str(e)
         )
+        if self.request.retries >= self.max_retries:
+            error = str(e)
+            
+            async def give_up():
+                async with get_async_session() as db:
+                    await mark_inbound_messages(db, [UUID(message_id)], "failed", error)
+            
+            run_async(give_up())
+            raise
         # Retry with exponential backoff
         raise self.retry(exc=e, countdown=2 ** self.request.retries)
 
@@ -80,7 +94,7 @@ def sync_integration_data(integration_id: str):
     """
     from app.core.database import get_async_session
     from app.db.models import Integration
-    from app.services.integrations.shopify import ShopifyClient
+    from app.workers.tasks.shopify_tasks import sync_shopify_integration
     from sqlalchemy import select
     
     try:
@@ -96,24 +110,20 @@ def sync_integration_data(integration_id: str):
                     logger.error("Integration not found", integration_id=integration_id)
                     return
                 
-                # Sync based on provider
-                if integration.provider == "shopify":
-                    client = ShopifyClient(integration.config)
-                    
-                    # Sync orders
-                    orders = await client.get_orders(limit=100)
-                    logger.info(
-                        "Shopify orders synced",
-                        integration_id=integration_id,
-                        count=len(orders)
-                    )
-                    
-                    # TODO: Save orders to database
-                
-                logger.info("Integration synced", integration_id=integration_id)
+                provider = integration.provider
+            
+            # Sync based on provider
+            if provider == "shopify":
+                result = await sync_shopify_integration(UUID(integration_id))
+                logger.info(
+                    "Shopify orders synced",
+                    integration_id=integration_id,
+                    count=result.get("synced_count", 0)
+                )
+            
+            logger.info("Integration synced", integration_id=integration_id)
         
-        import asyncio
-        asyncio.run(sync())
+        run_async(sync())
         
     except Exception as e:
         logger.error(
@@ -161,8 +171,7 @@ def auto_respond_to_customer(customer_id: str, project_id: str, context: dict):
                 
                 return response
         
-        import asyncio
-        return asyncio.run(respond())
+        return run_async(respond())
         
     except Exception as e:
         logger.error(
@@ -181,7 +190,7 @@ def analyze_conversation_sentiment(conversation_id: str):
     Args:
         conversation_id: UUID of the conversation
     """
-    from app.services.gemini_client import GeminiClient
+    from app.services.gemini_client import gemini_client
     from app.core.database import get_async_session
     from app.db.models import Message
     from sqlalchemy import select
@@ -207,8 +216,9 @@ def analyze_conversation_sentiment(conversation_id: str):
                 ])
                 
                 # Analyze with AI
-                gemini = GeminiClient()
-                sentiment = await gemini.analyze_sentiment(conversation_text)
+                sentiment = await gemini_client.analyze_sentiment(
+                    conversation_text, project_id=messages[0].project_id
+                )
                 
                 logger.info(
                     "Sentiment analyzed",
@@ -218,8 +228,7 @@ def analyze_conversation_sentiment(conversation_id: str):
                 
                 return sentiment
         
-        import asyncio
-        return asyncio.run(analyze())
+        return run_async(analyze())
         
     except Exception as e:
         logger.error(
@@ -239,7 +248,7 @@ def generate_sales_insights(project_id: str, timeframe: str = "7d"):
         project_id: UUID of the project
         timeframe: Timeframe for analysis (7d, 30d, etc.)
     """
-    from app.services.gemini_client import GeminiClient
+    from app.services.gemini_client import gemini_client
     from app.core.database import get_async_session
     from app.db.models import Order, Customer, Message
     from sqlalchemy import select, func
@@ -271,8 +280,7 @@ def generate_sales_insights(project_id: str, timeframe: str = "7d"):
                 }
                 
                 # Generate insights with AI
-                gemini = GeminiClient()
-                insights = await gemini.generate_insights(metrics)
+                insights = await gemini_client.generate_insights(metrics)
                 
                 logger.info(
                     "Insights generated",
@@ -282,8 +290,7 @@ def generate_sales_insights(project_id: str, timeframe: str = "7d"):
                 
                 return insights
         
-        import asyncio
-        return asyncio.run(generate())
+        return run_async(generate())
         
     except Exception as e:
         logger.error(
@@ -0,0 +1,54 @@
+"""
+Celery tasks for the local intent classifier.
+"""
+
+from celery import shared_task
+import structlog
+
+from app.workers.runtime import run_async
+
+logger = structlog.get_logger(__name__)
+
+
+@shared_task(name="app.workers.tasks.train_intent_classifiers")
+def train_intent_classifiers():
+    """Retrain the global classifier and one per project with enough labeled turns."""
+    from datetime import datetime, timedelta
+    from sqlalchemy import func, select
+    from app.core.config import settings
+    from app.core.database import get_async_session
+    from app.db.models import ConversationHistory, MessageDirection
+    from app.services.intent_classifier import train_and_store
+
+    async def run():
+        since = datetime.utcnow() - timedelta(days=settings.LOCAL_INTENT_TRAINING_DAYS)
+        async with get_async_session() as db:
+            result = await db.execute(
+                select(ConversationHistory.project_id)
+                .where(ConversationHistory.message_direction == MessageDirection.INBOUND)
+                .where(ConversationHistory.intent.is_not(None))
+                .where(ConversationHistory.created_at >= since)
+                .group_by(ConversationHistory.project_id)
+                .having(func.count() >= settings.LOCAL_INTENT_MIN_SAMPLES)
+            )
+            project_ids = result.scalars().all()
+
+        # One transaction per model so a failure only loses that one
+        reports = {}
+        for project_id in [None, *project_ids]:
+            scope = str(project_id) if project_id else "global"
+            try:
+                async with get_async_session() as db:
+                    report = await train_and_store(db, project_id)
+                reports[scope] = {
+                    "stored": report.get("stored", False),
+                    "samples": report.get("samples"),
+                    "reason": report.get("reason"),
+                }
+            except Exception as e:
+                logger.error("Intent classifier training failed", scope=scope, error=str(e))
+                reports[scope] = {"stored": False, "error": str(e)}
+        return reports
+
+    reports = run_async(run())
+    return {"status": "completed", "models": reports}
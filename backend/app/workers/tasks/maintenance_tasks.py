@@ -0,0 +1,45 @@
+"""
+Celery tasks for database maintenance.
+"""
+
+from celery import shared_task
+import structlog
+
+from app.workers.runtime import run_async
+
+logger = structlog.get_logger(__name__)
+
+
+@shared_task(name="app.workers.tasks.maintain_partitions")
+def maintain_partitions():
+    """Create monthly partitions for the coming months ahead of time."""
+    from app.core.database import get_async_session
+    from app.services.partition_manager import partition_manager
+
+    async def run():
+        async with get_async_session() as db:
+            return await partition_manager.ensure_all(db)
+
+    created = run_async(run())
+    logger.info("Partition maintenance finished", created=created)
+    return {"status": "completed", "created": created}
+
+
+@shared_task(name="app.workers.tasks.cleanup_old_logs")
+def cleanup_old_logs():
+    """
+    Retire messages, API logs and conversation history past their retention.
+
+    Whole monthly partitions are detached/dropped, so no large DELETE runs
+    against the live tables.
+    """
+    from app.core.database import get_async_session
+    from app.services.partition_manager import partition_manager
+
+    async def run():
+        async with get_async_session() as db:
+            return await partition_manager.apply_retention(db)
+
+    result = run_async(run())
+    logger.info("Retention cleanup finished", **result)
+    return {"status": "completed", **result}
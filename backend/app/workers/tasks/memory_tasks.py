@@ -0,0 +1,27 @@
+"""
+Celery tasks for conversation memory.
+"""
+
+from uuid import UUID
+from celery import shared_task
+import structlog
+
+from app.workers.runtime import run_async
+
+logger = structlog.get_logger(__name__)
+
+
+@shared_task(name="app.workers.tasks.refresh_conversation_summary")
+def refresh_conversation_summary(project_id: str, customer_id: str, platform: str):
+    """Fold older turns of one customer thread into its rolling summary."""
+    from app.core.database import get_async_session
+    from app.services.conversation_memory import ConversationMemory
+    from app.services.service_factory import get_gemini_without_tracking
+
+    async def run():
+        async with get_async_session() as db:
+            memory = ConversationMemory(db, UUID(project_id))
+            return await memory.refresh_summary(customer_id, platform, get_gemini_without_tracking())
+
+    folded = run_async(run())
+    return {"status": "completed", "turns_summarized": folded}
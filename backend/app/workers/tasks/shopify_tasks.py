@@ -0,0 +1,55 @@
+"""
+Celery tasks for Shopify order synchronization.
+"""
+
+from celery import shared_task
+import structlog
+
+from app.workers.runtime import run_async
+
+logger = structlog.get_logger(__name__)
+
+
+async def sync_shopify_integration(integration_id) -> dict:
+    """Run one incremental order sync for a Shopify integration."""
+    from app.core.database import get_async_session
+    from app.db.models import Integration
+    from app.services.integrations.shopify import ShopifyService
+    from app.services.order_manager import sync_all_shopify_orders
+
+    async with get_async_session() as db:
+        integration = await db.get(Integration, integration_id)
+        if integration is None or integration.provider != "shopify":
+            return {"success": False, "error": "Shopify integration not found"}
+
+        async with ShopifyService.from_integration(integration) as client:
+            return await sync_all_shopify_orders(db, integration.project_id, integration.id, client)
+
+
+@shared_task(name="app.workers.tasks.sync_shopify_orders")
+def sync_shopify_orders():
+    """Sync new and updated orders from all connected Shopify integrations."""
+    from sqlalchemy import select
+    from app.core.database import get_async_session
+    from app.db.models import Integration, IntegrationStatus
+
+    async def run():
+        async with get_async_session() as db:
+            result = await db.execute(
+                select(Integration.id).where(
+                    Integration.provider == "shopify",
+                    Integration.status == IntegrationStatus.CONNECTED
+                )
+            )
+            integration_ids = result.scalars().all()
+
+        # Shops run one after another; pages within a shop are fetched concurrently
+        return {
+            str(integration_id): await sync_shopify_integration(integration_id)
+            for integration_id in integration_ids
+        }
+
+    results = run_async(run())
+    synced = sum(result.get("synced_count", 0) for result in results.values())
+    logger.info("Shopify order sync finished", integrations=len(results), synced=synced)
+    return {"status": "completed", "synced": synced, "integrations": results}
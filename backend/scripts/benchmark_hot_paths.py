@@ -0,0 +1,383 @@
+#!/usr/bin/env python
+"""
+Micro-benchmarks for the pure-Python functions run on every message or request.
+Covers prompt building and response parsing, reply sanitizing, language
+request detection, inbox conversation aggregation and report aggregations,
+each on synthetic fixtures at several sizes.
+
+Run with: python scripts/benchmark_hot_paths.py [--sizes 10,100,1000]
+Track over time: --output results.json, then --baseline results.json on the
+next run fails (exit code 1) when a case got slower than --max-regression.
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from uuid import uuid4
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+CUSTOMER_SENTENCES = [
+    "Hi, where is my order? I placed it last week.",
+    "Do you have this jacket in a medium size?",
+    "Can you reply in Spanish please?",
+    "Hola, ¿cuándo llega mi pedido? Responde en español por favor.",
+    "Bonjour, je voudrais annuler ma commande.",
+    "مرحبا، أين طلبي؟ من فضلك رد بالعربية",
+    "What are your opening hours on Sunday?",
+]
+
+REPLY_LINES = [
+    "Thanks for reaching out! Your order is on its way.",
+    "The jacket is available in medium and large.",
+    "/track_order 10293",
+    "command: refund --order 10293",
+    "",
+    "You can expect delivery within 2-3 business days.",
+    "#!/bin/sh",
+    "Let me know if there is anything else I can help with.",
+]
+
+PROVIDERS = ["telegram", "whatsapp", "facebook", "instagram"]
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+def _prompt_context(size):
+    return {
+        "persona": "ai_saler",
+        "language_name": "English",
+        "persona_detail": "Brand voice: warm, concise, no emojis.",
+        "custom_instructions": [
+            {"priority": i % 5, "platforms": ["telegram", "whatsapp"], "instruction": f"Rule {i}: mention free returns."}
+            for i in range(size)
+        ],
+        "intent": {"primary_intent": "order_status", "urgency": "medium", "sentiment": "neutral"},
+        "channel": "telegram",
+        "current_message": CUSTOMER_SENTENCES[0],
+        "customer_profile": {"name": "Jane", "preferred_language": "en", "communication_style": "casual"},
+        "product_catalog": [
+            {"name": f"Product {i}", "price": 19.99 + i, "currency": "USD", "description": "Soft cotton tee."}
+            for i in range(min(size, 50))
+        ],
+        "conversation_history": [
+            {"role": "user" if i % 2 else "assistant", "content": random.choice(CUSTOMER_SENTENCES)}
+            for i in range(size)
+        ],
+        "order": {"id": "10293", "status": "shipped", "currency": "USD", "total": 59.97},
+    }
+
+
+def _gemini_response(size):
+    """Shape of a google.generativeai response with `size` function-call parts."""
+    parts = [SimpleNamespace(text="Your order is on its way.")]
+    parts += [
+        SimpleNamespace(
+            text="",
+            function_call=SimpleNamespace(name="get_order_status", args={"order_id": str(i)}),
+        )
+        for i in range(size)
+    ]
+    return SimpleNamespace(
+        text="",
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))],
+        usage_metadata=SimpleNamespace(total_token_count=420),
+    )
+
+
+def _reply_text(size):
+    lines = [random.choice(REPLY_LINES) for _ in range(size)]
+    lines.insert(len(lines) // 2, "```python\nprint('debug')\n```")
+    return "\n".join(lines)
+
+
+def _customer_message(size):
+    return " ".join(random.choice(CUSTOMER_SENTENCES) for _ in range(size))
+
+
+def _messages(size):
+    """Inbound/outbound Message rows spread over roughly size/5 conversations."""
+    from app.db.models import Message, MessageDirection
+
+    now = datetime.utcnow()
+    customers = max(size // 5, 1)
+    messages = []
+    for i in range(size):
+        customer = i % customers
+        payload = {"id": f"chat-{customer}", "name": f"Customer {customer}", "phone": f"+1555{customer:07d}"}
+        inbound = i % 2 == 0
+        messages.append(Message(
+            id=uuid4(),
+            direction=MessageDirection.INBOUND if inbound else MessageDirection.OUTBOUND,
+            platform=PROVIDERS[customer % len(PROVIDERS)],
+            provider=PROVIDERS[customer % len(PROVIDERS)],
+            content=random.choice(CUSTOMER_SENTENCES),
+            sender=payload if inbound else {},
+            recipient={} if inbound else payload,
+            ai_generated=not inbound,
+            is_read=i % 3 == 0,
+            extra_data={"ai_generated": not inbound, "response_time": 1.5} if not inbound else {},
+            created_at=now - timedelta(minutes=size - i),
+        ))
+    return messages
+
+
+def _orders(size):
+    # ReportGenerator reads attributes by name; plain rows keep the fixture independent of the ORM
+    from app.db.models import OrderStatus
+
+    now = datetime.utcnow()
+    statuses = list(OrderStatus)
+    return [
+        SimpleNamespace(
+            id=uuid4(),
+            external_id=str(1000 + i),
+            customer_name=f"Customer {i}",
+            customer_email=f"customer{i}@example.com",
+            total=round(10 + (i % 97) * 1.5, 2),
+            currency="USD",
+            status=statuses[i % len(statuses)],
+            provider="shopify" if i % 4 else None,
+            order_date=now - timedelta(hours=i),
+            items=[{"sku": "TEE"}] * (i % 3 + 1),
+        )
+        for i in range(size)
+    ]
+
+
+def _integrations():
+    return [
+        SimpleNamespace(provider=provider, is_active=i % 2 == 0, created_at=datetime.utcnow())
+        for i, provider in enumerate(PROVIDERS)
+    ]
+
+
+class _FixtureSession:
+    """Stands in for AsyncSession: each execute() returns the next prepared row list."""
+
+    def __init__(self, *row_sets):
+        self.row_sets = row_sets
+        self.calls = 0
+
+    async def execute(self, _statement):
+        rows = self.row_sets[self.calls % len(self.row_sets)]
+        self.calls += 1
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: rows))
+
+
+def _run(coro):
+    """Drive a coroutine that never suspends, without event loop overhead."""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("Benchmarked coroutine suspended")
+
+
+# ============================================================================
+# Cases
+# ============================================================================
+
+def _gemini_client():
+    from app.services.gemini_client import GeminiClient
+
+    # Skip __init__: no API keys or network needed for the pure helpers
+    client = GeminiClient.__new__(GeminiClient)
+    client.model_name = "gemini-benchmark"
+    return client
+
+
+def _chat_bot():
+    from app.services.ai_chat_bot import AIChatBot
+
+    return AIChatBot.__new__(AIChatBot)
+
+
+def case_build_prompt(size):
+    client = _gemini_client()
+    context = _prompt_context(size)
+    return lambda: client._build_prompt(CUSTOMER_SENTENCES[0], context)
+
+
+def case_parse_response(size):
+    client = _gemini_client()
+    response = _gemini_response(size)
+    return lambda: client._parse_response(response)
+
+
+def case_sanitize_response_text(size):
+    bot = _chat_bot()
+    text = _reply_text(size)
+    return lambda: bot._sanitize_response_text(text, "en")
+
+
+def case_extract_language_request(size):
+    bot = _chat_bot()
+    message = _customer_message(size)
+    return lambda: bot._extract_language_request(message)
+
+
+def case_aggregate_conversations(size):
+    from app.api.v1.messages import _aggregate_conversations
+
+    messages = _messages(size)
+    return lambda: _aggregate_conversations(messages)
+
+
+def case_sales_report(size):
+    from app.services.report_generator import ReportGenerator
+
+    generator = ReportGenerator(_FixtureSession(_orders(size)), uuid4())
+    end = datetime.utcnow()
+    return lambda: _run(generator.generate_sales_report(end - timedelta(days=30), end, include_ai_insights=False))
+
+
+def case_order_report(size):
+    from app.services.report_generator import ReportGenerator
+
+    generator = ReportGenerator(_FixtureSession(_orders(size)), uuid4())
+    end = datetime.utcnow()
+    return lambda: _run(generator.generate_order_report(end - timedelta(days=30), end))
+
+
+def case_performance_report(size):
+    from app.services.report_generator import ReportGenerator
+
+    generator = ReportGenerator(_FixtureSession(_messages(size), _integrations()), uuid4())
+    end = datetime.utcnow()
+    return lambda: _run(generator.generate_performance_report(end - timedelta(days=30), end))
+
+
+def case_engagement_trend(size):
+    from app.services.report_generator import ReportGenerator
+
+    generator = ReportGenerator(_FixtureSession(), uuid4())
+    messages = _messages(size)
+    return lambda: _run(generator._calculate_engagement_trend(messages))
+
+
+CASES = {
+    "gemini.build_prompt": case_build_prompt,
+    "gemini.parse_response": case_parse_response,
+    "chat.sanitize_response_text": case_sanitize_response_text,
+    "chat.extract_language_request": case_extract_language_request,
+    "messages.aggregate_conversations": case_aggregate_conversations,
+    "reports.sales": case_sales_report,
+    "reports.orders": case_order_report,
+    "reports.performance": case_performance_report,
+    "reports.engagement_trend": case_engagement_trend,
+}
+
+
+# ============================================================================
+# Timing
+# ============================================================================
+
+def _time_per_call(func, repeat, min_time):
+    """Best per-call time in µs over `repeat` rounds of at least `min_time` seconds."""
+    func()  # warm up (regex compile caches, lazy imports)
+
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best * 1_000_000
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results, baseline, max_regression):
+    regressions = []
+    for key, per_call_us in results.items():
+        before = baseline.get(key)
+        if not before:
+            continue
+        change = per_call_us / before - 1
+        marker = ""
+        if change > max_regression:
+            marker = "  REGRESSION"
+            regressions.append(key)
+        print(f"{key:<48} {before:>12.2f} → {per_call_us:>12.2f} µs  {change:+7.1%}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma-separated fixture sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing rounds per case (best is kept)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per round")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    results = {}
+    print("=" * 70)
+    print(f"Hot path micro-benchmarks (sizes: {', '.join(map(str, sizes))})")
+    print("=" * 70)
+    for name, case in CASES.items():
+        if args.filter not in name:
+            continue
+        for size in sizes:
+            random.seed(size)
+            per_call_us = _time_per_call(case(size), args.repeat, args.min_time)
+            key = f"{name}[{size}]"
+            results[key] = per_call_us
+            print(f"{key:<48} {per_call_us:>12.2f} µs")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            "timestamp": datetime.utcnow().isoformat(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results_us": results,
+        }, indent=2))
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        print()
+        print(f"Compared to {args.baseline} (revision {baseline.get('revision')}):")
+        regressions = _compare(results, baseline.get("results_us", {}), args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than allowed ({args.max_regression:.0%}): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
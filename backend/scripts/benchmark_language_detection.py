@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Benchmark language identification cost per message.
+Compares the legacy langdetect calls with the cached LanguageIdentifier.
+Run with: python scripts/benchmark_language_detection.py [--iterations 2000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+SAMPLE_MESSAGES = [
+    "Hi, where is my order? I placed it last week.",
+    "Do you have this jacket in a medium size?",
+    "ok thanks",
+    "Hola, ¿cuándo llega mi pedido?",
+    "¿Tienen envío gratis a Madrid?",
+    "gracias!",
+    "Bonjour, je voudrais annuler ma commande.",
+    "Est-ce que ce produit est disponible en bleu ?",
+    "merci",
+    "مرحبا، أين طلبي؟",
+    "هل يتوفر هذا المنتج باللون الأسود؟",
+    "What are your opening hours on Sunday?",
+]
+
+
+def _time_per_call(func, messages, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(messages[i % len(messages)], i)
+    elapsed = time.perf_counter() - start
+    return elapsed / iterations * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--customers", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+    messages = [random.choice(SAMPLE_MESSAGES) for _ in range(args.iterations)]
+
+    # Legacy path: detect_langs, then detect again (lazy profile load on first call)
+    from langdetect import detect, detect_langs, LangDetectException
+
+    def legacy(message, _i):
+        try:
+            candidates = detect_langs(message)
+            if candidates and candidates[0].prob >= 0.6:
+                return candidates[0].lang
+        except LangDetectException:
+            pass
+        try:
+            return detect(message)
+        except LangDetectException:
+            return None
+
+    cold_start = time.perf_counter()
+    legacy(messages[0], 0)
+    legacy_cold_ms = (time.perf_counter() - cold_start) * 1000
+    legacy_us = _time_per_call(legacy, messages, args.iterations)
+
+    # New path
+    load_start = time.perf_counter()
+    from app.services.language_detection import LanguageIdentifier
+    identifier = LanguageIdentifier()
+    preload_ms = (time.perf_counter() - load_start) * 1000
+
+    uncached = LanguageIdentifier(cache_size=0)
+    model_us = _time_per_call(lambda m, i: uncached.detect(m), messages, args.iterations)
+
+    cached_us = _time_per_call(
+        lambda m, i: identifier.detect(m, f"customer-{i % args.customers}"),
+        messages,
+        args.iterations,
+    )
+
+    batch_start = time.perf_counter()
+    identifier.detect_batch(messages)
+    batch_us = (time.perf_counter() - batch_start) / len(messages) * 1_000_000
+
+    print("=" * 70)
+    print(f"Language detection benchmark ({args.iterations} messages)")
+    print("=" * 70)
+    print(f"legacy langdetect   cold start: {legacy_cold_ms:9.1f} ms   per message: {legacy_us:9.1f} µs")
+    print(f"identifier          preload:    {preload_ms:9.1f} ms")
+    print(f"identifier (model only)                      per message: {model_us:9.1f} µs")
+    print(f"identifier (script + memo + cache)           per message: {cached_us:9.1f} µs")
+    print(f"identifier batch API                         per message: {batch_us:9.1f} µs")
+    print()
+    print("Stats:", identifier.get_stats())
+
+
+if __name__ == "__main__":
+    main()
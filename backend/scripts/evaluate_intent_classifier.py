@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+Train the local intent classifier and report how well it agrees with the
+LLM labels in ConversationHistory (holdout accuracy, macro-F1, coverage
+at the confidence threshold, per-label precision/recall, latency in us).
+Run with: python scripts/evaluate_intent_classifier.py [--project-id UUID] [--threshold 0.85] [--save]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+from uuid import UUID
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+async def evaluate(args):
+    from app.core.database import get_async_session
+    from app.services.intent_classifier import load_training_rows, train_and_store, train_classifier
+
+    async with get_async_session() as db:
+        if args.save:
+            return await train_and_store(db, args.project_id)
+        rows = await load_training_rows(db, args.project_id, days=args.days, limit=args.limit)
+
+    if not rows:
+        return {"samples": 0}
+    _, report = await asyncio.to_thread(train_classifier, rows, args.threshold)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--project-id", type=UUID, default=None, help="Omit for the global model")
+    parser.add_argument("--days", type=int, default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--save", action="store_true", help="Store the model if it passes the accuracy gate")
+    args = parser.parse_args()
+
+    report = asyncio.run(evaluate(args))
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the Shopify Admin REST orders API.
+Serves synthetic orders with Shopify's filters, Link-header (page_info)
+pagination and leaky-bucket rate limiting (429 + Retry-After), and keeps
+touching random orders so incremental syncs have something to pick up.
+
+Run with: python scripts/shopify_standin.py [--orders 20000] [--port 8790]
+Then point the app at it: SHOPIFY_API_BASE_URL=http://127.0.0.1:8790
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class Bucket:
+    """Shopify's REST leaky bucket: `capacity` calls, draining `leak_rate` per second."""
+
+    def __init__(self, capacity: int, leak_rate: float):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.level = 0.0
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.level = max(0.0, self.level - (now - self.updated) * self.leak_rate)
+        self.updated = now
+        if self.level + 1 > self.capacity:
+            return False
+        self.level += 1
+        return True
+
+    def header(self) -> str:
+        return f"{int(self.level)}/{self.capacity}"
+
+
+def _iso(value: datetime) -> str:
+    return value.isoformat(timespec="seconds")
+
+
+def _make_order(order_id: int, created_at: datetime) -> dict:
+    quantity = random.randint(1, 3)
+    price = round(random.uniform(9, 120), 2)
+    financial_status = random.choice(["paid", "paid", "pending", "refunded"])
+    return {
+        "id": order_id,
+        "order_number": order_id - 4_000_000_000 + 1000,
+        "email": f"customer{order_id % 5000}@example.com",
+        "phone": None,
+        "created_at": _iso(created_at),
+        "updated_at": _iso(created_at),
+        "cancelled_at": None,
+        "financial_status": financial_status,
+        "fulfillment_status": None,
+        "currency": "USD",
+        "total_price": f"{price * quantity:.2f}",
+        "tags": random.choice(["", "vip", "wholesale, repeat"]),
+        "customer": {
+            "id": 7_000_000 + order_id % 5000,
+            "first_name": "Customer",
+            "last_name": str(order_id % 5000),
+            "email": f"customer{order_id % 5000}@example.com",
+        },
+        "line_items": [
+            {"name": "Cotton Tee", "quantity": quantity, "price": f"{price:.2f}", "sku": "TEE", "product_id": 1, "variant_id": 11}
+        ],
+        "fulfillments": [],
+    }
+
+
+def build_app(args) -> FastAPI:
+    app = FastAPI(title="Shopify stand-in")
+    now = datetime.now(timezone.utc)
+    orders = {}
+    for index in range(args.orders):
+        order_id = 4_000_000_000 + index
+        orders[order_id] = _make_order(order_id, now - timedelta(days=args.days) + timedelta(days=args.days) * index / args.orders)
+    bucket = Bucket(args.bucket_size, args.leak_rate)
+    stats = {"requests": 0, "throttled": 0}
+
+    def _touch_random_orders(count: int):
+        stamp = _iso(datetime.now(timezone.utc))
+        for order_id in random.sample(list(orders), min(count, len(orders))):
+            order = orders[order_id]
+            if random.random() < 0.5:
+                order["fulfillment_status"] = "fulfilled"
+                order["fulfillments"] = [{"created_at": stamp}]
+            else:
+                order["tags"] = "updated"
+            order["updated_at"] = stamp
+
+    @app.on_event("startup")
+    async def _start_mutator():
+        async def mutate():
+            while True:
+                await asyncio.sleep(1)
+                _touch_random_orders(args.updates_per_second)
+
+        if args.updates_per_second:
+            asyncio.get_running_loop().create_task(mutate())
+
+    @app.middleware("http")
+    async def rate_limit(request: Request, call_next):
+        stats["requests"] += 1
+        if args.latency_ms:
+            await asyncio.sleep(args.latency_ms / 1000)
+        if not bucket.take():
+            stats["throttled"] += 1
+            return JSONResponse(
+                {"errors": "Exceeded 2 calls per second for api client. Reduce request rates to resume uninterrupted service."},
+                status_code=429,
+                headers={"Retry-After": "1.0", "X-Shopify-Shop-Api-Call-Limit": bucket.header()},
+            )
+        response = await call_next(request)
+        response.headers["X-Shopify-Shop-Api-Call-Limit"] = bucket.header()
+        return response
+
+    @app.get("/admin/api/{version}/orders.json")
+    async def list_orders(
+        request: Request,
+        limit: int = 50,
+        status: str = "any",
+        since_id: Optional[int] = None,
+        updated_at_min: Optional[str] = None,
+        updated_at_max: Optional[str] = None,
+        page_info: Optional[str] = None,
+    ):
+        if page_info:
+            cursor = json.loads(base64.urlsafe_b64decode(page_info))
+            since_id, updated_at_min, updated_at_max = cursor["since_id"], cursor["min"], cursor["max"]
+            offset = cursor["offset"]
+        else:
+            offset = 0
+
+        lower = datetime.fromisoformat(updated_at_min) if updated_at_min else None
+        upper = datetime.fromisoformat(updated_at_max) if updated_at_max else None
+        matching = [
+            order for order_id, order in sorted(orders.items())
+            if (since_id is None or order_id > since_id)
+            and (lower is None or datetime.fromisoformat(order["updated_at"]) >= lower)
+            and (upper is None or datetime.fromisoformat(order["updated_at"]) <= upper)
+        ]
+
+        limit = min(limit, 250)
+        page = matching[offset:offset + limit]
+        headers = {}
+        if offset + limit < len(matching):
+            next_cursor = base64.urlsafe_b64encode(json.dumps({
+                "since_id": since_id, "min": updated_at_min, "max": updated_at_max, "offset": offset + limit,
+            }).encode()).decode()
+            next_url = str(request.url.replace_query_params(limit=limit, page_info=next_cursor))
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return JSONResponse({"orders": page}, headers=headers)
+
+    @app.get("/admin/api/{version}/orders/{order_id}.json")
+    async def get_order(order_id: int):
+        if order_id not in orders:
+            return JSONResponse({"errors": "Not Found"}, status_code=404)
+        return {"order": orders[order_id]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return {**stats, "orders": len(orders)}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=365, help="Spread order creation over this many days")
+    parser.add_argument("--updates-per-second", type=int, default=5, help="Orders touched per second")
+    parser.add_argument("--bucket-size", type=int, default=40)
+    parser.add_argument("--leak-rate", type=float, default=2.0)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="Added to every response")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+
+    random.seed(0)
+    import uvicorn
+    uvicorn.run(build_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Tests for the conversation memory window and refresh schedule."""
+
+import pytest
+
+from app.core.config import settings
+from app.services.conversation_memory import fit_to_budget, refresh_due
+from app.services.token_budget import token_counter
+
+
+@pytest.fixture(autouse=True)
+def schedule(monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_RECENT_TURNS", 6)
+    monkeypatch.setattr(settings, "CONVERSATION_SUMMARY_EVERY_TURNS", 10)
+    monkeypatch.setattr(token_counter, "factor", 1.0)
+
+
+def test_refresh_is_due_once_enough_turns_pile_up_beyond_the_window():
+    assert not refresh_due(0, 15)
+    assert refresh_due(14, 16)
+    assert not refresh_due(16, 18)
+
+
+def test_refresh_is_due_again_every_interval_if_one_is_lost():
+    assert not refresh_due(18, 25)
+    assert refresh_due(25, 27)
+    assert refresh_due(34, 36)
+
+
+def test_refresh_is_due_when_a_big_step_crosses_the_threshold():
+    assert refresh_due(0, 40)
+
+
+def turns(*contents):
+    return [{"role": "user", "content": content} for content in contents]
+
+
+def test_fit_to_budget_keeps_the_newest_turns_oldest_first():
+    history = turns("a" * 40, "b" * 40, "c" * 40)
+
+    window = fit_to_budget(history, 20)
+
+    assert [turn["content"][0] for turn in window] == ["b", "c"]
+
+
+def test_fit_to_budget_stops_at_the_first_turn_that_does_not_fit():
+    history = turns("a" * 4, "b" * 400, "c" * 40)
+
+    window = fit_to_budget(history, 50)
+
+    assert [turn["content"][0] for turn in window] == ["c"]
+
+
+def test_fit_to_budget_always_keeps_a_cut_down_newest_turn():
+    window = fit_to_budget(turns("x" * 400), 10)
+
+    assert len(window) == 1
+    assert window[0]["content"].endswith("...")
+    assert token_counter.count(window[0]["content"]) <= 10
+
+
+def test_fit_to_budget_of_nothing_is_empty():
+    assert fit_to_budget([], 100) == []
@@ -0,0 +1,171 @@
+"""Tests for the deterministic fast path."""
+
+from uuid import uuid4
+
+import pytest
+
+from app.core.config import settings
+from app.db.models import AutoResponseTemplate, BusinessContext, Product
+from app.services.fast_path import FastPathRouter, detect_intent
+from app.services.usage_counters import usage_counters
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return list(self.rows)
+
+    def scalar_one_or_none(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeSession:
+    """Answers execute() with the queued row lists, in order (then nothing)."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return FakeResult(self.results.pop(0) if self.results else [])
+
+
+@pytest.fixture(autouse=True)
+def fast_path_settings(monkeypatch):
+    monkeypatch.setattr(settings, "FAST_PATH_ENABLED", True)
+    monkeypatch.setattr(settings, "FAST_PATH_MIN_CONFIDENCE", 0.8)
+    monkeypatch.setattr(settings, "FAST_PATH_MAX_CHARS", 200)
+    monkeypatch.setattr(usage_counters, "_pending", {})
+
+
+def template(keywords, text="We open at 9.", **fields):
+    return AutoResponseTemplate(
+        id=uuid4(),
+        name=fields.pop("name", "hours"),
+        trigger_keywords=keywords,
+        response_template=text,
+        **fields,
+    )
+
+
+HOURS = BusinessContext(
+    context_type="business_hours",
+    context_key="business_hours",
+    title="Hours",
+    content="Mon-Fri 9:00-17:00",
+)
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("Where is my order?", "order_status"),
+    ("¿Dónde está mi pedido?", "order_status"),
+    ("أين طلبي", "order_status"),
+    ("What are your opening hours?", "business_hours"),
+    ("Quel est le prix de la chemise ?", "product_price"),
+    ("How much is the blue shirt?", "product_price"),
+])
+def test_detect_intent_recognizes_common_questions(message, intent):
+    detected = detect_intent(message)
+
+    assert detected == {"intent": intent, "confidence": 0.9}
+
+
+def test_detect_intent_ignores_other_messages():
+    assert detect_intent("I love your new collection") is None
+
+
+def test_problems_and_long_messages_lower_the_confidence():
+    assert detect_intent("Where is my order? It is late")["confidence"] == 0.6
+    long_message = "where is my order " + "please tell me more about it " * 3
+    assert detect_intent(long_message)["confidence"] == 0.7
+    assert detect_intent("Where is my order? And when do you open?")["confidence"] == 0.7
+
+
+async def test_strong_template_answers_and_records_usage():
+    strong = template(["open", "today"], text="Hi {{customer_name}}, we open at 9.")
+    router = FastPathRouter(FakeSession([strong]), uuid4())
+
+    answer = await router.answer("are you open today", "c1", "telegram", customer_name="Sara")
+
+    assert answer.source == "template:hours"
+    assert answer.text == "Hi Sara, we open at 9."
+    assert answer.confidence >= 0.8
+    assert usage_counters._pending[(AutoResponseTemplate, strong.id)]["count"] == 1
+
+
+async def test_weak_template_does_not_hide_the_rules():
+    weak = template(["open"])
+    session = FakeSession([weak], [HOURS])
+    router = FastPathRouter(session, uuid4())
+
+    answer = await router.answer("are you open", "c1", "telegram")
+
+    assert answer.source == "business_context:business_hours"
+    assert answer.text == "Mon-Fri 9:00-17:00"
+    assert usage_counters._pending == {}
+
+
+async def test_template_matching_intent_gets_a_boost():
+    boosted = template(["hours"], trigger_intent="business_hours")
+    router = FastPathRouter(FakeSession([boosted]), uuid4())
+
+    answer = await router.answer("What are your opening hours?", "c1", "telegram")
+
+    assert answer.source == "template:hours"
+    assert answer.confidence == 0.85
+
+
+async def test_keywords_match_whole_words_only():
+    pins = template(["pin", "price"], name="pins")
+    router = FastPathRouter(FakeSession([pins]), uuid4())
+
+    assert await router.answer("what is the shipping price", "c1", "telegram") is None
+
+
+async def test_templates_needing_unknown_data_are_skipped():
+    needs_order = template(["open", "today"], text="Your order {{order_number}} ships today.")
+    router = FastPathRouter(FakeSession([needs_order], [HOURS]), uuid4())
+
+    answer = await router.answer("are you open today", "c1", "telegram")
+
+    assert answer.source == "business_context:business_hours"
+
+
+async def test_templates_for_other_platforms_are_skipped():
+    whatsapp_only = template(["open", "today"], trigger_platforms=["whatsapp"])
+    router = FastPathRouter(FakeSession([whatsapp_only], [HOURS]), uuid4())
+
+    answer = await router.answer("are you open today", "c1", "telegram")
+
+    assert answer.source == "business_context:business_hours"
+
+
+async def test_product_price_needs_an_unambiguous_whole_word_match():
+    shirt = Product(id=uuid4(), name="Blue Shirt", price=20.0, currency="USD", in_stock=True)
+    pin = Product(id=uuid4(), name="Pin", price=3.0, currency="USD", in_stock=True)
+    router = FastPathRouter(FakeSession([], [shirt, pin]), uuid4())
+
+    answer = await router.answer("How much is the blue shirt?", "c1", "telegram")
+
+    assert answer.text == "Blue Shirt costs 20.00 USD. It's in stock."
+    assert answer.entities["product_id"] == str(shirt.id)
+
+
+async def test_unconfident_messages_go_to_the_llm():
+    router = FastPathRouter(FakeSession([]), uuid4())
+
+    assert await router.answer("Where is my order? It is late", "c1", "telegram") is None
+
+
+async def test_disabled_fast_path_never_answers(monkeypatch):
+    monkeypatch.setattr(settings, "FAST_PATH_ENABLED", False)
+    session = FakeSession()
+
+    assert await FastPathRouter(session, uuid4()).answer("are you open", "c1", "telegram") is None
+    assert session.statements == []
@@ -0,0 +1,145 @@
+"""Tests for the per-key lock and the inbound dispatcher."""
+
+import asyncio
+
+from app.core import database
+from app.services.inbound_dispatcher import InboundDispatcher, KeyedLock
+
+
+async def test_keyed_lock_serializes_one_key_and_cleans_up():
+    locks = KeyedLock()
+    events = []
+
+    async def hold(key, name):
+        async with locks.acquire(key):
+            events.append(f"{name}:start")
+            await asyncio.sleep(0.01)
+            events.append(f"{name}:end")
+
+    await asyncio.gather(hold("a", "first"), hold("a", "second"))
+
+    assert events == ["first:start", "first:end", "second:start", "second:end"]
+    assert len(locks) == 0
+
+
+async def test_keyed_lock_does_not_block_other_keys():
+    locks = KeyedLock()
+    inside = asyncio.Event()
+
+    async def hold_a():
+        async with locks.acquire("a"):
+            await asyncio.wait_for(inside.wait(), timeout=1)
+
+    async def hold_b():
+        async with locks.acquire("b"):
+            inside.set()
+
+    await asyncio.gather(hold_a(), hold_b())
+    assert len(locks) == 0
+
+
+async def test_jobs_of_one_key_run_in_submission_order():
+    dispatcher = InboundDispatcher(max_concurrency=4, debounce_seconds=0, max_debounce_seconds=0)
+    done = []
+
+    def job(name, delay):
+        async def run():
+            await asyncio.sleep(delay)
+            done.append(name)
+        return run
+
+    dispatcher.submit("p:c1", job("slow", 0.03))
+    dispatcher.submit("p:c1", job("fast", 0))
+    dispatcher.submit("p:c2", job("other", 0))
+    await dispatcher.stop(timeout=1)
+
+    assert done.index("slow") < done.index("fast")
+    assert done[0] == "other"  # Different customers don't wait for each other
+    assert dispatcher.get_stats()["processed"] == 3
+
+
+async def test_failed_job_does_not_stop_the_queue():
+    dispatcher = InboundDispatcher(max_concurrency=1, debounce_seconds=0, max_debounce_seconds=0)
+    done = []
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def succeed():
+        done.append("ok")
+
+    dispatcher.submit("k", fail)
+    dispatcher.submit("k", succeed)
+    await dispatcher.stop(timeout=1)
+
+    assert done == ["ok"]
+    assert dispatcher.get_stats()["failed"] == 1
+
+
+async def test_burst_is_coalesced_into_one_call():
+    dispatcher = InboundDispatcher(max_concurrency=4, debounce_seconds=0.05, max_debounce_seconds=1)
+    calls = []
+
+    async def handler(items):
+        calls.append(list(items))
+
+    for text in ("hi", "I want", "a blue shirt"):
+        dispatcher.submit_burst("p:c1", text, handler)
+        await asyncio.sleep(0.01)
+    await dispatcher.stop(timeout=1)
+
+    assert calls == [["hi", "I want", "a blue shirt"]]
+    assert dispatcher.get_stats()["coalesced"] == 2
+
+
+async def test_items_arriving_during_a_turn_join_the_next_one():
+    dispatcher = InboundDispatcher(max_concurrency=4, debounce_seconds=0.01, max_debounce_seconds=1)
+    calls = []
+    started = asyncio.Event()
+
+    async def handler(items):
+        calls.append(list(items))
+        started.set()
+        await asyncio.sleep(0.05)
+
+    dispatcher.submit_burst("k", "first", handler)
+    await asyncio.wait_for(started.wait(), timeout=1)
+    dispatcher.submit_burst("k", "second", handler)
+    dispatcher.submit_burst("k", "third", handler)
+    await dispatcher.stop(timeout=1)
+
+    assert calls == [["first"], ["second", "third"]]
+
+
+async def test_max_debounce_bounds_a_continuous_burst():
+    dispatcher = InboundDispatcher(max_concurrency=4, debounce_seconds=0.05, max_debounce_seconds=0.08)
+    calls = []
+
+    async def handler(items):
+        calls.append(list(items))
+
+    for number in range(8):
+        dispatcher.submit_burst("k", number, handler)
+        await asyncio.sleep(0.02)
+    await dispatcher.stop(timeout=1)
+
+    assert len(calls) >= 2
+    assert [item for call in calls for item in call] == list(range(8))
+
+
+async def test_each_job_starts_with_replica_reads_allowed():
+    dispatcher = InboundDispatcher(max_concurrency=4, debounce_seconds=0, max_debounce_seconds=0)
+    seen = []
+
+    async def write():
+        database._wrote_to_primary.set(True)
+
+    async def read():
+        seen.append(database._wrote_to_primary.get())
+
+    dispatcher.submit("p:c1", write)
+    dispatcher.submit("p:c1", read)
+    await dispatcher.stop(timeout=1)
+
+    # A write in one job doesn't pin the next job's reads to the primary
+    assert seen == [False]
@@ -0,0 +1,171 @@
+"""Tests for the local intent classifier."""
+
+import itertools
+from uuid import uuid4
+
+import pytest
+
+from app.core.config import settings
+from app.services.intent_classifier import (
+    HASH_DIM,
+    IntentClassifier,
+    LinearHead,
+    LocalIntentService,
+    featurize,
+    train_classifier,
+)
+
+PRODUCTS = ["shirt", "dress", "jacket", "hoodie", "scarf", "belt", "hat", "bag", "jeans", "sneakers"]
+COLORS = ["red", "blue", "black", "white", "green", "grey"]
+
+TEMPLATES = {
+    ("order_status", "high", "negative"): [
+        "where is my order of the {color} {product}",
+        "my {product} order has not arrived yet",
+        "when will my {color} {product} be delivered",
+    ],
+    ("product_inquiry", "low", "neutral"): [
+        "do you have the {product} in {color}",
+        "is the {color} {product} available in medium",
+        "what sizes does the {product} come in",
+    ],
+    ("complaint", "urgent", "negative"): [
+        "the {color} {product} arrived broken i want a refund now",
+        "terrible quality my {product} is damaged refund me",
+        "worst service ever the {product} was wrong",
+    ],
+}
+
+
+def labeled_rows():
+    rows = []
+    for (intent, urgency, sentiment), templates in TEMPLATES.items():
+        for text, product, color in itertools.product(templates, PRODUCTS, COLORS):
+            message = text.format(product=product, color=color)
+            rows.append((message, {"intent": intent, "urgency": urgency, "sentiment": sentiment}))
+    return rows
+
+
+@pytest.fixture(scope="module")
+def trained():
+    classifier, report = train_classifier(labeled_rows(), threshold=0.5)
+    assert classifier is not None, report
+    return classifier, report
+
+
+def test_features_are_normalized_and_stable():
+    features = featurize("Where is my order?")
+
+    assert features == featurize("  where IS my   order?")
+    assert all(0 <= index < HASH_DIM for index in features)
+    assert abs(sum(value * value for value in features.values()) - 1.0) < 1e-9
+    assert featurize("") == {}
+
+
+def test_trained_heads_predict_unseen_messages(trained):
+    classifier, _ = trained
+
+    prediction = classifier.predict("where is my order of the purple coat")
+
+    assert prediction["intent"][0] == "order_status"
+    assert prediction["urgency"][0] == "high"
+    assert classifier.predict("the coat arrived broken i want a refund")["intent"][0] == "complaint"
+
+
+def test_report_covers_every_head(trained):
+    _, report = trained
+
+    assert set(report["heads"]) == {"intent", "urgency", "sentiment"}
+    intent = report["heads"]["intent"]
+    assert intent["accuracy"] >= 0.9
+    assert 0 < intent["test_samples"] < report["samples"]
+    assert set(intent["labels"]) == {"order_status", "product_inquiry", "complaint"}
+    assert report["latency_us"]["p50"] > 0
+
+
+def test_serialized_model_predicts_the_same(trained):
+    classifier, _ = trained
+    restored = IntentClassifier.from_dict(classifier.to_dict())
+
+    for text in ("do you have the hat in pink", "my belt order has not arrived"):
+        original, loaded = classifier.predict(text), restored.predict(text)
+        assert original["intent"][0] == loaded["intent"][0]
+        assert abs(original["intent"][1] - loaded["intent"][1]) < 1e-2
+
+
+def test_model_from_another_feature_space_is_rejected(trained):
+    classifier, _ = trained
+    data = {**classifier.to_dict(), "hash_dim": HASH_DIM // 2}
+
+    with pytest.raises(ValueError):
+        IntentClassifier.from_dict(data)
+
+
+def test_rare_labels_are_left_out():
+    rows = labeled_rows() + [("can i pay with crypto", {"intent": "payment", "urgency": "low"})] * 3
+
+    classifier, report = train_classifier(rows, threshold=0.5)
+
+    assert "payment" not in classifier.heads["intent"].labels
+    assert "payment" not in report["heads"]["intent"]["labels"]
+
+
+def test_no_model_without_an_urgency_head():
+    rows = [(text, {"intent": labels["intent"]}) for text, labels in labeled_rows()]
+
+    classifier, report = train_classifier(rows, threshold=0.5)
+
+    assert classifier is None
+    assert "skipped" in report["heads"]["urgency"]
+
+
+def test_linear_head_learns_a_separable_problem():
+    samples = [(featurize(f"yes {n}"), "yes") for n in range(20)] + [(featurize(f"no {n}"), "no") for n in range(20)]
+    head = LinearHead(["no", "yes"])
+    head.fit(samples)
+
+    assert head.predict(featurize("yes please"))[0] == "yes"
+    assert abs(sum(head.predict_proba(featurize("no thanks"))) - 1.0) < 1e-9
+
+
+class StaticService(LocalIntentService):
+    def __init__(self, classifier):
+        super().__init__()
+        self.classifier = classifier
+
+    async def _classifier(self, db, project_id):
+        return self.classifier
+
+
+@pytest.fixture
+def local_settings(monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_INTENT_ENABLED", True)
+    monkeypatch.setattr(settings, "LOCAL_INTENT_MIN_CONFIDENCE", 0.5)
+
+
+async def test_confident_prediction_replaces_the_llm(trained, local_settings):
+    classifier, _ = trained
+
+    intent = await StaticService(classifier).classify(None, uuid4(), "where is my order of the red hat")
+
+    assert intent["primary_intent"] == "order_status"
+    assert intent["urgency"] == "high"
+    assert intent["source"] == "local"
+
+
+async def test_model_without_urgency_is_never_served(trained, local_settings):
+    classifier, _ = trained
+    intent_only = IntentClassifier({"intent": classifier.heads["intent"]})
+
+    assert await StaticService(intent_only).classify(None, uuid4(), "where is my order of the red hat") is None
+
+
+async def test_unsure_prediction_goes_to_the_llm(trained, local_settings, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_INTENT_MIN_CONFIDENCE", 1.01)
+    classifier, _ = trained
+
+    assert await StaticService(classifier).classify(None, uuid4(), "where is my order of the red hat") is None
+
+
+async def test_no_model_means_no_local_intent(local_settings):
+    assert await StaticService(None).classify(None, uuid4(), "where is my order") is None
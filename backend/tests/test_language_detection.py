@@ -0,0 +1,58 @@
+"""Tests for the cached language identifier."""
+
+import pytest
+
+from app.services.language_detection import LanguageIdentifier
+
+
+@pytest.fixture
+def identifier():
+    return LanguageIdentifier()
+
+
+def test_detects_supported_languages(identifier):
+    assert identifier.detect("Hello, I would like to know the price of this shirt") == "en"
+    assert identifier.detect("Hola, quisiera saber el precio de esta camisa por favor") == "es"
+    assert identifier.detect("Bonjour, je voudrais connaître le prix de cette chemise") == "fr"
+
+
+def test_arabic_script_skips_the_model(identifier):
+    assert identifier.detect_with_source("مرحبا، كم سعر هذا القميص؟") == ("ar", "script")
+
+
+def test_short_messages_reuse_the_customer_language(identifier):
+    identifier.detect("Bonjour, je voudrais connaître le prix de cette chemise", customer_key="p:c1")
+
+    assert identifier.detect_with_source("ok", customer_key="p:c1") == ("fr", "memo")
+    assert identifier.detect_with_source("ok", customer_key="p:c2")[1] != "memo"
+
+
+def test_empty_text_is_undetermined(identifier):
+    assert identifier.detect_with_source("   ") == (None, "none")
+    assert identifier.detect_with_source(None) == (None, "none")
+
+
+def test_remember_ignores_unsupported_languages(identifier):
+    identifier.remember("p:c1", "de")
+    identifier.remember("p:c2", "es")
+
+    assert identifier.detect_with_source("ok", customer_key="p:c1")[1] != "memo"
+    assert identifier.detect_with_source("ok", customer_key="p:c2") == ("es", "memo")
+
+
+def test_results_are_cached(identifier):
+    text = "Hello, I would like to know the price of this shirt"
+    first = identifier.detect(text)
+    second = identifier.detect(text.upper())
+
+    assert first == second == "en"
+    assert identifier.get_stats()["cache_hits"] == 1
+
+
+def test_customer_memo_is_bounded():
+    identifier = LanguageIdentifier(customer_memo_size=2)
+    for key in ("a", "b", "c"):
+        identifier.remember(key, "en")
+
+    assert identifier.get_stats()["customers_memoized"] == 2
+    assert identifier.detect_with_source("ok", customer_key="a")[1] != "memo"
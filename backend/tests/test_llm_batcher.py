@@ -0,0 +1,206 @@
+"""Tests for micro-batching of small LLM prompts."""
+
+import asyncio
+import json
+from uuid import uuid4
+
+import pytest
+
+from app.services.enhanced_ai_service import EnhancedAIService
+from app.services.gemini_client import GeminiClient
+from app.services.llm_batcher import PromptBatcher, prompt_batcher
+
+
+class FakeClient:
+    """Records prompts; answers batched prompts with `reply(prompt)`."""
+
+    def __init__(self, reply=None, allowed=lambda user_id: True):
+        self.prompts = []
+        self.reply = reply or self.answer_all
+        self.allowed = allowed
+        self.usage = []
+
+    @staticmethod
+    def answer_all(prompt):
+        count = prompt.count("\nInput ")
+        return json.dumps({str(number): f"answer {number}" for number in range(1, count + 1)})
+
+    async def generate_response(self, prompt, use_functions, task, user_id=None, max_tokens=None):
+        self.prompts.append(prompt)
+        await asyncio.sleep(0)
+        if "Input 1:" in prompt:
+            return {"text": self.reply(prompt), "prompt_tokens": 100, "completion_tokens": 10}
+        return {"text": "single: " + prompt.rsplit("\n", 1)[-1]}
+
+    async def _check_usage_limit(self, user_id):
+        return self.allowed(user_id)
+
+    async def _track_usage(self, **kwargs):
+        self.usage.append(kwargs)
+
+
+def batcher(client, **options):
+    return PromptBatcher(client, window_ms=options.pop("window_ms", 20), enabled=True, **options)
+
+
+async def test_concurrent_requests_share_one_call():
+    client = FakeClient()
+    prompts = batcher(client, max_items=10)
+    project = uuid4()
+
+    answers = await asyncio.gather(*(
+        prompts.submit("intent", "Classify.", f"message {n}", project_id=project)
+        for n in range(3)
+    ))
+
+    assert answers == ["answer 1", "answer 2", "answer 3"]
+    assert len(client.prompts) == 1
+
+
+async def test_batch_is_sent_early_at_max_items():
+    client = FakeClient()
+    prompts = batcher(client, max_items=2, window_ms=10_000)
+    project = uuid4()
+
+    answers = await asyncio.wait_for(asyncio.gather(
+        prompts.submit("intent", "Classify.", "a", project_id=project),
+        prompts.submit("intent", "Classify.", "b", project_id=project),
+    ), timeout=1)
+
+    assert answers == ["answer 1", "answer 2"]
+
+
+async def test_projects_and_instructions_are_never_mixed():
+    client = FakeClient()
+    prompts = batcher(client, max_items=10)
+    first, second = uuid4(), uuid4()
+
+    await asyncio.gather(
+        prompts.submit("intent", "Classify.", "first-a", project_id=first),
+        prompts.submit("intent", "Classify.", "first-b", project_id=first),
+        prompts.submit("intent", "Classify.", "second-a", project_id=second),
+        prompts.submit("intent", "Summarize.", "first-c", project_id=first),
+    )
+
+    batched = [prompt for prompt in client.prompts if "Input 1:" in prompt]
+    assert len(batched) == 1
+    assert "first-a" in batched[0] and "first-b" in batched[0]
+    assert "second-a" not in batched[0] and "first-c" not in batched[0]
+    assert len(client.prompts) == 3
+
+
+async def test_requests_without_a_project_are_not_batched():
+    client = FakeClient()
+    prompts = batcher(client, max_items=10)
+
+    answers = await asyncio.gather(
+        prompts.submit("intent", "Classify.", "a"),
+        prompts.submit("intent", "Classify.", "b"),
+    )
+
+    assert answers == ["single: a", "single: b"]
+    assert prompts.get_stats()["batched_calls"] == 0
+
+
+async def test_missing_answers_are_retried_one_by_one():
+    client = FakeClient(reply=lambda prompt: json.dumps({"1": "answer 1"}))
+    prompts = batcher(client, max_items=10)
+    project = uuid4()
+
+    answers = await asyncio.gather(
+        prompts.submit("intent", "Classify.", "a", project_id=project),
+        prompts.submit("intent", "Classify.", "b", project_id=project),
+    )
+
+    assert answers == ["answer 1", "single: b"]
+    assert prompts.get_stats()["fallbacks"] == 1
+
+
+async def test_unparseable_reply_falls_back_for_everyone():
+    client = FakeClient(reply=lambda prompt: "Sorry, I can't help with that.")
+    prompts = batcher(client, max_items=10)
+    project = uuid4()
+
+    answers = await asyncio.gather(
+        prompts.submit("intent", "Classify.", "a", project_id=project),
+        prompts.submit("intent", "Classify.", "b", project_id=project),
+    )
+
+    assert answers == ["single: a", "single: b"]
+
+
+async def test_list_replies_are_accepted():
+    client = FakeClient(reply=lambda prompt: '```json\n["x", {"label": "y"}]\n```')
+    prompts = batcher(client, max_items=10)
+    project = uuid4()
+
+    answers = await asyncio.gather(
+        prompts.submit("intent", "Classify.", "a", project_id=project),
+        prompts.submit("intent", "Classify.", "b", project_id=project),
+    )
+
+    assert answers == ["x", '{"label": "y"}']
+
+
+async def test_callers_over_their_limit_get_a_single_call():
+    blocked = uuid4()
+    client = FakeClient(allowed=lambda user_id: user_id != blocked)
+    prompts = batcher(client, max_items=10)
+    project = uuid4()
+    allowed_users = [uuid4(), uuid4()]
+
+    answers = await asyncio.gather(
+        prompts.submit("intent", "Classify.", "a", user_id=allowed_users[0], project_id=project),
+        prompts.submit("intent", "Classify.", "b", user_id=blocked, project_id=project),
+        prompts.submit("intent", "Classify.", "c", user_id=allowed_users[1], project_id=project),
+    )
+
+    assert answers == ["answer 1", "single: b", "answer 2"]
+    # The batched call is billed in equal shares to its callers
+    assert [usage["user_id"] for usage in client.usage] == allowed_users
+    assert all(usage["tokens_input"] == 50 for usage in client.usage)
+
+
+async def test_errors_reach_every_caller():
+    class FailingClient(FakeClient):
+        async def generate_response(self, **kwargs):
+            raise RuntimeError("quota exceeded")
+
+    prompts = batcher(FailingClient(), max_items=10)
+    project = uuid4()
+
+    results = await asyncio.gather(
+        prompts.submit("intent", "Classify.", "a", project_id=project),
+        prompts.submit("intent", "Classify.", "b", project_id=project),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.parametrize("options", [{"enabled": False}, {"max_items": 1}])
+async def test_disabled_batching_sends_single_calls(options):
+    client = FakeClient()
+    prompts = PromptBatcher(client, window_ms=20, **{"enabled": True, **options})
+
+    answer = await prompts.submit("intent", "Classify.", "a", project_id=uuid4())
+
+    assert answer == "single: a"
+
+
+async def test_separately_built_services_share_one_batch(monkeypatch):
+    fake = FakeClient()
+    monkeypatch.setattr(GeminiClient, "generate_response", lambda client, **kwargs: fake.generate_response(**kwargs))
+    monkeypatch.setattr(prompt_batcher, "enabled", True)
+    project = uuid4()
+    # Each service builds its own GeminiClient, as per-message services do
+    services = [EnhancedAIService(None, project), EnhancedAIService(None, project)]
+    assert services[0].gemini_client is not services[1].gemini_client
+
+    answers = await asyncio.gather(*(
+        service.gemini_client.classify("intent", "Classify.", f"message {n}", project_id=project)
+        for n, service in enumerate(services)
+    ))
+
+    assert answers == ["answer 1", "answer 2"]
+    assert len(fake.prompts) == 1
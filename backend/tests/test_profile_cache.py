@@ -0,0 +1,39 @@
+"""Tests for publishing cached profiles only after their transaction commits."""
+
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import CustomerProfile
+from app.services.profile_cache import profile_cache
+
+
+def profile(**fields):
+    return CustomerProfile(**{"id": uuid4(), "project_id": uuid4(), "customer_id": "c1", **fields})
+
+
+async def test_snapshot_is_published_on_commit():
+    written = profile(preferred_language="fr")
+
+    async with AsyncSession() as session:
+        profile_cache.put_on_commit(session, written)
+        assert profile_cache.get(written.project_id, "c1") is None
+        await session.commit()
+
+    cached = profile_cache.get(written.project_id, "c1")
+    assert cached is not written
+    assert cached.preferred_language == "fr"
+
+
+async def test_snapshot_is_discarded_on_rollback():
+    written = profile(preferred_language="fr")
+    profile_cache.put(profile(project_id=written.project_id, preferred_language="en"))
+
+    async with AsyncSession() as session:
+        await session.begin()
+        profile_cache.put_on_commit(session, written)
+        await session.rollback()
+        await session.commit()  # Nothing left to publish
+
+    # The old entry is gone as well: it was about to change
+    assert profile_cache.get(written.project_id, "c1") is None
@@ -0,0 +1,104 @@
+"""Tests for the Shopify client and order upserts."""
+
+import base64
+import hashlib
+import hmac
+from uuid import uuid4
+
+import httpx
+from sqlalchemy.dialects import postgresql
+
+from app.services.integrations.shopify import ShopifyService
+from app.services.order_manager import OrderManager
+
+SHOP = "https://demo.myshopify.com/admin/api/2024-01"
+
+
+class FakeResult:
+    def scalars(self):
+        return self
+
+    def all(self):
+        return []
+
+
+class FakeSession:
+    """Records statements; nothing is written back."""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        self.statements.append(statement)
+        return FakeResult()
+
+
+def shopify(handler, **credentials):
+    service = ShopifyService("demo.myshopify.com", "key", "secret", **credentials)
+    service._client = httpx.AsyncClient(base_url=SHOP, transport=httpx.MockTransport(handler))
+    return service
+
+
+def signature(secret, body):
+    return base64.b64encode(hmac.new(secret.encode(), body, hashlib.sha256).digest()).decode()
+
+
+def order(order_id, updated_at, financial_status="paid"):
+    return {"id": order_id, "updated_at": updated_at, "financial_status": financial_status, "total_price": "10.00"}
+
+
+async def test_iter_orders_follows_link_header():
+    requests = []
+
+    def handler(request):
+        requests.append(request.url)
+        if "page_info" in str(request.url):
+            return httpx.Response(200, json={"orders": [{"id": 3}]})
+        return httpx.Response(
+            200,
+            json={"orders": [{"id": 1}, {"id": 2}]},
+            headers={"Link": f'<{SHOP}/orders.json?page_info=abc&limit=2>; rel="next"'},
+        )
+
+    async with shopify(handler) as service:
+        pages = [page async for page in service.iter_orders(since_id="0", page_size=2)]
+
+    assert pages == [[{"id": 1}, {"id": 2}], [{"id": 3}]]
+    assert requests[0].params["since_id"] == "0"
+    # The cursor URL carries its own query; filters are not sent again
+    assert dict(requests[1].params) == {"page_info": "abc", "limit": "2"}
+
+
+async def test_upsert_collapses_each_order_to_its_newest_payload():
+    db = FakeSession()
+    manager = OrderManager(db, uuid4())
+
+    await manager.upsert_shopify_orders([
+        order(1, "2024-05-01T10:00:00Z", "pending"),
+        order(2, "2024-05-01T09:00:00Z", "pending"),
+        order(1, "2024-05-01T12:00:00Z", "paid"),
+        order(1, "2024-05-01T11:00:00Z", "refunded"),
+    ])
+
+    params = db.statements[0].compile(dialect=postgresql.dialect()).params
+    rows = {params[f"external_id_m{n}"]: params[f"status_m{n}"] for n in range(2)}
+    assert "external_id_m2" not in params
+    assert rows == {"1": "processing", "2": "pending"}
+
+
+def test_verify_webhook_checks_base64_hmac():
+    service = ShopifyService("demo.myshopify.com", "key", "secret")
+    body = b'{"id": 1}'
+
+    assert service.verify_webhook(body, signature("secret", body))
+    assert not service.verify_webhook(body, hmac.new(b"secret", body, hashlib.sha256).hexdigest())
+    assert not service.verify_webhook(b'{"id": 2}', signature("secret", body))
+    assert not service.verify_webhook(body, "")
+
+
+def test_verify_webhook_prefers_the_webhook_secret():
+    service = ShopifyService("demo.myshopify.com", "key", "secret", webhook_secret="hook")
+    body = b'{"id": 1}'
+
+    assert service.verify_webhook(body, signature("hook", body))
+    assert not service.verify_webhook(body, signature("secret", body))
@@ -0,0 +1,105 @@
+"""Tests for token estimates and prompt budgets."""
+
+from app.services.token_budget import PromptBudget, TokenCounter, truncate_to_tokens
+
+# 40 ASCII characters are 10 tokens at factor 1.0
+TEN_TOKENS = "x" * 40
+
+
+def budget(max_tokens):
+    return PromptBudget(max_tokens, counter=TokenCounter(factor=1.0))
+
+
+def test_counter_weighs_non_latin_scripts_heavier():
+    counter = TokenCounter(factor=1.0)
+
+    assert counter.count(TEN_TOKENS) == 10
+    assert counter.count("م" * 20) == 10
+    assert counter.count("") == 0
+
+
+def test_calibration_moves_the_factor_towards_reported_counts():
+    counter = TokenCounter(factor=1.0)
+    counter.calibrate("x" * 400, 150)
+
+    assert counter.factor == 1.5
+    counter.calibrate("short", 100)  # Too short to say anything
+    assert counter.samples == 1
+
+
+def test_truncate_marks_the_cut():
+    counter = TokenCounter(factor=1.0)
+
+    assert truncate_to_tokens(TEN_TOKENS, 10, counter) == TEN_TOKENS
+    cut = truncate_to_tokens(TEN_TOKENS * 2, 10, counter)
+    assert cut.endswith("...") and counter.count(cut) <= 10
+    assert truncate_to_tokens(TEN_TOKENS, 0, counter) == ""
+
+
+def test_prompt_within_budget_is_untouched():
+    prompt = budget(100)
+    prompt.add("system", ["You are helpful. "], required=True)
+    prompt.add("history", [TEN_TOKENS, TEN_TOKENS])
+
+    assert prompt.render() == "You are helpful. " + TEN_TOKENS * 2
+    assert prompt.trimmed == {}
+
+
+def test_lowest_priority_segment_is_trimmed_first():
+    prompt = budget(40)
+    prompt.add("system", [TEN_TOKENS], required=True)
+    prompt.add("catalog", ["c" * 40, "d" * 40], priority=1)
+    prompt.add("history", ["h" * 40, "i" * 40], priority=0)
+
+    rendered = prompt.render()
+
+    assert "h" * 40 in rendered and "i" * 40 not in rendered
+    assert "c" * 40 in rendered and "d" * 40 in rendered
+    assert prompt.trimmed == {"history": 10}
+    assert prompt.tokens == 40
+
+
+def test_required_segments_are_never_trimmed():
+    prompt = budget(5)
+    prompt.add("system", [TEN_TOKENS], required=True)
+    prompt.add("history", [TEN_TOKENS])
+
+    assert prompt.render() == TEN_TOKENS
+    assert prompt.tokens == 10
+
+
+def test_drop_from_start_keeps_the_newest_items():
+    prompt = budget(20)
+    prompt.add("history", ["old " * 10, "mid " * 10, "new " * 10], drop_from="start")
+
+    assert prompt.render() == "mid " * 10 + "new " * 10
+
+
+def test_truncate_shortens_the_last_item_instead_of_dropping_it():
+    prompt = budget(15)
+    prompt.add("system", [TEN_TOKENS], required=True)
+    prompt.add("message", ["y" * 80], truncate=True)
+
+    rendered = prompt.render()
+
+    assert rendered.startswith(TEN_TOKENS + "y")
+    assert rendered.endswith("...")
+    assert prompt.tokens <= 15
+
+
+def test_segment_cap_applies_before_the_overall_budget():
+    prompt = budget(1000)
+    prompt.add("products", [TEN_TOKENS] * 5, header="Products:\n", max_tokens=25)
+
+    prompt.render()
+
+    assert prompt.trimmed["products"] > 0
+    assert prompt.tokens <= 25
+
+
+def test_emptied_segment_drops_its_header():
+    prompt = budget(10)
+    prompt.add("system", [TEN_TOKENS], required=True)
+    prompt.add("faq", ["z" * 40], header="FAQ:\n")
+
+    assert prompt.render() == TEN_TOKENS
@@ -0,0 +1,57 @@
+"""Tests for duplicate suppression of webhook redeliveries."""
+
+from uuid import uuid4
+
+from app.services import webhook_idempotency as idempotency
+from app.services.webhook_idempotency import WebhookIdempotency
+
+
+def guard(**options):
+    return WebhookIdempotency(backend="memory", ttl_seconds=options.pop("ttl_seconds", 60), **options)
+
+
+async def test_redelivery_is_rejected():
+    seen = guard()
+    project = uuid4()
+
+    assert await seen.claim("telegram", "42", project) is True
+    assert await seen.claim("telegram", "42", project) is False
+
+
+async def test_ids_are_scoped_to_provider_and_project():
+    seen = guard()
+    project = uuid4()
+
+    assert await seen.claim("telegram", "42", project) is True
+    assert await seen.claim("facebook", "42", project) is True
+    assert await seen.claim("telegram", "42", uuid4()) is True
+
+
+async def test_deliveries_without_an_id_are_always_processed():
+    seen = guard()
+
+    assert await seen.claim("whatsapp", None) is True
+    assert await seen.claim("whatsapp", None) is True
+
+
+async def test_released_and_expired_ids_are_processed_again(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(idempotency.time, "monotonic", lambda: now[0])
+    seen = guard(ttl_seconds=10)
+
+    await seen.claim("telegram", "released")
+    await seen.release("telegram", "released")
+    assert await seen.claim("telegram", "released") is True
+
+    await seen.claim("telegram", "expired")
+    now[0] += 11
+    assert await seen.claim("telegram", "expired") is True
+
+
+async def test_oldest_ids_are_evicted_at_max_entries():
+    seen = guard(max_entries=2)
+
+    for external_id in ("a", "b", "c"):
+        await seen.claim("telegram", external_id)
+
+    assert list(seen._seen) == [seen._key("telegram", "b", None), seen._key("telegram", "c", None)]